@@ -0,0 +1,112 @@
+"""
+设备聚合结果缓存模块
+将每台设备计算出的聚合结果（库存数据、每日用量、每日状态等）按内容寻址持久化到本地SQLite文件。
+缓存键由设备ID、日期范围、查询模板指纹、源数据水位和体积单位共同决定，
+源数据没有变化时重新运行同一批设备可以跳过数据库读取和计算，直接进入报表生成。
+桶数不参与缓存键，误差结果在读取缓存后按桶数换算。
+缓存文件可能被他人修改，每条结果带有当前用户本地密钥计算的签名，校验通过后才反序列化。
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+
+from .cache_signing import SIGNATURE_SIZE, sign, verify
+
+
+def aggregate_key(device_id, start_date, end_date, fingerprint, watermark, volume_scale=None):
+    """
+    计算聚合结果的内容地址
+
+    Args:
+        device_id: 设备ID
+        start_date (str): 开始日期
+        end_date (str): 结束日期
+        fingerprint (str): 查询模板指纹
+        watermark: 源数据水位（行数、最新时间、合计值等），任一变化都会得到新的地址
+        volume_scale (int, optional): 定点缩放倍数
+
+    Returns:
+        str: SHA1摘要
+    """
+    material = repr((str(device_id), str(start_date), str(end_date), fingerprint, watermark, volume_scale))
+    return hashlib.sha1(material.encode("utf-8")).hexdigest()
+
+
+class AggregateCache:
+    """设备聚合结果的本地缓存，基于SQLite实现"""
+
+    def __init__(self, db_path):
+        """
+        初始化聚合结果缓存
+
+        Args:
+            db_path (str): SQLite数据库文件路径，目录不存在时自动创建
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS aggregate_cache (
+                    cache_key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (cache_key, kind)
+                )
+                """
+            )
+
+    def get(self, cache_key, kind):
+        """
+        读取缓存的聚合结果
+
+        Args:
+            cache_key (str): aggregate_key计算的内容地址
+            kind (str): 聚合结果类型，例如 inventory_data、daily_usage、daily_states
+
+        Returns:
+            缓存的聚合结果，不存在、签名校验失败或无法反序列化时返回None
+        """
+        row = self._conn.execute(
+            "SELECT payload FROM aggregate_cache WHERE cache_key = ? AND kind = ?",
+            (cache_key, kind),
+        ).fetchone()
+        if not row:
+            return None
+        blob = bytes(row[0])
+        signature, payload = blob[:SIGNATURE_SIZE], blob[SIGNATURE_SIZE:]
+        try:
+            # 签名校验通过（由当前用户写入且未被修改）后才反序列化
+            if not verify(f"{cache_key}/{kind}", signature, payload):
+                raise ValueError("缓存内容签名校验失败")
+            return pickle.loads(payload)
+        except Exception as e:
+            print(f"  读取聚合缓存失败，将重新计算: {e}")
+            return None
+
+    def put(self, cache_key, kind, value):
+        """
+        写入聚合结果
+
+        Args:
+            cache_key (str): aggregate_key计算的内容地址
+            kind (str): 聚合结果类型
+            value: 可被pickle序列化的聚合结果
+        """
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        blob = sign(f"{cache_key}/{kind}", payload) + payload
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aggregate_cache (cache_key, kind, payload) VALUES (?, ?, ?)",
+                (cache_key, kind, sqlite3.Binary(blob)),
+            )
+
+    def close(self):
+        """关闭缓存连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
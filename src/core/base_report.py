@@ -12,11 +12,24 @@ class BaseReportGenerator(ABC):
     基础报表生成器类
     提供所有报表生成器的通用功能，如文件操作、日期处理等
     """
-    
+
+    # 报表版本，生成逻辑变化导致输出内容变化时递增，使输出清单中记录的旧报表失效
+    REPORT_VERSION = 1
+
     def __init__(self):
         """初始化基础报表生成器"""
         pass
 
+    @classmethod
+    def fingerprint(cls):
+        """
+        报表生成器的指纹，参与输出清单的输入摘要
+
+        Returns:
+            tuple: (生成器名称, 报表版本)
+        """
+        return (cls.__name__, cls.REPORT_VERSION)
+
     def _validate_date_range(self, start_date, end_date):
         """
         验证日期范围的有效性
@@ -0,0 +1,81 @@
+"""
+本地缓存签名模块
+模板缓存、聚合结果缓存等以pickle保存的缓存可能位于共享目录，反序列化他人写入的内容可以执行任意代码。
+写入缓存时以当前用户本地密钥计算HMAC-SHA256签名，读取时签名校验通过后才反序列化，
+其他人写入或篡改的内容视为缓存未命中。
+"""
+import hashlib
+import hmac
+import os
+import secrets
+
+# 签名密钥的路径，位于当前用户的主目录中，只有该用户可读写
+SIGNING_KEY_PATH = os.path.join(os.path.expanduser("~"), ".zr_daily_report", "cache.key")
+
+# 签名长度（字节）
+SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+# 进程内缓存的签名密钥：(密钥路径, 密钥)
+_signing_key = None
+
+
+def _get_signing_key():
+    """
+    读取当前用户的签名密钥，不存在时生成随机密钥并以仅本人可读写的权限保存
+
+    Returns:
+        bytes: 签名密钥
+    """
+    global _signing_key
+    if _signing_key is not None and _signing_key[0] == SIGNING_KEY_PATH:
+        return _signing_key[1]
+    if not os.path.exists(SIGNING_KEY_PATH):
+        os.makedirs(os.path.dirname(SIGNING_KEY_PATH), mode=0o700, exist_ok=True)
+        tmp_file = f"{SIGNING_KEY_PATH}.{os.getpid()}.tmp"
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(secrets.token_bytes(32))
+        try:
+            # 多个进程同时生成密钥时只保留第一个写入的密钥
+            os.link(tmp_file, SIGNING_KEY_PATH)
+        except FileExistsError:
+            pass
+        except OSError:
+            os.replace(tmp_file, SIGNING_KEY_PATH)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+    with open(SIGNING_KEY_PATH, "rb") as f:
+        key = f.read()
+    _signing_key = (SIGNING_KEY_PATH, key)
+    return key
+
+
+def sign(context, payload):
+    """
+    计算缓存内容的签名
+
+    Args:
+        context (str): 缓存内容所在的位置（文件名、缓存键等），签名与位置绑定，不能被移到其他位置使用
+        payload (bytes): pickle字节
+
+    Returns:
+        bytes: SIGNATURE_SIZE字节的签名
+    """
+    message = context.encode("utf-8") + b"\0" + payload
+    return hmac.new(_get_signing_key(), message, hashlib.sha256).digest()
+
+
+def verify(context, signature, payload):
+    """
+    校验缓存内容的签名
+
+    Args:
+        context (str): 缓存内容所在的位置
+        signature (bytes): 读取到的签名
+        payload (bytes): pickle字节
+
+    Returns:
+        bool: 签名是否由当前用户的密钥生成
+    """
+    return hmac.compare_digest(signature, sign(context, payload))
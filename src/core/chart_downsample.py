@@ -0,0 +1,179 @@
+"""
+图表数据降采样模块
+长时间范围的每日数据在折线图中每个系列有数百个带标记的数据点，图表XML体积大，Excel打开缓慢。
+降采样在计算好的数据和图表引用区域之间增加一步：工作表上的数据表保持完整，
+按点数预算选出的代表性数据行另外写入隐藏列，图表只引用这一缩减后的隐藏区域。
+
+支持两种方法：
+-   lttb: Largest-Triangle-Three-Buckets，保留折线的整体形状，适合库存余量等连续变化的曲线
+-   minmax: 每个分桶保留最小值和最大值所在的行，保证峰值和谷值不丢失
+"""
+from openpyxl.utils import get_column_letter
+
+# 支持的降采样方法
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+# 隐藏的图表数据区域起始列（AD列），位于数据表、标题合并区域和计算规则说明的右侧
+CHART_DATA_COLUMN = 30
+
+# 点数预算的下限：首尾两点之外至少保留一个中间点
+MIN_POINT_BUDGET = 3
+
+
+def parse_point_budget(value, report_type):
+    """
+    解析配置中的图表点数预算
+
+    Args:
+        value (int or dict or None): 配置值，正整数对所有报表类型生效，
+            字典按报表类型（例如 "inventory"、"daily_error"）分别配置
+        report_type (str): 报表类型
+
+    Returns:
+        int or None: 点数预算，未配置时为None（不降采样）
+
+    Raises:
+        ValueError: 预算不是不小于MIN_POINT_BUDGET的整数
+    """
+    if isinstance(value, dict):
+        value = value.get(report_type)
+    if value is None or value is False:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < MIN_POINT_BUDGET:
+        raise ValueError(f"图表点数预算必须是不小于{MIN_POINT_BUDGET}的整数: {value!r}")
+    return value
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def lttb_indices(values, budget):
+    """
+    按LTTB算法选出代表性数据点的下标，横坐标按等间距处理
+
+    Args:
+        values (list): 纵坐标值
+        budget (int): 保留的点数
+
+    Returns:
+        list: 升序的下标，包含首尾两点
+    """
+    count = len(values)
+    if budget >= count or budget < MIN_POINT_BUDGET:
+        return list(range(count))
+    ys = [_as_float(value) for value in values]
+    bucket_size = (count - 2) / (budget - 2)
+    indices = [0]
+    selected = 0
+    for bucket in range(budget - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # 下一个分桶的平均点（最后一个分桶之后是末点）
+        next_start = end
+        next_end = min(int((bucket + 2) * bucket_size) + 1, count)
+        if next_start >= next_end:
+            next_start, next_end = count - 1, count
+        average_x = (next_start + next_end - 1) / 2
+        average_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        selected_x, selected_y = selected, ys[selected]
+        best_area = -1.0
+        best_index = start
+        for index in range(start, end):
+            area = abs(
+                (selected_x - average_x) * (ys[index] - selected_y)
+                - (selected_x - index) * (average_y - selected_y)
+            )
+            if area > best_area:
+                best_area = area
+                best_index = index
+        indices.append(best_index)
+        selected = best_index
+    indices.append(count - 1)
+    return indices
+
+
+def minmax_indices(values, budget):
+    """
+    把数据分桶，每个分桶保留最小值和最大值所在的下标
+
+    Args:
+        values (list): 纵坐标值
+        budget (int): 保留的点数（上限）
+
+    Returns:
+        list: 升序的下标，包含首尾两点
+    """
+    count = len(values)
+    if budget >= count or budget < MIN_POINT_BUDGET:
+        return list(range(count))
+    ys = [_as_float(value) for value in values]
+    bucket_count = max(1, (budget - 2) // 2)
+    bucket_size = (count - 2) / bucket_count
+    indices = {0, count - 1}
+    for bucket in range(bucket_count):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        if start >= end:
+            continue
+        bucket_range = range(start, end)
+        indices.add(min(bucket_range, key=ys.__getitem__))
+        indices.add(max(bucket_range, key=ys.__getitem__))
+    return sorted(indices)
+
+
+def downsample_rows(rows, value_columns, budget, method="lttb"):
+    """
+    按点数预算选出图表使用的数据行
+
+    多个系列共用分类轴，每个系列分得相同份额的预算，各系列选中的行取并集，
+    因此每个系列自身的形状都得到保留，总行数不超过预算。
+
+    Args:
+        rows (list): 数据行
+        value_columns (list): 图表系列所在的列下标（从0开始）
+        budget (int or None): 点数预算，为None或不小于行数时不降采样
+        method (str): 降采样方法，"lttb" 或 "minmax"
+
+    Returns:
+        list: 选中的数据行（保持原顺序）
+
+    Raises:
+        ValueError: 不支持的降采样方法
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的图表降采样方法: {method}，可选: {', '.join(DOWNSAMPLE_METHODS)}")
+    if budget is None or len(rows) <= budget:
+        return list(rows)
+    select = lttb_indices if method == "lttb" else minmax_indices
+    per_series = max(MIN_POINT_BUDGET, budget // len(value_columns))
+    indices = set()
+    for column in value_columns:
+        indices.update(select([row[column] for row in rows], per_series))
+    return [rows[index] for index in sorted(indices)]
+
+
+def write_chart_range(worksheet, header, rows, first_column=CHART_DATA_COLUMN):
+    """
+    把图表数据写入隐藏列，表头与数据表一样位于第2行，数据从第3行开始
+
+    Args:
+        worksheet: 工作表（openpyxl或DirectWorkbook的工作表）
+        header (list): 表头（图表系列名称取自表头）
+        rows (list): 图表数据行
+        first_column (int): 起始列号
+
+    Returns:
+        int: 图表数据结束行
+    """
+    for column, value in enumerate(header, first_column):
+        worksheet.cell(2, column, value)
+        worksheet.column_dimensions[get_column_letter(column)].hidden = True
+    for row_index, row in enumerate(rows, 3):
+        for column, value in enumerate(row, first_column):
+            worksheet.cell(row_index, column, value)
+    return len(rows) + 2
@@ -0,0 +1,148 @@
+"""
+图表模板模块
+同一类报表的图表样式完全相同，只有工作表名称、数据结束行和标题随设备变化。
+图表模板在每个进程中只构建并序列化一次，每台设备只需在XML字符串中替换这几处内容，
+保存时由save_workbook直接写入替换后的XML，不再重新构建和序列化图表对象。
+"""
+from xml.etree.ElementTree import fromstring
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from openpyxl.chart._chart import ChartBase
+from openpyxl.chart.reference import DummyWorksheet
+from openpyxl.utils import quote_sheetname
+from openpyxl.utils.exceptions import InvalidFileException
+from openpyxl.writer.excel import ExcelWriter
+from openpyxl.xml.functions import tostring
+
+# 构建模板时使用的占位值，序列化后在XML中替换为每台设备的实际值
+_SHEET_TOKEN = "__CHART_SHEET__"
+_LAST_ROW_TOKEN = 999983
+_TITLE_TOKEN = "__CHART_TITLE__"
+
+# 进程内缓存：模板键 -> ChartTemplate
+_chart_templates = {}
+
+
+class StampedChart(ChartBase):
+    """由图表模板替换生成的图表，保存时直接写入XML"""
+
+    def __init__(self, xml, width, height):
+        """
+        初始化图表
+
+        Args:
+            xml (str): 完整的图表XML
+            width (float): 图表宽度（厘米）
+            height (float): 图表高度（厘米）
+        """
+        self._xml = xml
+        self.width = width
+        self.height = height
+
+    def _write(self):
+        # 使用openpyxl默认的保存流程时解析为XML元素
+        return fromstring(self._xml)
+
+
+class ChartTemplate:
+    """一次性序列化的图表XML，按设备替换工作表名称、数据结束行和标题"""
+
+    def __init__(self, build_chart):
+        """
+        构建并序列化图表模板
+
+        Args:
+            build_chart (callable): build_chart(worksheet, last_row, title)，返回配置完整的图表，
+                数据区域引用worksheet中截至last_row的行
+        """
+        chart = build_chart(DummyWorksheet(_SHEET_TOKEN), _LAST_ROW_TOKEN, _TITLE_TOKEN)
+        self.width = chart.width
+        self.height = chart.height
+        xml = tostring(chart._write()).decode("utf-8")
+        # 按占位值切分为片段，每台设备只需拼接字符串
+        self._segments = []
+        for piece in xml.split(quote_sheetname(_SHEET_TOKEN)):
+            self._segments.append([
+                part.split(_TITLE_TOKEN) for part in piece.split(f"${_LAST_ROW_TOKEN}")
+            ])
+
+    def render(self, sheet_title, last_row, title):
+        """
+        生成指定工作表、数据结束行和标题的图表XML
+
+        Args:
+            sheet_title (str): 数据所在工作表名称
+            last_row (int): 数据结束行
+            title (str): 图表标题
+
+        Returns:
+            str: 图表XML
+        """
+        sheet = quote_sheetname(sheet_title)
+        row = f"${last_row}"
+        text = escape(title)
+        return sheet.join(
+            row.join(text.join(parts) for parts in piece)
+            for piece in self._segments
+        )
+
+    def stamp(self, sheet_title, last_row, title):
+        """
+        生成可以添加到工作表的图表
+
+        Args:
+            sheet_title (str): 数据所在工作表名称
+            last_row (int): 数据结束行
+            title (str): 图表标题
+
+        Returns:
+            StampedChart: 图表对象
+        """
+        return StampedChart(self.render(sheet_title, last_row, title), self.width, self.height)
+
+
+def chart_template(key, build_chart):
+    """
+    获取图表模板，同一键在进程内只构建一次
+
+    Args:
+        key: 模板键，包括报表类型和影响图表样式的参数
+        build_chart (callable): 模板不存在时用于构建图表的函数，参数见ChartTemplate
+
+    Returns:
+        ChartTemplate: 图表模板
+    """
+    template = _chart_templates.get(key)
+    if template is None:
+        template = ChartTemplate(build_chart)
+        _chart_templates[key] = template
+    return template
+
+
+class _StampedChartWriter(ExcelWriter):
+    """直接写入StampedChart的XML，其他图表仍按openpyxl默认方式序列化"""
+
+    def _write_charts(self):
+        if len(self._charts) != len(set(self._charts)):
+            raise InvalidFileException("The same chart cannot be used in more than one worksheet")
+        for chart in self._charts:
+            if isinstance(chart, StampedChart):
+                xml = chart._xml.encode("utf-8")
+            else:
+                xml = tostring(chart._write())
+            self._archive.writestr(chart.path[1:], xml)
+            self.manifest.append(chart)
+
+
+def save_workbook(workbook, filename):
+    """
+    保存工作簿，StampedChart直接写入替换后的XML
+
+    Args:
+        workbook (Workbook): 工作簿
+        filename (str): 输出文件路径
+    """
+    archive = ZipFile(filename, "w", ZIP_DEFLATED, allowZip64=True)
+    writer = _StampedChartWriter(workbook, archive)
+    writer.save()
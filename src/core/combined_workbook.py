@@ -0,0 +1,234 @@
+"""
+合并输出模块
+每台设备一个xlsx文件时，设备很多的运行会产生大量小文件，每个文件都有独立的zip容器、样式表和文件创建开销。
+合并输出模式下每个客户（或整次运行）只写一个工作簿：每台设备一个工作表，第一个工作表为索引，
+各工作表共用同一份样式表，图表仍由图表模板生成。
+"""
+import os
+import traceback
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter, quote_sheetname
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from .chart_templates import save_workbook
+from .style_registry import StyleRegistry
+
+# 可选的合并输出模式：每个客户一个工作簿，或整次运行一个工作簿
+WORKBOOK_MODES = ("customer", "run")
+
+# 合并工作簿中索引工作表的名称
+INDEX_SHEET_TITLE = "索引"
+
+# 工作表名称中不允许出现的字符
+_INVALID_TITLE_CHARS = '\\/?*[]:'
+
+# Excel工作表名称的最大长度
+_MAX_TITLE_LENGTH = 31
+
+
+class CombinedWorkbook:
+    """多设备合并工作簿：每台设备一个工作表，另加索引工作表"""
+
+    def __init__(self, output_file_path, report_name):
+        """
+        初始化合并工作簿
+
+        Args:
+            output_file_path (str): 输出文件路径
+            report_name (str): 报表名称，用于索引标题
+        """
+        self.output_file_path = output_file_path
+        self.report_name = report_name
+        self.workbook = Workbook()
+        self.workbook.active.title = INDEX_SHEET_TITLE
+        self.styles = StyleRegistry(self.workbook)
+        self.entries = []
+        self._titles = {INDEX_SHEET_TITLE}
+
+    def add_sheet(self, device_code, customer_name=None, start_date=None, end_date=None):
+        """
+        为设备添加工作表并登记到索引
+
+        Args:
+            device_code (str): 设备编码，用作工作表名称
+            customer_name (str, optional): 客户名称
+            start_date (date, optional): 开始日期
+            end_date (date, optional): 结束日期
+
+        Returns:
+            Worksheet: 设备工作表
+        """
+        title = self._unique_title(device_code)
+        ws = self.workbook.create_sheet(title)
+        self.entries.append({
+            'sheet': title, 'device_code': device_code, 'customer_name': customer_name,
+            'start_date': start_date, 'end_date': end_date,
+        })
+        return ws
+
+    def discard(self, worksheet):
+        """
+        移除生成失败的设备工作表及其索引记录
+
+        Args:
+            worksheet (Worksheet): add_sheet返回的工作表
+        """
+        self.entries = [entry for entry in self.entries if entry['sheet'] != worksheet.title]
+        self._titles.discard(worksheet.title)
+        self.workbook.remove(worksheet)
+
+    def _unique_title(self, name):
+        """生成合法且不重复的工作表名称"""
+        base = "".join("_" if char in _INVALID_TITLE_CHARS else char for char in str(name))
+        base = base[:_MAX_TITLE_LENGTH] or "设备"
+        title = base
+        counter = 2
+        while title in self._titles:
+            suffix = f"_{counter}"
+            title = base[:_MAX_TITLE_LENGTH - len(suffix)] + suffix
+            counter += 1
+        self._titles.add(title)
+        return title
+
+    def _write_index(self):
+        """写入索引工作表，工作表名称链接到对应设备工作表"""
+        ws = self.workbook[INDEX_SHEET_TITLE]
+        headers = ["序号", "设备编码", "客户名称", "开始日期", "结束日期", "工作表"]
+        ws.append([f"{self.report_name}索引"])
+        ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(headers))
+        self.styles.apply(ws.cell(row=1, column=1), "报表标题")
+        ws.append(headers)
+        self.styles.apply_row(ws, 2, ["表头"] * len(headers))
+        data_pattern = ["数据"] * (len(headers) - 1) + ["数据_链接"]
+        for seq, entry in enumerate(self.entries, 1):
+            ws.append([
+                seq, entry['device_code'], entry['customer_name'],
+                str(entry['start_date']) if entry['start_date'] else None,
+                str(entry['end_date']) if entry['end_date'] else None,
+                entry['sheet'],
+            ])
+            row = ws.max_row
+            self.styles.apply_row(ws, row, data_pattern)
+            link = ws.cell(row=row, column=len(headers))
+            link.hyperlink = Hyperlink(ref=link.coordinate, location=f"{quote_sheetname(entry['sheet'])}!A1")
+        for idx, width in enumerate([8, 20, 25, 12, 12, 20], 1):
+            ws.column_dimensions[get_column_letter(idx)].width = width
+
+    def save(self):
+        """写入索引并保存合并工作簿"""
+        output_dir = os.path.dirname(self.output_file_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        self._write_index()
+        try:
+            save_workbook(self.workbook, self.output_file_path)
+        finally:
+            self.workbook.close()
+
+
+class CombinedWorkbookExecutor:
+    """
+    合并输出模式的报表任务执行器，接口与ReportTaskExecutor一致
+
+    每个任务把设备报表写入所属客户（或整次运行）合并工作簿中的一个工作表；
+    合并工作簿需要在同一进程中逐个写入，因此任务总是在当前进程中执行。
+    回调在wait()中合并工作簿保存之后执行，保存失败时该工作簿中的设备全部回调为失败。
+    """
+
+    def __init__(self, mode, output_dir, report_name):
+        """
+        初始化执行器
+
+        Args:
+            mode (str): "customer"（每个客户一个工作簿）或 "run"（整次运行一个工作簿）
+            output_dir (str): 输出目录
+            report_name (str): 报表名称，用于文件名和索引标题，例如 "每日消耗误差报表"
+
+        Raises:
+            ValueError: 不支持的合并输出模式
+        """
+        if mode not in WORKBOOK_MODES:
+            raise ValueError(f"不支持的合并输出模式: {mode}，可选值: {', '.join(WORKBOOK_MODES)}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.report_name = report_name
+        self._workbooks = {}
+        self._pending = []
+
+    @property
+    def is_parallel(self):
+        """合并输出模式总是在当前进程中执行"""
+        return False
+
+    def _workbook_for(self, report_kwargs):
+        """获取任务所属的合并工作簿，不存在时创建"""
+        group = report_kwargs.get('customer_name') if self.mode == "customer" else None
+        combined = self._workbooks.get(group)
+        if combined is None:
+            prefix = group if group else "全部设备"
+            filename = (
+                f"{prefix}_{report_kwargs.get('start_date')}_to_{report_kwargs.get('end_date')}_{self.report_name}.xlsx"
+            )
+            combined = CombinedWorkbook(os.path.join(self.output_dir, filename), self.report_name)
+            self._workbooks[group] = combined
+        return combined
+
+    def submit(self, key, func, payload, on_done):
+        """
+        把一台设备的报表写入合并工作簿
+
+        Args:
+            key: 任务标识（设备编码）
+            func: 报表生成函数，接收 (报表类型, generate_report关键字参数)
+            payload: (报表类型, generate_report关键字参数)，关键字参数中的customer_name用于分组
+            on_done: 回调函数 on_done(key, result, error, error_traceback)，result为合并工作簿路径
+        """
+        generator_name, report_kwargs = payload
+        combined = self._workbook_for(report_kwargs)
+        ws = combined.add_sheet(
+            report_kwargs['device_code'], report_kwargs.get('customer_name'),
+            report_kwargs.get('start_date'), report_kwargs.get('end_date'),
+        )
+        try:
+            func((generator_name, dict(report_kwargs, target_sheet=ws)))
+        except Exception as e:
+            combined.discard(ws)
+            self._pending.append((key, combined, on_done, e, traceback.format_exc()))
+            return
+        self._pending.append((key, combined, on_done, None, None))
+
+    def wait(self):
+        """保存所有合并工作簿，并按提交顺序回调"""
+        save_errors = {}
+        for combined in self._workbooks.values():
+            if not combined.entries:
+                combined.workbook.close()
+                continue
+            try:
+                combined.save()
+                print(f"合并工作簿已生成: {combined.output_file_path}（{len(combined.entries)} 台设备）")
+            except Exception as e:
+                save_errors[id(combined)] = (e, traceback.format_exc())
+        self._workbooks = {}
+
+        pending, self._pending = self._pending, []
+        for key, combined, on_done, error, error_traceback in pending:
+            if error is None and id(combined) in save_errors:
+                error, error_traceback = save_errors[id(combined)]
+            if error is None:
+                on_done(key, combined.output_file_path, None, None)
+            else:
+                on_done(key, None, error, error_traceback)
+
+    def shutdown(self):
+        """保存剩余的合并工作簿"""
+        self.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
+
@@ -1,6 +1,5 @@
-import csv
 import os
-from datetime import timedelta, datetime # 引入 datetime 类
+from datetime import datetime # 引入 datetime 类
 from collections import defaultdict
 
 from dateutil.relativedelta import relativedelta
@@ -10,9 +9,29 @@ from openpyxl.chart.axis import ChartLines
 from openpyxl.chart.marker import Marker
 from openpyxl.chart.shapes import GraphicalProperties
 from openpyxl.drawing.line import LineProperties
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
+from openpyxl.styles import Alignment, Font
 
+from ..utils.date_utils import default_calendar
 from .base_report import BaseReportGenerator
+from .chart_downsample import CHART_DATA_COLUMN, downsample_rows, write_chart_range
+from .chart_templates import chart_template
+from .style_registry import ZEBRA_SUFFIX, StyleRegistry
+from .table_export import TableExportWriter, export_table, parse_export_formats
+from .xlsx_writer import create_workbook, save_report_workbook
+
+# 每日、每月消耗误差报表数据表的列名，工作表和表格导出共用
+DAILY_ERROR_COLUMNS = ["日期", "原油剩余量(L)", "订单累积总量(L)", "库存消耗总量(L)", "中润亏损(L)", "客户亏损(L)"]
+MONTHLY_ERROR_COLUMNS = ["月份", "订单累积总量(L)", "库存消耗总量(L)", "中润亏损(L)", "客户亏损(L)"]
+# 与上面列名对应的Parquet列类型
+DAILY_ERROR_COLUMN_TYPES = ["date"] + ["float64"] * 5
+MONTHLY_ERROR_COLUMN_TYPES = ["string"] + ["float64"] * 4
+# 消耗误差汇总报表的列名
+SUMMARY_COLUMNS = [
+    "序号", "设备编码", "客户名称", "设备桶数", "订单总量(L)",
+    "[单桶]库存消耗(L)", "库存消耗总量(L)", "误差值总数(L)", "平均每日误差(L)", "误差百分比(%)",
+    "累计离线时长(小时)", "备注",
+]
+SUMMARY_COLUMN_TYPES = ["int64", "string", "string", "int64"] + ["float64"] * 7 + ["string"]
 
 
 class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
@@ -54,10 +73,16 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
         chart_style = kwargs.get('chart_style')
         barrel_count = int(kwargs.get('barrel_count', 1))
         export_format = kwargs.get('export_format', 'xlsx')
+        # 写出后端、合并输出的目标工作表、后台保存句柄和图表降采样只在配置时传递
+        options = {
+            key: kwargs[key]
+            for key in ('writer_backend', 'target_sheet', 'output_writer', 'chart_points', 'chart_downsample')
+            if kwargs.get(key) is not None
+        }
         
         return self.generate_daily_consumption_error_report_with_chart(
             inventory_data, error_data, output_file_path, device_code, start_date, end_date,
-            oil_name, chart_style, barrel_count, export_format
+            oil_name, chart_style, barrel_count, export_format, **options
         )
 
     def generate_daily_consumption_error_report_with_chart(
@@ -72,6 +97,11 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
         chart_style=None,
         barrel_count=1,
         export_format="xlsx",
+        writer_backend="openpyxl",
+        target_sheet=None,
+        output_writer=None,
+        chart_points=None,
+        chart_downsample="lttb",
     ):
         """
         生成包含库存数据和误差分析的Excel报告文件
@@ -90,110 +120,41 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
             oil_name (str): 油品名称
             chart_style (dict): 图表样式配置
             barrel_count (int): 油桶数量
-            export_format (str): 导出格式，支持xlsx和csv
+            export_format (str or list): 导出格式，xlsx、csv、jsonl、parquet之一，
+                或逗号分隔的多个格式（例如 "xlsx,parquet"），多种格式一次写出
+            writer_backend (str): xlsx写出后端，"openpyxl"（默认）或 "direct"（直接写出xlsx部件）
+            target_sheet (Worksheet, optional): 合并输出模式下写入的工作表，提供时不单独保存文件
+            output_writer (OutputTask, optional): 后台保存句柄，提供时工作簿交给后台线程保存
+            chart_points (int, optional): 图表点数预算，数据行超过预算时图表改为引用隐藏列中降采样后的数据
+            chart_downsample (str): 图表降采样方法，"lttb"（默认）或 "minmax"
         """
         try:
             # 确保输出文件路径不重复，如果重复则添加序号
             output_file_path = self._get_unique_filename(output_file_path)
             
-            # 验证并清理库存数据
-            cleaned_inventory_data = []
-            invalid_records = []
-            for date, value in inventory_data:
-                try:
-                    validated_value = self._validate_inventory_value(value)
-                    cleaned_inventory_data.append((date, validated_value))
-                except ValueError as e:
-                    invalid_records.append((date, value, str(e)))
-                    print(f"警告：日期 {date} 的数据已跳过 - {str(e)}")
-
-            if invalid_records:
-                print("\n无效数据汇总：")
-                for date, value, reason in invalid_records:
-                    print(f"- {date}: {value} ({reason})")
-
-            # 如果没有有效数据，尝试生成一个带有默认值的图表
-            if not cleaned_inventory_data:
-                print("警告：没有有效的原油剩余量数据可供处理，将生成默认数据图表")
-                # 使用默认数据点，确保能生成图表
-                cleaned_inventory_data = [(start_date, 0), (end_date, 0)]
-                print(f"使用默认数据点: {cleaned_inventory_data}")
-
-            # 初始化工作簿
-            wb = Workbook()
-
-            # 处理不同导出格式
-            if export_format.lower() == "csv":
-                with open(
-                    output_file_path.replace(".xlsx", ".csv"), "w", newline=""
-                ) as f:
-                    writer = csv.writer(f)
-                    # 写入标题行
-                    writer.writerow(["日期", "原油剩余量(L)", "订单累积总量(L)", "中润亏损(L)", "客户亏损(L)"])
-                    
-                    # 补全数据并写入
-                    data_dict = dict(cleaned_inventory_data)
-                    daily_order_totals = error_data.get('daily_order_totals', {})
-                    daily_shortage_errors = error_data.get('daily_shortage_errors', {})
-                    daily_excess_errors = error_data.get('daily_excess_errors', {})
-                    
-                    current_date = start_date
-                    while current_date <= end_date:
-                        inventory_value = data_dict.get(current_date, 0)
-                        order_total = daily_order_totals.get(current_date, 0)
-                        # 处理可能为字典格式的误差数据
-                        shortage_data = daily_shortage_errors.get(current_date, 0)
-                        excess_data = daily_excess_errors.get(current_date, 0)
-                        
-                        # 如果是字典格式，提取value字段
-                        if isinstance(shortage_data, dict):
-                            shortage_error = shortage_data.get('value', 0)
-                        else:
-                            shortage_error = shortage_data
-                            
-                        if isinstance(excess_data, dict):
-                            excess_error = excess_data.get('value', 0)
-                        else:
-                            excess_error = excess_data
-                        
-                        writer.writerow([current_date, inventory_value, order_total, shortage_error, excess_error])
-                        current_date += timedelta(days=1)
-                        
-                print(
-                    f"数据已导出为CSV格式：{output_file_path.replace('.xlsx', '.csv')}"
-                )
-                # 立即关闭工作簿
-                wb.close()
+            write_xlsx, table_formats = parse_export_formats(export_format)
+            wb = None
+            table_rows = self._table_rows(inventory_data, error_data, start_date, end_date)
+
+            # 表格导出直接使用计算结果，不构建工作簿
+            export_table(
+                output_file_path, DAILY_ERROR_COLUMNS, table_rows, table_formats,
+                column_types=DAILY_ERROR_COLUMN_TYPES,
+            )
+            if not write_xlsx:
                 return True
 
-            # 补全库存数据
-            data_dict = dict(cleaned_inventory_data)
-            complete_inventory_data = []
-            current_date = start_date
-
-            # 处理空数据情况，避免索引错误
-            if cleaned_inventory_data:
-                last_inventory = next(iter(cleaned_inventory_data))[1]
-            else:
-                last_inventory = 0
-                print("警告：没有有效的原油剩余量数据可供处理，将生成默认数据图表")
-                # 使用默认数据点，确保能生成图表
-                cleaned_inventory_data = [(start_date, 0), (end_date, 0)]
-                print(f"使用默认数据点: {cleaned_inventory_data}")
-
-            while current_date <= end_date:
-                current_inventory = data_dict.get(current_date, last_inventory)
-                complete_inventory_data.append([current_date, current_inventory])
-                last_inventory = current_inventory
-                current_date += timedelta(days=1)
-
             # Excel处理
-            ws = wb.active
-            ws.title = "消耗误差分析"
+            if target_sheet is not None:
+                # 合并输出模式：写入合并工作簿中该设备的工作表，由调用方统一保存
+                ws = target_sheet
+            else:
+                wb = create_workbook(writer_backend)
+                ws = wb.active
+                ws.title = "消耗误差分析"
 
             # 添加标题行
-            oil_name_str = f" {oil_name} " if oil_name else " "
-            title = f"{device_code}{oil_name_str}每日消耗误差分析({start_date} - {end_date})"
+            title = self._report_title(device_code, oil_name, start_date, end_date)
             ws.append([title])
             # 将合并单元格的宽度增加到18列
             ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=20)
@@ -201,42 +162,11 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
             ws.cell(row=1, column=1).font = Font(size=14, bold=True)
 
             # 添加数据列标题
-            ws.append(["日期", "原油剩余量(L)", "订单累积总量(L)", "库存消耗总量(L)","中润亏损(L)", "客户亏损(L)"])
-
-            # 准备误差数据
-            daily_order_totals = error_data.get('daily_order_totals', {})  # 每日订单累计总量数据
-            daily_shortage_errors = error_data.get('daily_shortage_errors', {})  # 每日中润亏损数据
-            daily_excess_errors = error_data.get('daily_excess_errors', {})  # 每日客户亏损数据
-            daily_consumption = error_data.get('daily_consumption', {})  # 获取每日消耗量数据
+            ws.append(DAILY_ERROR_COLUMNS)
 
             # 写入补全后的数据
-            for row in complete_inventory_data:
-                date = row[0]
-                inventory_value = row[1]
-
-                order_total = daily_order_totals.get(date, 0)
-                # 处理可能为字典格式的误差数据
-                shortage_data = daily_shortage_errors.get(date, 0)
-                excess_data = daily_excess_errors.get(date, 0)
-                consumption_data = daily_consumption.get(date, 0)  # 获取每日消耗量
-                
-                # 如果是字典格式，提取value字段
-                if isinstance(shortage_data, dict):
-                    shortage_error = shortage_data.get('value', 0)
-                else:
-                    shortage_error = shortage_data
-                    
-                if isinstance(excess_data, dict):
-                    excess_error = excess_data.get('value', 0)
-                else:
-                    excess_error = excess_data
-                    
-                if isinstance(consumption_data, dict):
-                    consumption_value = consumption_data.get('value', 0)
-                else:
-                    consumption_value = consumption_data
-                    
-                ws.append([date, inventory_value, order_total, consumption_value, shortage_error, excess_error])
+            for row in table_rows:
+                ws.append(row)
 
             # 调整列宽
             ws.column_dimensions["A"].width = 12  # 日期列宽度
@@ -246,50 +176,26 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
             ws.column_dimensions["E"].width = 12  # 中润亏损列宽度
             ws.column_dimensions["F"].width = 12  # 客户亏损列宽度
 
-            # 创建图表
-            chart = LineChart()
-            chart.title = "每日消耗误差分析"
-            chart.style = 13
-            chart.y_axis.title = "值 (L)"
-            chart.y_axis.majorGridlines = ChartLines(spPr=GraphicalProperties(noFill=True))
-            chart.x_axis.title = "日期"
-            chart.x_axis.number_format = 'yyyy-mm-dd'
-
-            # 设置图表显示数据标签
-            chart.x_axis.tickLblSkip = 3  # 每隔3个标签显示一个
-            chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
-            chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
-
-            # 设置数据范围
-            dates = Reference(ws, min_col=1, min_row=3, max_row=len(complete_inventory_data) + 2)
-            data_range = Reference(ws, min_col=2, min_row=2, max_col=4, max_row=len(complete_inventory_data) + 2)
-
-            # 添加数据到图表
-            chart.add_data(data_range, titles_from_data=True)
-            chart.set_categories(dates)
-
-            # 为不同数据系列设置不同的颜色
-            # 原油剩余量 - 蓝色
-            chart.series[0].graphicalProperties = GraphicalProperties()
-            chart.series[0].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="0000FF")
-            chart.series[0].marker = Marker(symbol="circle", size=8)
-            
-            # 订单累积总量 - 绿色
-            chart.series[1].graphicalProperties = GraphicalProperties()
-            chart.series[1].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="00FF00")
-            chart.series[1].marker = Marker(symbol="circle", size=8)
-            
-            # 库存消耗总量 - 紫色
-            chart.series[2].graphicalProperties = GraphicalProperties()
-            chart.series[2].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="800080")
-            chart.series[2].marker = Marker(symbol="circle", size=8)
+            # 数据行超过点数预算时，图表改为引用隐藏列中降采样后的数据（日期和图表的三个系列），
+            # 数据表保持完整
+            chart_rows = downsample_rows(table_rows, [1, 2, 3], chart_points, chart_downsample)
+            if len(chart_rows) < len(table_rows):
+                data_column = CHART_DATA_COLUMN
+                chart_last_row = write_chart_range(
+                    ws, DAILY_ERROR_COLUMNS[:4], [row[:4] for row in chart_rows], data_column
+                )
+            else:
+                data_column = 1
+                chart_last_row = len(table_rows) + 2
 
-            # 恢复图表到初始大小
-            chart.width = 30
-            chart.height = 15
+            # 创建图表：图表模板只构建一次，每台设备只替换数据范围
+            template = chart_template(
+                ("daily_error", data_column),
+                lambda sheet, last_row, chart_title: self._build_chart(sheet, last_row, chart_title, data_column),
+            )
 
             # 添加图表到工作表，从G5开始绘制
-            ws.add_chart(chart, "G5")
+            ws.add_chart(template.stamp(ws.title, chart_last_row, "每日消耗误差分析"), "G5")
             
             # 在H34单元格开始添加计算规则说明，确保位于图表下方
             annotation_row = 34
@@ -322,10 +228,19 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
             traceback.print_exc()
             raise
 
+        if wb is None:
+            return True
+
         # 将保存和关闭操作移到主try块之外，以确保文件句柄被正确释放
         try:
-            wb.save(output_file_path)
-            print(f"  每日消耗误差图表已生成并保存为{export_format.upper()}格式")
+            if output_writer is not None:
+                # 工作簿交给后台线程保存，并由后台线程关闭
+                output_writer.save_workbook(wb, output_file_path)
+                wb = None
+                print("  每日消耗误差图表已生成，已提交后台保存")
+                return True
+            save_report_workbook(wb, output_file_path)
+            print("  每日消耗误差图表已生成并保存为XLSX格式")
             return True
         except PermissionError:
             print(f"错误：无法保存文件 '{output_file_path}'，可能是文件正在被其他程序占用。")
@@ -339,6 +254,185 @@ class DailyConsumptionErrorReportGenerator(BaseReportGenerator):
                 except Exception as close_exc:
                     print(f"关闭工作簿时发生错误: {close_exc}")
 
+    def _table_rows(self, inventory_data, error_data, start_date, end_date):
+        """
+        验证并按日期补全原油剩余量，合并每日误差数据，工作表、表格导出和预览共用
+
+        Args:
+            inventory_data (list): 库存数据列表，格式为[(date, value), ...]
+            error_data (dict): 误差数据字典
+            start_date (date): 开始日期
+            end_date (date): 结束日期
+
+        Returns:
+            list: 与DAILY_ERROR_COLUMNS顺序一致的数据行
+        """
+        # 验证并清理库存数据
+        cleaned_inventory_data = []
+        invalid_records = []
+        for date, value in inventory_data:
+            try:
+                validated_value = self._validate_inventory_value(value)
+                cleaned_inventory_data.append((date, validated_value))
+            except ValueError as e:
+                invalid_records.append((date, value, str(e)))
+                print(f"警告：日期 {date} 的数据已跳过 - {str(e)}")
+
+        if invalid_records:
+            print("\n无效数据汇总：")
+            for date, value, reason in invalid_records:
+                print(f"- {date}: {value} ({reason})")
+
+        # 如果没有有效数据，尝试生成一个带有默认值的图表
+        if not cleaned_inventory_data:
+            print("警告：没有有效的原油剩余量数据可供处理，将生成默认数据图表")
+            # 使用默认数据点，确保能生成图表
+            cleaned_inventory_data = [(start_date, 0), (end_date, 0)]
+            print(f"使用默认数据点: {cleaned_inventory_data}")
+
+        # 补全库存数据
+        data_dict = dict(cleaned_inventory_data)
+        complete_inventory_data = []
+
+        # 处理空数据情况，避免索引错误
+        if cleaned_inventory_data:
+            last_inventory = next(iter(cleaned_inventory_data))[1]
+        else:
+            last_inventory = 0
+            print("警告：没有有效的原油剩余量数据可供处理，将生成默认数据图表")
+            # 使用默认数据点，确保能生成图表
+            cleaned_inventory_data = [(start_date, 0), (end_date, 0)]
+            print(f"使用默认数据点: {cleaned_inventory_data}")
+
+        for current_date in default_calendar.date_range(start_date, end_date):
+            current_inventory = data_dict.get(current_date, last_inventory)
+            complete_inventory_data.append([current_date, current_inventory])
+            last_inventory = current_inventory
+
+        # 准备误差数据
+        daily_order_totals = error_data.get('daily_order_totals', {})  # 每日订单累计总量数据
+        daily_shortage_errors = error_data.get('daily_shortage_errors', {})  # 每日中润亏损数据
+        daily_excess_errors = error_data.get('daily_excess_errors', {})  # 每日客户亏损数据
+        daily_consumption = error_data.get('daily_consumption', {})  # 获取每日消耗量数据
+
+        # 计算补全后的数据表，工作表和表格导出共用
+        table_rows = []
+        for row in complete_inventory_data:
+            date = row[0]
+            inventory_value = row[1]
+
+            order_total = daily_order_totals.get(date, 0)
+            # 处理可能为字典格式的误差数据
+            shortage_data = daily_shortage_errors.get(date, 0)
+            excess_data = daily_excess_errors.get(date, 0)
+            consumption_data = daily_consumption.get(date, 0)  # 获取每日消耗量
+            
+            # 如果是字典格式，提取value字段
+            if isinstance(shortage_data, dict):
+                shortage_error = shortage_data.get('value', 0)
+            else:
+                shortage_error = shortage_data
+                
+            if isinstance(excess_data, dict):
+                excess_error = excess_data.get('value', 0)
+            else:
+                excess_error = excess_data
+                
+            if isinstance(consumption_data, dict):
+                consumption_value = consumption_data.get('value', 0)
+            else:
+                consumption_value = consumption_data
+                
+            table_rows.append([date, inventory_value, order_total, consumption_value, shortage_error, excess_error])
+        return table_rows
+
+    @staticmethod
+    def _report_title(device_code, oil_name, start_date, end_date):
+        """报表标题，工作表和预览共用"""
+        oil_name_str = f" {oil_name} " if oil_name else " "
+        return f"{device_code}{oil_name_str}每日消耗误差分析({start_date} - {end_date})"
+
+    def preview_series(self, inventory_data, error_data, **kwargs):
+        """
+        计算预览页面使用的数据，与报表的数据表和图表系列一致
+
+        Args:
+            inventory_data (list): 库存数据列表
+            error_data (dict): 误差数据字典
+            **kwargs: 与generate_report相同的参数，使用device_code、start_date、end_date、oil_name
+
+        Returns:
+            dict: title（标题）、columns（列名）、rows（数据行）、series（图表系列所在的列下标）
+        """
+        start_date = kwargs.get('start_date')
+        end_date = kwargs.get('end_date')
+        return {
+            'title': self._report_title(kwargs.get('device_code'), kwargs.get('oil_name'), start_date, end_date),
+            'columns': DAILY_ERROR_COLUMNS,
+            'rows': self._table_rows(inventory_data, error_data, start_date, end_date),
+            'series': [1, 2, 3],
+        }
+
+    @staticmethod
+    def _build_chart(worksheet, last_row, title, data_column=1):
+        """
+        构建每日消耗误差折线图
+
+        Args:
+            worksheet: 数据所在工作表
+            last_row (int): 数据结束行
+            title (str): 图表标题
+            data_column (int): 日期列的列号，三个数据系列紧随其后；大于1时为隐藏的降采样数据区域
+
+        Returns:
+            LineChart: 图表对象
+        """
+        chart = LineChart()
+        chart.title = title
+        chart.style = 13
+        chart.y_axis.title = "值 (L)"
+        chart.y_axis.majorGridlines = ChartLines(spPr=GraphicalProperties(noFill=True))
+        chart.x_axis.title = "日期"
+        chart.x_axis.number_format = 'yyyy-mm-dd'
+
+        # 设置图表显示数据标签
+        chart.x_axis.tickLblSkip = 3  # 每隔3个标签显示一个
+        chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
+        chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
+
+        # 设置数据范围
+        dates = Reference(worksheet, min_col=data_column, min_row=3, max_row=last_row)
+        data_range = Reference(
+            worksheet, min_col=data_column + 1, min_row=2, max_col=data_column + 3, max_row=last_row
+        )
+        # 降采样数据位于隐藏列，需要绘制隐藏单元格中的数据
+        chart.visible_cells_only = data_column == 1
+
+        # 添加数据到图表
+        chart.add_data(data_range, titles_from_data=True)
+        chart.set_categories(dates)
+
+        # 为不同数据系列设置不同的颜色
+        # 原油剩余量 - 蓝色
+        chart.series[0].graphicalProperties = GraphicalProperties()
+        chart.series[0].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="0000FF")
+        chart.series[0].marker = Marker(symbol="circle", size=8)
+        
+        # 订单累积总量 - 绿色
+        chart.series[1].graphicalProperties = GraphicalProperties()
+        chart.series[1].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="00FF00")
+        chart.series[1].marker = Marker(symbol="circle", size=8)
+        
+        # 库存消耗总量 - 紫色
+        chart.series[2].graphicalProperties = GraphicalProperties()
+        chart.series[2].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="800080")
+        chart.series[2].marker = Marker(symbol="circle", size=8)
+
+        # 恢复图表到初始大小
+        chart.width = 30
+        chart.height = 15
+        return chart
+
     def _validate_inventory_value(self, value):
         """
         验证原油剩余量值是否有效
@@ -391,10 +485,15 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
         chart_style = kwargs.get('chart_style')
         barrel_count = int(kwargs.get('barrel_count', 1))
         export_format = kwargs.get('export_format', 'xlsx')
+        # 写出后端、合并输出的目标工作表和后台保存句柄只在配置时传递
+        options = {
+            key: kwargs[key] for key in ('writer_backend', 'target_sheet', 'output_writer')
+            if kwargs.get(key) is not None
+        }
         
         return self.generate_monthly_consumption_error_report_with_chart(
             inventory_data, error_data, output_file_path, device_code, start_date, end_date,
-            oil_name, chart_style, barrel_count, export_format
+            oil_name, chart_style, barrel_count, export_format, **options
         )
 
     def generate_monthly_consumption_error_report_with_chart(
@@ -409,6 +508,9 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
         chart_style=None,
         barrel_count=1,
         export_format="xlsx",
+        writer_backend="openpyxl",
+        target_sheet=None,
+        output_writer=None,
     ):
         """
         生成包含库存数据和误差分析的Excel报告文件
@@ -427,48 +529,39 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
             oil_name (str): 油品名称
             chart_style (dict): 图表样式配置
             barrel_count (int): 油桶数量
-            export_format (str): 导出格式，支持xlsx和csv
+            export_format (str or list): 导出格式，xlsx、csv、jsonl、parquet之一，
+                或逗号分隔的多个格式（例如 "xlsx,parquet"），多种格式一次写出
+            writer_backend (str): xlsx写出后端，"openpyxl"（默认）或 "direct"（直接写出xlsx部件）
+            target_sheet (Worksheet, optional): 合并输出模式下写入的工作表，提供时不单独保存文件
+            output_writer (OutputTask, optional): 后台保存句柄，提供时工作簿交给后台线程保存
         """
         try:
             # 确保输出文件路径不重复，如果重复则添加序号
             output_file_path = self._get_unique_filename(output_file_path)
 
-            # 准备月度数据
-            complete_inventory_data = []
-            
-            # 直接使用error_data中的月份数据，而不是生成日期范围
-            # 这样可以确保日期格式完全匹配
-            monthly_order_totals = error_data.get('monthly_order_totals', {})
-            monthly_shortage_errors = error_data.get('monthly_shortage_errors', {})
-            monthly_excess_errors = error_data.get('monthly_excess_errors', {})
-            monthly_consumption = error_data.get('monthly_consumption', {})
-            
-            # 获取所有唯一的月份标签并排序
-            all_months = set()
-            all_months.update(monthly_order_totals.keys())
-            all_months.update(monthly_shortage_errors.keys())
-            all_months.update(monthly_excess_errors.keys())
-            all_months.update(monthly_consumption.keys())
-            
-            # 排序月份
-            sorted_months = sorted(list(all_months))
-            
-            # 限制只显示最多12个月的数据
-            if len(sorted_months) > 12:
-                sorted_months = sorted_months[-12:]
-            
-            # 为每个唯一月份创建数据点
-            for month in sorted_months:
-                complete_inventory_data.append([month, 0])
+            table_rows = self._table_rows(error_data)
+
+            # 表格导出直接使用计算结果，不构建工作簿
+            write_xlsx, table_formats = parse_export_formats(export_format)
+            export_table(
+                output_file_path, MONTHLY_ERROR_COLUMNS, table_rows, table_formats,
+                column_types=MONTHLY_ERROR_COLUMN_TYPES,
+            )
+            if not write_xlsx:
+                return True
 
             # Excel处理
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "消耗误差分析"
+            if target_sheet is not None:
+                # 合并输出模式：写入合并工作簿中该设备的工作表，由调用方统一保存
+                wb = None
+                ws = target_sheet
+            else:
+                wb = create_workbook(writer_backend)
+                ws = wb.active
+                ws.title = "消耗误差分析"
 
             # 添加标题行
-            oil_name_str = f" {oil_name} " if oil_name else " "
-            title = f"{device_code}{oil_name_str}每月消耗误差分析({start_date} - {end_date})"
+            title = self._report_title(device_code, oil_name, start_date, end_date)
             ws.append([title])
             # 将合并单元格的宽度增加到18列
             ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=20)
@@ -476,37 +569,11 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
             ws.cell(row=1, column=1).font = Font(size=14, bold=True)
 
             # 添加数据列标题
-            ws.append(["月份", "订单累积总量(L)", "库存消耗总量(L)","中润亏损(L)", "客户亏损(L)"])
+            ws.append(MONTHLY_ERROR_COLUMNS)
 
             # 写入补全后的数据
-            for row in complete_inventory_data:
-                month_str = row[0]
-                
-                # 从误差数据中获取实际值，如果不存在则使用默认值0
-                order_total = monthly_order_totals.get(month_str, 0)
-                
-                # 处理可能为字典格式的误差数据
-                shortage_data = monthly_shortage_errors.get(month_str, 0)
-                excess_data = monthly_excess_errors.get(month_str, 0)
-                consumption_data = monthly_consumption.get(month_str, 0)
-                
-                # 如果是字典格式，提取value字段
-                if isinstance(shortage_data, dict):
-                    shortage_error = shortage_data.get('value', 0)
-                else:
-                    shortage_error = shortage_data
-                    
-                if isinstance(excess_data, dict):
-                    excess_error = excess_data.get('value', 0)
-                else:
-                    excess_error = excess_data
-                    
-                if isinstance(consumption_data, dict):
-                    consumption_value = consumption_data.get('value', 0)
-                else:
-                    consumption_value = consumption_data
-                    
-                ws.append([month_str, order_total, consumption_value, shortage_error, excess_error])
+            for row in table_rows:
+                ws.append(row)
 
             # 调整列宽
             ws.column_dimensions["A"].width = 12  # 月份列宽度
@@ -515,51 +582,15 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
             ws.column_dimensions["D"].width = 12  # 中润亏损列宽度
             ws.column_dimensions["E"].width = 12  # 客户亏损列宽度
 
-            # 创建图表
-            chart = LineChart()
-            chart.title = "每月消耗误差分析"
-            chart.style = 13
-            chart.y_axis.title = "值(L)"
-            chart.y_axis.titleLayout = None  # 垂直显示Y轴标题
-            chart.x_axis.title = "月份"
-
-            # 设置图表显示数据标签
-            # 添加这部分配置来调整x轴日期显示
-            chart.x_axis.tickLblSkip = 1  # 每个标签都显示
-            chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
-            chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
-
-            # 设置数据范围（现在只有4列数据）
-            # 调整数据范围，只包含“订单累积总量”和“库存消耗总量”两列
-            data_range = Reference(ws, min_col=2, min_row=2, max_col=3, max_row=len(complete_inventory_data) + 2
-            )
-            months = Reference(ws, min_col=1, min_row=3, max_row=len(complete_inventory_data) + 2)
-
-            # 添加数据到图表
-            chart.add_data(data_range, titles_from_data=True)
-            chart.set_categories(months)
-
-            # 为不同数据系列设置不同的颜色
-            # 订单累积总量 - 淡绿色（与库存报表保持一致）
-            chart.series[0].graphicalProperties = GraphicalProperties()
-            chart.series[0].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="90EE90") # 设置线条属性
-            chart.series[0].marker = Marker(symbol="circle", size=8)
-            
-            # 库存消耗总量 - 紫色
-            chart.series[1].graphicalProperties = GraphicalProperties()
-            chart.series[1].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="800080") # 设置线条属性
-            chart.series[1].marker = Marker(symbol="circle", size=8)
-
-            # 恢复图表到初始大小
-            chart.width = 30
-            chart.height = 15
+            # 创建图表：图表模板只构建一次，每台设备只替换数据范围
+            template = chart_template(("monthly_error",), self._build_chart)
 
             # 添加图表到工作表，从F5开始绘制
-            ws.add_chart(chart, "F5")
+            ws.add_chart(template.stamp(ws.title, len(table_rows) + 2, "每月消耗误差分析"), "F5")
             
             # 在图表下方添加注释说明
             # 计算注释的起始行（数据行数 + 标题行 + 适当间隔）
-            data_end_row = len(complete_inventory_data) + 2  # 数据结束行
+            data_end_row = len(table_rows) + 2  # 数据结束行
             annotation_row = data_end_row + 3  # 在数据下方留出一些空间
             
             # 添加图例说明标题
@@ -594,10 +625,19 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
             traceback.print_exc()
             raise
 
+        if wb is None:
+            return True
+
         # 将保存和关闭操作移到主try块之外
         try:
-            wb.save(output_file_path)
-            print(f"  每月消耗误差图表已生成并保存为{export_format.upper()}格式")
+            if output_writer is not None:
+                # 工作簿交给后台线程保存，并由后台线程关闭
+                output_writer.save_workbook(wb, output_file_path)
+                wb = None
+                print("  每月消耗误差图表已生成，已提交后台保存")
+                return True
+            save_report_workbook(wb, output_file_path)
+            print("  每月消耗误差图表已生成并保存为XLSX格式")
             return True
         except PermissionError:
             print(f"错误：无法保存文件 '{output_file_path}'，可能是文件正在被其他程序占用。")
@@ -608,6 +648,155 @@ class MonthlyConsumptionErrorReportGenerator(BaseReportGenerator):
                 wb.close()
 
 
+    @staticmethod
+    def _table_rows(error_data):
+        """
+        按月份合并误差数据（最多最近12个月），工作表、表格导出和预览共用
+
+        Args:
+            error_data (dict): 误差数据字典
+
+        Returns:
+            list: 与MONTHLY_ERROR_COLUMNS顺序一致的数据行
+        """
+        # 准备月度数据
+        complete_inventory_data = []
+        
+        # 直接使用error_data中的月份数据，而不是生成日期范围
+        # 这样可以确保日期格式完全匹配
+        monthly_order_totals = error_data.get('monthly_order_totals', {})
+        monthly_shortage_errors = error_data.get('monthly_shortage_errors', {})
+        monthly_excess_errors = error_data.get('monthly_excess_errors', {})
+        monthly_consumption = error_data.get('monthly_consumption', {})
+        
+        # 获取所有唯一的月份标签并排序
+        all_months = set()
+        all_months.update(monthly_order_totals.keys())
+        all_months.update(monthly_shortage_errors.keys())
+        all_months.update(monthly_excess_errors.keys())
+        all_months.update(monthly_consumption.keys())
+        
+        # 排序月份
+        sorted_months = sorted(list(all_months))
+        
+        # 限制只显示最多12个月的数据
+        if len(sorted_months) > 12:
+            sorted_months = sorted_months[-12:]
+        
+        # 为每个唯一月份创建数据点
+        for month in sorted_months:
+            complete_inventory_data.append([month, 0])
+
+        # 计算补全后的数据表，工作表和表格导出共用
+        table_rows = []
+        for row in complete_inventory_data:
+            month_str = row[0]
+            
+            # 从误差数据中获取实际值，如果不存在则使用默认值0
+            order_total = monthly_order_totals.get(month_str, 0)
+            
+            # 处理可能为字典格式的误差数据
+            shortage_data = monthly_shortage_errors.get(month_str, 0)
+            excess_data = monthly_excess_errors.get(month_str, 0)
+            consumption_data = monthly_consumption.get(month_str, 0)
+            
+            # 如果是字典格式，提取value字段
+            if isinstance(shortage_data, dict):
+                shortage_error = shortage_data.get('value', 0)
+            else:
+                shortage_error = shortage_data
+                
+            if isinstance(excess_data, dict):
+                excess_error = excess_data.get('value', 0)
+            else:
+                excess_error = excess_data
+                
+            if isinstance(consumption_data, dict):
+                consumption_value = consumption_data.get('value', 0)
+            else:
+                consumption_value = consumption_data
+                
+            table_rows.append([month_str, order_total, consumption_value, shortage_error, excess_error])
+        return table_rows
+
+    @staticmethod
+    def _report_title(device_code, oil_name, start_date, end_date):
+        """报表标题，工作表和预览共用"""
+        oil_name_str = f" {oil_name} " if oil_name else " "
+        return f"{device_code}{oil_name_str}每月消耗误差分析({start_date} - {end_date})"
+
+    def preview_series(self, inventory_data, error_data, **kwargs):
+        """
+        计算预览页面使用的数据，与报表的数据表和图表系列一致
+
+        Args:
+            inventory_data (list): 库存数据列表（月度报表不使用）
+            error_data (dict): 误差数据字典
+            **kwargs: 与generate_report相同的参数，使用device_code、start_date、end_date、oil_name
+
+        Returns:
+            dict: title（标题）、columns（列名）、rows（数据行）、series（图表系列所在的列下标）
+        """
+        return {
+            'title': self._report_title(
+                kwargs.get('device_code'), kwargs.get('oil_name'), kwargs.get('start_date'), kwargs.get('end_date')
+            ),
+            'columns': MONTHLY_ERROR_COLUMNS,
+            'rows': self._table_rows(error_data),
+            'series': [1, 2],
+        }
+
+    @staticmethod
+    def _build_chart(worksheet, last_row, title):
+        """
+        构建每月消耗误差折线图
+
+        Args:
+            worksheet: 数据所在工作表
+            last_row (int): 数据结束行
+            title (str): 图表标题
+
+        Returns:
+            LineChart: 图表对象
+        """
+        chart = LineChart()
+        chart.title = title
+        chart.style = 13
+        chart.y_axis.title = "值(L)"
+        chart.y_axis.titleLayout = None  # 垂直显示Y轴标题
+        chart.x_axis.title = "月份"
+
+        # 设置图表显示数据标签
+        # 添加这部分配置来调整x轴日期显示
+        chart.x_axis.tickLblSkip = 1  # 每个标签都显示
+        chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
+        chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
+
+        # 设置数据范围（现在只有4列数据）
+        # 调整数据范围，只包含“订单累积总量”和“库存消耗总量”两列
+        data_range = Reference(worksheet, min_col=2, min_row=2, max_col=3, max_row=last_row)
+        months = Reference(worksheet, min_col=1, min_row=3, max_row=last_row)
+
+        # 添加数据到图表
+        chart.add_data(data_range, titles_from_data=True)
+        chart.set_categories(months)
+
+        # 为不同数据系列设置不同的颜色
+        # 订单累积总量 - 淡绿色（与库存报表保持一致）
+        chart.series[0].graphicalProperties = GraphicalProperties()
+        chart.series[0].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="90EE90") # 设置线条属性
+        chart.series[0].marker = Marker(symbol="circle", size=8)
+        
+        # 库存消耗总量 - 紫色
+        chart.series[1].graphicalProperties = GraphicalProperties()
+        chart.series[1].graphicalProperties.line = LineProperties(w=2.5 * 12700, solidFill="800080") # 设置线条属性
+        chart.series[1].marker = Marker(symbol="circle", size=8)
+
+        # 恢复图表到初始大小
+        chart.width = 30
+        chart.height = 15
+        return chart
+
     def _validate_inventory_value(self, value):
         """
         验证原油剩余量值是否有效
@@ -633,241 +822,208 @@ class ConsumptionErrorSummaryGenerator(BaseReportGenerator):
         """初始化消耗误差汇总报表生成器"""
         super().__init__()
 
+    @staticmethod
+    def _offline_summary(offline_events, start_date_dt, end_date_dt, current_real_time):
+        """
+        计算查询范围内的累计离线时长并生成离线备注
+
+        Args:
+            offline_events (list): 离线事件列表
+            start_date_dt (datetime): 查询开始时间
+            end_date_dt (datetime): 查询结束时间
+            current_real_time (datetime): 当前实际时间
+
+        Returns:
+            tuple: (累计离线时长(小时), 备注列表)
+        """
+        total_offline_hours = 0
+        remarks = []
+        for event in offline_events:
+            create_time = event.get('create_time')
+            biz_type = event.get('biz_type')
+            recovery_time = event.get('recovery_time')
+
+            # 格式化备注文本
+            create_time_str = create_time.strftime('%Y-%m-%d %H:%M')
+
+            # biz_type = 2 代表已恢复
+            if biz_type == 2 and recovery_time:
+                recovery_time_str = recovery_time.strftime('%Y-%m-%d %H:%M')
+                remarks.append(f"{create_time_str}离线至{recovery_time_str}恢复")
+                # 计算交集时长
+                overlap_start = max(create_time, start_date_dt)
+                overlap_end = min(recovery_time, end_date_dt)
+                if overlap_end > overlap_start:
+                    total_offline_hours += (overlap_end - overlap_start).total_seconds() / 3600
+            # biz_type = 1 代表未恢复
+            elif biz_type == 1:
+                # 确定离线事件的有效结束时间，不超过当前实际时间，也不超过查询结束时间
+                effective_end_time_for_event = min(current_real_time, end_date_dt)
+
+                # 根据有效结束时间生成备注
+                if effective_end_time_for_event == current_real_time:
+                    remark_end_time_str = f"当前时间({current_real_time.strftime('%Y-%m-%d %H:%M')})"
+                else: # effective_end_time_for_event == end_date_dt
+                    remark_end_time_str = f"查询结束({end_date_dt.strftime('%Y-%m-%d %H:%M')})"
+
+                remarks.append(f"{create_time_str}离线至{remark_end_time_str}")
+
+                # 计算交集时长
+                overlap_start = max(create_time, start_date_dt)
+                overlap_end = effective_end_time_for_event # 使用有效结束时间进行计算
+                if overlap_end > overlap_start:
+                    total_offline_hours += (overlap_end - overlap_start).total_seconds() / 3600
+        return total_offline_hours, remarks
+
+    @staticmethod
+    def _is_high_error(device_data):
+        """判断误差百分比的绝对值是否超过5%（按单桶消耗判断，忽略桶数影响）"""
+        try:
+            total_order = float(device_data.get('total_order_volume', 0))
+            total_consumption = float(device_data.get('total_inventory_consumption', 0))
+            if total_order != 0:
+                return abs((total_consumption - total_order) / total_order) > 0.05
+        except (ValueError, TypeError):
+            pass # 如果数据转换失败，则不应用高亮
+        return False
+
+    @staticmethod
+    def _barrel_count(device_data, barrel_counts=None):
+        """
+        设备桶数：优先使用设备信息CSV中的桶数，其次使用查询结果中的barrel_count字段，默认为1
+        """
+        device_code = device_data.get('device_code')
+        if barrel_counts and device_code in barrel_counts:
+            return barrel_counts[device_code]
+        try:
+            return max(1, int(device_data.get('barrel_count') or 1))
+        except (ValueError, TypeError):
+            return 1
+
+    @classmethod
+    def aggregate_offline_events(cls, offline_events, start_date_dt, end_date_dt, current_real_time):
+        """
+        按设备逐条累计离线事件，返回每台设备的累计离线时长和备注
+
+        事件可以来自分批游标，不需要整体加载到内存。
+
+        Args:
+            offline_events (iterable): 离线事件，需包含device_code字段
+            start_date_dt (datetime): 查询开始时间
+            end_date_dt (datetime): 查询结束时间
+            current_real_time (datetime): 当前实际时间
+
+        Returns:
+            dict: 设备编码 -> (累计离线时长(小时), 备注列表)
+        """
+        offline_map = {}
+        for event in offline_events:
+            hours, remarks = cls._offline_summary([event], start_date_dt, end_date_dt, current_real_time)
+            total_hours, all_remarks = offline_map.get(event.get('device_code'), (0, []))
+            all_remarks.extend(remarks)
+            offline_map[event.get('device_code')] = (total_hours + hours, all_remarks)
+        return offline_map
+
+    def _summary_values(self, seq, device_data, start_date_dt, end_date_dt, current_real_time, barrel_counts=None):
+        """
+        计算一行汇总数据，公式列（G–J列）直接计算为数值
+
+        离线时长和备注优先使用device_data中预先累计的offline_summary，其次按offline_events计算。
+
+        Args:
+            seq (int): 序号
+            device_data (dict): 一台设备的汇总数据
+            barrel_counts (dict, optional): 设备编码 -> 桶数，未提供的设备见_barrel_count
+
+        Returns:
+            list: 与SUMMARY_COLUMNS顺序一致的一行数据
+        """
+        total_order = device_data.get('total_order_volume')
+        consumption = device_data.get('total_inventory_consumption')
+        days_in_range = device_data.get('days_in_range', 1)
+        barrel_count = self._barrel_count(device_data, barrel_counts)
+        offline_summary = device_data.get('offline_summary')
+        if offline_summary is None:
+            offline_summary = self._offline_summary(
+                device_data.get('offline_events', []), start_date_dt, end_date_dt, current_real_time
+            )
+        total_offline_hours, remarks = offline_summary
+        try:
+            total_consumption = float(consumption) * barrel_count if consumption is not None else None
+            error_total = float(consumption or 0) * barrel_count - float(total_order or 0)
+            daily_error = error_total / days_in_range if days_in_range else None
+            error_percentage = error_total / float(total_order) if total_order else 0
+        except (ValueError, TypeError):
+            total_consumption = error_total = daily_error = error_percentage = None
+        return [
+            seq, device_data.get('device_code'), device_data.get('customer_name'), barrel_count,
+            total_order, consumption, total_consumption, error_total, daily_error, error_percentage,
+            round(total_offline_hours, 2), "\n".join(remarks) or None,
+        ]
+
     def generate_report(self, summary_data, output_file_path, **kwargs):
         """
         生成消耗误差汇总报表。
 
+        设备数据只遍历一次：工作表以只写模式逐行写入，表格导出在同一次遍历中写出，
+        summary_data 可以是列表，也可以是分批游标产出的迭代器。
+
         Args:
-            summary_data (list): 从数据库直接查询出的汇总数据列表。
+            summary_data (iterable): 从数据库查询出的汇总数据（列表或迭代器）。
             output_file_path (str): 输出文件路径。
-            **kwargs: 其他参数，如 start_date, end_date。
+            **kwargs: 其他参数，如 start_date, end_date；
+                export_format 为导出格式，可选 xlsx、csv、jsonl、parquet 或逗号分隔的多个格式，默认只生成xlsx；
+                summary_values 为True时D列和G–J列写入计算好的数值而不是公式；
+                barrel_counts 为设备编码到桶数的字典（来自设备信息CSV），数值模式和表格导出使用。
         """
         start_date = kwargs.get('start_date')
         end_date = kwargs.get('end_date')
-
-        # --- 定义样式 ---
-        # 标题字体
-        title_font = Font(size=16, bold=True, name='Calibri')
-        # 表头字体和填充
-        header_font = Font(bold=True, color="FFFFFF", name='Calibri')
-        header_fill = PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid")
-        # 数据行交替填充
-        even_row_fill = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
-        # 提示信息字体
-        hint_font = Font(size=9, color="FF4500", name='Calibri', bold=True, italic=False)
-        # 误差解读提示字体
-        explanation_font = Font(size=9, color="0070C0", name='Calibri', bold=True)
-        # 边框样式
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-        # 警告样式
-        warning_font = Font(color="9C0006")
-        warning_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+        summary_values = bool(kwargs.get('summary_values'))
+        barrel_counts = kwargs.get('barrel_counts') or {}
 
         try:
             # 确保输出文件路径不重复
             output_file_path = self._get_unique_filename(output_file_path)
-
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "设备误差汇总" # 主Sheet
-
-            # 添加数据列标题
-            headers = [ "序号",
-                "设备编码", "客户名称", "设备桶数", "订单总量(L)",
-                "[单桶]库存消耗(L)", "库存消耗总量(L)", "误差值总数(L)", "平均每日误差(L)", "误差百分比(%)",
-                "累计离线时长(小时)", "备注"
-            ]
-
-            # --- 调整：先写入所有行内容，再设置格式 ---
-            # 1. 准备所有行内容
-            title_text = f"安卓设备消耗误差汇总报表 ({start_date} - {end_date})"
-            hint_text_1 = "1. 提示：D列【设备桶数】默认为1。如需更新，请在【非单桶设备编码】Sheet中填写设备编码和对应的桶数，此处的桶数将自动更新。"
-            explanation_text = "2. 误差百分比解读：正数(%)表示`库存消耗 > 订单总量`，可能为公司亏损；负数(%)表示`库存消耗 < 订单总量`，可能为客户亏损。"
-            hint_text = f"{hint_text_1}\n{explanation_text}"
-
-            # 2. 一次性写入
-            ws.append([title_text])
-            ws.append([hint_text])
-            ws.append(headers)
-
-            # 3. 设置标题行格式
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=12)
-            title_cell = ws.cell(row=1, column=1)
-            title_cell.alignment = Alignment(horizontal="center")
-            title_cell.font = title_font
-
-            # 4. 设置提示行格式
-            ws.merge_cells(start_row=2, start_column=1, end_row=2, end_column=12)
-            hint_cell = ws.cell(row=2, column=1)
-            hint_cell.alignment = Alignment(horizontal="left", vertical="center", wrap_text=True)
-            hint_cell.font = hint_font
-            ws.row_dimensions[2].height = 30
-
-            # 5. 设置表头行格式
-            for cell in ws[3]: # 表头现在是第3行
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = thin_border
-
-            data_start_row = 4 # 数据从第4行开始
-            # 写入数据和公式
-            for row_idx, device_data in enumerate(summary_data, start=data_start_row):
-                row_num = row_idx # 当前行号
-                # A列: 序号
-                seq_cell = ws.cell(row=row_num, column=1, value=row_idx - data_start_row + 1)
-                seq_cell.alignment = Alignment(horizontal="center", vertical="center")
-                ws.cell(row=row_num, column=2, value=device_data.get('device_code'))
-                ws.cell(row=row_num, column=3, value=device_data.get('customer_name'))
-                # D列: 设备桶数 - 使用VLOOKUP自动查找，找不到则默认为1
-                ws.cell(row=row_num, column=4, value=f"=IFERROR(VLOOKUP(B{row_num},'非单桶设备编码'!A:B,2,FALSE),1)")
-                ws.cell(row=row_num, column=5, value=device_data.get('total_order_volume'))
-                ws.cell(row=row_num, column=6, value=device_data.get('total_inventory_consumption'))
-
-                # --- 写入Excel公式 ---
-                # G列: 库存消耗总量 = D * F
-                ws.cell(row=row_num, column=7, value=f"=D{row_num}*F{row_num}")
-                # H列: 误差值总数 = G - E
-                ws.cell(row=row_num, column=8, value=f"=G{row_num}-E{row_num}")
-                # I列: 平均每日误差 = H / (查询天数)
-                days_in_range = device_data.get('days_in_range', 1)
-                avg_error_cell = ws.cell(row=row_num, column=9, value=f"=H{row_num}/{days_in_range}")
-                avg_error_cell.number_format = '0.00'
-                # J列: 误差百分比 = H / E
-                ws.cell(row=row_num, column=10, value=f'=IF(E{row_num}=0, 0, H{row_num}/E{row_num})')
-                ws.cell(row=row_num, column=10).number_format = '0.00%' # 设置为百分比格式
-
-                # --- 处理离线时长和备注 ---
-                # from datetime import datetime # 已在文件顶部引入，此处不再重复
-                offline_events = device_data.get('offline_events', [])
-                total_offline_hours = 0
-                remarks = []
-
-                # 将日期字符串转换为datetime对象
-                start_date_dt = datetime.strptime(start_date, '%Y-%m-%d')
-                end_date_dt = datetime.strptime(end_date + ' 23:59:59', '%Y-%m-%d %H:%M:%S')
-                
-                # 获取当前实际时间，用于精确计算“离线至今”
-                current_real_time = datetime.now()
-
-                for event in offline_events:
-                    create_time = event.get('create_time')
-                    biz_type = event.get('biz_type')
-                    recovery_time = event.get('recovery_time')
-
-                    # 格式化备注文本
-                    create_time_str = create_time.strftime('%Y-%m-%d %H:%M')
-                    
-                    # biz_type = 2 代表已恢复
-                    if biz_type == 2 and recovery_time:
-                        recovery_time_str = recovery_time.strftime('%Y-%m-%d %H:%M')
-                        remarks.append(f"{create_time_str}离线至{recovery_time_str}恢复")
-                        # 计算交集时长
-                        overlap_start = max(create_time, start_date_dt)
-                        overlap_end = min(recovery_time, end_date_dt)
-                        if overlap_end > overlap_start:
-                            total_offline_hours += (overlap_end - overlap_start).total_seconds() / 3600
-                    # biz_type = 1 代表未恢复
-                    elif biz_type == 1:
-                        # 确定离线事件的有效结束时间，不超过当前实际时间，也不超过查询结束时间
-                        effective_end_time_for_event = min(current_real_time, end_date_dt)
-                        
-                        # 根据有效结束时间生成备注
-                        remark_end_time_str = ""
-                        if effective_end_time_for_event == current_real_time:
-                            remark_end_time_str = f"当前时间({current_real_time.strftime('%Y-%m-%d %H:%M')})"
-                        else: # effective_end_time_for_event == end_date_dt
-                            remark_end_time_str = f"查询结束({end_date_dt.strftime('%Y-%m-%d %H:%M')})"
-                        
-                        remarks.append(f"{create_time_str}离线至{remark_end_time_str}")
-                        
-                        # 计算交集时长
-                        overlap_start = max(create_time, start_date_dt)
-                        overlap_end = effective_end_time_for_event # 使用有效结束时间进行计算
-                        if overlap_end > overlap_start:
-                            total_offline_hours += (overlap_end - overlap_start).total_seconds() / 3600
-
-
-                # K列: 累计离线时长
-                ws.cell(row=row_num, column=11, value=round(total_offline_hours, 2))
-
-                # --- 应用样式 ---
-                is_high_error = False
-                try:
-                    # 尝试计算误差百分比的绝对值
-                    total_order = float(device_data.get('total_order_volume', 0))
-                    total_consumption = float(device_data.get('total_inventory_consumption', 0))
-                    if total_order != 0:
-                        # 注意：这里用的是单桶消耗，需要乘以桶数才能和Excel公式对应，但我们只做判断，所以暂时忽略桶数影响
-                        error_percentage_abs = abs((total_consumption - total_order) / total_order)
-                        if error_percentage_abs > 0.05: # 误差超过5%
-                            is_high_error = True
-                except (ValueError, TypeError):
-                    pass # 如果数据转换失败，则不应用高亮
-                
-                # L列: 备注
-                remark_cell = ws.cell(row=row_num, column=12)
-                if remarks:
-                    remark_cell.value = "\n".join(remarks)
-                    remark_cell.font = warning_font
-                    remark_cell.alignment = Alignment(vertical='top', wrap_text=True) # 重新启用自动换行
-
-                # 应用行样式
-                for col_num in range(1, 13):
-                    cell = ws.cell(row=row_num, column=col_num)
-                    cell.border = thin_border
-                    if (row_num - data_start_row) % 2 == 1: # 斑马纹
-                        cell.fill = even_row_fill
-                
-                # 设置数据行固定高度，防止备注过长自动扩展
-                ws.row_dimensions[row_num].height = 15 # 设置一个适合单行文本的固定高度
-
-                # 如果误差高，只高亮误差百分比列
-                if is_high_error:
-                    ws.cell(row=row_num, column=10).fill = warning_fill
-                        
-            # --- 应用筛选功能 ---
-            # 设置筛选范围，从表头行开始，到数据最后一行结束
-            ws.auto_filter.ref = f"A3:L{ws.max_row}"
+            write_xlsx, table_formats = parse_export_formats(kwargs.get('export_format'))
+
+            # 将日期字符串转换为datetime对象
+            start_date_dt = datetime.strptime(start_date, '%Y-%m-%d')
+            end_date_dt = datetime.strptime(end_date + ' 23:59:59', '%Y-%m-%d %H:%M:%S')
+            # 获取当前实际时间，用于精确计算“离线至今”
+            current_real_time = datetime.now()
+
+            # 表格导出直接使用计算结果，不经过工作簿和公式
+            exporter = TableExportWriter(
+                os.path.splitext(output_file_path)[0], SUMMARY_COLUMNS, table_formats,
+                column_types=SUMMARY_COLUMN_TYPES,
+            )
+            try:
+                if write_xlsx:
+                    wb = Workbook(write_only=True)
+                    # 样式在工作簿中只注册一次，之后按索引整行应用
+                    styles = StyleRegistry(wb)
+                    ws = wb.create_sheet("设备误差汇总") # 主Sheet
+                    device_count, non_single_barrel = self._write_summary_sheet(
+                        ws, styles, summary_data, exporter, start_date, end_date,
+                        start_date_dt, end_date_dt, current_real_time, summary_values, barrel_counts,
+                    )
+                else:
+                    for seq, device_data in enumerate(summary_data, 1):
+                        exporter.write_row(self._summary_values(
+                            seq, device_data, start_date_dt, end_date_dt, current_real_time, barrel_counts
+                        ))
+            finally:
+                for path in exporter.close():
+                    print(f"数据已导出: {path}")
+            if not write_xlsx:
+                return True
 
             # --- 创建并设置 "非单桶设备编码" Sheet ---
-            ws_update = wb.create_sheet("非单桶设备编码")
-            
-            # 设置标题和提示
-            ws_update.append(["非单桶设备编码及桶数更新"])
-            ws_update.merge_cells('A1:C1')
-            ws_update['A1'].font = title_font
-            ws_update['A1'].alignment = Alignment(horizontal="center")
-
-            ws_update.append(["操作步骤：请在此表格的A列和B列粘贴或填写需要更新桶数的【设备编码】和【桶数】。C列备注会自动检查设备编码是否存在于主表中。"])
-            ws_update.merge_cells('A2:D2')
-            ws_update['A2'].font = hint_font
-            ws_update['A2'].alignment = Alignment(horizontal="center")
-
-            # 设置表头
-            update_headers = ["设备编码", "桶数", "备注"]
-            ws_update.append(update_headers)
-            for cell in ws_update[3]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.border = thin_border
-
-            # 预设备注列的公式
-            for i in range(4, 500): # 预设约500行公式
-                remark_formula = f'=IF(A{i}<>"", IF(COUNTIF(设备误差汇总!B:B, A{i})>0, "匹配设备正确，桶数已替换", "未匹配到此设备"), "")'
-                ws_update.cell(row=i, column=3, value=remark_formula)
-
-            ws_update.column_dimensions['A'].width = 25
-            ws_update.column_dimensions['B'].width = 12
-            ws_update.column_dimensions['C'].width = 35
-
-            # 调整列宽
-            column_widths = {'A': 8, 'B': 20, 'C': 25, 'D': 12, 'E': 15, 'F': 20, 'G': 18, 'H': 15, 'I': 18, 'J': 15, 'K': 20, 'L': 30}
-            for col_letter, width in column_widths.items():
-                ws.column_dimensions[col_letter].width = width
+            self._write_barrel_sheet(wb, styles, device_count, non_single_barrel, summary_values)
 
             # 保存文件
             wb.save(output_file_path)
-            print(f"误差汇总报表已生成并保存: {output_file_path}")
+            print(f"误差汇总报表已生成并保存: {output_file_path}（{device_count} 台设备）")
             return True
 
         except Exception as e:
@@ -878,3 +1034,142 @@ class ConsumptionErrorSummaryGenerator(BaseReportGenerator):
         finally:
             if 'wb' in locals() and wb:
                 wb.close()
+
+    def _write_summary_sheet(self, ws, styles, summary_data, exporter, start_date, end_date,
+                             start_date_dt, end_date_dt, current_real_time, summary_values, barrel_counts):
+        """
+        以只写模式逐行写入设备误差汇总Sheet，同时把计算结果写入表格导出
+
+        只写模式下列宽和行高必须在写入对应行之前设置，合并单元格和筛选范围在保存时写出。
+
+        Returns:
+            tuple: (设备数量, [(设备编码, 桶数), ...] 数值模式下桶数不为1的设备)
+        """
+        # 数据行各列的样式：序号居中，平均每日误差两位小数，误差百分比为百分比格式
+        row_style_names = ["数据_序号"] + ["数据"] * 7 + ["数据_两位小数", "数据_百分比", "数据", "数据"]
+        row_pattern = [styles.index(name) for name in row_style_names]
+        zebra_pattern = [styles.index(name + ZEBRA_SUFFIX) for name in row_style_names]
+        high_error_style = styles.index("数据_百分比_警告")
+        remark_styles = (styles.index("数据_备注_警告"), styles.index("数据_备注_警告" + ZEBRA_SUFFIX))
+
+        # 调整列宽
+        column_widths = {'A': 8, 'B': 20, 'C': 25, 'D': 12, 'E': 15, 'F': 20, 'G': 18, 'H': 15, 'I': 18, 'J': 15, 'K': 20, 'L': 30}
+        for col_letter, width in column_widths.items():
+            ws.column_dimensions[col_letter].width = width
+        # 数据行使用固定的默认行高，防止备注过长自动扩展，不需要逐行记录行高
+        ws.sheet_format.defaultRowHeight = 15
+        ws.sheet_format.customHeight = True
+        ws.row_dimensions[1].height = 21
+        ws.row_dimensions[2].height = 30
+
+        title_text = f"安卓设备消耗误差汇总报表 ({start_date} - {end_date})"
+        if summary_values:
+            hint_text_1 = "1. 提示：D列【设备桶数】来自设备信息文件（未提供时为1），G–J列为生成时计算的数值。如需更新桶数，请修改设备信息文件后重新生成；【非单桶设备编码】Sheet列出本表使用的非单桶设备。"
+        else:
+            hint_text_1 = "1. 提示：D列【设备桶数】默认为1。如需更新，请在【非单桶设备编码】Sheet中填写设备编码和对应的桶数，此处的桶数将自动更新。"
+        explanation_text = "2. 误差百分比解读：正数(%)表示`库存消耗 > 订单总量`，可能为公司亏损；负数(%)表示`库存消耗 < 订单总量`，可能为客户亏损。"
+        hint_text = f"{hint_text_1}\n{explanation_text}"
+
+        # 标题行和提示行
+        ws.append(styles.cells(ws, [title_text], ["报表标题"]))
+        ws.merged_cells.add("A1:L1")
+        ws.append(styles.cells(ws, [hint_text], ["报表提示"]))
+        ws.merged_cells.add("A2:L2")
+        # 表头行（第3行）
+        ws.append(styles.cells(ws, SUMMARY_COLUMNS, ["表头"] * len(SUMMARY_COLUMNS)))
+
+        data_start_row = 4 # 数据从第4行开始
+        non_single_barrel = []
+        device_count = 0
+        for seq, device_data in enumerate(summary_data, 1):
+            device_count = seq
+            row_num = data_start_row + seq - 1 # 当前行号
+            values = self._summary_values(
+                seq, device_data, start_date_dt, end_date_dt, current_real_time, barrel_counts
+            )
+            exporter.write_row(values)
+            remarks = values[11]
+
+            if summary_values:
+                # 数值模式：整行直接使用计算结果，打开和筛选时不需要重新计算
+                row_values = values
+                if values[3] != 1:
+                    non_single_barrel.append((values[1], values[3]))
+            else:
+                row_values = list(values)
+                # D列: 设备桶数 - 使用VLOOKUP自动查找，找不到则默认为1
+                row_values[3] = f"=IFERROR(VLOOKUP(B{row_num},'非单桶设备编码'!A:B,2,FALSE),1)"
+                # --- 写入Excel公式 ---
+                # G列: 库存消耗总量 = D * F
+                row_values[6] = f"=D{row_num}*F{row_num}"
+                # H列: 误差值总数 = G - E
+                row_values[7] = f"=G{row_num}-E{row_num}"
+                # I列: 平均每日误差 = H / (查询天数)
+                row_values[8] = f"=H{row_num}/{device_data.get('days_in_range', 1)}"
+                # J列: 误差百分比 = H / E
+                row_values[9] = f'=IF(E{row_num}=0, 0, H{row_num}/E{row_num})'
+
+            # --- 应用样式 ---
+            is_zebra = (row_num - data_start_row) % 2 == 1 # 斑马纹
+            pattern = zebra_pattern if is_zebra else row_pattern
+            is_high_error = self._is_high_error(device_data)
+            if remarks or is_high_error:
+                pattern = list(pattern)
+            # L列: 备注，警告字体，自动换行
+            if remarks:
+                pattern[11] = remark_styles[is_zebra]
+            # 如果误差高，只高亮误差百分比列
+            if is_high_error:
+                pattern[9] = high_error_style
+            ws.append(styles.cells(ws, row_values, pattern))
+
+        # --- 应用筛选功能 ---
+        # 设置筛选范围，从表头行开始，到数据最后一行结束
+        ws.auto_filter.ref = f"A3:L{data_start_row + device_count - 1 if device_count else 3}"
+        return device_count, non_single_barrel
+
+    @staticmethod
+    def _write_barrel_sheet(wb, styles, device_count, non_single_barrel, summary_values):
+        """
+        写入"非单桶设备编码"Sheet
+
+        Args:
+            wb (Workbook): 只写模式的工作簿
+            styles (StyleRegistry): 工作簿的样式注册表
+            device_count (int): 主表中的设备数量
+            non_single_barrel (list): 数值模式下桶数不为1的设备
+            summary_values (bool): 是否为数值模式
+        """
+        ws_update = wb.create_sheet("非单桶设备编码")
+        ws_update.column_dimensions['A'].width = 25
+        ws_update.column_dimensions['B'].width = 12
+        ws_update.column_dimensions['C'].width = 35
+
+        # 设置标题和提示
+        ws_update.append(styles.cells(ws_update, ["非单桶设备编码及桶数更新"], ["报表标题"]))
+        ws_update.merged_cells.add('A1:C1')
+        if summary_values:
+            hint = "以下为本表中桶数不为1的设备，桶数已计入主表数值。如需修改桶数，请更新设备信息文件后重新生成报表。"
+        else:
+            hint = "操作步骤：请在此表格的A列和B列粘贴或填写需要更新桶数的【设备编码】和【桶数】。C列备注会自动检查设备编码是否存在于主表中。"
+        ws_update.append(styles.cells(ws_update, [hint], ["报表提示_居中"]))
+        ws_update.merged_cells.add('A2:D2')
+
+        # 设置表头
+        update_headers = ["设备编码", "桶数", "备注"]
+        ws_update.append(styles.cells(ws_update, update_headers, ["表头"] * len(update_headers)))
+
+        data_start_row = 4
+        if summary_values:
+            # 数值模式只保留一层小范围公式：逐行核对列出的设备是否在主表数据区域中
+            last_data_row = data_start_row + device_count - 1
+            for i, (device_code, barrel_count) in enumerate(non_single_barrel, 4):
+                ws_update.append([
+                    device_code, barrel_count,
+                    f'=IF(COUNTIF(设备误差汇总!$B${data_start_row}:$B${last_data_row}, A{i})>0, "已按此桶数计算", "未匹配到此设备")',
+                ])
+        else:
+            # 预设备注列的公式
+            for i in range(4, 500): # 预设约500行公式
+                remark_formula = f'=IF(A{i}<>"", IF(COUNTIF(设备误差汇总!B:B, A{i})>0, "匹配设备正确，桶数已替换", "未匹配到此设备"), "")'
+                ws_update.append([None, None, remark_formula])
@@ -0,0 +1,208 @@
+"""
+每日期末状态存储模块
+将每台设备每天的计算结果（期末库存、订单总量、推断加油量、单桶消耗量）持久化到本地SQLite文件，
+滚动窗口报表再次运行时只需计算上次持久化之后的新日期
+"""
+import datetime
+import hashlib
+import os
+import sqlite3
+
+
+def query_fingerprint(query_template):
+    """
+    计算查询模板的指纹，用于区分不同查询口径下计算出的状态
+
+    Args:
+        query_template (str): SQL查询模板
+
+    Returns:
+        str: 模板内容的SHA1摘要
+    """
+    return hashlib.sha1((query_template or "").encode("utf-8")).hexdigest()
+
+
+class DailyStateStore:
+    """每日期末状态的本地存储，基于SQLite实现"""
+
+    def __init__(self, db_path):
+        """
+        初始化状态存储
+
+        Args:
+            db_path (str): SQLite数据库文件路径，目录不存在时自动创建
+        """
+        self.db_path = db_path
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir, exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._create_tables()
+
+    def _create_tables(self):
+        """创建状态表和覆盖区间表"""
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_state (
+                    device_id TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    state_date TEXT NOT NULL,
+                    end_inventory REAL NOT NULL,
+                    order_total REAL NOT NULL,
+                    refill REAL NOT NULL,
+                    consumption REAL NOT NULL,
+                    oil_name TEXT,
+                    PRIMARY KEY (device_id, fingerprint, state_date)
+                )
+                """
+            )
+            # 覆盖区间：记录已经完整计算过的连续日期范围（包括没有订单的日期）
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS state_coverage (
+                    device_id TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    covered_from TEXT NOT NULL,
+                    covered_to TEXT NOT NULL,
+                    PRIMARY KEY (device_id, fingerprint)
+                )
+                """
+            )
+
+    def get_coverage(self, device_id, fingerprint):
+        """
+        获取设备已持久化的连续日期范围
+
+        Args:
+            device_id: 设备ID
+            fingerprint (str): 查询模板指纹
+
+        Returns:
+            tuple or None: (covered_from, covered_to) 日期对象元组，未持久化过时返回None
+        """
+        row = self._conn.execute(
+            "SELECT covered_from, covered_to FROM state_coverage WHERE device_id = ? AND fingerprint = ?",
+            (str(device_id), fingerprint),
+        ).fetchone()
+        if not row:
+            return None
+        return (
+            datetime.date.fromisoformat(row[0]),
+            datetime.date.fromisoformat(row[1]),
+        )
+
+    def get_last_state(self, device_id, fingerprint, on_or_before):
+        """
+        获取指定日期（含）之前最近一天的状态，用作后续计算的期初库存
+
+        Args:
+            device_id: 设备ID
+            fingerprint (str): 查询模板指纹
+            on_or_before (date): 截止日期
+
+        Returns:
+            tuple or None: (date, state_dict)，不存在时返回None
+        """
+        row = self._conn.execute(
+            "SELECT state_date, end_inventory, order_total, refill, consumption, oil_name "
+            "FROM daily_state WHERE device_id = ? AND fingerprint = ? AND state_date <= ? "
+            "ORDER BY state_date DESC LIMIT 1",
+            (str(device_id), fingerprint, on_or_before.isoformat()),
+        ).fetchone()
+        if not row:
+            return None
+        return datetime.date.fromisoformat(row[0]), self._row_to_state(row)
+
+    def load_states(self, device_id, fingerprint, start_date, end_date):
+        """
+        读取日期范围内的所有状态
+
+        Args:
+            device_id: 设备ID
+            fingerprint (str): 查询模板指纹
+            start_date (date): 开始日期
+            end_date (date): 结束日期
+
+        Returns:
+            dict: {date: state_dict}，按日期升序
+        """
+        rows = self._conn.execute(
+            "SELECT state_date, end_inventory, order_total, refill, consumption, oil_name "
+            "FROM daily_state WHERE device_id = ? AND fingerprint = ? AND state_date BETWEEN ? AND ? "
+            "ORDER BY state_date",
+            (str(device_id), fingerprint, start_date.isoformat(), end_date.isoformat()),
+        ).fetchall()
+        return {datetime.date.fromisoformat(row[0]): self._row_to_state(row) for row in rows}
+
+    def save_states(self, device_id, fingerprint, states, covered_from, covered_to):
+        """
+        写入状态并更新覆盖区间
+
+        Args:
+            device_id: 设备ID
+            fingerprint (str): 查询模板指纹
+            states (dict): {date: state_dict}
+            covered_from (date): 覆盖区间开始日期
+            covered_to (date): 覆盖区间结束日期
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO daily_state "
+                "(device_id, fingerprint, state_date, end_inventory, order_total, refill, consumption, oil_name) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        str(device_id),
+                        fingerprint,
+                        state_date.isoformat(),
+                        state["end_inventory"],
+                        state["order_total"],
+                        state["refill"],
+                        state["consumption"],
+                        state.get("oil_name"),
+                    )
+                    for state_date, state in states.items()
+                    if covered_from <= state_date <= covered_to
+                ],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state_coverage (device_id, fingerprint, covered_from, covered_to) "
+                "VALUES (?, ?, ?, ?)",
+                (str(device_id), fingerprint, covered_from.isoformat(), covered_to.isoformat()),
+            )
+
+    def clear_device(self, device_id, fingerprint):
+        """
+        清除设备的所有状态（例如历史数据被修正后需要重算）
+
+        Args:
+            device_id: 设备ID
+            fingerprint (str): 查询模板指纹
+        """
+        with self._conn:
+            self._conn.execute(
+                "DELETE FROM daily_state WHERE device_id = ? AND fingerprint = ?",
+                (str(device_id), fingerprint),
+            )
+            self._conn.execute(
+                "DELETE FROM state_coverage WHERE device_id = ? AND fingerprint = ?",
+                (str(device_id), fingerprint),
+            )
+
+    def close(self):
+        """关闭存储连接"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @staticmethod
+    def _row_to_state(row):
+        """将查询行转换为状态字典"""
+        return {
+            "end_inventory": row[1],
+            "order_total": row[2],
+            "refill": row[3],
+            "consumption": row[4],
+            "oil_name": row[5],
+        }
@@ -3,23 +3,46 @@
 负责统一管理报表所需的数据获取和处理，避免重复数据库查询
 """
 import datetime
-from collections import defaultdict
 #from ..utils.date_utils import parse_date
 # 改为绝对导入：
-from src.utils.date_utils import parse_date
+from src.utils.date_utils import parse_date, default_calendar
+from src.core.aggregate_cache import aggregate_key
+from src.core.daily_state_store import query_fingerprint
+from src.core.fleet_calculator import build_fleet_arrays, compute_fleet_errors
+from src.core.period_rollup import rollup_states, rollup_usage
+from src.core.row_stream import (
+    RowStream,
+    UsageAccumulator,
+    InventoryAccumulator,
+    PeriodStateAccumulator,
+    sorted_records,
+    volume_scale_for,
+    to_fixed_point,
+    from_fixed_point,
+)
+
+# 状态中以体积计量的字段，定点模式下输出前转换回升
+_VOLUME_STATE_FIELDS = ('end_inventory', 'order_total', 'refill', 'consumption')
 
 
 class ReportDataManager:
     """报表数据管理器，负责统一管理报表所需的数据获取和处理"""
     
-    def __init__(self, db_handler):
+    def __init__(self, db_handler, state_store=None, volume_unit=None, aggregate_cache=None):
         """
         初始化报表数据管理器
         
         Args:
             db_handler: 数据库处理器实例
+            state_store: 每日状态存储实例（DailyStateStore），用于增量计算每日误差，可选
+            volume_unit (str, optional): 定点体积单位 'cl' 或 'ml'。设置后油加注值和原油剩余量
+                在读取时一次性转换为整数，求和、求差均为精确的整数运算，只在返回结果时转换回升
+            aggregate_cache: 聚合结果缓存实例（AggregateCache），用于fetch_device_aggregates，可选
         """
         self.db_handler = db_handler
+        self.state_store = state_store
+        self.volume_scale = volume_scale_for(volume_unit)
+        self.aggregate_cache = aggregate_cache
         self._raw_data_cache = {}
         
     def fetch_raw_data(self, device_id, query_template, start_date, end_date):
@@ -45,16 +68,177 @@ class ReportDataManager:
             self._raw_data_cache[cache_key] = (data, columns, raw_data)
         return self._raw_data_cache[cache_key]
         
+    def release_raw_data(self):
+        """
+        释放已缓存的原始数据，包括数据库处理器的查询缓存
+
+        按客户分批处理时，在每个客户的报表数据计算完成后调用，使峰值内存只与单个客户的数据量相关
+        """
+        self._raw_data_cache.clear()
+        clear_query_cache = getattr(self.db_handler, 'clear_query_cache', None)
+        if clear_query_cache is not None:
+            clear_query_cache()
+
+    def fetch_device_aggregates(self, device_id, query_template, start_date, end_date,
+                                kinds=('inventory_data', 'daily_states')):
+        """
+        获取设备的聚合结果，配置聚合结果缓存时按内容寻址读取和写入缓存
+
+        缓存地址由设备ID、日期范围、查询模板指纹、源数据水位和体积单位决定，
+        所有请求的聚合结果都命中缓存时不再读取原始数据。
+
+        Args:
+            device_id: 设备ID
+            query_template: 查询模板
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            kinds (tuple): 需要的聚合结果，可选 inventory_data、daily_usage、daily_states
+
+        Returns:
+            dict: {kind: 聚合结果}，另外包含has_oil_name_column和oil_name，
+                与原始数据第一条记录的油品名称一致
+        """
+        kinds = tuple(kinds) + ('oil_name',)
+        cache_key = None
+        aggregates = {}
+        if self.aggregate_cache is not None:
+            watermark = self.db_handler.fetch_source_watermark(device_id, query_template, start_date, end_date)
+            if watermark is not None:
+                cache_key = aggregate_key(
+                    device_id, start_date, end_date, query_fingerprint(query_template), watermark, self.volume_scale
+                )
+                for kind in kinds:
+                    value = self.aggregate_cache.get(cache_key, kind)
+                    if value is not None:
+                        aggregates[kind] = value
+
+        missing = [kind for kind in kinds if kind not in aggregates]
+        if missing:
+            raw_data = self.fetch_raw_data(device_id, query_template, start_date, end_date)
+            for kind in missing:
+                if kind == 'inventory_data':
+                    value = self.extract_inventory_data(raw_data)
+                elif kind == 'daily_usage':
+                    value = self.calculate_daily_usage(raw_data)
+                elif kind == 'daily_states':
+                    value = self.calculate_daily_states(raw_data)
+                elif kind == 'oil_name':
+                    value = self.extract_oil_name(raw_data)
+                else:
+                    raise ValueError(f"不支持的聚合结果类型: {kind}")
+                aggregates[kind] = value
+                if cache_key is not None:
+                    self.aggregate_cache.put(cache_key, kind, value)
+        else:
+            print("  使用缓存的聚合结果，跳过数据读取和计算")
+
+        has_oil_name_column, oil_name = aggregates.pop('oil_name')
+        aggregates['has_oil_name_column'] = has_oil_name_column
+        aggregates['oil_name'] = oil_name
+        return aggregates
+
+    @staticmethod
+    def extract_oil_name(raw_data):
+        """
+        读取原始数据第一条记录的油品名称
+
+        Returns:
+            tuple: (是否存在油品名称列, 油品名称)
+        """
+        data, columns, raw_data_content = raw_data
+        if not raw_data_content or '油品名称' not in columns:
+            return False, None
+        # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
+        first_row = raw_data_content[0]
+        if isinstance(first_row, dict):
+            return True, first_row.get('油品名称')
+        oil_name_index = columns.index('油品名称')
+        return True, first_row[oil_name_index] if oil_name_index < len(first_row) else None
+
+    def _feed(self, raw_data, *accumulators, ordered=False):
+        """
+        将原始数据分发给聚合器
+
+        Args:
+            raw_data: 原始数据元组 (data, columns, raw_data)，或按时间升序排列的RowStream
+            *accumulators: 聚合器
+            ordered (bool): 聚合器是否要求按时间升序输入。物化数据会先排序，数据流按原样消费
+        """
+        if isinstance(raw_data, RowStream):
+            # 数据流的体积单位与数据管理器保持一致，保证结果换算正确
+            raw_data.volume_scale = self.volume_scale
+            raw_data.consume(*accumulators)
+            return
+        data, columns, raw_data_content = raw_data
+        if ordered:
+            records = sorted_records(columns, raw_data_content, self.volume_scale)
+        else:
+            records = RowStream(columns, raw_data_content, volume_scale=self.volume_scale).records()
+        for record in records:
+            for accumulator in accumulators:
+                accumulator.add(*record)
+
+    def _usage_to_litres(self, usage):
+        """将定点模式下的用量结果 [(period, usage), ...] 转换回升"""
+        if self.volume_scale is None:
+            return usage
+        return [(period, from_fixed_point(value, self.volume_scale)) for period, value in usage]
+
+    def _usage_to_fixed(self, usage):
+        """将以升为单位的用量结果重新转换为定点值，使周期汇总按整数相加"""
+        if self.volume_scale is None:
+            return usage
+        return [(period, to_fixed_point(value, self.volume_scale)) for period, value in usage]
+
+    def _states_to_fixed(self, states):
+        """将以升为单位的每日状态复制并转换为定点值，不修改传入的状态"""
+        if self.volume_scale is None:
+            return states
+        fixed_states = {}
+        for state_date, state in states.items():
+            fixed_state = dict(state)
+            for field in _VOLUME_STATE_FIELDS:
+                fixed_state[field] = to_fixed_point(state[field], self.volume_scale)
+            fixed_states[state_date] = fixed_state
+        return fixed_states
+
+    def _rollup_usage(self, daily_usage, period):
+        """按周期汇总每日用量，定点模式下以整数相加后再转换回升"""
+        return self._usage_to_litres(rollup_usage(self._usage_to_fixed(daily_usage), period))
+
+    def _rollup_states(self, daily_states, period):
+        """按周期汇总每日状态，定点模式下以整数相加后再转换回升"""
+        return self._states_to_litres(rollup_states(self._states_to_fixed(daily_states), period))
+
+    def _scale_by_barrels(self, consumption, barrel_count):
+        """单桶消耗量乘以桶数，定点模式下按整数相乘"""
+        if self.volume_scale is None:
+            return consumption * barrel_count
+        fixed = to_fixed_point(consumption, self.volume_scale)
+        return from_fixed_point(fixed * barrel_count, self.volume_scale)
+
+    def _states_to_litres(self, states):
+        """将定点模式下的周期状态转换回升"""
+        if self.volume_scale is not None:
+            for state in states.values():
+                for field in _VOLUME_STATE_FIELDS:
+                    state[field] = from_fixed_point(state[field], self.volume_scale)
+        return states
+
     def extract_inventory_data(self, raw_data):
         """
         从原始数据中提取库存表所需数据
         
         Args:
-            raw_data: 原始数据元组 (data, columns, raw_data)
+            raw_data: 原始数据元组 (data, columns, raw_data)，或RowStream数据流
             
         Returns:
             list: 库存数据
         """
+        if isinstance(raw_data, RowStream):
+            accumulator = InventoryAccumulator()
+            raw_data.consume(accumulator)
+            return accumulator.result()
         # 直接返回原始数据，因为db_handler.fetch_generic_data已经处理好了
         return raw_data[0]  # data部分
         
@@ -63,92 +247,50 @@ class ReportDataManager:
         从原始数据中计算每日用量数据
         
         Args:
-            raw_data: 原始数据元组 (data, columns, raw_data)
+            raw_data: 原始数据元组 (data, columns, raw_data)，或RowStream数据流
             
         Returns:
             list: 按日期排序的每日用量数据 [(date, usage), ...]
         """
-        data, columns, raw_data_content = raw_data
         # 按日期分组并累加注加注值
-        daily_usage = defaultdict(float)
-        
-        for i, row in enumerate(raw_data_content):
-            row_dict = dict(zip(columns, row))
-            order_time = row_dict.get("加注时间")
-            oil_val = row_dict.get("油加注值", 0) if row_dict.get("油加注值") is not None else 0
-            
-            if isinstance(order_time, datetime.datetime):
-                order_date = order_time.date()
-                daily_usage[order_date] += float(oil_val)
-            elif isinstance(order_time, str):
-                # 处理字符串格式的日期
-                parsed_datetime = None
-                for fmt in ["%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                    try:
-                        parsed_datetime = datetime.datetime.strptime(order_time, fmt)
-                        break
-                    except ValueError:
-                        continue
-                if parsed_datetime:
-                    order_date = parsed_datetime.date()
-                    daily_usage[order_date] += float(oil_val)
-        
-        return sorted(daily_usage.items())
+        accumulator = UsageAccumulator(lambda order_time: order_time.date())
+        self._feed(raw_data, accumulator)
+        return self._usage_to_litres(accumulator.result())
         
-    def calculate_monthly_usage(self, raw_data, start_date=None, end_date=None):
+    def calculate_monthly_usage(self, raw_data, start_date=None, end_date=None, daily_usage=None):
         """
         从原始数据中计算每月用量数据
         
         Args:
-            raw_data: 原始数据元组 (data, columns, raw_data)
+            raw_data: 原始数据元组 (data, columns, raw_data)，或RowStream数据流；
+                提供daily_usage时不再使用，可以为None
             start_date: 开始日期
             end_date: 结束日期
+            daily_usage (list, optional): calculate_daily_usage已计算的每日用量，
+                提供时直接按月汇总，不再重新扫描原始数据
             
         Returns:
             list: 按月份排序的每月用量数据 [(month, usage), ...]
         """
-        data, columns, raw_data_content = raw_data
-        # 按月份分组并累加注加注值
-        monthly_usage = defaultdict(float)
-        
-        for i, row in enumerate(raw_data_content):
-            row_dict = dict(zip(columns, row))
-            order_time = row_dict.get("加注时间")
-            oil_val = row_dict.get("油加注值", 0) if row_dict.get("油加注值") is not None else 0
-            
-            if isinstance(order_time, datetime.datetime):
-                # 按记录本身的日期归属月份，除非开始日期与结束日期不同，则以结束日期为归属月份
-                if start_date and end_date and start_date != end_date:
-                    # 跨月对账处理：以结束日期为归属月份
-                    order_month = parse_date(end_date).strftime("%Y-%m")
-                else:
-                    # 正常情况：按记录本身的日期归属月份
-                    order_month = order_time.strftime("%Y-%m")
-                
-                monthly_usage[order_month] += float(oil_val)
-            elif isinstance(order_time, str):
-                # 处理字符串格式的日期
-                parsed_datetime = None
-                for fmt in ["%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                    try:
-                        parsed_datetime = datetime.datetime.strptime(order_time, fmt)
-                        break
-                    except ValueError:
-                        continue
-                if parsed_datetime:
-                    # 按记录本身的日期归属月份，除非开始日期与结束日期不同，则以结束日期为归属月份
-                    if start_date and end_date and start_date != end_date:
-                        # 跨月对账处理：以结束日期为归属月份
-                        order_month = parse_date(end_date).strftime("%Y-%m")
-                    else:
-                        # 正常情况：按记录本身的日期归属月份
-                        order_month = parsed_datetime.strftime("%Y-%m")
-                    
-                    monthly_usage[order_month] += float(oil_val)
-        
-        return sorted(monthly_usage.items())
-
-    def calculate_daily_errors(self, raw_data, barrel_count=1):
+        # 按记录本身的日期归属月份，除非开始日期与结束日期不同，则以结束日期为归属月份
+        if start_date and end_date and start_date != end_date:
+            # 跨月对账处理：以结束日期为归属月份
+            end_month = default_calendar.month_key(parse_date(end_date))
+            if daily_usage is not None:
+                if not daily_usage:
+                    return []
+                total = sum(usage for _, usage in self._usage_to_fixed(daily_usage))
+                return self._usage_to_litres([(end_month, total)])
+            accumulator = UsageAccumulator(lambda order_time: end_month)
+        elif daily_usage is not None:
+            return self._rollup_usage(daily_usage, 'month')
+        else:
+            # 正常情况：按记录本身的日期归属月份
+            accumulator = UsageAccumulator(default_calendar.month_key)
+        self._feed(raw_data, accumulator)
+        return self._usage_to_litres(accumulator.result())
+
+    def calculate_daily_errors(self, raw_data, barrel_count=1, daily_states=None):
         """
         计算每日消耗误差数据。
 
@@ -164,48 +306,76 @@ class ReportDataManager:
             -   负数表示订单记录大于库存消耗，记为“客户亏损”。
 
         Args:
-            raw_data: 原始数据元组 (data, columns, raw_data)
+            raw_data: 原始数据元组 (data, columns, raw_data)，或按时间升序排列的RowStream；
+                提供daily_states时不再使用，可以为None
             barrel_count (int): 油桶数量，默认为1
+            daily_states (dict, optional): 已计算的每日状态（单桶），提供时直接按桶数换算
 
         Returns:
             dict: 包含每日订单累积总量、中润亏损和客户亏损的数据
         """
-        data, columns, raw_data_content = raw_data
+        if daily_states is None:
+            daily_states = self.calculate_daily_states(raw_data)
+        return self._build_daily_error_result(daily_states, barrel_count)
+
+    def calculate_daily_states(self, raw_data):
+        """
+        计算每日期末状态，可用于每日误差，也可通过rollup_daily_states汇总为周/月/季度状态
+
+        Args:
+            raw_data: 原始数据元组 (data, columns, raw_data)，或按时间升序排列的RowStream
+
+        Returns:
+            dict: {date: state_dict}，state_dict包含end_inventory、order_total、refill、consumption（单桶）、oil_name
+        """
+        accumulator = PeriodStateAccumulator(lambda order_time: order_time.date())
+        self._feed(raw_data, accumulator, ordered=True)
+        return self._states_to_litres(accumulator.result())
+
+    def rollup_daily_states(self, daily_states, period='month'):
+        """
+        将每日状态汇总为周/月/季度状态，计算量只与天数相关
+
+        Args:
+            daily_states (dict): {date: state_dict}
+            period (str): 汇总周期，week / month / quarter
+
+        Returns:
+            dict: {周期键: state_dict}
+        """
+        return self._rollup_states(daily_states, period)
 
-        # 按日期分组数据
-        daily_data = defaultdict(list)
-
-        for row in raw_data_content:
-            row_dict = dict(zip(columns, row))
-            order_time = row_dict.get("加注时间")
-            oil_val = float(row_dict.get("油加注值", 0) or 0)
-            avai_oil = float(row_dict.get("原油剩余量", 0) or 0)
-
-            if isinstance(order_time, datetime.datetime):
-                order_date = order_time.date()
-                daily_data[order_date].append({
-                    'oil_val': oil_val,
-                    'avai_oil': avai_oil,
-                    'order_time': order_time
-                })
-            elif isinstance(order_time, str):
-                # 处理字符串格式的日期
-                parsed_datetime = None
-                for fmt in ["%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                    try:
-                        parsed_datetime = datetime.datetime.strptime(order_time, fmt)
-                        break
-                    except ValueError:
-                        continue
-                if parsed_datetime:
-                    order_date = parsed_datetime.date()
-                    daily_data[order_date].append({
-                        'oil_val': oil_val,
-                        'avai_oil': avai_oil,
-                        'order_time': parsed_datetime
-                    })
-
-        # 计算每日数据
+    def _compute_daily_states(self, columns, raw_data_content, opening_inventory=None):
+        """
+        按天计算期末状态（期末库存、订单总量、推断加油量、单桶消耗量）
+
+        Args:
+            columns (list): 列名列表
+            raw_data_content (list): 原始数据行
+            opening_inventory (float, optional): 第一天的期初库存。
+                为None时使用第一天最早一条记录的库存作为基准（与原有逻辑一致）
+
+        Returns:
+            dict: {date: state_dict}，按日期升序排列
+        """
+        if opening_inventory is not None and self.volume_scale is not None:
+            opening_inventory = to_fixed_point(opening_inventory, self.volume_scale)
+        accumulator = PeriodStateAccumulator(lambda order_time: order_time.date(), opening_inventory)
+        for record in sorted_records(columns, raw_data_content, self.volume_scale):
+            accumulator.add(*record)
+        return self._states_to_litres(accumulator.result())
+
+    def _build_daily_error_result(self, daily_states, barrel_count=1):
+        """
+        根据每日状态组装每日误差结果
+
+        Args:
+            daily_states (dict): {date: state_dict}
+            barrel_count (int): 油桶数量
+
+        Returns:
+            dict: 与calculate_daily_errors返回格式一致的结果
+        """
         result = {
             'daily_order_totals': {},  # 每日订单累积总量
             'daily_shortage_errors': {},  # 每日中润亏损
@@ -214,54 +384,11 @@ class ReportDataManager:
             'daily_consumption': {}  # 每日消耗量
         }
 
-        # 按日期排序处理
-        sorted_dates = sorted(daily_data.keys())
-        previous_day_end_inventory = 0
-
-        # 关键修复：正确初始化第一天的“上日结束库存”
-        # 应该获取查询开始日期前一天的最后一条库存记录
-        if sorted_dates:
-            first_day_in_data = sorted_dates[0]
-            # 查找在 first_day_in_data 之前的所有记录
-            previous_day_records = [
-                dict(zip(columns, r)) for r in raw_data_content 
-                if (isinstance(dict(zip(columns, r)).get("加注时间"), datetime.datetime) and 
-                    dict(zip(columns, r)).get("加注时间").date() < first_day_in_data)
-            ]
-            if previous_day_records:
-                # 如果有前一天的数据，取前一天最晚的一条记录作为基准库存
-                previous_day_records.sort(key=lambda x: x['加注时间'])
-                previous_day_end_inventory = float(previous_day_records[-1].get("原油剩余量", 0) or 0)
-            else:
-                # 如果没有前一天的数据，则使用第一天最早的一条记录作为基准库存（作为备用方案）
-                first_day_data = sorted(daily_data[first_day_in_data], key=lambda x: x['order_time'])
-                if first_day_data:
-                    previous_day_end_inventory = first_day_data[0]['avai_oil']
-
-        for date in sorted_dates:
-            day_data = sorted(daily_data[date], key=lambda x: x['order_time'])
-            
-            # 当天开始库存 = 上一天结束库存
-            start_inventory = previous_day_end_inventory
-            # 当天结束库存 = 当天最晚记录的库存
-            end_inventory = day_data[-1]['avai_oil']
-
-            # 计算当天总加油量（推断）
-            total_refill_today = 0
-            last_inventory_point = start_inventory
-            for record in day_data:
-                current_inventory_point = record['avai_oil']
-                if current_inventory_point > last_inventory_point:
-                    total_refill_today += (current_inventory_point - last_inventory_point)
-                last_inventory_point = current_inventory_point
-
-            # 计算库存消耗总量
-            inventory_consumption = ((start_inventory - end_inventory) + total_refill_today) * barrel_count
-
-            # 计算订单总量
-            order_total = sum(item['oil_val'] for item in day_data)
+        for date in sorted(daily_states.keys()):
+            state = daily_states[date]
+            inventory_consumption = self._scale_by_barrels(state['consumption'], barrel_count)
+            order_total = state['order_total']
 
-            # 存储结果
             result['daily_order_totals'][date] = order_total
             result['daily_consumption'][date] = inventory_consumption
 
@@ -272,67 +399,170 @@ class ReportDataManager:
             elif difference < 0:
                 result['daily_excess_errors'][date] = abs(difference)
 
-            # 更新上一天结束库存，为下一天做准备
-            previous_day_end_inventory = end_inventory
-
         return result
 
+    def calculate_daily_errors_incremental(self, device_id, query_template, start_date, end_date, barrel_count=1):
+        """
+        增量计算每日消耗误差数据
+
+        已持久化的完整日期直接从状态存储读取，只查询和计算最后持久化日期之后的新日期，
+        新日期的期初库存取自存储中的上一日期末库存。当天（未结束）的数据只参与本次计算，不会持久化。
+        请求窗口早于已持久化范围或与之不连续时，整个窗口重新计算并替换已有状态。
 
-    def calculate_monthly_errors(self, raw_data, start_date, end_date, barrel_count=1):
+        Args:
+            device_id: 设备ID
+            query_template: 查询模板
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            barrel_count (int): 油桶数量，默认为1
+
+        Returns:
+            tuple: (error_data, inventory_data, oil_name)
+                error_data与calculate_daily_errors返回格式一致，
+                inventory_data为[(date, 期末库存), ...]
+        """
+        states = self.load_daily_states_incremental(device_id, query_template, start_date, end_date)
+        error_data = self._build_daily_error_result(states, barrel_count)
+        inventory_data = [(state_date, states[state_date]['end_inventory']) for state_date in sorted(states)]
+        oil_name = next((state['oil_name'] for state in states.values() if state.get('oil_name')), None)
+        return error_data, inventory_data, oil_name
+
+    def calculate_monthly_errors_incremental(self, device_id, query_template, start_date, end_date, barrel_count=1):
+        """
+        基于持久化的每日状态计算每月消耗误差数据
+
+        每日状态的读取和增量补算与calculate_daily_errors_incremental相同，
+        每月结果由每日状态汇总得到，不再扫描整个日期范围的原始订单记录。
+
+        Args:
+            device_id: 设备ID
+            query_template: 查询模板
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+            barrel_count (int): 油桶数量，默认为1
+
+        Returns:
+            tuple: (error_data, inventory_data, oil_name)
+                error_data与calculate_monthly_errors返回格式一致，
+                inventory_data为[(date, 期末库存), ...]
+        """
+        states = self.load_daily_states_incremental(device_id, query_template, start_date, end_date)
+        error_data = self.calculate_monthly_errors(None, start_date, end_date, barrel_count, daily_states=states)
+        inventory_data = [(state_date, states[state_date]['end_inventory']) for state_date in sorted(states)]
+        oil_name = next((state['oil_name'] for state in states.values() if state.get('oil_name')), None)
+        return error_data, inventory_data, oil_name
+
+    def load_daily_states_incremental(self, device_id, query_template, start_date, end_date):
+        """
+        读取日期范围内的每日状态，缺失的日期从数据库增量补算并持久化
+
+        Args:
+            device_id: 设备ID
+            query_template: 查询模板
+            start_date (str): 开始日期
+            end_date (str): 结束日期
+
+        Returns:
+            dict: {date: state_dict}，只包含有数据的日期
+        """
+        if self.state_store is None:
+            raise ValueError("未配置每日状态存储，无法进行增量计算")
+
+        window_start = parse_date(start_date).date()
+        window_end = parse_date(end_date).date()
+        # 只有已经结束的日期才能持久化
+        last_complete_day = min(window_end, datetime.date.today() - datetime.timedelta(days=1))
+
+        fingerprint = query_fingerprint(query_template)
+        coverage = self.state_store.get_coverage(device_id, fingerprint)
+        one_day = datetime.timedelta(days=1)
+
+        if coverage and coverage[0] <= window_start <= coverage[1] + one_day:
+            covered_from, covered_to = coverage
+            fetch_start = covered_to + one_day
+            last_state = self.state_store.get_last_state(device_id, fingerprint, covered_to)
+            opening_inventory = last_state[1]['end_inventory'] if last_state else None
+        else:
+            if coverage:
+                self.state_store.clear_device(device_id, fingerprint)
+            covered_from, covered_to = window_start, window_start - one_day
+            fetch_start = window_start
+            opening_inventory = None
+
+        new_states = {}
+        if fetch_start <= window_end:
+            print(f"  增量计算: {fetch_start} 至 {window_end}")
+            data, columns, raw_data_content = self.db_handler.fetch_generic_data(
+                device_id, query_template, fetch_start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")
+            )
+            new_states = self._compute_daily_states(columns, raw_data_content, opening_inventory)
+            if fetch_start <= last_complete_day:
+                self.state_store.save_states(device_id, fingerprint, new_states, covered_from, last_complete_day)
+        else:
+            print(f"  已持久化至 {covered_to}，无需重新计算")
+
+        states = self.state_store.load_states(
+            device_id, fingerprint, window_start, min(covered_to, window_end)
+        )
+        states.update(
+            (state_date, state) for state_date, state in new_states.items()
+            if window_start <= state_date <= window_end
+        )
+        return states
+
+
+    def calculate_fleet_errors(self, arrays):
+        """
+        一次性计算所有设备的每日、每月消耗误差
+
+        与逐台调用calculate_daily_errors / calculate_monthly_errors口径一致，
+        安装numpy时使用分段向量化计算，计算量只与总记录数相关。
+
+        Args:
+            arrays (dict): 拼接后的列数组，包含device_index、timestamp、oil_val、avai_oil、barrel_count，
+                可通过build_fleet_arrays从多台设备的原始数据构建
+
+        Returns:
+            FleetErrorTables: 全设备计算结果，通过daily_errors / monthly_errors / inventory_data按设备索引切片
+        """
+        return compute_fleet_errors(arrays, self.volume_scale)
+
+    def build_fleet_arrays(self, raw_data_list, barrel_counts=None):
+        """
+        将多台设备的原始数据拼接为calculate_fleet_errors所需的列数组
+
+        Args:
+            raw_data_list (list): 每台设备的原始数据元组 (data, columns, raw_data)，列表下标即设备索引
+            barrel_counts (list, optional): 每台设备的油桶数量
+
+        Returns:
+            dict: 列数组
+        """
+        return build_fleet_arrays(raw_data_list, barrel_counts, self.volume_scale)
+
+    def calculate_monthly_errors(self, raw_data, start_date, end_date, barrel_count=1, daily_states=None):
         """
         计算每月消耗误差数据
 
         Args:
-            raw_data: 原始数据元组 (data, columns, raw_data)
+            raw_data: 原始数据元组 (data, columns, raw_data)，或按时间升序排列的RowStream；
+                提供daily_states时不再使用，可以为None
             barrel_count (int): 油桶数量，默认为1
             start_date: 开始日期
             end_date: 结束日期 (用于确定完整的月份范围)
+            daily_states (dict, optional): calculate_daily_states或状态存储中的每日状态，
+                提供时直接按月汇总，不再重新扫描原始数据
 
         Returns:
             dict: 包含每月订单累积总量、中润亏损和客户亏损的数据
         """
-        data, columns, raw_data_content = raw_data
-
-        # 按月份分组数据
-        monthly_data = defaultdict(list)
-
-        for row in raw_data_content:
-            row_dict = dict(zip(columns, row))
-            order_time = row_dict.get("加注时间")
-            oil_val = float(row_dict.get("油加注值", 0) or 0)
-            avai_oil = float(row_dict.get("原油剩余量", 0) or 0)
-
-            if isinstance(order_time, datetime.datetime):
-                order_month = order_time.strftime("%Y-%m")
-                monthly_data[order_month].append({
-                    'oil_val': oil_val,
-                    'avai_oil': avai_oil,
-                    'order_time': order_time
-                })
-            elif isinstance(order_time, str):
-                # 处理字符串格式的日期
-                parsed_datetime = None
-                for fmt in ["%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
-                    try:
-                        parsed_datetime = datetime.datetime.strptime(order_time, fmt)
-                        break
-                    except ValueError:
-                        continue
-                if parsed_datetime:
-                    order_month = parsed_datetime.strftime("%Y-%m")
-                    monthly_data[order_month].append({
-                        'oil_val': oil_val,
-                        'avai_oil': avai_oil,
-                        'order_time': parsed_datetime
-                    })
-
-        # 计算每月数据
-        result = {
-            'monthly_order_totals': {},  # 每月订单累积总量
-            'monthly_shortage_errors': {},  # 每月中润亏损
-            'monthly_excess_errors': {},   # 每月客户亏损
-            'monthly_consumption': {}  # 每月消耗量
-        }
+        if daily_states is not None:
+            monthly_states = self._rollup_states(daily_states, 'month')
+        else:
+            # 按月份增量计算期末状态，每月期初库存 = 上一个有数据月份的期末库存
+            accumulator = PeriodStateAccumulator(default_calendar.month_key)
+            self._feed(raw_data, accumulator, ordered=True)
+            monthly_states = self._states_to_litres(accumulator.result())
 
         # --- 关键优化：生成完整的月份范围，以处理数据缺失的月份 ---
         # 解析传入的字符串日期
@@ -344,64 +574,40 @@ class ReportDataManager:
             start_dt = parse_date(start_date)
             end_dt = parse_date(end_date)
 
-        sorted_months = []
-        current_month = start_dt.replace(day=1)
-        while current_month <= end_dt:
-            sorted_months.append(current_month.strftime("%Y-%m"))
-            # 移动到下一个月的第一天
-            current_month = (current_month + datetime.timedelta(days=32)).replace(day=1)
+        sorted_months = default_calendar.month_range(start_dt, end_dt)
 
-        previous_month_end_inventory = 0
+        return self._build_monthly_error_result(monthly_states, sorted_months, barrel_count)
 
-        # 关键修复：正确初始化第一个月的“上月期末库存”
-        if sorted_months:
-            first_month_str = sorted_months[0]
-            first_month_date = datetime.datetime.strptime(first_month_str, "%Y-%m").date()
-            
-            # 查找在第一个月之前的所有记录
-            previous_records = [
-                dict(zip(columns, r)) for r in raw_data_content
-                if (isinstance(dict(zip(columns, r)).get("加注时间"), datetime.datetime) and
-                    dict(zip(columns, r)).get("加注时间").date() < first_month_date.replace(day=1))
-            ]
-            if previous_records:
-                # 如果有之前的数据，取最晚的一条记录作为基准库存
-                previous_records.sort(key=lambda x: x['加注时间'])
-                previous_month_end_inventory = float(previous_records[-1].get("原油剩余量", 0) or 0)
-            else:
-                # 如果没有，则使用第一个月最早的一条记录作为基准库存（备用方案）
-                first_month_data = sorted(monthly_data[first_month_str], key=lambda x: x['order_time'])
-                if first_month_data:
-                    previous_month_end_inventory = first_month_data[0]['avai_oil']
+    def _build_monthly_error_result(self, monthly_states, sorted_months, barrel_count=1):
+        """
+        根据每月状态组装每月误差结果
+
+        Args:
+            monthly_states (dict): {month: state_dict}
+            sorted_months (list): 需要输出的月份列表
+            barrel_count (int): 油桶数量
+
+        Returns:
+            dict: 与calculate_monthly_errors返回格式一致的结果
+        """
+        result = {
+            'monthly_order_totals': {},  # 每月订单累积总量
+            'monthly_shortage_errors': {},  # 每月中润亏损
+            'monthly_excess_errors': {},   # 每月客户亏损
+            'monthly_consumption': {}  # 每月消耗量
+        }
 
         for month in sorted_months:
             # 如果这个月在原始数据中不存在，则所有值都为0，然后继续下一个月
-            if month not in monthly_data:
+            if month not in monthly_states:
                 result['monthly_order_totals'][month] = 0
                 result['monthly_consumption'][month] = {'value': 0}
                 continue
 
-            month_data = sorted(monthly_data[month], key=lambda x: x['order_time'])
-
-            # 当月期初库存 = 上月期末库存
-            start_inventory = previous_month_end_inventory
-            # 当月期末库存 = 当月最晚记录的库存
-            end_inventory = month_data[-1]['avai_oil']
-
-            # 计算当月总加油量（推断）
-            total_refill_this_month = 0
-            last_inventory_point = start_inventory
-            for record in month_data:
-                current_inventory_point = record['avai_oil']
-                if current_inventory_point > last_inventory_point:
-                    total_refill_this_month += (current_inventory_point - last_inventory_point)
-                last_inventory_point = current_inventory_point
-
+            state = monthly_states[month]
             # 计算库存消耗总量 (核心公式)
-            inventory_consumption = ((start_inventory - end_inventory) + total_refill_this_month) * barrel_count
-
-            # 计算订单总量
-            order_total = sum(item['oil_val'] for item in month_data)
+            inventory_consumption = self._scale_by_barrels(state['consumption'], barrel_count)
+            order_total = state['order_total']
 
             # 存储结果
             result['monthly_order_totals'][month] = order_total
@@ -414,9 +620,6 @@ class ReportDataManager:
             elif difference < 0:
                 result['monthly_excess_errors'][month] = {'value': abs(difference)}
 
-            # 更新上月期末库存，为下个月做准备
-            previous_month_end_inventory = end_inventory
-
         return result
 
 
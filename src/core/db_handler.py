@@ -1,3 +1,4 @@
+import re
 import sys
 import traceback
 import time
@@ -9,6 +10,16 @@ import logging
 from typing import List, Tuple, Optional
 from mysql.connector import pooling
 
+from src.core.row_stream import RowStream
+from src.utils.date_utils import default_calendar
+
+# 匹配查询末尾的降序排序子句，分批读取时改为升序以便增量聚合
+# 带LIMIT的查询改为升序会改变结果集，因此不做改写
+_ORDER_BY_DESC_PATTERN = re.compile(r"(ORDER\s+BY\s+[\w.`]+)\s+DESC(\s*;?\s*)$", re.IGNORECASE)
+
+# 匹配查询末尾的排序子句和分号，计算源数据水位时作为子查询不需要排序
+_TRAILING_ORDER_BY_PATTERN = re.compile(r"\s+ORDER\s+BY\s+[\w.`,\s]+?\s*;?\s*$", re.IGNORECASE)
+
 
 class DatabaseHandler:
     """处理数据库连接和查询操作"""
@@ -442,6 +453,161 @@ class DatabaseHandler:
             raise
 
 
+    def _cursor_batches(self, cursor, batch_size):
+        """
+        把已执行查询的游标包装为行批次迭代器
+
+        游标在数据读完或调用release时释放。数据流未读完时先丢弃剩余结果再关闭游标，
+        否则mysql-connector关闭游标时报“Unread result found”，同一连接上的下一次查询也会失败。
+
+        Args:
+            cursor: 已执行查询的游标
+            batch_size (int): 每批读取的行数
+
+        Returns:
+            tuple: (行批次迭代器, release函数)，release可以重复调用
+        """
+        released = []
+
+        def release():
+            if released:
+                return
+            released.append(True)
+            try:
+                self.connection.consume_results()
+            finally:
+                cursor.close()
+
+        def batches():
+            try:
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        break
+                    yield batch
+            finally:
+                release()
+
+        return batches(), release
+
+    def iter_generic_rows(self, device_id, query_or_template, start_date=None, end_date=None, batch_size=5000,
+                          keep_order=False):
+        """
+        分批读取查询结果，返回按时间升序排列的行数据流
+
+        与fetch_generic_data不同，结果不会整体加载到内存，也不会写入查询缓存。
+        查询末尾的 ORDER BY ... DESC 会改写为升序，以满足增量聚合的输入要求；
+        keep_order为True时保留查询原有的排序（例如按原顺序导出加注明细）。
+        数据流被完全消费之前，不能在同一连接上执行其他查询。
+
+        Args:
+            device_id (int): 设备ID
+            query_or_template (str): SQL查询语句或模板
+            start_date (str, optional): 开始日期
+            end_date (str, optional): 结束日期
+            batch_size (int): 每批读取的行数
+            keep_order (bool): 是否保留查询原有的排序
+
+        Returns:
+            RowStream: 行批次数据流
+        """
+        self._ensure_connection()
+
+        if start_date and end_date:
+            query = query_or_template.format(
+                device_id=device_id,
+                start_date=start_date,
+                end_condition=f"{end_date} 23:59:59",
+            )
+        else:
+            query = query_or_template
+        query = query.strip()
+        if not keep_order:
+            query = _ORDER_BY_DESC_PATTERN.sub(r"\1 ASC\2", query)
+
+        cursor = self.connection.cursor()
+        cursor.execute(query)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        batches, release = self._cursor_batches(cursor, batch_size)
+        return RowStream(columns, batches, batched=True, on_close=release)
+
+    def iter_dict_rows(self, query, params=None, batch_size=5000):
+        """
+        分批读取任意查询的结果，每行为列名到值的字典
+
+        结果不会整体加载到内存，也不会写入查询缓存。
+        数据流被完全消费之前，不能在同一连接上执行其他查询。
+
+        Args:
+            query (str): SQL查询语句
+            params (tuple, optional): 查询参数
+            batch_size (int): 每批读取的行数
+
+        Returns:
+            RowStream: 行批次数据流
+        """
+        self._ensure_connection()
+
+        cursor = self.connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+        batches, release = self._cursor_batches(cursor, batch_size)
+        return RowStream(columns, batches, batched=True, on_close=release)
+
+    def fetch_source_watermark(self, device_id, query_or_template, start_date=None, end_date=None):
+        """
+        查询源数据水位：结果集的行数、最新加注时间、油加注值和原油剩余量的合计，
+        以及每行加注时间、油加注值、原油剩余量和油品名称的CRC32校验和之和
+
+        只返回一行汇总结果，用于判断设备的源数据自上次计算以来是否发生变化。
+        校验和覆盖每一行，修改非最新记录的加注时间或油品名称也会改变水位。
+
+        Args:
+            device_id (int): 设备ID
+            query_or_template (str): SQL查询语句或模板
+            start_date (str, optional): 开始日期
+            end_date (str, optional): 结束日期
+
+        Returns:
+            tuple or None: 水位值（均转换为字符串），查询失败时返回None
+        """
+        if start_date and end_date:
+            query = query_or_template.format(
+                device_id=device_id,
+                start_date=start_date,
+                end_condition=f"{end_date} 23:59:59",
+            )
+        else:
+            query = query_or_template
+        query = query.strip()
+        if not re.search(r"\bLIMIT\b", query, re.IGNORECASE):
+            query = _TRAILING_ORDER_BY_PATTERN.sub("", query)
+        query = query.rstrip().rstrip(";")
+        watermark_query = (
+            "SELECT COUNT(*), MAX(`加注时间`), SUM(`油加注值`), SUM(`原油剩余量`), "
+            "SUM(CRC32(CONCAT_WS('|', `加注时间`, `油加注值`, `原油剩余量`, `油品名称`))) "
+            f"FROM ({query}) AS watermark_source"
+        )
+
+        cursor = None
+        try:
+            self._ensure_connection()
+            cursor = self.connection.cursor()
+            cursor.execute(watermark_query)
+            row = cursor.fetchone()
+            return tuple(str(value) for value in row) if row else None
+        except Exception as e:
+            print(f"  查询源数据水位失败，本次不使用聚合缓存: {e}")
+            return None
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+
     def fetch_daily_usage_data(
         self, device_id, query_or_template, start_date=None, end_date=None
     ):
@@ -610,10 +776,10 @@ class DatabaseHandler:
                         if start_date and end_date and start_date != end_date:
                             # 跨月对账处理：以结束日期为归属月份
                             from src.utils.date_utils import parse_date
-                            order_month = parse_date(end_date).strftime("%Y-%m")
+                            order_month = default_calendar.month_key(parse_date(end_date))
                         else:
                             # 正常情况：按记录本身的日期归属月份
-                            order_month = order_time.strftime("%Y-%m")
+                            order_month = default_calendar.month_key(order_time)
                         
                         # 累加该月份的油加注值
                         if order_month not in data:
@@ -640,10 +806,10 @@ class DatabaseHandler:
                             if start_date and end_date and start_date != end_date:
                                 # 跨月对账处理：以结束日期为归属月份
                                 from src.utils.date_utils import parse_date
-                                order_month = parse_date(end_date).strftime("%Y-%m")
+                                order_month = default_calendar.month_key(parse_date(end_date))
                             else:
                                 # 正常情况：按记录本身的日期归属月份
-                                order_month = parsed_datetime.strftime("%Y-%m")
+                                order_month = default_calendar.month_key(parsed_datetime)
                             
                             # 累加该月份的油加注值
                             if order_month not in data:
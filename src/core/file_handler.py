@@ -99,6 +99,59 @@ class FileHandler:
         
         return devices if state['success'] else []
 
+    def read_barrel_counts_from_csv(self, csv_file):
+        """
+        从设备信息CSV文件读取设备桶数，支持多种编码格式
+
+        只读取device_code和barrel_count两列，不校验日期范围；没有barrel_count列时返回空字典。
+
+        Args:
+            csv_file (str): CSV文件路径
+
+        Returns:
+            dict: 设备编码 -> 桶数（正整数）
+
+        Raises:
+            FileReadError: 文件无法读取、缺少device_code列或桶数无效时抛出异常
+        """
+        if not os.path.exists(csv_file):
+            raise FileReadError(f"错误：设备信息文件不存在: {csv_file}")
+
+        for encoding in self.encodings:
+            try:
+                with open(csv_file, 'r', encoding=encoding, newline='') as f:
+                    reader = csv.DictReader(f)
+                    # 处理可能存在的BOM字符
+                    fieldnames = [name.strip('\ufeff').strip() for name in (reader.fieldnames or [])]
+                    reader.fieldnames = fieldnames
+                    rows = list(reader)
+            except (UnicodeDecodeError, UnicodeError):
+                continue
+            break
+        else:
+            raise FileReadError(f"错误：无法使用任何支持的编码格式读取设备信息文件: {csv_file}")
+
+        if 'device_code' not in fieldnames:
+            raise FileReadError(f"错误：设备信息文件缺少device_code列: {csv_file}")
+        if 'barrel_count' not in fieldnames:
+            return {}
+
+        barrel_counts = {}
+        for line_num, row in enumerate(rows, 2):
+            device_code = (row.get('device_code') or '').strip()
+            value = (row.get('barrel_count') or '').strip()
+            if not device_code or not value:
+                continue
+            try:
+                barrel_count = int(value)
+            except ValueError:
+                barrel_count = 0
+            if barrel_count < 1:
+                raise FileReadError(f"错误：桶数必须为正整数，第{line_num}行: {device_code}, {value}")
+            barrel_counts[device_code] = barrel_count
+        print(f"已从设备信息文件读取 {len(barrel_counts)} 台设备的桶数")
+        return barrel_counts
+
     def _validate_file(self, csv_file):
         """验证文件是否存在和是否为空"""
         # 检查文件是否存在
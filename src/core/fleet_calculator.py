@@ -0,0 +1,341 @@
+"""
+全设备批量误差计算模块
+将所有设备的订单记录拼接为列数组，一次性计算每日、每月的订单总量、消耗量和误差，
+计算量只与总记录数相关，不再受每台设备一次Python调用的开销影响。
+安装numpy时使用分段向量化计算，未安装时退回逐条记录的Python实现，结果格式一致。
+"""
+import datetime
+from collections import OrderedDict
+
+from src.core.row_stream import parse_order_time, to_fixed_point, from_fixed_point
+from src.utils.date_utils import default_calendar
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - 取决于运行环境
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def build_fleet_arrays(raw_data_list, barrel_counts=None, volume_scale=None):
+    """
+    将多台设备的原始数据拼接为列数组
+
+    Args:
+        raw_data_list (list): 每台设备的原始数据元组 (data, columns, raw_data)，列表下标即设备索引
+        barrel_counts (list, optional): 每台设备的油桶数量，默认均为1
+        volume_scale (int, optional): 定点缩放倍数，设置时体积列为整数定点值
+
+    Returns:
+        dict: 包含device_index、timestamp、oil_val、avai_oil、barrel_count五个等长列，
+              安装numpy时为ndarray，否则为list
+    """
+    if volume_scale is None:
+        to_volume = lambda value: float(value or 0)
+    else:
+        to_volume = lambda value: to_fixed_point(value, volume_scale)
+    device_index, timestamps, oil_vals, avai_oils, barrels = [], [], [], [], []
+    for index, raw_data in enumerate(raw_data_list):
+        _, columns, raw_data_content = raw_data
+        barrel_count = barrel_counts[index] if barrel_counts else 1
+        time_idx = columns.index("加注时间") if "加注时间" in columns else None
+        oil_idx = columns.index("油加注值") if "油加注值" in columns else None
+        avai_idx = columns.index("原油剩余量") if "原油剩余量" in columns else None
+        if time_idx is None:
+            continue
+        for row in raw_data_content:
+            order_time = parse_order_time(row[time_idx])
+            if order_time is None:
+                continue
+            device_index.append(index)
+            timestamps.append(order_time)
+            oil_vals.append(to_volume(row[oil_idx] if oil_idx is not None else 0))
+            avai_oils.append(to_volume(row[avai_idx] if avai_idx is not None else 0))
+            barrels.append(barrel_count)
+
+    if not NUMPY_AVAILABLE:
+        return {
+            "device_index": device_index,
+            "timestamp": timestamps,
+            "oil_val": oil_vals,
+            "avai_oil": avai_oils,
+            "barrel_count": barrels,
+        }
+    volume_dtype = np.float64 if volume_scale is None else np.int64
+    return {
+        "device_index": np.asarray(device_index, dtype=np.int64),
+        "timestamp": np.asarray(timestamps, dtype="datetime64[us]"),
+        "oil_val": np.asarray(oil_vals, dtype=volume_dtype),
+        "avai_oil": np.asarray(avai_oils, dtype=volume_dtype),
+        "barrel_count": np.asarray(barrels, dtype=volume_dtype),
+    }
+
+
+class FleetErrorTables:
+    """
+    全设备误差计算结果
+
+    daily和monthly为按(设备索引, 周期)升序排列的列表，每列等长；
+    并记录每台设备在表中的起止位置，用于按设备切片。
+    定点模式下表中的体积为整数，切片输出时转换回升
+    """
+
+    def __init__(self, daily, monthly, volume_scale=None):
+        self.daily = daily
+        self.monthly = monthly
+        self.volume_scale = volume_scale
+        self._daily_offsets = self._build_offsets(daily["device_index"])
+        self._monthly_offsets = self._build_offsets(monthly["device_index"])
+
+    def _litres(self, value):
+        """将表中的体积值转换为以升为单位的float"""
+        if self.volume_scale is None:
+            return float(value)
+        return from_fixed_point(int(value), self.volume_scale)
+
+    @staticmethod
+    def _build_offsets(device_index):
+        """计算每台设备在表中的[起始, 结束)位置"""
+        offsets = {}
+        for position, index in enumerate(device_index):
+            index = int(index)
+            if index not in offsets:
+                offsets[index] = [position, position + 1]
+            else:
+                offsets[index][1] = position + 1
+        return offsets
+
+    def daily_errors(self, device_index):
+        """
+        切出单台设备的每日误差数据
+
+        Args:
+            device_index (int): 设备索引
+
+        Returns:
+            dict: 与ReportDataManager.calculate_daily_errors返回格式一致的结果
+        """
+        result = {
+            'daily_order_totals': {},
+            'daily_shortage_errors': {},
+            'daily_excess_errors': {},
+            'daily_inventory_changes': {},
+            'daily_consumption': {}
+        }
+        start, end = self._daily_offsets.get(device_index, (0, 0))
+        for position in range(start, end):
+            day = _to_date(self.daily["period"][position])
+            order_total = self._litres(self.daily["order_total"][position])
+            consumption = self._litres(self.daily["consumption"][position])
+            result['daily_order_totals'][day] = order_total
+            result['daily_consumption'][day] = consumption
+            difference = consumption - order_total
+            if difference > 0:
+                result['daily_shortage_errors'][day] = difference
+            elif difference < 0:
+                result['daily_excess_errors'][day] = abs(difference)
+        return result
+
+    def inventory_data(self, device_index):
+        """
+        切出单台设备的每日期末库存
+
+        Args:
+            device_index (int): 设备索引
+
+        Returns:
+            list: [(date, 期末库存), ...]
+        """
+        start, end = self._daily_offsets.get(device_index, (0, 0))
+        return [
+            (_to_date(self.daily["period"][position]), self._litres(self.daily["end_inventory"][position]))
+            for position in range(start, end)
+        ]
+
+    def monthly_errors(self, device_index, start_date, end_date):
+        """
+        切出单台设备的每月误差数据，并补齐日期范围内没有数据的月份
+
+        Args:
+            device_index (int): 设备索引
+            start_date (date): 开始日期
+            end_date (date): 结束日期
+
+        Returns:
+            dict: 与ReportDataManager.calculate_monthly_errors返回格式一致的结果
+        """
+        result = {
+            'monthly_order_totals': {},
+            'monthly_shortage_errors': {},
+            'monthly_excess_errors': {},
+            'monthly_consumption': {}
+        }
+        start, end = self._monthly_offsets.get(device_index, (0, 0))
+        by_month = {}
+        for position in range(start, end):
+            month = _to_date(self.monthly["period"][position])
+            by_month[default_calendar.month_key(month)] = position
+
+        for month_key in default_calendar.month_range(start_date, end_date):
+            position = by_month.get(month_key)
+            if position is None:
+                result['monthly_order_totals'][month_key] = 0
+                result['monthly_consumption'][month_key] = {'value': 0}
+            else:
+                order_total = self._litres(self.monthly["order_total"][position])
+                consumption = self._litres(self.monthly["consumption"][position])
+                result['monthly_order_totals'][month_key] = order_total
+                result['monthly_consumption'][month_key] = {'value': consumption}
+                difference = consumption - order_total
+                if difference > 0:
+                    result['monthly_shortage_errors'][month_key] = {'value': difference}
+                elif difference < 0:
+                    result['monthly_excess_errors'][month_key] = {'value': abs(difference)}
+        return result
+
+
+def _to_date(value):
+    """将numpy datetime64或datetime对象转换为date"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return value.astype("datetime64[D]").astype(datetime.date)
+
+
+def compute_fleet_errors(arrays, volume_scale=None):
+    """
+    一次性计算所有设备的每日、每月订单总量、消耗量和误差
+
+    计算口径与ReportDataManager.calculate_daily_errors / calculate_monthly_errors一致：
+    每条记录与同设备上一条记录比较库存，升高部分计为推断加油量；
+    周期消耗量 = (周期期初库存 - 周期期末库存 + 周期加油量) * 桶数，
+    设备第一条记录的期初库存取其自身库存。
+
+    Args:
+        arrays (dict): build_fleet_arrays返回的列数组
+        volume_scale (int, optional): 定点缩放倍数，需与构建列数组时一致，设置时全程使用整数运算
+
+    Returns:
+        FleetErrorTables: 全设备计算结果
+    """
+    if NUMPY_AVAILABLE:
+        return _compute_fleet_errors_numpy(arrays, volume_scale)
+    return _compute_fleet_errors_python(arrays, volume_scale)
+
+
+def _compute_fleet_errors_numpy(arrays, volume_scale=None):
+    """使用numpy分段运算计算全设备误差"""
+    volume_dtype = np.float64 if volume_scale is None else np.int64
+    device_index = np.asarray(arrays["device_index"], dtype=np.int64)
+    timestamps = np.asarray(arrays["timestamp"], dtype="datetime64[us]")
+    oil_val = np.asarray(arrays["oil_val"], dtype=volume_dtype)
+    avai_oil = np.asarray(arrays["avai_oil"], dtype=volume_dtype)
+    barrel_count = np.asarray(arrays["barrel_count"], dtype=volume_dtype)
+
+    # 按设备、时间稳定排序，同一时间的记录保持输入顺序
+    order = np.lexsort((timestamps, device_index))
+    device_index = device_index[order]
+    timestamps = timestamps[order]
+    oil_val = oil_val[order]
+    avai_oil = avai_oil[order]
+    barrel_count = barrel_count[order]
+
+    # 同设备上一条记录的库存，设备第一条记录取自身库存
+    previous_inventory = np.empty_like(avai_oil)
+    if avai_oil.size:
+        previous_inventory[0] = avai_oil[0]
+        previous_inventory[1:] = avai_oil[:-1]
+        device_start = np.ones(avai_oil.size, dtype=bool)
+        device_start[1:] = device_index[1:] != device_index[:-1]
+        previous_inventory[device_start] = avai_oil[device_start]
+    refill = np.maximum(avai_oil - previous_inventory, 0)
+
+    daily = _segment_tables(
+        device_index, timestamps.astype("datetime64[D]"), oil_val, avai_oil,
+        previous_inventory, refill, barrel_count
+    )
+    monthly = _segment_tables(
+        device_index, timestamps.astype("datetime64[M]"), oil_val, avai_oil,
+        previous_inventory, refill, barrel_count
+    )
+    return FleetErrorTables(daily, monthly, volume_scale)
+
+
+def _segment_tables(device_index, period, oil_val, avai_oil, previous_inventory, refill, barrel_count):
+    """按(设备, 周期)分段汇总"""
+    if device_index.size == 0:
+        empty = oil_val[:0]
+        return {
+            "device_index": np.array([], dtype=np.int64),
+            "period": period[:0],
+            "order_total": empty,
+            "consumption": empty,
+            "end_inventory": empty,
+        }
+
+    boundary = np.ones(device_index.size, dtype=bool)
+    boundary[1:] = (device_index[1:] != device_index[:-1]) | (period[1:] != period[:-1])
+    starts = np.flatnonzero(boundary)
+    ends = np.append(starts[1:], device_index.size) - 1
+
+    order_total = np.add.reduceat(oil_val, starts)
+    refill_total = np.add.reduceat(refill, starts)
+    start_inventory = previous_inventory[starts]
+    end_inventory = avai_oil[ends]
+    consumption = ((start_inventory - end_inventory) + refill_total) * barrel_count[starts]
+
+    return {
+        "device_index": device_index[starts],
+        "period": period[starts],
+        "order_total": order_total,
+        "consumption": consumption,
+        "end_inventory": end_inventory,
+    }
+
+
+def _compute_fleet_errors_python(arrays, volume_scale=None):
+    """未安装numpy时的逐条记录实现"""
+    records = sorted(
+        zip(arrays["device_index"], arrays["timestamp"], arrays["oil_val"],
+            arrays["avai_oil"], arrays["barrel_count"]),
+        key=lambda record: (record[0], record[1])
+    )
+    daily_groups = OrderedDict()
+    monthly_groups = OrderedDict()
+    previous_device = None
+    previous_inventory = 0
+    for index, order_time, oil_val, avai_oil, barrel_count in records:
+        if index != previous_device:
+            previous_inventory = avai_oil
+            previous_device = index
+        refill = max(avai_oil - previous_inventory, 0)
+        for groups, period in (
+            (daily_groups, order_time.date()),
+            (monthly_groups, datetime.date(order_time.year, order_time.month, 1)),
+        ):
+            key = (index, period)
+            if key not in groups:
+                groups[key] = {"start": previous_inventory, "order_total": 0,
+                               "refill": 0, "barrel_count": barrel_count}
+            group = groups[key]
+            group["order_total"] += oil_val
+            group["refill"] += refill
+            group["end"] = avai_oil
+        previous_inventory = avai_oil
+
+    def to_table(groups):
+        table = {"device_index": [], "period": [], "order_total": [], "consumption": [], "end_inventory": []}
+        for (index, period), group in groups.items():
+            table["device_index"].append(index)
+            table["period"].append(period)
+            table["order_total"].append(group["order_total"])
+            table["consumption"].append(
+                ((group["start"] - group["end"]) + group["refill"]) * group["barrel_count"]
+            )
+            table["end_inventory"].append(group["end"])
+        return table
+
+    return FleetErrorTables(to_table(daily_groups), to_table(monthly_groups), volume_scale)
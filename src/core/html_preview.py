@@ -0,0 +1,324 @@
+"""
+HTML快速预览模块
+为了看一眼趋势而逐个打开几十个xlsx文件很慢，构建工作簿本身也是整个流程中最耗时的部分。
+预览模式使用报表生成器计算出的同一份数据行和图表系列，每次运行生成一个自包含的HTML页面：
+页首是设备索引，每台设备一个内联SVG折线图，不依赖外部脚本、样式表或网络，任意浏览器直接打开。
+长序列按点数上限以LTTB降采样后绘制，页面大小与数据天数基本无关。
+"""
+import datetime
+import html
+import os
+import traceback
+
+from .chart_downsample import downsample_rows
+
+# 每个预览图表最多绘制的数据点数
+PREVIEW_MAX_POINTS = 400
+
+# 支持预览的报表类型（报表生成器需提供preview_series方法）
+PREVIEW_REPORTS = ("inventory", "daily_error", "monthly_error")
+
+# 各系列的折线颜色，与报表图表的配色一致
+SERIES_COLORS = ("#1f77b4", "#ff7f0e", "#800080", "#2ca02c", "#d62728")
+
+# SVG图表尺寸和边距（像素）
+CHART_WIDTH = 880
+CHART_HEIGHT = 260
+_MARGIN_LEFT = 64
+_MARGIN_RIGHT = 16
+_MARGIN_TOP = 16
+_MARGIN_BOTTOM = 32
+
+_PAGE_STYLE = """
+body{font-family:"Microsoft YaHei",Calibri,sans-serif;margin:24px;color:#222}
+h1{font-size:20px}h2{font-size:16px;margin:28px 0 4px}
+table{border-collapse:collapse;font-size:13px}
+th,td{border:1px solid #ccc;padding:3px 8px;text-align:left}
+th{background:#4F81BD;color:#fff}
+td.num{text-align:right}
+.failed{color:#9C0006}
+.legend span{display:inline-block;margin-right:16px;font-size:13px}
+.legend i{display:inline-block;width:14px;height:3px;margin-right:4px;vertical-align:middle}
+svg{display:block;margin-top:4px}
+svg text{font-size:11px;fill:#555}
+a.top{font-size:12px;margin-left:8px}
+"""
+
+
+def _as_number(value):
+    """转换为浮点数，无法转换时返回None（折线在此处断开）"""
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _format_label(value):
+    """横轴标签：日期格式化为YYYY-MM-DD，其他值转为字符串"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y-%m-%d")
+    return str(value)
+
+
+def _format_number(value):
+    return "" if value is None else f"{value:,.2f}"
+
+
+def render_svg_chart(columns, rows, series, max_points=PREVIEW_MAX_POINTS):
+    """
+    把数据行绘制为内联SVG折线图
+
+    Args:
+        columns (list): 列名，系列名称取自列名
+        rows (list): 数据行，第一列为横轴标签
+        series (list): 图表系列所在的列下标
+        max_points (int): 最多绘制的数据点数，超过时按LTTB降采样
+
+    Returns:
+        str: SVG元素和图例的HTML片段
+    """
+    rows = downsample_rows(rows, series, max_points) if rows else []
+    values = [_as_number(row[column]) for row in rows for column in series]
+    values = [value for value in values if value is not None]
+    low = min(values + [0.0])
+    high = max(values + [0.0])
+    if high == low:
+        high = low + 1.0
+
+    plot_width = CHART_WIDTH - _MARGIN_LEFT - _MARGIN_RIGHT
+    plot_height = CHART_HEIGHT - _MARGIN_TOP - _MARGIN_BOTTOM
+    step = plot_width / max(len(rows) - 1, 1)
+
+    def x_at(index):
+        return _MARGIN_LEFT + index * step
+
+    def y_at(value):
+        return _MARGIN_TOP + (high - value) / (high - low) * plot_height
+
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{CHART_WIDTH}" height="{CHART_HEIGHT}" '
+             f'viewBox="0 0 {CHART_WIDTH} {CHART_HEIGHT}">']
+    # 纵轴刻度和网格线
+    for tick in range(5):
+        value = low + (high - low) * tick / 4
+        y = y_at(value)
+        parts.append(f'<line x1="{_MARGIN_LEFT}" y1="{y:.1f}" x2="{CHART_WIDTH - _MARGIN_RIGHT}" y2="{y:.1f}" '
+                     f'stroke="#e5e5e5"/>')
+        parts.append(f'<text x="{_MARGIN_LEFT - 6}" y="{y + 4:.1f}" text-anchor="end">{value:,.0f}</text>')
+    # 横轴标签：首、中、尾
+    if rows:
+        for index in sorted({0, (len(rows) - 1) // 2, len(rows) - 1}):
+            anchor = "start" if index == 0 else "end" if index == len(rows) - 1 else "middle"
+            parts.append(f'<text x="{x_at(index):.1f}" y="{CHART_HEIGHT - 10}" text-anchor="{anchor}">'
+                         f'{html.escape(_format_label(rows[index][0]))}</text>')
+    # 折线，遇到空值断开
+    for number, column in enumerate(series):
+        color = SERIES_COLORS[number % len(SERIES_COLORS)]
+        segments, points = [], []
+        for index, row in enumerate(rows):
+            value = _as_number(row[column])
+            if value is None:
+                if points:
+                    segments.append(points)
+                points = []
+                continue
+            points.append(f"{x_at(index):.1f},{y_at(value):.1f}")
+        if points:
+            segments.append(points)
+        for points in segments:
+            parts.append(f'<polyline fill="none" stroke="{color}" stroke-width="2" points="{" ".join(points)}"/>')
+    parts.append("</svg>")
+
+    legend = "".join(
+        f'<span><i style="background:{SERIES_COLORS[number % len(SERIES_COLORS)]}"></i>'
+        f'{html.escape(str(columns[column]))}</span>'
+        for number, column in enumerate(series)
+    )
+    return f'<div class="legend">{legend}</div>' + "".join(parts)
+
+
+class PreviewPage:
+    """一次运行的预览页面，按提交顺序收集各设备的图表数据，最后写出为一个HTML文件"""
+
+    def __init__(self, title):
+        """
+        初始化预览页面
+
+        Args:
+            title (str): 页面标题
+        """
+        self.title = title
+        self.sections = []
+        self.failures = []
+
+    def add(self, key, preview):
+        """
+        添加一台设备的图表
+
+        索引中的统计值按完整数据计算，页面只保留降采样后的数据行。
+
+        Args:
+            key: 设备编码
+            preview (dict): 报表生成器preview_series的返回值
+        """
+        rows = preview["rows"]
+        first_series = [_as_number(row[preview["series"][0]]) for row in rows]
+        first_series = [value for value in first_series if value is not None]
+        self.sections.append((str(key), {
+            "title": preview["title"],
+            "columns": preview["columns"],
+            "series": preview["series"],
+            "rows": downsample_rows(rows, preview["series"], PREVIEW_MAX_POINTS) if rows else [],
+            "row_count": len(rows),
+            "latest": first_series[-1] if first_series else None,
+            "low": min(first_series) if first_series else None,
+            "high": max(first_series) if first_series else None,
+        }))
+
+    def add_failure(self, key, error):
+        """
+        记录无法生成预览的设备
+
+        Args:
+            key: 设备编码
+            error (Exception): 异常
+        """
+        self.failures.append((str(key), str(error)))
+
+    def render(self):
+        """
+        生成HTML页面
+
+        Returns:
+            str: HTML文本
+        """
+        generated_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        parts = [
+            "<!DOCTYPE html>",
+            '<html lang="zh-CN"><head><meta charset="utf-8">',
+            f"<title>{html.escape(self.title)}</title>",
+            f"<style>{_PAGE_STYLE}</style></head><body>",
+            f'<h1 id="top">{html.escape(self.title)}</h1>',
+            f"<p>生成时间: {generated_at}，共 {len(self.sections)} 台设备</p>",
+        ]
+
+        # 设备索引：每台设备的标题、数据行数和第一个系列的最新值、最小值、最大值
+        parts.append("<table><tr><th>设备</th><th>报表</th><th>数据行数</th>"
+                     "<th>最新值</th><th>最小值</th><th>最大值</th></tr>")
+        for number, (key, section) in enumerate(self.sections, 1):
+            parts.append(
+                f'<tr><td><a href="#section-{number}">{html.escape(key)}</a></td>'
+                f'<td>{html.escape(section["title"])}</td><td class="num">{section["row_count"]}</td>'
+                f'<td class="num">{_format_number(section["latest"])}</td>'
+                f'<td class="num">{_format_number(section["low"])}</td>'
+                f'<td class="num">{_format_number(section["high"])}</td></tr>'
+            )
+        for key, error in self.failures:
+            parts.append(f'<tr class="failed"><td>{html.escape(key)}</td>'
+                         f'<td colspan="5">预览生成失败: {html.escape(error)}</td></tr>')
+        parts.append("</table>")
+
+        for number, (key, section) in enumerate(self.sections, 1):
+            parts.append(f'<h2 id="section-{number}">{html.escape(section["title"])}'
+                         f'<a class="top" href="#top">返回索引</a></h2>')
+            parts.append(render_svg_chart(section["columns"], section["rows"], section["series"]))
+        parts.append("</body></html>")
+        return "\n".join(parts)
+
+    def write(self, output_file_path):
+        """
+        写出HTML文件
+
+        Args:
+            output_file_path (str): 输出文件路径
+
+        Returns:
+            str: 输出文件路径
+        """
+        output_dir = os.path.dirname(output_file_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_file_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        print(f"预览页面已生成: {output_file_path}（{len(self.sections)} 台设备）")
+        return output_file_path
+
+
+class PreviewExecutor:
+    """
+    生成预览页面的任务执行器，包装其他执行器，接口与ReportTaskExecutor一致
+
+    每个报表任务提交时在当前进程中按报表参数计算预览数据并加入页面，
+    preview_only为True时不再把任务交给内部执行器（不生成xlsx和表格导出）。
+    shutdown时关闭内部执行器并写出预览页面。
+    """
+
+    def __init__(self, executor, page, page_path, series_func, preview_only=False):
+        """
+        初始化执行器
+
+        Args:
+            executor: 内部执行器
+            page (PreviewPage): 预览页面
+            page_path (str): 预览页面的输出路径
+            series_func (callable): series_func(报表类型, generate_report关键字参数)，返回预览数据
+            preview_only (bool): 是否只生成预览
+        """
+        self.executor = executor
+        self.page = page
+        self.page_path = page_path
+        self.series_func = series_func
+        self.preview_only = preview_only
+        self._written = False
+
+    @property
+    def is_parallel(self):
+        """与内部执行器一致"""
+        return self.executor.is_parallel
+
+    def submit(self, key, func, payload, on_done):
+        """
+        计算预览数据，并按需把报表生成任务交给内部执行器
+
+        Args:
+            key: 任务标识（设备编码）
+            func: 模块级报表生成函数，接收payload
+            payload: (报表类型, generate_report关键字参数)
+            on_done: 回调函数 on_done(key, result, error, error_traceback)
+        """
+        generator_name, report_kwargs = payload
+        if generator_name in PREVIEW_REPORTS:
+            try:
+                self.page.add(key, self.series_func(generator_name, report_kwargs))
+            except Exception as e:
+                self.page.add_failure(key, e)
+                if self.preview_only:
+                    on_done(key, None, e, traceback.format_exc())
+                    return
+                print(f"  生成设备 {key} 的预览数据失败: {e}")
+            if self.preview_only:
+                # 结果为预览页面中该设备图表的位置
+                on_done(key, f"{self.page_path}#section-{len(self.page.sections)}", None, None)
+                return
+        self.executor.submit(key, func, payload, on_done)
+
+    def wait(self):
+        """等待内部执行器的任务完成"""
+        self.executor.wait()
+
+    def shutdown(self):
+        """关闭内部执行器并写出预览页面，重复调用时只写出一次"""
+        try:
+            self.executor.shutdown()
+        finally:
+            if not self._written:
+                self._written = True
+                self.page.write(self.page_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
@@ -1,11 +1,8 @@
-import csv
 import os
 import time
-from datetime import timedelta
 from decimal import Decimal
 
 import openpyxl
-from openpyxl import Workbook
 from openpyxl.chart import LineChart, Reference
 from openpyxl.chart.label import DataLabelList
 from openpyxl.chart.marker import Marker
@@ -13,7 +10,12 @@ from openpyxl.chart.shapes import GraphicalProperties
 from openpyxl.drawing.line import LineProperties
 from openpyxl.styles import Alignment, Font, PatternFill
 
+from ..utils.date_utils import default_calendar
 from .base_report import BaseReportGenerator
+from .chart_downsample import CHART_DATA_COLUMN, downsample_rows, write_chart_range
+from .chart_templates import chart_template
+from .table_export import export_table, parse_export_formats
+from .xlsx_writer import create_workbook, save_report_workbook
 
 
 class InventoryReportGenerator(BaseReportGenerator):
@@ -41,10 +43,16 @@ class InventoryReportGenerator(BaseReportGenerator):
         oil_name = kwargs.get('oil_name')
         chart_style = kwargs.get('chart_style')
         export_format = kwargs.get('export_format', 'xlsx')
+        # 写出后端、合并输出的目标工作表、后台保存句柄和图表降采样只在配置时传递
+        options = {
+            key: kwargs[key]
+            for key in ('writer_backend', 'target_sheet', 'output_writer', 'chart_points', 'chart_downsample')
+            if kwargs.get(key) is not None
+        }
         
         return self.generate_inventory_report_with_chart(
             inventory_data, output_file_path, device_code, start_date, end_date,
-            oil_name, chart_style, export_format
+            oil_name, chart_style, export_format, **options
         )
 
     def generate_inventory_report_with_chart(
@@ -57,6 +65,11 @@ class InventoryReportGenerator(BaseReportGenerator):
         oil_name=None,
         chart_style=None,
         export_format="xlsx",
+        writer_backend="openpyxl",
+        target_sheet=None,
+        output_writer=None,
+        chart_points=None,
+        chart_downsample="lttb",
     ):
         """
         生成包含库存数据和趋势图表的Excel报告文件
@@ -69,81 +82,38 @@ class InventoryReportGenerator(BaseReportGenerator):
             end_date (date): 结束日期
             oil_name (str): 油品名称
             chart_style (dict): 图表样式配置
-            export_format (str): 导出格式，支持xlsx和csv
+            export_format (str or list): 导出格式，xlsx、csv、jsonl、parquet之一，
+                或逗号分隔的多个格式（例如 "xlsx,parquet"），多种格式一次写出
+            writer_backend (str): xlsx写出后端，"openpyxl"（默认）或 "direct"（直接写出xlsx部件）
+            target_sheet (Worksheet, optional): 合并输出模式下写入的工作表，提供时不单独保存文件
+            output_writer (OutputTask, optional): 后台保存句柄，提供时工作簿交给后台线程保存
+            chart_points (int, optional): 图表点数预算，数据行超过预算时图表改为引用隐藏列中降采样后的数据
+            chart_downsample (str): 图表降采样方法，"lttb"（默认）或 "minmax"
         """
         try:
-            # 验证并清理数据
-            cleaned_data = []
-            invalid_records = []
-            for date, value in inventory_data:
-                try:
-                    validated_value = self._validate_inventory_value(value)
-                    if validated_value > 1000:
-                        print(f"提示：日期 {date} 的液位库存值 {validated_value} 超过1000L")
-                    cleaned_data.append((date, validated_value))
-                except ValueError as e:
-                    invalid_records.append((date, value, str(e)))
-                    print(f"警告：日期 {date} 的数据已跳过 - {str(e)}")
-
-            if invalid_records:
-                print("\n无效数据汇总：")
-                for date, value, reason in invalid_records:
-                    print(f"- {date}: {value} ({reason})")
-
-            # 如果没有有效数据，尝试生成一个带有默认值的图表
-            if not cleaned_data:
-                print("警告：没有有效的库存数据可供处理，将生成默认数据图表")
-                # 使用默认数据点，确保能生成图表
-                cleaned_data = [(start_date, 0), (end_date, 0)]
-                print(f"使用默认数据点: {cleaned_data}")
-
-            # 初始化工作簿
-            wb = Workbook()
-
-            # 处理不同导出格式
-            if export_format.lower() == "csv":
-                with open(
-                    output_file_path.replace(".xlsx", ".csv"), "w", newline=""
-                ) as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["日期", "原油剩余量(L)"])
-                    writer.writerows(cleaned_data)
-                print(
-                    f"数据已导出为CSV格式：{output_file_path.replace('.xlsx', '.csv')}"
-                )
-                # 立即关闭工作簿
-                wb.close()
-                return
-
-            # 补全数据
-            data_dict = dict(cleaned_data)
-            complete_data = []
-            current_date = start_date
+            write_xlsx, table_formats = parse_export_formats(export_format)
+            complete_data = self._complete_data(inventory_data, start_date, end_date)
 
-            # 处理空数据情况，避免索引错误
-            if cleaned_data:
-                last_inventory = next(iter(cleaned_data))[1]
-            else:
-                last_inventory = 0
-                print("警告：没有有效的库存数据可供处理，将生成默认数据图表")
-                # 使用默认数据点，确保能生成图表
-                cleaned_data = [(start_date, 0), (end_date, 0)]
-                print(f"使用默认数据点: {cleaned_data}")
-
-            while current_date <= end_date:
-                current_inventory = data_dict.get(current_date, last_inventory)
-                complete_data.append([current_date, current_inventory])
-                last_inventory = current_inventory
-                current_date += timedelta(days=1)
+            # 表格导出直接使用补全后的数据，不构建工作簿
+            export_table(
+                output_file_path, ["日期", "原油剩余量(L)"], complete_data, table_formats,
+                column_types=["date", "float64"],
+            )
+            if not write_xlsx:
+                return
 
             # Excel处理
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "库存数据"
+            if target_sheet is not None:
+                # 合并输出模式：写入合并工作簿中该设备的工作表，由调用方统一保存
+                wb = None
+                ws = target_sheet
+            else:
+                wb = create_workbook(writer_backend)
+                ws = wb.active
+                ws.title = "库存数据"
 
             # 添加标题行
-            oil_name_str = f" {oil_name} " if oil_name else " "
-            title = f"{device_code}{oil_name_str}每日库存余量变化趋势({start_date} - {end_date})"
+            title = self._report_title(device_code, oil_name, start_date, end_date)
             ws.append([title])
             # 将合并单元格的宽度增加到18列
             ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=20)
@@ -161,57 +131,39 @@ class InventoryReportGenerator(BaseReportGenerator):
             ws.column_dimensions["A"].width = 12  # 日期列宽度
             ws.column_dimensions["B"].width = 12  # 原油剩余量(L)列宽度
 
-            # 创建图表
-            chart = LineChart()
-            chart.title = "每日库存余量变化趋势"
-            chart.style = 13
-            chart.y_axis.title = "原油剩余量(L)"
-            chart.x_axis.title = "日期"
-
-            # 设置图表显示数据标签
-
-            # 添加这部分配置来调整x轴日期显示
-            chart.x_axis.tickLblSkip = 3  # 每隔3个标签显示一个
-            chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
-            chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
-
-            # 设置数据范围
-            data_range = Reference(
-                ws, min_col=2, min_row=2, max_col=2, max_row=len(complete_data) + 2
-            )
-            dates = Reference(ws, min_col=1, min_row=3, max_row=len(complete_data) + 2)
-
-            # 添加数据到图表
-            chart.add_data(data_range, titles_from_data=True)
-            chart.set_categories(dates)
-
-            # 应用图表样式
-            if chart_style:
-                marker_style = chart_style.get("marker_style", "circle")
-                marker_size = chart_style.get("marker_size", 8)
-                line_color = chart_style.get("line_color", "0000FF")
-                line_width = chart_style.get("line_width", 2.5)
-
-                series = chart.series[0]
-                series.graphicalProperties = GraphicalProperties()
-                series.graphicalProperties.line = LineProperties(
-                    w=line_width * 12700, solidFill=line_color
-                )
-                series.marker = Marker(symbol=marker_style, size=marker_size)
+            # 数据行超过点数预算时，图表改为引用隐藏列中降采样后的数据，数据表保持完整
+            chart_rows = downsample_rows(complete_data, [1], chart_points, chart_downsample)
+            if len(chart_rows) < len(complete_data):
+                data_column = CHART_DATA_COLUMN
+                chart_last_row = write_chart_range(ws, ["日期", "原油剩余量(L)"], chart_rows, data_column)
             else:
-                # 默认样式
-                chart.series[0].marker = Marker(symbol="circle", size=8)
+                data_column = 1
+                chart_last_row = len(complete_data) + 2
 
-            # 恢复图表到初始大小
-            chart.width = 30
-            chart.height = 15
+            # 创建图表：同一样式的图表模板只构建一次，每台设备只替换数据范围
+            style_key = tuple(sorted(chart_style.items())) if chart_style else None
+            template = chart_template(
+                ("inventory", style_key, data_column),
+                lambda sheet, last_row, chart_title: self._build_chart(
+                    sheet, last_row, chart_title, chart_style, data_column
+                ),
+            )
 
             # 添加图表到工作表，从E5开始绘制
-            ws.add_chart(chart, "E5")
+            ws.add_chart(template.stamp(ws.title, chart_last_row, "每日库存余量变化趋势"), "E5")
+
+            if wb is None:
+                return
 
             try:
-                wb.save(output_file_path)
-                print(f"  库存余量图表已生成并保存为{export_format.upper()}格式")
+                if output_writer is not None:
+                    # 工作簿交给后台线程保存，并由后台线程关闭
+                    output_writer.save_workbook(wb, output_file_path)
+                    wb = None
+                    print("  库存余量图表已生成，已提交后台保存")
+                    return
+                save_report_workbook(wb, output_file_path)
+                print("  库存余量图表已生成并保存为XLSX格式")
             except PermissionError:
                 print(
                     f"错误：无法保存文件 '{output_file_path}'，可能是文件正在被其他程序占用。"
@@ -231,6 +183,151 @@ class InventoryReportGenerator(BaseReportGenerator):
             raise
         # finally 块已移至try-save-block内部，统一管理关闭逻辑
 
+    def _complete_data(self, inventory_data, start_date, end_date):
+        """
+        验证库存数据并按日期补全，缺失的日期沿用前一天的库存，工作表、表格导出和预览共用
+
+        Args:
+            inventory_data (list): 库存数据列表，格式为[(date, value), ...]
+            start_date (date): 开始日期
+            end_date (date): 结束日期
+
+        Returns:
+            list: [[日期, 原油剩余量], ...]
+        """
+        # 验证并清理数据
+        cleaned_data = []
+        invalid_records = []
+        for date, value in inventory_data:
+            try:
+                validated_value = self._validate_inventory_value(value)
+                if validated_value > 1000:
+                    print(f"提示：日期 {date} 的液位库存值 {validated_value} 超过1000L")
+                cleaned_data.append((date, validated_value))
+            except ValueError as e:
+                invalid_records.append((date, value, str(e)))
+                print(f"警告：日期 {date} 的数据已跳过 - {str(e)}")
+
+        if invalid_records:
+            print("\n无效数据汇总：")
+            for date, value, reason in invalid_records:
+                print(f"- {date}: {value} ({reason})")
+
+        # 如果没有有效数据，尝试生成一个带有默认值的图表
+        if not cleaned_data:
+            print("警告：没有有效的库存数据可供处理，将生成默认数据图表")
+            # 使用默认数据点，确保能生成图表
+            cleaned_data = [(start_date, 0), (end_date, 0)]
+            print(f"使用默认数据点: {cleaned_data}")
+
+        # 补全数据
+        data_dict = dict(cleaned_data)
+        complete_data = []
+
+        # 处理空数据情况，避免索引错误
+        if cleaned_data:
+            last_inventory = next(iter(cleaned_data))[1]
+        else:
+            last_inventory = 0
+            print("警告：没有有效的库存数据可供处理，将生成默认数据图表")
+            # 使用默认数据点，确保能生成图表
+            cleaned_data = [(start_date, 0), (end_date, 0)]
+            print(f"使用默认数据点: {cleaned_data}")
+
+        for current_date in default_calendar.date_range(start_date, end_date):
+            current_inventory = data_dict.get(current_date, last_inventory)
+            complete_data.append([current_date, current_inventory])
+            last_inventory = current_inventory
+        return complete_data
+
+    @staticmethod
+    def _report_title(device_code, oil_name, start_date, end_date):
+        """报表标题，工作表和预览共用"""
+        oil_name_str = f" {oil_name} " if oil_name else " "
+        return f"{device_code}{oil_name_str}每日库存余量变化趋势({start_date} - {end_date})"
+
+    def preview_series(self, inventory_data, **kwargs):
+        """
+        计算预览页面使用的数据，与报表的数据表和图表系列一致
+
+        Args:
+            inventory_data (list): 库存数据列表
+            **kwargs: 与generate_report相同的参数，使用device_code、start_date、end_date、oil_name
+
+        Returns:
+            dict: title（标题）、columns（列名）、rows（数据行）、series（图表系列所在的列下标）
+        """
+        start_date = kwargs.get('start_date')
+        end_date = kwargs.get('end_date')
+        return {
+            'title': self._report_title(kwargs.get('device_code'), kwargs.get('oil_name'), start_date, end_date),
+            'columns': ["日期", "原油剩余量(L)"],
+            'rows': self._complete_data(inventory_data, start_date, end_date),
+            'series': [1],
+        }
+
+    @staticmethod
+    def _build_chart(worksheet, last_row, title, chart_style=None, data_column=1):
+        """
+        构建库存余量折线图
+
+        Args:
+            worksheet: 数据所在工作表
+            last_row (int): 数据结束行
+            title (str): 图表标题
+            chart_style (dict): 图表样式配置
+            data_column (int): 日期列的列号，库存列紧随其后；大于1时为隐藏的降采样数据区域
+
+        Returns:
+            LineChart: 图表对象
+        """
+        chart = LineChart()
+        chart.title = title
+        chart.style = 13
+        chart.y_axis.title = "原油剩余量(L)"
+        chart.x_axis.title = "日期"
+
+        # 设置图表显示数据标签
+
+        # 添加这部分配置来调整x轴日期显示
+        chart.x_axis.tickLblSkip = 3  # 每隔3个标签显示一个
+        chart.x_axis.tickLblPos = "low"  # 将标签位置调整到底部
+        chart.x_axis.textRotation = 0  # 将文本旋转角度设为0度（水平显示）
+
+        # 设置数据范围
+        data_range = Reference(
+            worksheet, min_col=data_column + 1, min_row=2, max_col=data_column + 1, max_row=last_row
+        )
+        dates = Reference(worksheet, min_col=data_column, min_row=3, max_row=last_row)
+        # 降采样数据位于隐藏列，需要绘制隐藏单元格中的数据
+        chart.visible_cells_only = data_column == 1
+
+        # 添加数据到图表
+        chart.add_data(data_range, titles_from_data=True)
+        chart.set_categories(dates)
+
+        # 应用图表样式
+        if chart_style:
+            marker_style = chart_style.get("marker_style", "circle")
+            marker_size = chart_style.get("marker_size", 8)
+            line_color = chart_style.get("line_color", "0000FF")
+            line_width = chart_style.get("line_width", 2.5)
+
+            series = chart.series[0]
+            series.graphicalProperties = GraphicalProperties()
+            series.graphicalProperties.line = LineProperties(
+                w=line_width * 12700, solidFill=line_color
+            )
+            series.marker = Marker(symbol=marker_style, size=marker_size)
+        else:
+            # 默认样式
+            chart.series[0].marker = Marker(symbol="circle", size=8)
+
+        # 恢复图表到初始大小
+        chart.width = 30
+        chart.height = 15
+        return chart
+
     def _validate_inventory_value(self, value):
         """
         验证库存值是否有效
@@ -0,0 +1,250 @@
+"""
+ZIP打包输出模块
+运行结束后再把输出目录中的报表和日志打包，需要把所有文件从磁盘重新读一遍，共享目录中也会留下大量小文件。
+打包输出模式下报表生成器把工作簿写入内存（工作进程中同样如此），由主进程在回调中直接写入同一个zip文件，
+日志和本次运行的清单也写入其中，不在输出目录中产生单独的报表文件。
+xlsx本身已经是压缩过的zip容器，以ZIP_STORED方式存入，不再重复压缩。
+"""
+import io
+import json
+import os
+import traceback
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from .xlsx_writer import save_report_workbook
+
+# 打包文件中的运行清单
+BUNDLE_MANIFEST_NAME = "manifest.json"
+
+# 已经压缩过的文件类型，以ZIP_STORED方式存入
+_STORED_SUFFIXES = (".xlsx", ".zip", ".parquet")
+
+
+def _compress_type(name):
+    return ZIP_STORED if name.lower().endswith(_STORED_SUFFIXES) else ZIP_DEFLATED
+
+
+class BundleCapture:
+    """
+    把一个报表任务写出的文件收集到内存中，接口与OutputTask的save/save_workbook一致
+
+    可以在工作进程中使用，收集到的(输出文件路径, 文件内容)随任务结果返回主进程。
+    """
+
+    def __init__(self):
+        self.members = []
+
+    def save(self, output_file_path, write_func, workbook=None):
+        """
+        把文件写入内存
+
+        Args:
+            output_file_path (str): 输出文件路径，决定在打包文件中的名称
+            write_func (callable): 写出函数，接收文件路径或文件对象
+            workbook (optional): 写出后需要关闭的工作簿
+        """
+        buffer = io.BytesIO()
+        try:
+            write_func(buffer)
+        finally:
+            if workbook is not None:
+                try:
+                    workbook.close()
+                except Exception:
+                    pass
+        self.members.append((output_file_path, buffer.getvalue()))
+
+    def save_workbook(self, workbook, output_file_path):
+        """
+        把create_workbook创建的工作簿写入内存，写出后关闭工作簿
+
+        Args:
+            workbook (Workbook or DirectWorkbook): 工作簿
+            output_file_path (str): 输出文件路径
+        """
+        self.save(output_file_path, lambda buffer: save_report_workbook(workbook, buffer), workbook)
+
+
+def render_captured(task):
+    """
+    生成报表并把写出的文件收集到内存中
+
+    该函数需保持为模块级函数，以便进程池序列化调用。
+
+    Args:
+        task (tuple): (报表生成函数, (报表类型, generate_report关键字参数))
+
+    Returns:
+        tuple: (报表生成函数的结果, [(输出文件路径, 文件内容), ...])
+    """
+    func, (generator_name, report_kwargs) = task
+    capture = BundleCapture()
+    result = func((generator_name, dict(report_kwargs, output_writer=capture)))
+    return result, capture.members
+
+
+class OutputBundle:
+    """一次运行的zip打包文件，先写入同目录下的临时文件，关闭时原子重命名"""
+
+    def __init__(self, bundle_path, output_dir):
+        """
+        创建打包文件
+
+        Args:
+            bundle_path (str): 打包文件路径
+            output_dir (str): 输出目录，报表在打包文件中的名称为相对该目录的路径
+        """
+        self.path = bundle_path
+        self.output_dir = output_dir
+        directory, filename = os.path.split(bundle_path)
+        self._temp_path = os.path.join(directory, f".{filename}.tmp")
+        self._archive = ZipFile(self._temp_path, "w", allowZip64=True)
+        self._names = set()
+        self.reports = []
+
+    def _member_name(self, output_file_path):
+        """相对输出目录的成员名称，重名时添加序号"""
+        name = os.path.relpath(output_file_path, self.output_dir).replace(os.sep, "/")
+        if name.startswith("../"):
+            name = os.path.basename(output_file_path)
+        base, ext = os.path.splitext(name)
+        counter = 1
+        while name in self._names:
+            name = f"{base}_{counter}{ext}"
+            counter += 1
+        self._names.add(name)
+        return name
+
+    def add(self, output_file_path, data):
+        """
+        写入一个文件
+
+        Args:
+            output_file_path (str): 输出文件路径
+            data (bytes): 文件内容
+
+        Returns:
+            str: 在打包文件中的名称
+        """
+        name = self._member_name(output_file_path)
+        self._archive.writestr(name, data, compress_type=_compress_type(name))
+        return name
+
+    def record(self, key, members, error=None):
+        """
+        登记一个报表任务的结果，写入运行清单
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            members (list): 该任务写入的成员名称
+            error (Exception, optional): 任务失败时的异常
+        """
+        entry = {"key": str(key), "files": list(members), "status": "ok" if error is None else "failed"}
+        if error is not None:
+            entry["error"] = str(error)
+        self.reports.append(entry)
+
+    def close(self):
+        """写入运行清单，关闭并原子重命名打包文件"""
+        if self._archive is None:
+            return
+        try:
+            manifest = {"reports": self.reports}
+            self._archive.writestr(
+                BUNDLE_MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1), compress_type=ZIP_DEFLATED
+            )
+            self._archive.close()
+            self._archive = None
+            os.replace(self._temp_path, self.path)
+        except BaseException:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+            raise
+        print(f"已写入打包文件: {self.path}（{len(self.reports)} 个报表任务）")
+
+
+def append_to_bundle(bundle_path, name, data):
+    """
+    在已关闭的打包文件末尾追加一个文件（例如运行结束后才写出的日志），不重写已有内容
+
+    Args:
+        bundle_path (str): 打包文件路径
+        name (str): 成员名称
+        data (bytes or str): 文件内容
+    """
+    with ZipFile(bundle_path, "a", allowZip64=True) as archive:
+        archive.writestr(name, data, compress_type=_compress_type(name))
+
+
+class BundleExecutor:
+    """
+    打包输出的任务执行器，包装ReportTaskExecutor，接口与其一致
+
+    报表由内部执行器（当前进程或进程池）生成到内存中，回调时在主进程中写入打包文件，
+    结果为打包文件中的位置。shutdown时写入运行清单并关闭打包文件。
+    """
+
+    def __init__(self, executor, bundle):
+        """
+        初始化执行器
+
+        Args:
+            executor (ReportTaskExecutor): 内部执行器
+            bundle (OutputBundle): 打包文件
+        """
+        self.executor = executor
+        self.bundle = bundle
+
+    @property
+    def is_parallel(self):
+        """与内部执行器一致"""
+        return self.executor.is_parallel
+
+    def submit(self, key, func, payload, on_done):
+        """
+        提交一个报表生成任务，生成的文件写入打包文件
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            func: 模块级报表生成函数，接收payload
+            payload: (报表类型, generate_report关键字参数)
+            on_done: 回调函数 on_done(key, result, error, error_traceback)
+        """
+        def add_and_notify(task_key, result, error, error_traceback):
+            if error is not None:
+                self.bundle.record(task_key, [], error)
+                on_done(task_key, None, error, error_traceback)
+                return
+            _, members = result
+            try:
+                names = [self.bundle.add(path, data) for path, data in members]
+            except Exception as e:
+                self.bundle.record(task_key, [], e)
+                on_done(task_key, None, e, traceback.format_exc())
+                return
+            self.bundle.record(task_key, names)
+            location = os.path.join(self.bundle.path, names[0]) if names else self.bundle.path
+            on_done(task_key, location, None, None)
+
+        self.executor.submit(key, render_captured, (func, payload), add_and_notify)
+
+    def wait(self):
+        """等待内部执行器的任务完成"""
+        self.executor.wait()
+
+    def shutdown(self):
+        """关闭内部执行器，写入运行清单并关闭打包文件"""
+        try:
+            self.executor.shutdown()
+        finally:
+            self.bundle.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
@@ -0,0 +1,223 @@
+"""
+输出清单模块
+在输出目录中维护一份清单，记录每个报表文件对应的输入摘要。
+输入摘要由报表类型、生成器版本（对账单还包括模板内容摘要）以及生成报表的全部参数和数据共同决定，
+设备、日期范围、桶数、源数据或模板任一变化都会得到新的摘要。
+重新运行时摘要与清单一致且文件仍然存在的报表直接跳过，只重新生成变化或上次失败的设备。
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import traceback
+
+from .output_writer import atomic_save
+
+# 清单文件名，位于输出目录中
+MANIFEST_FILENAME = ".report_manifest.json"
+
+# 清单格式版本
+MANIFEST_VERSION = 1
+
+# 每记录多少个报表把清单写回磁盘一次，中途中断时已完成的报表仍然有记录
+MANIFEST_FLUSH_EVERY = 50
+
+# 不影响报表内容的运行时参数，不参与输入摘要
+_RUNTIME_KWARGS = ("output_file_path", "output_writer", "target_sheet")
+
+
+def input_digest(generator_name, report_kwargs, fingerprint=None):
+    """
+    计算报表输入的摘要
+
+    Args:
+        generator_name (str): 报表类型
+        report_kwargs (dict): generate_report关键字参数，其中的数据即源数据水位
+        fingerprint (tuple, optional): 生成器指纹（生成器版本、模板摘要等）
+
+    Returns:
+        str: SHA1摘要
+    """
+    material = (
+        generator_name,
+        fingerprint,
+        sorted((key, value) for key, value in report_kwargs.items() if key not in _RUNTIME_KWARGS),
+    )
+    # pickle能完整序列化数据（包括numpy数组），相同的数据得到相同的字节
+    return hashlib.sha1(pickle.dumps(material, protocol=4)).hexdigest()
+
+
+class OutputManifest:
+    """输出目录中的报表清单：文件（相对输出目录的路径） -> 输入摘要"""
+
+    def __init__(self, output_dir):
+        """
+        加载输出目录中的清单，不存在或无法解析时从空清单开始
+
+        Args:
+            output_dir (str): 输出目录
+        """
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_FILENAME)
+        self.reports = {}
+        self._unsaved = 0
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    self.reports = dict(data.get("reports", {}))
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"警告：无法读取输出清单 {self.path}，将重新生成所有报表: {e}")
+
+    def _key(self, output_file_path):
+        return os.path.relpath(output_file_path, self.output_dir).replace(os.sep, "/")
+
+    def is_current(self, output_file_path, digest):
+        """
+        报表文件是否存在且由相同的输入生成
+
+        Args:
+            output_file_path (str): 报表文件路径
+            digest (str): 输入摘要
+
+        Returns:
+            bool: 是否可以跳过
+        """
+        return self.reports.get(self._key(output_file_path)) == digest and os.path.exists(output_file_path)
+
+    def forget(self, output_file_path):
+        """
+        输入已变化：删除清单记录。旧文件保留，新报表生成成功后才替换
+
+        Args:
+            output_file_path (str): 报表文件路径
+        """
+        if self.reports.pop(self._key(output_file_path), None) is not None:
+            self._unsaved += 1
+
+    def record(self, output_file_path, digest):
+        """
+        记录生成成功的报表
+
+        Args:
+            output_file_path (str): 报表文件路径
+            digest (str): 输入摘要
+        """
+        self.reports[self._key(output_file_path)] = digest
+        self._unsaved += 1
+        if self._unsaved >= MANIFEST_FLUSH_EVERY:
+            self.save()
+
+    def save(self):
+        """把清单原子写回输出目录"""
+        if not self._unsaved:
+            return
+        if self.output_dir and not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        def write(path):
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "reports": self.reports}, f, ensure_ascii=False, indent=1)
+
+        atomic_save(self.path, write)
+        self._unsaved = 0
+
+
+class ManifestExecutor:
+    """
+    跳过未变化报表的任务执行器，包装ReportTaskExecutor等执行器，接口与其一致
+
+    提交任务时计算输入摘要，与清单一致且文件存在时直接回调成功，不再生成；
+    否则交给内部执行器生成到输出目录中的临时目录，成功后把生成的文件（包括表格导出和拆分的文件）
+    用os.replace移回输出目录并记录到清单。
+    新报表总是写回原文件名：生成器看到的路径上没有同名文件，不会改用带序号的文件名；
+    生成失败时输出目录中上次的文件保持不变。
+    """
+
+    def __init__(self, executor, output_dir, fingerprint=None):
+        """
+        初始化执行器
+
+        Args:
+            executor: 内部执行器
+            output_dir (str): 输出目录，清单保存在其中
+            fingerprint (callable, optional): 根据报表类型返回生成器指纹的函数
+        """
+        self.executor = executor
+        self.manifest = OutputManifest(output_dir)
+        self.fingerprint = fingerprint
+        self.skipped = 0
+
+    @property
+    def is_parallel(self):
+        """与内部执行器一致"""
+        return self.executor.is_parallel
+
+    def submit(self, key, func, payload, on_done):
+        """
+        提交一个报表生成任务，输入未变化时跳过
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            func: 报表生成函数
+            payload: (报表类型, generate_report关键字参数)
+            on_done: 回调函数 on_done(key, result, error, error_traceback)
+        """
+        generator_name, report_kwargs = payload
+        output_file_path = report_kwargs['output_file_path']
+        fingerprint = self.fingerprint(generator_name) if self.fingerprint else None
+        digest = input_digest(generator_name, report_kwargs, fingerprint)
+        if self.manifest.is_current(output_file_path, digest):
+            self.skipped += 1
+            print(f"  输入未变化，跳过: {output_file_path}")
+            on_done(key, output_file_path, None, None)
+            return
+        self.manifest.forget(output_file_path)
+        target_dir = os.path.dirname(output_file_path) or "."
+        staging_dir = tempfile.mkdtemp(prefix=".manifest_", dir=target_dir)
+        staged_path = os.path.join(staging_dir, os.path.basename(output_file_path))
+
+        def replace_and_notify(task_key, result, error, error_traceback):
+            try:
+                if error is None:
+                    written = os.path.exists(staged_path)
+                    for name in os.listdir(staging_dir):
+                        os.replace(os.path.join(staging_dir, name), os.path.join(target_dir, name))
+                    if written:
+                        self.manifest.record(output_file_path, digest)
+                    if isinstance(result, str) and os.path.dirname(result) == staging_dir:
+                        result = os.path.join(target_dir, os.path.basename(result))
+            except OSError as e:
+                result, error, error_traceback = None, e, traceback.format_exc()
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            on_done(task_key, result, error, error_traceback)
+
+        staged_kwargs = dict(report_kwargs, output_file_path=staged_path)
+        self.executor.submit(key, func, (generator_name, staged_kwargs), replace_and_notify)
+
+    def wait(self):
+        """等待内部执行器的任务完成并保存清单"""
+        try:
+            self.executor.wait()
+        finally:
+            self.manifest.save()
+
+    def shutdown(self):
+        """关闭内部执行器并保存清单"""
+        try:
+            self.executor.shutdown()
+        finally:
+            self.manifest.save()
+            if self.skipped:
+                print(f"输入未变化而跳过的报表: {self.skipped} 个")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
@@ -0,0 +1,259 @@
+"""
+后台保存模块
+顺序生成报表时，每台设备的工作簿保存（zip压缩、写入本地磁盘或网络共享）会阻塞设备循环。
+生成器把完成的工作簿交给OutputWriter，由后台线程压缩并写出，主线程继续查询和计算下一台设备。
+待保存的工作簿数量有上限，超过时提交方等待，避免内存中堆积过多工作簿。
+每个文件先写入同目录下的临时文件，写完后原子重命名，中途失败不会留下不完整的报表文件。
+"""
+import os
+import queue
+import threading
+import traceback
+import uuid
+
+from .xlsx_writer import save_report_workbook
+
+# 默认最多等待保存的工作簿数量
+DEFAULT_MAX_PENDING = 4
+
+
+def atomic_save(output_file_path, write_func):
+    """
+    先写入同目录下的临时文件，成功后原子替换为目标文件
+
+    Args:
+        output_file_path (str): 目标文件路径
+        write_func (callable): 写出函数，接收临时文件路径
+    """
+    directory, filename = os.path.split(output_file_path)
+    temp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        write_func(temp_path)
+        os.replace(temp_path, output_file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class OutputTask:
+    """
+    一个报表任务的后台保存句柄
+
+    生成器通过save/save_workbook提交该任务的文件，任务结束（finish）且所有文件都保存完成后，
+    在主线程中回调 on_done(key, result, error, error_traceback)。
+    """
+
+    def __init__(self, writer, key, on_done):
+        self._writer = writer
+        self.key = key
+        self._on_done = on_done
+        self._remaining = 0
+        self._finished = False
+        self._result = None
+        self._error = None
+        self._error_traceback = None
+
+    def save(self, output_file_path, write_func, workbook=None):
+        """
+        提交一个文件的后台保存
+
+        Args:
+            output_file_path (str): 输出文件路径
+            write_func (callable): 写出函数，接收（临时）文件路径
+            workbook (optional): 保存完成后需要关闭的工作簿
+        """
+        self._remaining += 1
+        self._writer._enqueue(self, output_file_path, write_func, workbook)
+
+    def save_workbook(self, workbook, output_file_path):
+        """
+        提交create_workbook创建的工作簿的后台保存，保存后由后台线程关闭工作簿
+
+        Args:
+            workbook (Workbook or DirectWorkbook): 工作簿
+            output_file_path (str): 输出文件路径
+        """
+        self.save(output_file_path, lambda path: save_report_workbook(workbook, path), workbook)
+
+    def finish(self, result, error=None, error_traceback=None):
+        """
+        标记报表任务的生成阶段结束，不再提交新的文件
+
+        Args:
+            result: 任务结果（输出文件路径）
+            error (Exception, optional): 生成阶段的异常
+            error_traceback (str, optional): 异常堆栈
+        """
+        self._finished = True
+        self._result = result
+        if error is not None and self._error is None:
+            self._error, self._error_traceback = error, error_traceback
+        self._complete_if_done()
+
+    def _saved(self, error, error_traceback):
+        """后台保存完成，由OutputWriter在主线程中调用"""
+        self._remaining -= 1
+        if error is not None and self._error is None:
+            self._error, self._error_traceback = error, error_traceback
+        self._complete_if_done()
+
+    def _complete_if_done(self):
+        if not self._finished or self._remaining:
+            return
+        if self._error is None:
+            self._on_done(self.key, self._result, None, None)
+        else:
+            self._on_done(self.key, None, self._error, self._error_traceback)
+
+
+class OutputWriter:
+    """
+    带有界队列的后台保存服务
+
+    保存在后台线程中执行，完成结果先放入结果队列，由poll()/join()在主线程中分发给各任务，
+    因此任务回调可以安全地修改failed_devices、log_messages等主线程状态。
+    """
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING, workers=1):
+        """
+        初始化后台保存服务
+
+        Args:
+            max_pending (int): 最多等待保存的文件数，队列满时提交方等待
+            workers (int): 后台保存线程数
+        """
+        if not isinstance(max_pending, int) or max_pending <= 0:
+            raise ValueError(f"max_pending 必须为正整数: {max_pending}")
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._results = queue.Queue()
+        self._workers = workers
+        self._threads = []
+        self._outstanding = 0
+
+    def task(self, key, on_done):
+        """
+        为一个报表任务创建保存句柄
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            on_done: 回调函数 on_done(key, result, error, error_traceback)
+
+        Returns:
+            OutputTask: 保存句柄
+        """
+        return OutputTask(self, key, on_done)
+
+    def _enqueue(self, task, output_file_path, write_func, workbook):
+        """把保存请求放入队列，队列满时等待后台线程腾出位置"""
+        if not self._threads:
+            for _ in range(self._workers):
+                thread = threading.Thread(target=self._run, name="OutputWriter", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._outstanding += 1
+        self._queue.put((task, output_file_path, write_func, workbook))
+
+    def _run(self):
+        """后台线程：依次保存队列中的文件"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            task, output_file_path, write_func, workbook = item
+            error = error_traceback = None
+            try:
+                atomic_save(output_file_path, write_func)
+            except Exception as e:
+                error, error_traceback = e, traceback.format_exc()
+            finally:
+                if workbook is not None:
+                    try:
+                        workbook.close()
+                    except Exception:
+                        pass
+            self._results.put((task, error, error_traceback))
+
+    def poll(self):
+        """在主线程中分发已完成的保存结果，不等待"""
+        while True:
+            try:
+                task, error, error_traceback = self._results.get_nowait()
+            except queue.Empty:
+                return
+            self._outstanding -= 1
+            task._saved(error, error_traceback)
+
+    def join(self):
+        """等待所有已提交的保存完成，并在主线程中分发结果"""
+        while self._outstanding:
+            task, error, error_traceback = self._results.get()
+            self._outstanding -= 1
+            task._saved(error, error_traceback)
+
+    def close(self):
+        """等待所有保存完成并结束后台线程"""
+        self.join()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+class BackgroundSaveExecutor:
+    """
+    后台保存模式的报表任务执行器，接口与ReportTaskExecutor一致
+
+    报表在当前进程中依次生成，生成器把工作簿交给后台保存线程后立即返回，
+    保存与下一台设备的查询和计算重叠进行。保存完成后才回调，保存失败的设备回调为失败。
+    """
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING):
+        """
+        初始化执行器
+
+        Args:
+            max_pending (int): 最多等待保存的文件数
+        """
+        self.writer = OutputWriter(max_pending)
+
+    @property
+    def is_parallel(self):
+        """报表在当前进程中依次生成"""
+        return False
+
+    def submit(self, key, func, payload, on_done):
+        """
+        生成一个报表，保存交给后台线程
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            func: 报表生成函数，接收 (报表类型, generate_report关键字参数)
+            payload: (报表类型, generate_report关键字参数)
+            on_done: 回调函数 on_done(key, result, error, error_traceback)，保存完成后调用
+        """
+        generator_name, report_kwargs = payload
+        task = self.writer.task(key, on_done)
+        try:
+            result = func((generator_name, dict(report_kwargs, output_writer=task)))
+        except Exception as e:
+            task.finish(None, e, traceback.format_exc())
+        else:
+            task.finish(result)
+        self.writer.poll()
+
+    def wait(self):
+        """等待所有后台保存完成并回调"""
+        self.writer.join()
+
+    def shutdown(self):
+        """等待所有后台保存完成并结束后台线程"""
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
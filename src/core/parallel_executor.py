@@ -0,0 +1,94 @@
+"""
+报表生成并行执行模块
+将每台设备（或每个客户）的报表生成任务分发到进程池中执行，绕开GIL以利用多核CPU。
+未配置工作进程数时在当前进程中顺序执行，行为与原有流程一致。
+"""
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+# 报表生成阶段不需要的大字段，分发到工作进程前剔除以减少序列化开销
+_HEAVY_DEVICE_FIELDS = ("raw_data", "columns")
+
+
+def compact_device_payload(device_data):
+    """
+    剔除设备数据中报表生成阶段不需要的原始行数据
+
+    Args:
+        device_data (dict): 设备数据
+
+    Returns:
+        dict: 精简后的设备数据副本
+    """
+    return {key: value for key, value in device_data.items() if key not in _HEAVY_DEVICE_FIELDS}
+
+
+class ReportTaskExecutor:
+    """报表生成任务执行器，支持顺序执行和进程池执行两种模式"""
+
+    def __init__(self, max_workers=None):
+        """
+        初始化任务执行器
+
+        Args:
+            max_workers (int, optional): 工作进程数，为None或小于2时在当前进程中顺序执行
+        """
+        self.max_workers = max_workers if max_workers and max_workers > 1 else None
+        self._pool = None
+        self._pending = []
+
+    @property
+    def is_parallel(self):
+        """是否使用进程池执行"""
+        return self.max_workers is not None
+
+    def submit(self, key, func, payload, on_done):
+        """
+        提交一个报表生成任务
+
+        顺序模式下立即执行并回调；进程池模式下回调在wait()中于主进程执行，
+        因此回调可以安全地修改failed_devices、log_messages等主进程状态。
+
+        Args:
+            key: 任务标识（设备编码或客户ID）
+            func: 模块级可序列化函数，接收payload作为唯一参数
+            payload: 任务数据，进程池模式下需可被pickle序列化
+            on_done: 回调函数 on_done(key, result, error, error_traceback)，成功时error为None
+        """
+        if not self.is_parallel:
+            try:
+                result = func(payload)
+            except Exception as e:
+                on_done(key, None, e, traceback.format_exc())
+                return
+            on_done(key, result, None, None)
+            return
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._pending.append((key, self._pool.submit(func, payload), on_done))
+
+    def wait(self):
+        """等待所有已提交任务完成，并按提交顺序在主进程中回调"""
+        pending, self._pending = self._pending, []
+        for key, future, on_done in pending:
+            try:
+                result = future.result()
+            except Exception as e:
+                on_done(key, None, e, traceback.format_exc())
+                continue
+            on_done(key, result, None, None)
+
+    def shutdown(self):
+        """等待剩余任务并关闭进程池"""
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown()
+        return False
@@ -0,0 +1,78 @@
+"""
+周期汇总模块
+由每日聚合结果（每日状态、每日用量）推导周、月、季度的订单总量、期末库存、加油量和消耗量，
+计算量只与天数相关，不需要重新扫描原始订单记录。
+每日状态可以来自本次计算，也可以来自DailyStateStore持久化的结果。
+"""
+from src.utils.date_utils import default_calendar
+
+# 支持的汇总周期及其周期键函数
+ROLLUP_PERIODS = {
+    'week': default_calendar.week_key,
+    'month': default_calendar.month_key,
+    'quarter': default_calendar.quarter_key,
+}
+
+
+def _period_key_func(period):
+    """返回汇总周期对应的周期键函数"""
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"不支持的汇总周期: {period}，可选值: {', '.join(ROLLUP_PERIODS)}")
+    return ROLLUP_PERIODS[period]
+
+
+def rollup_states(daily_states, period='month'):
+    """
+    将每日状态汇总为周期状态
+
+    每日消耗量 = 前一日期末库存 - 当日期末库存 + 当日加油量，逐日相加后中间日期的库存相互抵消，
+    因此周期消耗量等于按周期直接扫描原始记录得到的结果：
+    周期消耗量 = 周期期初库存 - 周期期末库存 + 周期加油量。
+
+    Args:
+        daily_states (dict): {date: state_dict}，state_dict包含end_inventory、order_total、refill、consumption
+        period (str): 汇总周期，week / month / quarter
+
+    Returns:
+        dict: {周期键: state_dict}，按周期升序
+    """
+    period_key = _period_key_func(period)
+    period_states = {}
+    for state_date in sorted(daily_states):
+        state = daily_states[state_date]
+        key = period_key(state_date)
+        if key not in period_states:
+            period_states[key] = {
+                'end_inventory': state['end_inventory'],
+                'order_total': 0,
+                'refill': 0,
+                'consumption': 0,
+                'oil_name': None,
+            }
+        period_state = period_states[key]
+        period_state['order_total'] += state['order_total']
+        period_state['refill'] += state['refill']
+        period_state['consumption'] += state['consumption']
+        period_state['end_inventory'] = state['end_inventory']
+        if period_state['oil_name'] is None and state.get('oil_name'):
+            period_state['oil_name'] = state['oil_name']
+    return period_states
+
+
+def rollup_usage(daily_usage, period='month'):
+    """
+    将每日用量汇总为周期用量
+
+    Args:
+        daily_usage (list): 每日用量 [(date, usage), ...]
+        period (str): 汇总周期，week / month / quarter
+
+    Returns:
+        list: 按周期排序的用量 [(周期键, usage), ...]
+    """
+    period_key = _period_key_func(period)
+    totals = {}
+    for usage_date, usage in daily_usage:
+        key = period_key(usage_date)
+        totals[key] = totals.get(key, 0) + usage
+    return sorted(totals.items())
@@ -1,9 +1,27 @@
+import itertools
 import os
+import pickle
+import tempfile
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.styles import Alignment, Font
+from openpyxl.utils import get_column_letter
 
 from .base_report import BaseReportGenerator
+from .table_export import TableExportWriter, parse_export_formats
+
+# 未提供列名时使用的默认列标题
+DEFAULT_COLUMNS = [
+    '订单序号', '加注时间', '油品序号', '油品名称', '水油比：水值', '水油比：油值',
+    '水加注值', '油加注值', '原油剩余量', '原油剩余比例', '油加设量',
+    '是否结算：1=待结算 2=待生效 3=已结算', '加注模式：1=近程自动 2=远程自动 3=手动'
+]
+
+# Excel单个工作表的最大行数（含标题行）
+EXCEL_MAX_ROWS = 1048576
+
+# 拆分为多个工作表或文件时写入的索引工作表名称
+INDEX_SHEET_TITLE = "索引"
 
 
 class RefuelingDetailsReportGenerator(BaseReportGenerator):
@@ -30,10 +48,15 @@ class RefuelingDetailsReportGenerator(BaseReportGenerator):
         end_date = kwargs.get('end_date')
         customer_name = kwargs.get('customer_name')
         columns = kwargs.get('columns')
+        # 行数预算和导出格式只在配置时传递
+        options = {
+            key: kwargs[key] for key in ('rows_per_sheet', 'rows_per_file', 'export_format')
+            if kwargs.get(key) is not None
+        }
 
         return self.generate_refueling_details_report(
             refueling_data, output_file_path, device_code, start_date, end_date,
-            customer_name, columns
+            customer_name, columns, **options
         )
 
     def generate_refueling_details_report(
@@ -44,86 +67,262 @@ class RefuelingDetailsReportGenerator(BaseReportGenerator):
         start_date,
         end_date,
         customer_name=None,
-        columns=None
+        columns=None,
+        rows_per_sheet=None,
+        rows_per_file=None,
+        export_format="xlsx"
     ):
         """
         生成加注明细Excel报告文件
 
+        数据行数超过单个工作表或单个文件的行数预算时，依次拆分到编号的工作表（加注明细_2、加注明细_3……）
+        和编号的文件（原文件名_part2、原文件名_part3……），并在第一个文件开头写入索引工作表，
+        列出每一部分所在的文件、工作表和序号范围。
+
         Args:
-            refueling_data (list): 加注明细数据列表
+            refueling_data (iterable): 加注明细数据列表，或只能消费一次的行数据流（例如数据库分批游标）
             output_file_path (str): 输出文件路径
             device_code (str): 设备编码
             start_date (date): 开始日期
             end_date (date): 结束日期
             customer_name (str): 客户名称
             columns (list): 列名列表
+            rows_per_sheet (int, optional): 每个工作表最多写入的数据行数，默认为Excel的行数上限
+            rows_per_file (int, optional): 每个文件最多写入的数据行数，默认不限制
+            export_format (str or list): 导出格式，xlsx、csv、jsonl、parquet之一，
+                或逗号分隔的多个格式；表格格式在统计列宽的同一次遍历中写出
         """
         try:
+            write_xlsx, table_formats = parse_export_formats(export_format)
+
             # 检查输出目录是否存在，如果不存在则创建
             output_dir = os.path.dirname(output_file_path)
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir, exist_ok=True)
-            
-            # 初始化工作簿
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "加注明细"
 
             # 添加列标题（直接从第一行开始，不添加合并的标题行）
-            if columns:
-                ws.append(columns)
-            else:
-                ws.append([
-                    '订单序号', '加注时间', '油品序号', '油品名称', '水油比：水值', '水油比：油值',
-                    '水加注值', '油加注值', '原油剩余量', '原油剩余比例', '油加设量', 
-                    '是否结算：1=待结算 2=待生效 3=已结算', '加注模式：1=近程自动 2=远程自动 3=手动'
-                ])
-
-            # 写入数据，确保使用原始数据中的油品名称
-            for row in refueling_data:
-                # 确保row是列表或元组格式
-                if isinstance(row, (list, tuple)):
-                    # 直接写入原始数据，不进行任何修改
-                    ws.append(list(row))
-                else:
-                    # 如果是字典格式，按列顺序提取值
-                    if columns and isinstance(row, dict):
-                        row_data = [row.get(col, '') for col in columns]
-                        ws.append(row_data)
+            header = list(columns) if columns else list(DEFAULT_COLUMNS)
+
+            # 列宽在写入过程中按每列的最大长度累计，不再在写完后逐个单元格回扫
+            max_lengths = [len(str(value)) for value in header]
+            total_rows = 0
+
+            def track(values):
+                for idx, value in enumerate(values):
+                    if value is None:
+                        continue
+                    length = len(str(value))
+                    if idx >= len(max_lengths):
+                        max_lengths.extend([0] * (idx + 1 - len(max_lengths)))
+                    if length > max_lengths[idx]:
+                        max_lengths[idx] = length
+
+            with tempfile.TemporaryFile() as spool:
+                exporter = TableExportWriter(os.path.splitext(output_file_path)[0], header, table_formats)
+                try:
+                    if isinstance(refueling_data, (list, tuple)):
+                        # 数据已在内存中，直接统计列宽并重放
+                        for row in refueling_data:
+                            values = _row_values(row, columns)
+                            track(values)
+                            if table_formats:
+                                exporter.write_row(values)
+                        total_rows = len(refueling_data)
                     else:
-                        ws.append([str(row)])
-
-            # 调整列宽
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-
-            # 保存文件，处理可能的权限问题
-            try:
-                wb.save(output_file_path)
-                print(f"加注明细报表已生成: {output_file_path}")
-                return True
-            except PermissionError:
-                # 如果是权限错误，尝试添加时间戳到文件名
-                import time
-                timestamp = time.strftime("%Y%m%d_%H%M%S")
-                name, ext = os.path.splitext(output_file_path)
-                new_output_file_path = f"{name}_{timestamp}{ext}"
-                print(f"原文件可能正在被使用，保存到新文件: {new_output_file_path}")
-                wb.save(new_output_file_path)
-                print(f"加注明细报表已生成: {new_output_file_path}")
-                return True
+                        # 数据流（例如数据库分批游标）只能消费一次：逐行暂存到临时文件并统计列宽，
+                        # 内存占用与行数无关；只导出表格格式时不需要暂存
+                        for row in refueling_data:
+                            values = _row_values(row, columns)
+                            track(values)
+                            if table_formats:
+                                exporter.write_row(values)
+                            if write_xlsx:
+                                pickle.dump(values, spool, protocol=pickle.HIGHEST_PROTOCOL)
+                            total_rows += 1
+                finally:
+                    exported = exporter.close()
+                for path in exported:
+                    print(f"数据已导出: {path}")
+                if not write_xlsx:
+                    return True
+
+                if isinstance(refueling_data, (list, tuple)):
+                    def replay():
+                        for row in refueling_data:
+                            yield _row_values(row, columns)
+                else:
+                    def replay():
+                        spool.seek(0)
+                        while True:
+                            try:
+                                yield pickle.load(spool)
+                            except EOFError:
+                                return
+
+                widths = [min(length + 2, 50) for length in max_lengths]
+
+                # 保存文件，处理可能的权限问题
+                try:
+                    pieces = plan_refueling_pieces(output_file_path, total_rows, rows_per_sheet, rows_per_file)
+                    self._write_pieces(pieces, header, replay(), widths)
+                    return True
+                except PermissionError:
+                    # 如果是权限错误，尝试添加时间戳到文件名
+                    import time
+                    timestamp = time.strftime("%Y%m%d_%H%M%S")
+                    name, ext = os.path.splitext(output_file_path)
+                    new_output_file_path = f"{name}_{timestamp}{ext}"
+                    print(f"原文件可能正在被使用，保存到新文件: {new_output_file_path}")
+                    pieces = plan_refueling_pieces(new_output_file_path, total_rows, rows_per_sheet, rows_per_file)
+                    self._write_pieces(pieces, header, replay(), widths)
+                    return True
 
         except Exception as e:
             print(f"生成加注明细报表时发生错误: {e}")
             import traceback
             traceback.print_exc()
             return False
+
+    @classmethod
+    def _write_pieces(cls, pieces, header, rows, widths):
+        """
+        按拆分计划依次写出各个文件，行数据按顺序从同一个迭代器中取出
+
+        Args:
+            pieces (list): plan_refueling_pieces返回的拆分计划
+            header (list): 列标题
+            rows (iterator): 行数据迭代器
+            widths (list): 各列宽度
+        """
+        split = len(pieces) > 1 or len(pieces[0]['sheets']) > 1
+        for file_no, piece in enumerate(pieces):
+            # 索引只写入第一个文件
+            index = pieces if split and file_no == 0 else None
+            sheets = [
+                (sheet['title'], itertools.islice(rows, sheet['row_count']))
+                for sheet in piece['sheets']
+            ]
+            cls._write_workbook(piece['path'], header, sheets, widths, index)
+            print(f"加注明细报表已生成: {piece['path']}")
+
+    @staticmethod
+    def _write_workbook(output_file_path, header, sheets, widths, index=None):
+        """
+        以只写模式写出一个加注明细文件，行数据逐行写入文件，不在内存中保留单元格
+
+        每个文件自带标题行和列宽，不依赖其他文件的写入结果。
+
+        Args:
+            output_file_path (str): 输出文件路径
+            header (list): 列标题
+            sheets (list): [(工作表名称, 行数据迭代器)]，按顺序消费
+            widths (list): 各列宽度，只写模式下必须在写入第一行之前设置
+            index (list, optional): 完整的拆分计划，提供时在文件开头写入索引工作表
+        """
+        wb = Workbook(write_only=True)
+        if index:
+            index_ws = wb.create_sheet(INDEX_SHEET_TITLE)
+            index_ws.append(['文件', '工作表', '起始序号', '结束序号', '行数'])
+            for piece in index:
+                for sheet in piece['sheets']:
+                    index_ws.append([
+                        os.path.basename(piece['path']), sheet['title'],
+                        sheet['first_row'], sheet['first_row'] + sheet['row_count'] - 1, sheet['row_count']
+                    ])
+        for title, rows in sheets:
+            ws = wb.create_sheet(title)
+            for idx, width in enumerate(widths, 1):
+                ws.column_dimensions[get_column_letter(idx)].width = width
+            ws.append(header)
+            for values in rows:
+                ws.append(values)
+        wb.save(output_file_path)
+
+
+def validate_row_budget(name, budget):
+    """
+    检查行数预算
+
+    Args:
+        name (str): 配置项名称，用于错误信息
+        budget: 行数预算，None表示不限制
+
+    Raises:
+        ValueError: 行数预算不是正整数（包括配置文件中的字符串和布尔值）
+    """
+    if budget is not None and (isinstance(budget, bool) or not isinstance(budget, int) or budget <= 0):
+        raise ValueError(f"{name} 必须为正整数: {budget!r}")
+
+
+def plan_refueling_pieces(output_file_path, total_rows, rows_per_sheet=None, rows_per_file=None):
+    """
+    按行数预算规划加注明细的文件和工作表拆分
+
+    每一部分的行范围在写入前即已确定，各文件可以独立写出。
+
+    Args:
+        output_file_path (str): 第一个文件的路径，后续文件在文件名后追加 _part2、_part3……
+        total_rows (int): 数据总行数（不含标题行）
+        rows_per_sheet (int, optional): 每个工作表最多写入的数据行数，默认为Excel的行数上限
+        rows_per_file (int, optional): 每个文件最多写入的数据行数，默认不限制
+
+    Returns:
+        list: [{'path': 文件路径, 'sheets': [{'title', 'first_row', 'row_count'}]}]，
+            first_row 为该工作表第一行数据在全部数据中的序号（从1开始）
+
+    Raises:
+        ValueError: 行数预算不是正整数
+    """
+    validate_row_budget('rows_per_sheet', rows_per_sheet)
+    validate_row_budget('rows_per_file', rows_per_file)
+
+    sheet_budget = min(rows_per_sheet or EXCEL_MAX_ROWS - 1, EXCEL_MAX_ROWS - 1)
+    file_budget = rows_per_file or max(total_rows, 1)
+    name, ext = os.path.splitext(output_file_path)
+
+    pieces = []
+    first_row = 1
+    sheet_no = 1
+    remaining = total_rows
+    while True:
+        file_no = len(pieces) + 1
+        path = output_file_path if file_no == 1 else f"{name}_part{file_no}{ext}"
+        piece = {'path': path, 'sheets': []}
+        file_remaining = min(file_budget, remaining)
+        while True:
+            row_count = min(sheet_budget, file_remaining)
+            piece['sheets'].append({
+                'title': "加注明细" if sheet_no == 1 else f"加注明细_{sheet_no}",
+                'first_row': first_row,
+                'row_count': row_count,
+            })
+            sheet_no += 1
+            first_row += row_count
+            remaining -= row_count
+            file_remaining -= row_count
+            if file_remaining <= 0:
+                break
+        pieces.append(piece)
+        if remaining <= 0:
+            return pieces
+
+
+def _row_values(row, columns):
+    """
+    把一行加注明细转换为写入Excel的值列表
+
+    Args:
+        row: 行数据（列表、元组或字典）
+        columns (list): 列名列表
+
+    Returns:
+        list: 单元格值列表
+    """
+    # 确保row是列表或元组格式
+    if isinstance(row, (list, tuple)):
+        # 直接写入原始数据，不进行任何修改
+        return list(row)
+    # 如果是字典格式，按列顺序提取值
+    if columns and isinstance(row, dict):
+        return [row.get(col, '') for col in columns]
+    return [str(row)]
@@ -3,6 +3,7 @@
 负责协调库存报表和客户对账单的生成流程
 """
 import datetime
+import itertools
 import json
 import os
 import traceback
@@ -10,9 +11,18 @@ import traceback
 from src.core.db_handler import DatabaseHandler
 from src.core.inventory_handler import InventoryReportGenerator
 from src.core.statement_handler import CustomerStatementGenerator
-from src.core.refueling_details_handler import RefuelingDetailsReportGenerator
+from src.core.refueling_details_handler import RefuelingDetailsReportGenerator, validate_row_budget
 from src.core.file_handler import FileHandler
 from src.core.data_manager import ReportDataManager,CustomerGroupingUtil
+from src.core.aggregate_cache import AggregateCache
+from src.core.chart_downsample import DOWNSAMPLE_METHODS, parse_point_budget
+from src.core.daily_state_store import DailyStateStore
+from src.core.parallel_executor import ReportTaskExecutor, compact_device_payload
+from src.core.combined_workbook import CombinedWorkbookExecutor
+from src.core.output_bundle import BundleExecutor, OutputBundle, append_to_bundle
+from src.core.html_preview import PreviewExecutor, PreviewPage
+from src.core.output_manifest import ManifestExecutor
+from src.core.output_writer import DEFAULT_MAX_PENDING, BackgroundSaveExecutor
 from src.core.consumption_error_handler import DailyConsumptionErrorReportGenerator, MonthlyConsumptionErrorReportGenerator, ConsumptionErrorSummaryGenerator
 from src.utils.date_utils import validate_csv_data
 from src.ui.filedialog_selector import file_dialog_selector
@@ -112,6 +122,309 @@ def _check_device_dates_consistency(devices_data):
     return True, ""
 
 
+def _open_aggregate_cache(report_options):
+    """
+    根据报表选项打开聚合结果缓存
+
+    Args:
+        report_options (dict): query_config中的report_options
+
+    Returns:
+        AggregateCache or None: 未配置aggregate_cache时返回None
+    """
+    if not report_options.get('aggregate_cache'):
+        return None
+    print(f"已启用聚合结果缓存: {report_options['aggregate_cache']}")
+    return AggregateCache(report_options['aggregate_cache'])
+
+
+def _chart_options(report_options, report_type):
+    """
+    根据报表选项获取图表降采样参数
+
+    Args:
+        report_options (dict): query_config中的report_options
+        report_type (str): 报表类型，chart_point_budget为字典时按此键取值
+
+    Returns:
+        dict: generate_report的chart_points和chart_downsample关键字参数，未配置点数预算时为空
+
+    Raises:
+        ValueError: 点数预算或降采样方法无效
+    """
+    chart_points = parse_point_budget(report_options.get('chart_point_budget'), report_type)
+    if chart_points is None:
+        return {}
+    method = report_options.get('chart_downsample') or 'lttb'
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"不支持的图表降采样方法: {method}，可选: {', '.join(DOWNSAMPLE_METHODS)}")
+    return {'chart_points': chart_points, 'chart_downsample': method}
+
+
+def _refueling_options(report_options):
+    """
+    根据报表选项获取加注明细报表的行数预算和导出格式
+
+    Args:
+        report_options (dict): query_config中的report_options
+
+    Returns:
+        dict: generate_report的rows_per_sheet、rows_per_file和export_format关键字参数
+
+    Raises:
+        ValueError: 行数预算不是正整数
+    """
+    options = {
+        'rows_per_sheet': report_options.get('refueling_rows_per_sheet'),
+        'rows_per_file': report_options.get('refueling_rows_per_file'),
+        'export_format': report_options.get('export_format'),
+    }
+    validate_row_budget('refueling_rows_per_sheet', options['rows_per_sheet'])
+    validate_row_budget('refueling_rows_per_file', options['rows_per_file'])
+    return options
+
+
+def _use_fleet_compute(report_options, state_store, aggregate_cache):
+    """
+    判断是否对全部设备批量计算消耗误差
+
+    Args:
+        report_options (dict): query_config中的report_options
+        state_store: 每日状态存储实例，未配置时为None
+        aggregate_cache: 聚合结果缓存实例，未配置时为None
+
+    Returns:
+        bool: 配置fleet_compute且未启用每日状态存储和聚合结果缓存时为True
+    """
+    if not report_options.get('fleet_compute'):
+        return False
+    if state_store is not None or aggregate_cache is not None:
+        print("提示：已配置daily_state_store或aggregate_cache，fleet_compute不生效，逐台设备计算误差")
+        return False
+    print("已启用批量误差计算：读取全部设备数据后一次性计算误差")
+    return True
+
+
+def _submit_fleet_reports(data_manager, executor, generator_name, fleet_raw_data, fleet_reports, on_done):
+    """
+    一次性计算所有设备的消耗误差，按设备切出结果后提交报表生成
+
+    Args:
+        data_manager (ReportDataManager): 数据管理器
+        executor: 报表执行器
+        generator_name (str): 'daily_error' 或 'monthly_error'
+        fleet_raw_data (list): 每台设备的原始数据，计算完成后清空以释放内存
+        fleet_reports (list): 与原始数据一一对应的 (设备编码, 桶数, 报表参数)，报表参数中的error_data在这里填入
+        on_done: 报表完成回调，批量计算失败时对每台设备以失败回调
+    """
+    if not fleet_reports:
+        return
+    print(f"\n正在批量计算 {len(fleet_reports)} 台设备的消耗误差...")
+    try:
+        arrays = data_manager.build_fleet_arrays(
+            fleet_raw_data, [barrel_count for _, barrel_count, _ in fleet_reports]
+        )
+        fleet_raw_data.clear()
+        data_manager.release_raw_data()
+        fleet = data_manager.calculate_fleet_errors(arrays)
+    except Exception as e:
+        error_traceback = traceback.format_exc()
+        for device_code, _, _ in fleet_reports:
+            on_done(device_code, None, e, error_traceback)
+        return
+    for index, (device_code, _, report_kwargs) in enumerate(fleet_reports):
+        if generator_name == 'daily_error':
+            report_kwargs['error_data'] = fleet.daily_errors(index)
+        else:
+            report_kwargs['error_data'] = fleet.monthly_errors(
+                index, report_kwargs['start_date'], report_kwargs['end_date']
+            )
+        executor.submit(device_code, _render_report, (generator_name, report_kwargs), on_done)
+
+
+def _open_report_executor(report_options, output_dir, report_name):
+    """
+    根据报表选项创建报表生成阶段的执行器
+
+    Args:
+        report_options (dict): query_config中的report_options
+        output_dir (str): 输出目录
+        report_name (str): 报表名称，合并输出模式下用于文件名和索引标题
+
+    Returns:
+        执行器: 配置workbook_mode时每个客户（或整次运行）写入一个合并工作簿，
+            否则每台设备一个文件，执行方式见_open_task_executor；
+            配置html_preview时再包装一层，同时生成一个HTML预览页面（为"only"时只生成预览页面）
+
+    Raises:
+        ValueError: html_preview配置无效
+    """
+    html_preview = report_options.get('html_preview')
+    if html_preview not in (None, False, True, 'only'):
+        raise ValueError(f"不支持的html_preview配置: {html_preview!r}，可选: true, \"only\"")
+    if html_preview == 'only':
+        # 只生成预览页面，任务不交给内部执行器，不需要打开合并工作簿、打包文件等
+        executor = ReportTaskExecutor(None)
+    elif report_options.get('workbook_mode'):
+        print(f"已启用合并输出模式: {report_options['workbook_mode']}")
+        executor = CombinedWorkbookExecutor(report_options['workbook_mode'], output_dir, report_name)
+    else:
+        executor = _open_task_executor(report_options, output_dir, report_name)
+    if html_preview:
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        page_path = os.path.join(output_dir, f"{report_name}预览_{timestamp}.html")
+        print(f"已启用HTML预览{'（不生成xlsx）' if html_preview == 'only' else ''}: {page_path}")
+        executor = PreviewExecutor(
+            executor, PreviewPage(f"{report_name}预览"), page_path, _preview_series,
+            preview_only=html_preview == 'only',
+        )
+    return executor
+
+
+def _open_task_executor(report_options, output_dir, report_name="报表"):
+    """
+    根据报表选项创建每台设备（或每个客户）一个文件的执行器
+
+    Args:
+        report_options (dict): query_config中的report_options
+        output_dir (str): 输出目录
+        report_name (str): 报表名称，打包输出时用于打包文件名
+
+    Returns:
+        ReportTaskExecutor, BackgroundSaveExecutor, ManifestExecutor or BundleExecutor:
+            配置max_workers时在进程池中并行生成；
+            否则配置background_save时在当前进程中生成、由后台线程保存，未配置时顺序生成并保存；
+            配置skip_unchanged时再包装一层，跳过输入未变化的报表；
+            配置output_bundle时所有文件写入同一个zip打包文件，background_save和skip_unchanged不生效
+    """
+    executor = ReportTaskExecutor(report_options.get('max_workers'))
+    if report_options.get('output_bundle'):
+        bundle_path = _bundle_path(report_options['output_bundle'], output_dir, report_name)
+        print(f"已启用打包输出，报表和日志写入: {bundle_path}")
+        return BundleExecutor(executor, OutputBundle(bundle_path, output_dir))
+    background_save = report_options.get('background_save')
+    if background_save and not executor.is_parallel:
+        # background_save 为true时使用默认队列长度，为整数时作为最多等待保存的文件数
+        max_pending = DEFAULT_MAX_PENDING if background_save is True else background_save
+        print(f"已启用后台保存，最多 {max_pending} 个文件等待保存")
+        executor = BackgroundSaveExecutor(max_pending)
+    if report_options.get('skip_unchanged'):
+        print(f"已启用输出清单，输入未变化的报表将跳过: {output_dir}")
+        executor = ManifestExecutor(executor, output_dir, _generator_fingerprint)
+    return executor
+
+
+def _bundle_path(output_bundle, output_dir, report_name):
+    """
+    打包文件路径
+
+    Args:
+        output_bundle (bool or str): 配置值，为字符串时作为打包文件名（相对输出目录）
+        output_dir (str): 输出目录
+        report_name (str): 报表名称
+
+    Returns:
+        str: 打包文件路径
+    """
+    if isinstance(output_bundle, str):
+        return os.path.join(output_dir, output_bundle)
+    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+    return os.path.join(output_dir, f"{report_name}_{timestamp}.zip")
+
+
+def _write_run_log(log_file, log_messages, executor=None):
+    """
+    保存运行日志，打包输出时追加到打包文件中，否则写入日志文件
+
+    Args:
+        log_file (str): 日志文件路径
+        log_messages (list): 日志消息列表
+        executor (optional): 报表生成阶段的执行器
+    """
+    try:
+        if isinstance(executor, PreviewExecutor):
+            # 先写出预览页面，日志按内部执行器的方式保存
+            executor.shutdown()
+            executor = executor.executor
+        if isinstance(executor, BundleExecutor):
+            # 生成阶段中途出错时打包文件可能尚未关闭，先关闭（已关闭时不做任何事）再追加日志
+            executor.shutdown()
+            append_to_bundle(executor.bundle.path, os.path.basename(log_file), '\n'.join(log_messages))
+            print(f"\n日志文件已写入打包文件: {executor.bundle.path}")
+            return
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(log_messages))
+        print(f"\n日志文件已保存到: {log_file}")
+    except Exception as e:
+        print(f"保存日志文件失败: {e}")
+        print(f"详细错误信息:\n{traceback.format_exc()}")
+
+
+def _generator_classes():
+    """
+    报表类型 -> 报表生成器类，每次调用时按模块中的当前名称构建
+
+    Returns:
+        dict: 报表类型到生成器类的映射
+    """
+    return {
+        'inventory': InventoryReportGenerator,
+        'daily_error': DailyConsumptionErrorReportGenerator,
+        'monthly_error': MonthlyConsumptionErrorReportGenerator,
+        'refueling': RefuelingDetailsReportGenerator,
+        'statement': CustomerStatementGenerator,
+    }
+
+
+def _generator_fingerprint(generator_name):
+    """
+    获取报表生成器的指纹（生成器版本、模板摘要等），参与输出清单的输入摘要
+
+    Args:
+        generator_name (str): 报表类型
+
+    Returns:
+        tuple: 生成器指纹
+    """
+    return _generator_classes()[generator_name].fingerprint()
+
+
+def _preview_series(generator_name, report_kwargs):
+    """
+    按报表参数计算预览页面使用的数据，与报表生成器写入xlsx的数据相同
+
+    Args:
+        generator_name (str): 报表类型
+        report_kwargs (dict): generate_report关键字参数
+
+    Returns:
+        dict: 报表生成器preview_series的返回值
+    """
+    return _generator_classes()[generator_name]().preview_series(**report_kwargs)
+
+
+def _render_report(task):
+    """
+    在当前进程或工作进程中生成单个报表文件
+
+    该函数需保持为模块级函数，以便进程池序列化调用。
+
+    Args:
+        task (tuple): (报表类型, generate_report关键字参数)
+
+    Returns:
+        str: 输出文件路径
+
+    Raises:
+        Exception: 报表生成器返回False（内部捕获了异常）时抛出，使各执行器都能记录为失败
+    """
+    generator_name, report_kwargs = task
+    generator = _generator_classes()[generator_name]()
+    if generator.generate_report(**report_kwargs) is False:
+        raise Exception(f"报表写入失败: {report_kwargs['output_file_path']}")
+    return report_kwargs['output_file_path']
+
+
 def generate_error_summary_report(log_prefix="误差汇总处理日志", query_config=None):
     """
     生成所有设备的消耗误差汇总报表 (SQL核心版)。
@@ -165,6 +478,21 @@ def generate_error_summary_report(log_prefix="误差汇总处理日志", query_c
         end_date_obj = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() # type: ignore
         days_in_range = (end_date_obj - start_date_obj).days + 1 # type: ignore
 
+        report_options = query_config.get('report_options', {})
+        # 流式汇总：离线事件和误差设备都从分批游标读取，报表以只写模式逐行写出，内存占用与设备数无关
+        stream_error_summary = report_options.get('stream_error_summary', False)
+
+        # 选择输出目录（在执行查询之前，避免等待用户选择期间连接上留有未读取的结果）
+        output_dir = file_dialog_selector.choose_directory(title="选择保存目录（误差汇总报表）", initialdir=os.path.join(os.path.expanduser("~"), "Desktop"))
+        if not output_dir:
+            print("未选择输出目录，程序退出。")
+            return
+
+        # 数值模式：桶数来自设备信息CSV（summary_barrel_csv），未列出的设备使用查询结果中的桶数或1
+        barrel_counts = None
+        if report_options.get('summary_barrel_csv'):
+            barrel_counts = FileHandler().read_barrel_counts_from_csv(report_options['summary_barrel_csv'])
+
         db_handler = DatabaseHandler(db_config)
         connection = db_handler.connect()
         
@@ -175,56 +503,86 @@ def generate_error_summary_report(log_prefix="误差汇总处理日志", query_c
             start_date_str=start_date_str,
             end_date_str=end_date_str
         )
-
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute(sql_query)
-        summary_data = cursor.fetchall()
-
-        # --- 单独查询离线事件 ---
         # 格式化离线事件查询SQL
         offline_query = error_summary_offline_query_template.format(
             start_date_str=start_date_str,
             end_date_str=end_date_str
         )
-        cursor.execute(offline_query, (f"{end_date_str} 23:59:59", f"{start_date_str} 00:00:00"))
-        offline_events = cursor.fetchall()
-        cursor.close()
-
-        # 将离线事件按device_code分组
-        from collections import defaultdict
-        offline_data_map = defaultdict(list)
-        for event in offline_events:
-            offline_data_map[event['device_code']].append(event)
-
-        if not summary_data:
-            print("\n分析完成，在指定日期范围内未发现任何存在消耗误差的设备。")
-            return
+        offline_params = (f"{end_date_str} 23:59:59", f"{start_date_str} 00:00:00")
+
+        if stream_error_summary:
+            # 离线事件先分批读取并按设备累计，之后主查询的数据流独占连接，直到报表写完
+            offline_map = ConsumptionErrorSummaryGenerator.aggregate_offline_events(
+                db_handler.iter_dict_rows(offline_query, offline_params),
+                datetime.datetime.strptime(start_date_str, '%Y-%m-%d'),
+                datetime.datetime.strptime(f"{end_date_str} 23:59:59", '%Y-%m-%d %H:%M:%S'),
+                datetime.datetime.now(),
+            )
+            summary_stream = db_handler.iter_dict_rows(sql_query)
+            summary_rows = iter(summary_stream)
+            first_row = next(summary_rows, None)
+            if first_row is None:
+                summary_stream.close()
+                print("\n分析完成，在指定日期范围内未发现任何存在消耗误差的设备。")
+                return
 
-        print(f"\n查询完成，共找到 {len(summary_data)} 个存在误差的设备。")
+            print("\n查询完成，存在误差的设备将在写入报表时分批读取。")
 
-        # 为每条记录添加查询天数和离线事件
-        for item in summary_data:
-            item['days_in_range'] = days_in_range
-            device_code = item.get('device_code')
-            item['offline_events'] = offline_data_map.get(device_code, [])
+            def stream_summary_data():
+                # 为每条记录添加查询天数和该设备累计的离线时长、备注
+                for item in itertools.chain([first_row], summary_rows):
+                    item['days_in_range'] = days_in_range
+                    item['offline_summary'] = offline_map.get(item.get('device_code'), (0, []))
+                    yield item
 
-        # 选择输出目录
-        output_dir = file_dialog_selector.choose_directory(title="选择保存目录（误差汇总报表）", initialdir=os.path.join(os.path.expanduser("~"), "Desktop"))
-        if not output_dir:
-            print("未选择输出目录，程序退出。")
-            return
+            summary_data = stream_summary_data()
+        else:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(sql_query)
+            summary_data = cursor.fetchall()
+
+            # --- 单独查询离线事件 ---
+            cursor.execute(offline_query, offline_params)
+            offline_events = cursor.fetchall()
+            cursor.close()
+
+            # 将离线事件按device_code分组
+            from collections import defaultdict
+            offline_data_map = defaultdict(list)
+            for event in offline_events:
+                offline_data_map[event['device_code']].append(event)
+
+            if not summary_data:
+                print("\n分析完成，在指定日期范围内未发现任何存在消耗误差的设备。")
+                return
+
+            print(f"\n查询完成，共找到 {len(summary_data)} 个存在误差的设备。")
+
+            # 为每条记录添加查询天数和离线事件
+            for item in summary_data:
+                item['days_in_range'] = days_in_range
+                device_code = item.get('device_code')
+                item['offline_events'] = offline_data_map.get(device_code, [])
 
         # 生成报表
         summary_generator = ConsumptionErrorSummaryGenerator()
         output_filename = f"安卓设备消耗误差汇总_{start_date_str}_to_{end_date_str}.xlsx"
         output_filepath = os.path.join(output_dir, output_filename)
 
-        summary_generator.generate_report(
-            summary_data=summary_data,
-            output_file_path=output_filepath,
-            start_date=start_date_str,
-            end_date=end_date_str
-        )
+        try:
+            summary_generator.generate_report(
+                summary_data=summary_data,
+                output_file_path=output_filepath,
+                start_date=start_date_str,
+                end_date=end_date_str,
+                export_format=report_options.get('export_format'),
+                summary_values=report_options.get('summary_values'),
+                barrel_counts=barrel_counts
+            )
+        finally:
+            if stream_error_summary:
+                # 写入失败时数据流可能未读完，丢弃剩余结果并释放游标
+                summary_stream.close()
 
     except mysql.connector.Error as db_err:
         print(f"数据库查询执行失败: {db_err}")
@@ -383,7 +741,39 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
         failed_devices = []
         
         # 创建数据管理器
-        data_manager = ReportDataManager(db_handler)
+        # 配置了每日状态存储时启用增量计算，只计算上次持久化之后的新日期
+        report_options = query_config.get('report_options', {})
+        state_store = None
+        if report_options.get('daily_state_store'):
+            state_store = DailyStateStore(report_options['daily_state_store'])
+            print(f"已启用每日状态存储: {report_options['daily_state_store']}")
+        aggregate_cache = _open_aggregate_cache(report_options)
+        data_manager = ReportDataManager(
+            db_handler, state_store=state_store, volume_unit=report_options.get('volume_unit'),
+            aggregate_cache=aggregate_cache
+        )
+        # 配置fleet_compute时设备循环只读取数据，误差在循环结束后对全部设备一次性计算
+        fleet_compute = _use_fleet_compute(report_options, state_store, aggregate_cache)
+        fleet_raw_data = []
+        fleet_reports = []
+        
+        # 配置chart_point_budget时图表引用降采样后的隐藏数据区域
+        chart_options = _chart_options(report_options, 'daily_error')
+
+        # 报表生成阶段的执行器，配置max_workers时在进程池中并行生成，配置workbook_mode时写入合并工作簿
+        executor = _open_report_executor(report_options, output_dir, "每日消耗误差报表")
+        
+        def on_report_done(device_code, output_filepath, error, error_traceback):
+            if error is None:
+                success_msg = f"  成功生成每日消耗误差报表: {output_filepath}"
+                print(success_msg)
+                log_messages.append(success_msg)
+            else:
+                error_msg = f"  处理设备 {device_code} 时发生错误: {error}"
+                print(error_msg)
+                print(f"详细错误信息:\n{error_traceback}")
+                log_messages.append(error_msg)
+                failed_devices.append(device_code)
         
         # 将 parse_date 函数移到循环外部，避免重复定义和作用域问题
         def parse_date(date_string):
@@ -436,38 +826,56 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
                     end_condition=end_condition
                 )
                 
-                # 通过数据管理器一次性获取设备原始数据（仅一次数据库查询）
-                raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
-                
-                # 从原始数据中提取库存表所需数据
-                inventory_data = data_manager.extract_inventory_data(raw_data)
-                
-                # 计算误差数据
                 barrel_count = int(device.get('barrel_count') or 1)
-                error_data = data_manager.calculate_daily_errors(raw_data, barrel_count)
-                
-                if not inventory_data:
-                    print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                    log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                
-                # 保存设备数据供后续使用
-                # 检查是否存在油品名称列
-                if not raw_data[2] or '油品名称' not in raw_data[1]:
-                    error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
-                    print(error_msg)
-                    log_messages.append(error_msg)
-                    failed_devices.append(device_code)
-                    continue
-                
-                # 获取第一条记录的油品名称作为该设备的油品名称
-                # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
-                first_row = raw_data[2][0]
-                if isinstance(first_row, dict):
-                    oil_name = first_row.get('油品名称')
+                if state_store is not None:
+                    # 增量计算：已持久化的日期直接读取，只计算新日期
+                    error_data, inventory_data, oil_name = data_manager.calculate_daily_errors_incremental(
+                        device_id, inventory_query_template, start_date, end_date, barrel_count
+                    )
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                elif fleet_compute:
+                    # 批量计算：这里只读取原始数据，误差在设备循环结束后一次性计算
+                    raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
+                    inventory_data = data_manager.extract_inventory_data(raw_data)
+                    has_oil_name_column, oil_name = data_manager.extract_oil_name(raw_data)
+                    error_data = None
+                    
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                    
+                    if not has_oil_name_column:
+                        error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
+                        print(error_msg)
+                        log_messages.append(error_msg)
+                        failed_devices.append(device_code)
+                        continue
                 else:
-                    # 如果是元组或列表形式，根据列名索引获取油品名称
-                    oil_name_index = raw_data[1].index('油品名称')
-                    oil_name = first_row[oil_name_index] if oil_name_index < len(first_row) else None
+                    # 通过数据管理器获取设备聚合结果（仅一次数据库查询；配置聚合缓存且源数据未变化时直接读取缓存）
+                    aggregates = data_manager.fetch_device_aggregates(
+                        device_id, inventory_query_template, start_date, end_date, ('inventory_data', 'daily_states')
+                    )
+                    inventory_data = aggregates['inventory_data']
+                    
+                    # 计算误差数据，桶数在单桶状态上换算，不影响缓存
+                    error_data = data_manager.calculate_daily_errors(None, barrel_count, daily_states=aggregates['daily_states'])
+                    
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                    
+                    # 检查是否存在油品名称列
+                    if not aggregates['has_oil_name_column']:
+                        error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
+                        print(error_msg)
+                        log_messages.append(error_msg)
+                        failed_devices.append(device_code)
+                        continue
+                    
+                    # 获取第一条记录的油品名称作为该设备的油品名称
+                    oil_name = aggregates['oil_name']
                 
                 # 检查油品名称是否有效
                 if not oil_name:
@@ -478,7 +886,6 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
                     continue
                 
                 # 生成Excel文件
-                error_handler = DailyConsumptionErrorReportGenerator()
                 # 替换日期中的非法字符，确保文件名合法
                 safe_start_date = start_date.replace("/", "-").replace("\\", "-")
                 safe_end_date = end_date.replace("/", "-").replace("\\", "-")
@@ -486,19 +893,25 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
                 output_filepath = os.path.join(output_dir, output_filename)
                 
                 # 使用重构后的generate_report方法
-                error_handler.generate_report(
-                    inventory_data=inventory_data,
-                    error_data=error_data,
-                    output_file_path=output_filepath,
-                    device_code=device_code,
-                    start_date=parsed_start_date,
-                    end_date=parsed_end_date,
-                    oil_name=oil_name,
-                    barrel_count=barrel_count
-                )
-                success_msg = f"  成功生成每日消耗误差报表: {output_filepath}"
-                print(success_msg)
-                log_messages.append(success_msg)
+                report_kwargs = {
+                    'inventory_data': inventory_data,
+                    'error_data': error_data,
+                    'output_file_path': output_filepath,
+                    'device_code': device_code,
+                    'customer_name': customer_name,
+                    'start_date': parsed_start_date,
+                    'end_date': parsed_end_date,
+                    'oil_name': oil_name,
+                    'barrel_count': barrel_count,
+                    'writer_backend': report_options.get('xlsx_writer'),
+                    'export_format': report_options.get('export_format'),
+                    **chart_options
+                }
+                if fleet_compute:
+                    fleet_raw_data.append(raw_data)
+                    fleet_reports.append((device_code, barrel_count, report_kwargs))
+                else:
+                    executor.submit(device_code, _render_report, ('daily_error', report_kwargs), on_report_done)
 
             except Exception as e:
                 error_msg = f"  处理设备 {device_code} 时发生错误: {e}"
@@ -508,6 +921,11 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
                 failed_devices.append(device_code)
                 continue
         
+        _submit_fleet_reports(data_manager, executor, 'daily_error', fleet_raw_data, fleet_reports, on_report_done)
+
+        # 等待并行生成的报表全部完成
+        executor.shutdown()
+        
         # 记录程序结束时间
         end_time = datetime.datetime.now()
         duration = end_time - start_time
@@ -548,13 +966,12 @@ def generate_daily_consumption_error_reports(log_prefix="每日消耗误差处
         
         # 生成日志文件
         log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_messages))
-            print(f"\n日志文件已保存到: {log_file}")
-        except Exception as e:
-            print(f"保存日志文件失败: {e}")
-            print(f"详细错误信息:\n{traceback.format_exc()}")
+        _write_run_log(log_file, log_messages, executor)
+        
+        if state_store is not None:
+            state_store.close()
+        if aggregate_cache is not None:
+            aggregate_cache.close()
         
         print("\n每日消耗误差报表生成功能执行完毕！")
         try:
@@ -750,8 +1167,36 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
         # 用于存储处理失败的设备
         failed_devices = []
         
-        # 创建数据管理器
-        data_manager = ReportDataManager(db_handler)
+        # 创建数据管理器，配置每日状态存储时每月结果由持久化的每日状态汇总
+        report_options = query_config.get('report_options', {})
+        state_store = None
+        if report_options.get('daily_state_store'):
+            state_store = DailyStateStore(report_options['daily_state_store'])
+            print(f"已启用每日状态存储: {report_options['daily_state_store']}")
+        aggregate_cache = _open_aggregate_cache(report_options)
+        data_manager = ReportDataManager(
+            db_handler, state_store=state_store, volume_unit=report_options.get('volume_unit'),
+            aggregate_cache=aggregate_cache
+        )
+        # 配置fleet_compute时设备循环只读取数据，误差在循环结束后对全部设备一次性计算
+        fleet_compute = _use_fleet_compute(report_options, state_store, aggregate_cache)
+        fleet_raw_data = []
+        fleet_reports = []
+        
+        # 报表生成阶段的执行器，配置max_workers时在进程池中并行生成，配置workbook_mode时写入合并工作簿
+        executor = _open_report_executor(report_options, output_dir, "每月消耗误差报表")
+        
+        def on_report_done(device_code, output_filepath, error, error_traceback):
+            if error is None:
+                success_msg = f"  成功生成每月消耗误差报表: {output_filepath}"
+                print(success_msg)
+                log_messages.append(success_msg)
+            else:
+                error_msg = f"  生成每月消耗误差报表失败: {error}"
+                print(error_msg)
+                print(f"详细错误信息:\n{error_traceback}")
+                log_messages.append(error_msg)
+                failed_devices.append(device_code)
         
         # 处理每个设备
         for i, device in enumerate(valid_devices, 1):
@@ -787,38 +1232,58 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
                     end_condition=end_condition
                 )
                 
-                # 通过数据管理器一次性获取设备原始数据（仅一次数据库查询）
-                raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
-                
-                # 从原始数据中提取库存表所需数据
-                inventory_data = data_manager.extract_inventory_data(raw_data)
-                
-                # 计算误差数据
                 barrel_count = int(device.get('barrel_count') or 1)
-                error_data = data_manager.calculate_monthly_errors(raw_data, start_date, end_date, barrel_count)
-                
-                if not inventory_data:
-                    print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                    log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                
-                # 保存设备数据供后续使用
-                # 检查是否存在油品名称列
-                if not raw_data[2] or '油品名称' not in raw_data[1]:
-                    error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
-                    print(error_msg)
-                    log_messages.append(error_msg)
-                    failed_devices.append(device_code)
-                    continue
-                
-                # 获取第一条记录的油品名称作为该设备的油品名称
-                # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
-                first_row = raw_data[2][0]
-                if isinstance(first_row, dict):
-                    oil_name = first_row.get('油品名称')
+                if state_store is not None:
+                    # 由持久化的每日状态按月汇总，只计算尚未持久化的日期
+                    error_data, inventory_data, oil_name = data_manager.calculate_monthly_errors_incremental(
+                        device_id, inventory_query_template, start_date, end_date, barrel_count
+                    )
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                elif fleet_compute:
+                    # 批量计算：这里只读取原始数据，误差在设备循环结束后一次性计算
+                    raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
+                    inventory_data = data_manager.extract_inventory_data(raw_data)
+                    has_oil_name_column, oil_name = data_manager.extract_oil_name(raw_data)
+                    error_data = None
+                    
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                    
+                    if not has_oil_name_column:
+                        error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
+                        print(error_msg)
+                        log_messages.append(error_msg)
+                        failed_devices.append(device_code)
+                        continue
                 else:
-                    # 如果是元组或列表形式，根据列名索引获取油品名称
-                    oil_name_index = raw_data[1].index('油品名称')
-                    oil_name = first_row[oil_name_index] if oil_name_index < len(first_row) else None
+                    # 通过数据管理器获取设备聚合结果（仅一次数据库查询；配置聚合缓存且源数据未变化时直接读取缓存）
+                    aggregates = data_manager.fetch_device_aggregates(
+                        device_id, inventory_query_template, start_date, end_date, ('inventory_data', 'daily_states')
+                    )
+                    inventory_data = aggregates['inventory_data']
+                    
+                    # 计算误差数据：每月结果由每日状态汇总，桶数在单桶状态上换算，不影响缓存
+                    error_data = data_manager.calculate_monthly_errors(
+                        None, start_date, end_date, barrel_count, daily_states=aggregates['daily_states']
+                    )
+                    
+                    if not inventory_data:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                    
+                    # 检查是否存在油品名称列
+                    if not aggregates['has_oil_name_column']:
+                        error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
+                        print(error_msg)
+                        log_messages.append(error_msg)
+                        failed_devices.append(device_code)
+                        continue
+                    
+                    # 获取第一条记录的油品名称作为该设备的油品名称
+                    oil_name = aggregates['oil_name']
                 
                 # 检查油品名称是否有效
                 if not oil_name:
@@ -829,7 +1294,6 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
                     continue
                 
                 # 生成Excel文件
-                error_handler = MonthlyConsumptionErrorReportGenerator()
                 # 替换日期中的非法字符，确保文件名合法
                 safe_start_date = start_date.replace("/", "-").replace("\\", "-")
                 safe_end_date = end_date.replace("/", "-").replace("\\", "-")
@@ -851,19 +1315,24 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
                         raise ValueError(f"无法解析日期格式: {date_string}")
                     
                     # 使用重构后的generate_report方法
-                    error_handler.generate_report(
-                        inventory_data=inventory_data,
-                        error_data=error_data,
-                        output_file_path=output_filepath,
-                        device_code=device_code,
-                        start_date=parse_date(start_date),
-                        end_date=parse_date(end_date),
-                        oil_name=oil_name,
-                        barrel_count=barrel_count
-                    )
-                    success_msg = f"  成功生成每月消耗误差报表: {output_filepath}"
-                    print(success_msg)
-                    log_messages.append(success_msg)
+                    report_kwargs = {
+                        'inventory_data': inventory_data,
+                        'error_data': error_data,
+                        'output_file_path': output_filepath,
+                        'device_code': device_code,
+                        'customer_name': customer_name,
+                        'start_date': parse_date(start_date),
+                        'end_date': parse_date(end_date),
+                        'oil_name': oil_name,
+                        'barrel_count': barrel_count,
+                        'writer_backend': report_options.get('xlsx_writer'),
+                        'export_format': report_options.get('export_format')
+                    }
+                    if fleet_compute:
+                        fleet_raw_data.append(raw_data)
+                        fleet_reports.append((device_code, barrel_count, report_kwargs))
+                    else:
+                        executor.submit(device_code, _render_report, ('monthly_error', report_kwargs), on_report_done)
                 except Exception as e:
                     error_msg = f"  生成每月消耗误差报表失败: {e}"
                     print(error_msg)
@@ -880,6 +1349,11 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
                 failed_devices.append(device_code)
                 continue
         
+        _submit_fleet_reports(data_manager, executor, 'monthly_error', fleet_raw_data, fleet_reports, on_report_done)
+
+        # 等待并行生成的报表全部完成
+        executor.shutdown()
+        
         # 记录程序结束时间
         end_time = datetime.datetime.now()
         duration = end_time - start_time
@@ -920,13 +1394,12 @@ def generate_monthly_consumption_error_reports(log_prefix="每月消耗误差处
         
         # 生成日志文件
         log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_messages))
-            print(f"\n日志文件已保存到: {log_file}")
-        except Exception as e:
-            print(f"保存日志文件失败: {e}")
-            print(f"详细错误信息:\n{traceback.format_exc()}")
+        _write_run_log(log_file, log_messages, executor)
+        
+        if state_store is not None:
+            state_store.close()
+        if aggregate_cache is not None:
+            aggregate_cache.close()
         
         print("\n每月消耗误差报表生成功能执行完毕！")
         try:
@@ -1100,8 +1573,27 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
         # 用于存储处理失败的设备
         failed_devices = []
         
-        # 创建数据管理器
-        data_manager = ReportDataManager(db_handler)
+        # 创建数据管理器，配置aggregate_cache时源数据未变化的设备直接读取缓存的库存数据
+        aggregate_cache = _open_aggregate_cache(query_config.get('report_options', {}))
+        data_manager = ReportDataManager(db_handler, aggregate_cache=aggregate_cache)
+        
+        # 配置chart_point_budget时图表引用降采样后的隐藏数据区域
+        chart_options = _chart_options(query_config.get('report_options', {}), 'inventory')
+
+        # 报表生成阶段的执行器，配置max_workers时在进程池中并行生成，配置workbook_mode时写入合并工作簿
+        executor = _open_report_executor(query_config.get('report_options', {}), output_dir, "库存报表")
+        
+        def on_report_done(device_code, output_filepath, error, error_traceback):
+            if error is None:
+                success_msg = f"  成功生成库存报表: {output_filepath}"
+                print(success_msg)
+                log_messages.append(success_msg)
+            else:
+                error_msg = f"  生成库存报表失败: {error}"
+                print(error_msg)
+                print(f"详细错误信息:\n{error_traceback}")
+                log_messages.append(error_msg)
+                failed_devices.append(device_code)
         
         # 处理每个设备
         for i, device in enumerate(valid_devices, 1):
@@ -1140,19 +1632,18 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
                     end_condition=end_condition
                 )
                 
-                # 通过数据管理器一次性获取设备原始数据
-                raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
-                
-                # 从原始数据中提取库存表所需数据
-                data = data_manager.extract_inventory_data(raw_data)
+                # 通过数据管理器获取库存数据（仅一次数据库查询；配置聚合缓存且源数据未变化时直接读取缓存）
+                aggregates = data_manager.fetch_device_aggregates(
+                    device_id, inventory_query_template, start_date, end_date, ('inventory_data',)
+                )
+                data = aggregates['inventory_data']
                 
                 if not data:
                     print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
                     log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
                 
-                # 保存设备数据供后续使用
                 # 检查是否存在油品名称列
-                if not raw_data[2] or '油品名称' not in raw_data[1]:
+                if not aggregates['has_oil_name_column']:
                     error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
                     print(error_msg)
                     log_messages.append(error_msg)
@@ -1161,13 +1652,7 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
                 
                 # 获取第一条记录的油品名称作为该设备的油品名称
                 # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
-                first_row = raw_data[2][0]
-                if isinstance(first_row, dict):
-                    oil_name = first_row.get('油品名称')
-                else:
-                    # 如果是元组或列表形式，根据列名索引获取油品名称
-                    oil_name_index = raw_data[1].index('油品名称')
-                    oil_name = first_row[oil_name_index] if oil_name_index < len(first_row) else None
+                oil_name = aggregates['oil_name']
                 
                 # 检查油品名称是否有效
                 if not oil_name:
@@ -1177,18 +1662,7 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
                     failed_devices.append(device_code)
                     continue
                 
-                device_data = {
-                    'device_code': device_code,
-                    'oil_name': oil_name,  # 从数据库查询结果中获取油品名称
-                    'data': data,
-                    'raw_data': raw_data[2],
-                    'columns': raw_data[1],
-                    'customer_name': customer_name,
-                    'customer_id': customer_id  # 添加客户ID用于高性能分组
-                }
-                
                 # 生成Excel文件
-                inventory_handler = InventoryReportGenerator()
                 # 替换日期中的非法字符，确保文件名合法
                 safe_start_date = start_date.replace("/", "-").replace("\\", "-")
                 safe_end_date = end_date.replace("/", "-").replace("\\", "-")
@@ -1210,17 +1684,18 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
                         raise ValueError(f"无法解析日期格式: {date_string}")
                     
                     # 使用重构后的generate_report方法
-                    inventory_handler.generate_report(
-                        inventory_data=data,
-                        output_file_path=output_filepath,
-                        device_code=device_code,
-                        start_date=parse_date(start_date),
-                        end_date=parse_date(end_date),
-                        oil_name=oil_name
-                    )
-                    success_msg = f"  成功生成库存报表: {output_filepath}"
-                    print(success_msg)
-                    log_messages.append(success_msg)
+                    executor.submit(device_code, _render_report, ('inventory', {
+                        'inventory_data': data,
+                        'output_file_path': output_filepath,
+                        'device_code': device_code,
+                        'customer_name': customer_name,
+                        'start_date': parse_date(start_date),
+                        'end_date': parse_date(end_date),
+                        'oil_name': oil_name,
+                        'writer_backend': query_config.get('report_options', {}).get('xlsx_writer'),
+                        'export_format': query_config.get('report_options', {}).get('export_format'),
+                        **chart_options
+                    }), on_report_done)
                 except Exception as e:
                     error_msg = f"  生成库存报表失败: {e}"
                     print(error_msg)
@@ -1237,6 +1712,9 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
                 failed_devices.append(device_code)
                 continue
         
+        # 等待并行生成的报表全部完成
+        executor.shutdown()
+        
         # 记录程序结束时间
         end_time = datetime.datetime.now()
         duration = end_time - start_time
@@ -1277,13 +1755,10 @@ def generate_inventory_reports(log_prefix="库存表处理日志", query_config=
         
         # 生成日志文件
         log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_messages))
-            print(f"\n日志文件已保存到: {log_file}")
-        except Exception as e:
-            print(f"保存日志文件失败: {e}")
-            print(f"详细错误信息:\n{traceback.format_exc()}")
+        _write_run_log(log_file, log_messages, executor)
+        
+        if aggregate_cache is not None:
+            aggregate_cache.close()
         
         print("\n库存报表生成功能执行完毕！")
         try:
@@ -1449,20 +1924,40 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
         print("步骤2：生成客户对账单")
         print("-" * 50)
         
-        # 用于存储所有设备数据，供生成对账单使用
+        # 已处理设备的客户信息，用于失败列表按客户分组
         all_devices_data = []
         failed_devices = []
+        # 每个已提交对账单的客户对应的设备编码，对账单生成失败时计入失败列表
+        statement_devices = {}
         
         # 创建数据管理器
-        data_manager = ReportDataManager(db_handler)
+        report_options = query_config.get('report_options', {})
+        aggregate_cache = _open_aggregate_cache(report_options)
+        data_manager = ReportDataManager(
+            db_handler, volume_unit=report_options.get('volume_unit'), aggregate_cache=aggregate_cache
+        )
         
-        # 处理每个设备
+        # 报表生成阶段的执行器，配置max_workers时在进程池中并行生成，配置background_save时后台保存
+        executor = _open_task_executor(report_options, output_dir, "客户对账单")
+        
+        def on_statement_done(customer_id, output_filepath, error, error_traceback):
+            if error is None:
+                success_msg = f"成功生成客户对账单: {output_filepath}"
+                print(success_msg)
+                log_messages.append(success_msg)
+            else:
+                error_msg = f"生成客户对账单失败: {error}"
+                print(error_msg)
+                print(f"详细错误信息:\n{error_traceback}")
+                log_messages.append(error_msg)
+                failed_devices.extend(statement_devices.get(customer_id, []))
+        
+        # 先解析每个设备所属的客户（只查询设备和客户信息，不读取订单数据）
+        device_refs = []
         for i, device in enumerate(valid_devices, 1):
             device_code = device['device_code']
-            start_date = device['start_date']
-            end_date = device['end_date']
             
-            print(f"\n处理第 {i} 个设备 ({device_code})...")
+            print(f"\n解析第 {i} 个设备 ({device_code}) 的客户信息...")
             log_messages.append(f"处理设备 {device_code}...")
             
             try:
@@ -1482,69 +1977,14 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
                 customer_name = db_handler.get_customer_name_by_device_code(device_code)
                 print(f"  客户名称: {customer_name}")
                 
-                # 生成查询语句
-                end_condition = f"{end_date} 23:59:59"
-                query = inventory_query_template.format(
-                    device_id=device_id,
-                    start_date=start_date,
-                    end_condition=end_condition
-                )
-                
-                # 通过数据管理器一次性获取设备原始数据
-                raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
-                
-                # 从原始数据中计算对账单所需的各种数据
-                data = data_manager.extract_inventory_data(raw_data)
-                daily_usage_data = data_manager.calculate_daily_usage(raw_data)
-                monthly_usage_data = data_manager.calculate_monthly_usage(raw_data, start_date, end_date)
-                
-                if not data:
-                    print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                    log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                
-                # 保存设备数据供后续使用
-                # 检查是否存在油品名称列
-                if not raw_data[2] or '油品名称' not in raw_data[1]:
-                    error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
-                    print(error_msg)
-                    log_messages.append(error_msg)
-                    failed_devices.append(device_code)
-                    continue
-                
-                # 获取第一条记录的油品名称作为该设备的油品名称
-                # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
-                first_row = raw_data[2][0]
-                if isinstance(first_row, dict):
-                    oil_name = first_row.get('油品名称')
-                else:
-                    # 如果是元组或列表形式，根据列名索引获取油品名称
-                    oil_name_index = raw_data[1].index('油品名称')
-                    oil_name = first_row[oil_name_index] if oil_name_index < len(first_row) else None
-                
-                # 检查油品名称是否有效
-                if not oil_name:
-                    error_msg = f"  错误：设备 {device_code} 的数据中油品名称为空，请检查数据库数据完整性"
-                    print(error_msg)
-                    log_messages.append(error_msg)
-                    failed_devices.append(device_code)
-                    continue
-                
-                # 保存设备数据供后续使用
-                device_data = {
+                device_refs.append({
                     'device_code': device_code,
-                    'oil_name': oil_name,
-                    'data': data,
-                    'daily_usage_data': daily_usage_data,
-                    'monthly_usage_data': monthly_usage_data,
-                    'raw_data': raw_data[2],
-                    'columns': raw_data[1],
-                    'customer_name': customer_name,
+                    'device_id': device_id,
                     'customer_id': customer_id,
-                    'start_date': start_date,  # 添加开始日期
-                    'end_date': end_date       # 添加结束日期
-                }
-                all_devices_data.append(device_data)
-                
+                    'customer_name': customer_name,
+                    'start_date': device['start_date'],
+                    'end_date': device['end_date']
+                })
             except Exception as e:
                 error_msg = f"  处理设备 {device_code} 时发生错误: {e}"
                 print(error_msg)
@@ -1553,45 +1993,96 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
                 failed_devices.append(device_code)
                 continue
         
-        # 检查是否有有效设备数据
-        if not all_devices_data:
-            error_msg = "没有有效的设备数据可用于生成对账单。"
-            print(error_msg)
-            log_messages.append(error_msg)
-            log_messages.append("")
-            
-            # 生成日志文件
-            log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
-            try:
-                with open(log_file, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(log_messages))
-                print(f"\n日志文件已保存到: {log_file}")
-            except Exception as e:
-                print(f"保存日志文件失败: {e}")
-                print(f"详细错误信息:\n{traceback.format_exc()}")
-            
-            try:
-                if connection and connection.is_connected():
-                    connection.close()
-                    print("数据库连接已关闭")
-            except Exception as e:
-                print(f"关闭数据库连接时发生错误: {e}")
-            
-            return
-        
-        # 生成客户对账单
+        # 按客户逐个处理：读取并计算一个客户的所有设备，提交对账单后立即释放该客户的数据，
+        # 峰值内存只与设备最多的客户相关，而不是整个CSV
         try:
             print("\n" + "-" * 50)
-            print("步骤3：生成客户对账单文件")
+            print("步骤3：按客户生成客户对账单文件")
             print("-" * 50)
 
-            # 按客户分组设备数据
-            customers_data = CustomerGroupingUtil.group_devices_by_customer(all_devices_data)
+            # 按客户分组设备
+            customers_data = CustomerGroupingUtil.group_devices_by_customer(device_refs)
 
-            # 为每个客户生成对账单
             for customer_id, customer_info in customers_data.items():
                 customer_name = customer_info['customer_name']
-                customer_devices = customer_info['devices']
+                customer_devices = []
+
+                for device_ref in customer_info['devices']:
+                    device_code = device_ref['device_code']
+                    start_date = device_ref['start_date']
+                    end_date = device_ref['end_date']
+                    
+                    print(f"\n处理设备 ({device_code})...")
+                    
+                    try:
+                        # 通过数据管理器获取设备聚合结果（仅一次数据库查询；配置聚合缓存且源数据未变化时直接读取缓存）
+                        aggregates = data_manager.fetch_device_aggregates(
+                            device_ref['device_id'], inventory_query_template, start_date, end_date,
+                            ('inventory_data', 'daily_usage')
+                        )
+                        
+                        # 对账单所需的各种数据
+                        data = aggregates['inventory_data']
+                        daily_usage_data = aggregates['daily_usage']
+                        # 每月用量由每日用量汇总，不再重新扫描原始数据
+                        monthly_usage_data = data_manager.calculate_monthly_usage(
+                            None, start_date, end_date, daily_usage=daily_usage_data
+                        )
+                        
+                        if not data:
+                            print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                            log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        
+                        # 检查是否存在油品名称列
+                        if not aggregates['has_oil_name_column']:
+                            error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
+                            print(error_msg)
+                            log_messages.append(error_msg)
+                            failed_devices.append(device_code)
+                            continue
+                        
+                        # 获取第一条记录的油品名称作为该设备的油品名称
+                        oil_name = aggregates['oil_name']
+                        
+                        # 检查油品名称是否有效
+                        if not oil_name:
+                            error_msg = f"  错误：设备 {device_code} 的数据中油品名称为空，请检查数据库数据完整性"
+                            print(error_msg)
+                            log_messages.append(error_msg)
+                            failed_devices.append(device_code)
+                            continue
+                        
+                        # 保存设备数据供生成该客户的对账单使用
+                        customer_devices.append({
+                            'device_code': device_code,
+                            'oil_name': oil_name,
+                            'data': data,
+                            'daily_usage_data': daily_usage_data,
+                            'monthly_usage_data': monthly_usage_data,
+                            'customer_name': customer_name,
+                            'customer_id': customer_id,
+                            'start_date': start_date,  # 添加开始日期
+                            'end_date': end_date       # 添加结束日期
+                        })
+                        all_devices_data.append({
+                            'device_code': device_code,
+                            'customer_name': customer_name,
+                            'customer_id': customer_id
+                        })
+                        
+                    except Exception as e:
+                        error_msg = f"  处理设备 {device_code} 时发生错误: {e}"
+                        print(error_msg)
+                        print(f"详细错误信息:\n{traceback.format_exc()}")
+                        log_messages.append(error_msg)
+                        failed_devices.append(device_code)
+                        continue
+
+                # 该客户的原始数据已不再需要，立即释放
+                data_manager.release_raw_data()
+
+                if not customer_devices:
+                    continue
 
                 print(f"\n为客户 {customer_name} (ID: {customer_id}) 生成对账单...")
                 log_messages.append(f"为客户 {customer_name} (ID: {customer_id}) 生成对账单...")
@@ -1630,20 +2121,24 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
                     raise ValueError(f"无法解析日期格式: {date_string}")
 
                 # 生成对账单，使用重构后的generate_report方法
-                statement_handler = CustomerStatementGenerator()
-                statement_handler.generate_report(
-                    statement_data=customer_devices,
-                    output_file_path=output_filepath,
-                    template_path=None,  # 从现有代码看，这个参数似乎未被使用
-                    customer_name=customer_name,
-                    start_date=parse_date(start_date),
-                    end_date=parse_date(end_date),
-                    device_data=customer_devices
-                )
+                # 分发到工作进程时只携带对账单所需的数据，不包含原始行数据
+                compact_devices = [compact_device_payload(device) for device in customer_devices]
+                statement_devices[customer_id] = [device['device_code'] for device in customer_devices]
+                executor.submit(customer_id, _render_report, ('statement', {
+                    'statement_data': compact_devices,
+                    'output_file_path': output_filepath,
+                    'template_path': None,  # 从现有代码看，这个参数似乎未被使用
+                    'customer_name': customer_name,
+                    'start_date': parse_date(start_date),
+                    'end_date': parse_date(end_date),
+                    'device_data': compact_devices,
+                    'template_cache_dir': report_options.get('template_cache'),
+                    'export_format': report_options.get('export_format')
+                }), on_statement_done)
+                del customer_devices, compact_devices
 
-                success_msg = f"成功生成客户对账单: {output_filepath}"
-                print(success_msg)
-                log_messages.append(success_msg)
+            # 等待并行生成的对账单全部完成
+            executor.shutdown()
 
         except ValueError as e:
             error_msg = f"生成客户对账单失败: {e}"
@@ -1657,6 +2152,29 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
             log_messages.append(error_msg)
             failed_devices.extend([d['device_code'] for d in all_devices_data])
         
+        # 检查是否有有效设备数据
+        if not all_devices_data:
+            error_msg = "没有有效的设备数据可用于生成对账单。"
+            print(error_msg)
+            log_messages.append(error_msg)
+            log_messages.append("")
+            
+            # 生成日志文件
+            log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
+            _write_run_log(log_file, log_messages, executor)
+            
+            if aggregate_cache is not None:
+                aggregate_cache.close()
+            
+            try:
+                if connection and connection.is_connected():
+                    connection.close()
+                    print("数据库连接已关闭")
+            except Exception as e:
+                print(f"关闭数据库连接时发生错误: {e}")
+            
+            return
+        
         # 记录程序结束时间
         end_time = datetime.datetime.now()
         duration = end_time - start_time
@@ -1672,7 +2190,7 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
             # 按客户分组显示失败设备
             # 创建一个映射：设备代码 -> 客户信息
             device_to_customer = {}
-            for device_data in all_devices_data:
+            for device_data in device_refs:
                 device_code = device_data['device_code']
                 if device_code in failed_devices:
                     device_to_customer[device_code] = {
@@ -1700,13 +2218,10 @@ def generate_customer_statement(log_prefix="对账单处理日志", devices_data
         
         # 生成日志文件
         log_file = os.path.join(output_dir, f"{log_prefix}_{start_time.strftime('%Y%m%d_%H%M%S')}.txt")
-        try:
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(log_messages))
-            print(f"\n日志文件已保存到: {log_file}")
-        except Exception as e:
-            print(f"保存日志文件失败: {e}")
-            print(f"详细错误信息:\n{traceback.format_exc()}")
+        _write_run_log(log_file, log_messages, executor)
+        
+        if aggregate_cache is not None:
+            aggregate_cache.close()
         
         print("\n客户对账单生成功能执行完毕！")
         try:
@@ -1884,6 +2399,27 @@ def generate_refueling_details(log_prefix="加注明细处理日志", devices_da
         # 创建数据管理器
         data_manager = ReportDataManager(db_handler)
         
+        # 报表生成阶段的执行器，配置max_workers时在进程池中并行生成
+        report_options = query_config.get('report_options', {})
+        executor = ReportTaskExecutor(report_options.get('max_workers'))
+        # 流式导出：直接从数据库分批游标写入只写模式的工作簿，内存占用与订单行数无关
+        stream_refueling_details = report_options.get('stream_refueling_details', False)
+        # 单个工作表/文件的行数预算，超出时拆分为编号的工作表或文件；导出格式
+        # 预算在处理设备前检查，无效配置直接报错，而不是每台设备读取完数据后才失败
+        refueling_options = _refueling_options(report_options)
+        
+        def on_report_done(device_code, output_filepath, error, error_traceback):
+            if error is None:
+                success_msg = f"  成功生成加注明细报表: {output_filepath}"
+                print(success_msg)
+                log_messages.append(success_msg)
+            else:
+                error_msg = f"  生成加注明细报表失败: {error}"
+                print(error_msg)
+                print(f"详细错误信息:\n{error_traceback}")
+                log_messages.append(error_msg)
+                failed_devices.append(device_code)
+        
         # 处理每个设备
         for i, device in enumerate(valid_devices, 1):
             device_code = device['device_code']
@@ -1918,15 +2454,19 @@ def generate_refueling_details(log_prefix="加注明细处理日志", devices_da
                     end_condition=end_condition
                 )
                 
-                # 获取加注明细数据
-                raw_data = data_manager.fetch_raw_data(device_id, refueling_query_template, start_date, end_date)
-                data = raw_data[0]  # 实际数据
-                columns = raw_data[1]  # 列名
-                raw_rows = raw_data[2]  # 原始行数据
-                
-                if not data and not raw_rows:
-                    print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
-                    log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                if stream_refueling_details:
+                    # 流式导出时不读取整个结果集，行数据在写入报表时逐批读取
+                    data, columns, raw_rows = [], None, None
+                else:
+                    # 获取加注明细数据
+                    raw_data = data_manager.fetch_raw_data(device_id, refueling_query_template, start_date, end_date)
+                    data = raw_data[0]  # 实际数据
+                    columns = raw_data[1]  # 列名
+                    raw_rows = raw_data[2]  # 原始行数据
+                    
+                    if not data and not raw_rows:
+                        print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
+                        log_messages.append(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
                 
                 # 保存设备数据供后续使用
                 device_data = {
@@ -1940,7 +2480,6 @@ def generate_refueling_details(log_prefix="加注明细处理日志", devices_da
                 all_devices_data.append(device_data)
                 
                 # 生成Excel文件
-                refueling_handler = RefuelingDetailsReportGenerator()
                 # 替换日期中的非法字符，确保文件名合法
                 safe_start_date = start_date.replace("/", "-").replace("\\", "-")
                 safe_end_date = end_date.replace("/", "-").replace("\\", "-")
@@ -1961,19 +2500,42 @@ def generate_refueling_details(log_prefix="加注明细处理日志", devices_da
                         # 如果所有格式都失败，则抛出异常
                         raise ValueError(f"无法解析日期格式: {date_string}")
                     
+                    if stream_refueling_details:
+                        # 数据流占用数据库连接，必须在当前进程中消费完毕后才能处理下一台设备
+                        stream = db_handler.iter_generic_rows(
+                            device_id, refueling_query_template, start_date, end_date, keep_order=True
+                        )
+                        try:
+                            generated = RefuelingDetailsReportGenerator().generate_report(
+                                refueling_data=stream,
+                                output_file_path=output_filepath,
+                                device_code=device_code,
+                                start_date=parse_date(start_date),
+                                end_date=parse_date(end_date),
+                                customer_name=customer_name,
+                                columns=stream.columns,
+                                **refueling_options
+                            )
+                        finally:
+                            # 写入中途失败时丢弃未读取的行并释放游标，下一台设备的查询才能使用该连接
+                            stream.close()
+                        if generated:
+                            on_report_done(device_code, output_filepath, None, None)
+                        else:
+                            on_report_done(device_code, output_filepath, "加注明细报表写入失败", "")
+                        continue
+                    
                     # 使用重构后的generate_report方法
-                    refueling_handler.generate_report(
-                        refueling_data=raw_rows,  # 使用原始行数据，包含所有字段
-                        output_file_path=output_filepath,
-                        device_code=device_code,
-                        start_date=parse_date(start_date),
-                        end_date=parse_date(end_date),
-                        customer_name=customer_name,
-                        columns=columns
-                    )
-                    success_msg = f"  成功生成加注明细报表: {output_filepath}"
-                    print(success_msg)
-                    log_messages.append(success_msg)
+                    executor.submit(device_code, _render_report, ('refueling', {
+                        'refueling_data': raw_rows,  # 使用原始行数据，包含所有字段
+                        'output_file_path': output_filepath,
+                        'device_code': device_code,
+                        'start_date': parse_date(start_date),
+                        'end_date': parse_date(end_date),
+                        'customer_name': customer_name,
+                        'columns': columns,
+                        **refueling_options
+                    }), on_report_done)
                 except Exception as e:
                     error_msg = f"  生成加注明细报表失败: {e}"
                     print(error_msg)
@@ -1990,6 +2552,9 @@ def generate_refueling_details(log_prefix="加注明细处理日志", devices_da
                 failed_devices.append(device_code)
                 continue
         
+        # 等待并行生成的报表全部完成
+        executor.shutdown()
+        
         # 记录程序结束时间
         end_time = datetime.datetime.now()
         duration = end_time - start_time
@@ -2213,8 +2778,12 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
         # 用于存储处理失败的设备
         failed_devices = []
         
-        # 创建数据管理器
-        data_manager = ReportDataManager(db_handler)
+        # 创建数据管理器，配置aggregate_cache时源数据未变化的设备直接读取缓存的聚合结果
+        aggregate_cache = _open_aggregate_cache(query_config.get('report_options', {}))
+        data_manager = ReportDataManager(
+            db_handler, volume_unit=query_config.get('report_options', {}).get('volume_unit'),
+            aggregate_cache=aggregate_cache
+        )
         
         # 存储所有设备的处理后数据
         all_devices_processed_data = []
@@ -2256,13 +2825,18 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                     end_condition=end_condition
                 )
                 
-                # 通过数据管理器一次性获取设备原始数据（仅一次数据库查询）
-                raw_data = data_manager.fetch_raw_data(device_id, inventory_query_template, start_date, end_date)
+                # 通过数据管理器获取设备聚合结果（仅一次数据库查询；配置聚合缓存且源数据未变化时直接读取缓存）
+                aggregates = data_manager.fetch_device_aggregates(
+                    device_id, inventory_query_template, start_date, end_date, ('inventory_data', 'daily_usage')
+                )
                 
-                # 从原始数据中提取所有报表所需的数据
-                inventory_data = data_manager.extract_inventory_data(raw_data)
-                daily_usage_data = data_manager.calculate_daily_usage(raw_data)
-                monthly_usage_data = data_manager.calculate_monthly_usage(raw_data, start_date, end_date)
+                # 所有报表所需的数据
+                inventory_data = aggregates['inventory_data']
+                daily_usage_data = aggregates['daily_usage']
+                # 每月用量由每日用量汇总，不再重新扫描原始数据
+                monthly_usage_data = data_manager.calculate_monthly_usage(
+                    None, start_date, end_date, daily_usage=daily_usage_data
+                )
                 
                 if not inventory_data:
                     print(f"  警告：设备 {device_code} 在指定时间范围内没有数据")
@@ -2270,7 +2844,7 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                 
                 # 保存设备数据供后续使用
                 # 检查是否存在油品名称列
-                if not raw_data[2] or '油品名称' not in raw_data[1]:
+                if not aggregates['has_oil_name_column']:
                     error_msg = f"  错误：设备 {device_code} 的数据中未找到油品名称列，请检查数据库查询结果"
                     print(error_msg)
                     log_messages.append(error_msg)
@@ -2279,13 +2853,7 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                 
                 # 获取第一条记录的油品名称作为该设备的油品名称
                 # 注意：这里假设一个设备只使用一种油品，这是业务上的合理假设
-                first_row = raw_data[2][0]
-                if isinstance(first_row, dict):
-                    oil_name = first_row.get('油品名称')
-                else:
-                    # 如果是元组或列表形式，根据列名索引获取油品名称
-                    oil_name_index = raw_data[1].index('油品名称')
-                    oil_name = first_row[oil_name_index] if oil_name_index < len(first_row) else None
+                oil_name = aggregates['oil_name']
                 
                 # 检查油品名称是否有效
                 if not oil_name:
@@ -2302,8 +2870,6 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                     'inventory_data': inventory_data,
                     'daily_usage_data': daily_usage_data,
                     'monthly_usage_data': monthly_usage_data,
-                    'raw_data': raw_data[2],
-                    'columns': raw_data[1],
                     'customer_name': customer_name,
                     'customer_id': customer_id,
                     'start_date': start_date,
@@ -2340,7 +2906,10 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                         device_code=device_code,
                         start_date=parse_date(start_date),
                         end_date=parse_date(end_date),
-                        oil_name=oil_name  # 添加注品名称参数
+                        oil_name=oil_name,  # 添加注品名称参数
+                        writer_backend=query_config.get('report_options', {}).get('xlsx_writer'),
+                        export_format=query_config.get('report_options', {}).get('export_format'),
+                        **_chart_options(query_config.get('report_options', {}), 'inventory')
                     )
                     success_msg = f"  成功生成库存报表: {inventory_output_filepath}"
                     print(success_msg)
@@ -2378,6 +2947,9 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                 print(f"保存日志文件失败: {e}")
                 print(f"详细错误信息:\n{traceback.format_exc()}")
             
+            if aggregate_cache is not None:
+                aggregate_cache.close()
+            
             try:
                 if connection and connection.is_connected():
                     connection.close()
@@ -2446,7 +3018,9 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
                     customer_name=customer_name,
                     start_date=parse_date(start_date),
                     end_date=parse_date(end_date),
-                    device_data=customer_devices
+                    device_data=customer_devices,
+                    template_cache_dir=query_config.get('report_options', {}).get('template_cache'),
+                    export_format=query_config.get('report_options', {}).get('export_format')
                 )
 
                 success_msg = f"成功生成客户对账单: {statement_output_filepath}"
@@ -2516,6 +3090,9 @@ def generate_both_reports(log_prefix="综合处理日志", query_config=None):
             print(f"保存日志文件失败: {e}")
             print(f"详细错误信息:\n{traceback.format_exc()}")
         
+        if aggregate_cache is not None:
+            aggregate_cache.close()
+        
         print("\n综合报表生成功能执行完毕！")
         try:
             if connection and connection.is_connected():
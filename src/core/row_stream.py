@@ -0,0 +1,304 @@
+"""
+行数据流与增量聚合模块
+报表计算器可以直接消费按时间升序排列的行（或行批次）迭代器，边读取边更新聚合结果，
+内存占用只与聚合结果大小（天数 × 设备数）相关，而与原始行数无关。
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+# 定点体积单位：单位名称 -> 每升对应的整数单位数
+VOLUME_SCALES = {
+    'cl': 100,
+    'ml': 1000,
+}
+
+
+def volume_scale_for(unit):
+    """
+    返回定点体积单位对应的缩放倍数
+
+    Args:
+        unit (str or None): 'cl'（厘升）、'ml'（毫升），为None时不使用定点运算
+
+    Returns:
+        int or None: 每升对应的整数单位数
+    """
+    if unit is None:
+        return None
+    if unit not in VOLUME_SCALES:
+        raise ValueError(f"不支持的定点体积单位: {unit}，可选值: {', '.join(VOLUME_SCALES)}")
+    return VOLUME_SCALES[unit]
+
+
+def to_fixed_point(value, scale):
+    """
+    将体积值（升）一次性转换为整数定点值，之后的求和、求差都是精确的整数运算
+
+    Args:
+        value: Decimal（mysql.connector返回类型）、int、float、字符串或None
+        scale (int): 每升对应的整数单位数
+
+    Returns:
+        int: 定点值，四舍五入到最小单位
+    """
+    if not value:
+        return 0
+    if isinstance(value, int):
+        return value * scale
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int((value * scale).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_fixed_point(value, scale):
+    """
+    将定点值转换回升，只在输出结果时调用
+
+    Args:
+        value (int): 定点值
+        scale (int or None): 每升对应的整数单位数，为None时原样返回
+
+    Returns:
+        float: 以升为单位的体积
+    """
+    if scale is None:
+        return value
+    return value / scale
+
+
+def parse_order_time(order_time):
+    """
+    将加注时间统一转换为datetime对象
+
+    Args:
+        order_time: datetime对象或字符串格式的时间
+
+    Returns:
+        datetime.datetime or None: 无法解析时返回None
+    """
+    if isinstance(order_time, datetime.datetime):
+        return order_time
+    if isinstance(order_time, str):
+        for fmt in ["%Y/%m/%d %H:%M:%S", "%Y-%m-%d %H:%M:%S"]:
+            try:
+                return datetime.datetime.strptime(order_time, fmt)
+            except ValueError:
+                continue
+    return None
+
+
+class RowStream:
+    """
+    按时间升序排列的行数据流
+
+    可以包装任意行迭代器：数据库分批游标、本地存储读取器或生成器。
+    数据流只能被消费一次，需要同时计算多种聚合时使用consume()一次性分发给多个聚合器。
+    """
+
+    def __init__(self, columns, rows, batched=False, volume_scale=None, on_close=None):
+        """
+        初始化行数据流
+
+        Args:
+            columns (list): 列名列表
+            rows (iterable): 行迭代器；batched为True时为行批次迭代器
+            batched (bool): rows的每个元素是否为一批行
+            volume_scale (int, optional): 定点缩放倍数，设置时油加注值和原油剩余量转换为整数定点值
+            on_close (callable, optional): close()时调用，释放底层游标；数据流尚未开始读取时也会调用
+        """
+        self.columns = list(columns)
+        self._rows = rows
+        self._batched = batched
+        self._consumed = False
+        self.volume_scale = volume_scale
+        self._on_close = on_close
+
+    def __iter__(self):
+        if self._consumed:
+            raise RuntimeError("行数据流只能被消费一次")
+        self._consumed = True
+        if self._batched:
+            for batch in self._rows:
+                for row in batch:
+                    yield row
+        else:
+            for row in self._rows:
+                yield row
+
+    def close(self):
+        """
+        结束数据流（例如未消费完就放弃），关闭底层的分批游标或读取器
+
+        可以重复调用；已完整读取的数据流调用时不做任何事。
+        """
+        self._consumed = True
+        try:
+            close = getattr(self._rows, "close", None)
+            if close is not None:
+                close()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+
+    def records(self):
+        """
+        逐条产出解析后的记录，跳过无法解析加注时间的行
+
+        Yields:
+            tuple: (加注时间datetime, 油加注值, 原油剩余量, 油品名称)，
+                设置volume_scale时体积为整数定点值，否则为float
+        """
+        columns = self.columns
+        time_idx = columns.index("加注时间") if "加注时间" in columns else None
+        oil_idx = columns.index("油加注值") if "油加注值" in columns else None
+        avai_idx = columns.index("原油剩余量") if "原油剩余量" in columns else None
+        name_idx = columns.index("油品名称") if "油品名称" in columns else None
+        if time_idx is None:
+            return
+        scale = self.volume_scale
+        if scale is not None:
+            for row in self:
+                order_time = parse_order_time(row[time_idx])
+                if order_time is None:
+                    continue
+                yield (
+                    order_time,
+                    to_fixed_point(row[oil_idx] if oil_idx is not None else 0, scale),
+                    to_fixed_point(row[avai_idx] if avai_idx is not None else 0, scale),
+                    row[name_idx] if name_idx is not None else None,
+                )
+            return
+        for row in self:
+            order_time = parse_order_time(row[time_idx])
+            if order_time is None:
+                continue
+            yield (
+                order_time,
+                float((row[oil_idx] if oil_idx is not None else 0) or 0),
+                float((row[avai_idx] if avai_idx is not None else 0) or 0),
+                row[name_idx] if name_idx is not None else None,
+            )
+
+    def consume(self, *accumulators):
+        """
+        一次遍历数据流，把每条记录分发给所有聚合器
+
+        Args:
+            *accumulators: 实现add(order_time, oil_val, avai_oil, oil_name)的聚合器
+
+        Returns:
+            tuple: 传入的聚合器，便于链式读取结果
+        """
+        for record in self.records():
+            for accumulator in accumulators:
+                accumulator.add(*record)
+        return accumulators
+
+
+def sorted_records(columns, rows, volume_scale=None):
+    """
+    将已物化的行数据解析并按加注时间稳定排序
+
+    Args:
+        columns (list): 列名列表
+        rows (list): 行数据
+        volume_scale (int, optional): 定点缩放倍数
+
+    Returns:
+        list: 按时间升序排列的记录 (加注时间, 油加注值, 原油剩余量, 油品名称)
+    """
+    return sorted(RowStream(columns, rows, volume_scale=volume_scale).records(), key=lambda record: record[0])
+
+
+class UsageAccumulator:
+    """按周期累加订单加注值，不要求输入有序"""
+
+    def __init__(self, period_key):
+        """
+        Args:
+            period_key: 将加注时间映射为周期键的函数
+        """
+        self.period_key = period_key
+        self.totals = defaultdict(int)
+
+    def add(self, order_time, oil_val, avai_oil=None, oil_name=None):
+        self.totals[self.period_key(order_time)] += oil_val
+
+    def result(self):
+        """返回按周期排序的 [(period, usage), ...]"""
+        return sorted(self.totals.items())
+
+
+class InventoryAccumulator:
+    """记录每天最晚一条记录的库存，与DatabaseHandler.fetch_generic_data的库存数据口径一致"""
+
+    def __init__(self):
+        self._latest = {}
+
+    def add(self, order_time, oil_val, avai_oil, oil_name=None):
+        order_date = order_time.date()
+        latest = self._latest.get(order_date)
+        if latest is None or order_time > latest[0]:
+            self._latest[order_date] = (order_time, avai_oil)
+
+    def result(self):
+        """返回按日期排序的 [(date, 期末库存), ...]"""
+        return [(order_date, value[1]) for order_date, value in sorted(self._latest.items())]
+
+
+class PeriodStateAccumulator:
+    """
+    按周期增量计算期末状态（期末库存、订单总量、推断加油量、单桶消耗量）
+
+    输入必须按加注时间升序排列。每条记录与上一条记录比较库存，升高部分计为推断加油量；
+    周期消耗量 = 周期期初库存 - 周期期末库存 + 周期加油量，
+    第一条记录的期初库存取其自身库存（或指定的opening_inventory）。
+    """
+
+    def __init__(self, period_key, opening_inventory=None):
+        """
+        Args:
+            period_key: 将加注时间映射为周期键的函数
+            opening_inventory (float, optional): 第一个周期的期初库存
+        """
+        self.period_key = period_key
+        self.states = {}
+        self.oil_name = None
+        self._last_inventory = opening_inventory
+        self._last_time = None
+        self._current = None
+
+    def add(self, order_time, oil_val, avai_oil, oil_name=None):
+        if self._last_time is not None and order_time < self._last_time:
+            raise ValueError("行数据未按加注时间升序排列")
+        self._last_time = order_time
+        if self.oil_name is None and oil_name:
+            self.oil_name = oil_name
+        if self._last_inventory is None:
+            self._last_inventory = avai_oil
+
+        period = self.period_key(order_time)
+        if self._current is None or self._current[0] != period:
+            self._current = (period, self._last_inventory)
+            self.states[period] = {
+                'end_inventory': avai_oil,
+                'order_total': 0,
+                'refill': 0,
+                'consumption': 0,
+                'oil_name': None,
+            }
+        state = self.states[period]
+
+        if avai_oil > self._last_inventory:
+            state['refill'] += (avai_oil - self._last_inventory)
+        state['order_total'] += oil_val
+        state['end_inventory'] = avai_oil
+        state['consumption'] = (self._current[1] - avai_oil) + state['refill']
+        self._last_inventory = avai_oil
+
+    def result(self):
+        """返回 {period: state_dict}，按周期升序"""
+        for state in self.states.values():
+            state['oil_name'] = self.oil_name
+        return self.states
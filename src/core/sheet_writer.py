@@ -0,0 +1,164 @@
+"""
+模板工作表批量写入模块
+模板工作表中有大量合并单元格，逐个单元格写入时每次都要在全部合并区域中查找，
+耗时随设备数 × 天数 × 合并区域数增长。SheetWriter为每个工作表预先计算一次合并单元格映射，
+之后按行、列或矩形区域批量写入和清除，每个单元格只需一次字典查找。
+"""
+
+
+class SheetWriter:
+    """带合并单元格映射的工作表写入器"""
+
+    def __init__(self, worksheet):
+        """
+        预先计算工作表的合并单元格映射
+
+        Args:
+            worksheet (Worksheet): 工作表
+        """
+        self.worksheet = worksheet
+        # (行, 列) -> 所在合并区域左上角的(行, 列)
+        self._merged = {}
+        for merged_range in worksheet.merged_cells.ranges:
+            self._add_range(merged_range.min_row, merged_range.min_col, merged_range.max_row, merged_range.max_col)
+
+    def _add_range(self, min_row, min_col, max_row, max_col):
+        anchor = (min_row, min_col)
+        for row in range(min_row, max_row + 1):
+            for column in range(min_col, max_col + 1):
+                self._merged[(row, column)] = anchor
+
+    def is_merged(self, row, column):
+        """
+        单元格是否属于合并区域（包括左上角单元格）
+
+        Args:
+            row (int): 行号（从1开始）
+            column (int): 列号（从1开始）
+
+        Returns:
+            bool: 是否属于合并区域
+        """
+        return (row, column) in self._merged
+
+    def merge(self, start_row, start_column, end_row, end_column):
+        """
+        合并单元格并更新合并单元格映射
+
+        Args:
+            start_row (int): 起始行号
+            start_column (int): 起始列号
+            end_row (int): 结束行号
+            end_column (int): 结束列号
+        """
+        self.worksheet.merge_cells(
+            start_row=start_row, start_column=start_column, end_row=end_row, end_column=end_column
+        )
+        self._add_range(start_row, start_column, end_row, end_column)
+
+    def cell(self, row, column):
+        """
+        获取单元格，合并区域中的单元格返回其左上角单元格
+
+        Args:
+            row (int): 行号（从1开始）
+            column (int): 列号（从1开始）
+
+        Returns:
+            Cell: 单元格
+        """
+        row, column = self._merged.get((row, column), (row, column))
+        return self.worksheet._get_cell(row, column)
+
+    def write(self, row, column, value):
+        """
+        写入单元格值，属于合并区域的单元格不写入
+
+        Args:
+            row (int): 行号（从1开始）
+            column (int): 列号（从1开始）
+            value: 要写入的值
+
+        Returns:
+            bool: 是否写入
+        """
+        if (row, column) in self._merged:
+            return False
+        self.worksheet._get_cell(row, column).value = value
+        return True
+
+    def write_anchor(self, row, column, value):
+        """
+        写入单元格值，合并区域只能写入左上角单元格，其余单元格不写入
+
+        Args:
+            row (int): 行号（从1开始）
+            column (int): 列号（从1开始）
+            value: 要写入的值
+
+        Returns:
+            bool: 是否写入
+        """
+        if self._merged.get((row, column), (row, column)) != (row, column):
+            return False
+        self.worksheet._get_cell(row, column).value = value
+        return True
+
+    def write_row(self, row, start_column, values):
+        """
+        从start_column开始向右依次写入一行的值，跳过合并区域中的单元格
+
+        Args:
+            row (int): 行号
+            start_column (int): 起始列号
+            values (iterable): 各列的值
+        """
+        self.write_block(row, start_column, [values])
+
+    def write_column(self, start_row, column, values):
+        """
+        从start_row开始向下依次写入一列的值，跳过合并区域中的单元格
+
+        Args:
+            start_row (int): 起始行号
+            column (int): 列号
+            values (iterable): 各行的值
+        """
+        self.write_block(start_row, column, ([value] for value in values))
+
+    def write_block(self, start_row, start_column, rows):
+        """
+        以(start_row, start_column)为左上角写入矩形区域，跳过合并区域中的单元格
+
+        Args:
+            start_row (int): 起始行号
+            start_column (int): 起始列号
+            rows (iterable): 各行的值列表
+        """
+        merged = self._merged
+        get_cell = self.worksheet._get_cell
+        for row, values in enumerate(rows, start_row):
+            for column, value in enumerate(values, start_column):
+                if (row, column) not in merged:
+                    get_cell(row, column).value = value
+
+    def clear(self, min_row, min_column, max_row, max_column):
+        """
+        清除矩形区域中已有单元格的值，合并区域中的单元格保持不变
+
+        只遍历工作表中已存在的单元格，不为空白区域创建单元格，单元格格式保持不变。
+
+        Args:
+            min_row (int): 起始行号
+            min_column (int): 起始列号
+            max_row (int): 结束行号（包含）
+            max_column (int): 结束列号（包含）
+        """
+        merged = self._merged
+        for (row, column), cell in self.worksheet._cells.items():
+            if (
+                min_row <= row <= max_row
+                and min_column <= column <= max_column
+                and (row, column) not in merged
+            ):
+                cell.value = None
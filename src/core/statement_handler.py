@@ -1,16 +1,30 @@
 import os
 import time
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 
-import warnings
 from openpyxl import load_workbook
 from openpyxl.chart import BarChart, LineChart, Reference
 from openpyxl.styles import Alignment
 
 # 修复导入语句，使用正确的相对导入
-from ..utils.date_utils import parse_date
+from ..utils.date_utils import default_calendar, parse_date
 from .base_report import BaseReportGenerator
+from .sheet_writer import SheetWriter
+from .table_export import export_table, parse_export_formats
+from .template_cache import load_template, template_digest
+
+
+# 对账单模板路径（项目根目录下的template目录）
+STATEMENT_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "template",
+    "statement_template.xlsx",
+)
+
+# 对账单表格导出的列名
+STATEMENT_COLUMNS = ["客户名称", "设备编码", "油品名称", "日期", "用量(L)"]
+STATEMENT_COLUMN_TYPES = ["string", "string", "string", "date", "float64"]
 
 
 class CustomerStatementGenerator(BaseReportGenerator):
@@ -20,6 +34,12 @@ class CustomerStatementGenerator(BaseReportGenerator):
         """初始化客户对账单生成器"""
         super().__init__()
 
+    @classmethod
+    def fingerprint(cls):
+        """对账单生成器的指纹，包含模板文件内容摘要，模板修改后旧对账单失效"""
+        digest = template_digest(STATEMENT_TEMPLATE_PATH) if os.path.exists(STATEMENT_TEMPLATE_PATH) else None
+        return super().fingerprint() + (digest,)
+
     def generate_report(self, statement_data, output_file_path, **kwargs):
         """
         生成对账单报表的实现方法
@@ -44,7 +64,10 @@ class CustomerStatementGenerator(BaseReportGenerator):
             output_file=output_file_path,  # 注意参数名称变化
             customer_name=customer_name,
             start_date=start_date,
-            end_date=end_date
+            end_date=end_date,
+            template_cache_dir=kwargs.get('template_cache_dir'),
+            export_format=kwargs.get('export_format'),
+            output_writer=kwargs.get('output_writer')
         )
 
     def _collect_oil_types(self, devices_data):
@@ -82,23 +105,6 @@ class CustomerStatementGenerator(BaseReportGenerator):
         except Exception as e:
             print(f"写入单元格({row}, {column})时出错: {e}")
 
-    def _write_cell_or_merge(self, worksheet, row, column, value):
-        """
-        写入单元格值，适用于合并和非合并单元格
-        
-        Args:
-            worksheet: 工作表对象
-            row: 行号（从1开始）
-            column: 列号（从1开始）
-            value: 要写入的值
-        """
-        try:
-            cell = worksheet.cell(row=row, column=column)
-            # 直接写入值，保留格式
-            cell.value = value
-        except Exception as e:
-            print(f"写入单元格({row}, {column})时出错: {e}")
-
     def _generate_date_list(self, start_date, end_date):
         """
         生成从开始日期到结束日期的日期列表
@@ -110,12 +116,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
         Returns:
             list: 包含所有日期的列表
         """
-        date_list = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_list.append(current_date)
-            current_date += timedelta(days=1)
-        return date_list
+        return list(default_calendar.date_range(start_date, end_date))
 
     def _update_charts_data_source(self, wb, all_devices_data, start_date, end_date):
         """
@@ -372,7 +373,8 @@ class CustomerStatementGenerator(BaseReportGenerator):
             print(f"更新每日图表数据时出错: {e}")
 
     def generate_customer_statement_from_template(
-        self, all_devices_data, output_file, customer_name, start_date, end_date
+        self, all_devices_data, output_file, customer_name, start_date, end_date, template_cache_dir=None,
+        export_format=None, output_writer=None
     ):
         """
         基于模板生成对账单Excel报表
@@ -383,13 +385,22 @@ class CustomerStatementGenerator(BaseReportGenerator):
             customer_name: 客户名称
             start_date: 开始日期
             end_date: 结束日期
-        """
-        # 修复模板路径，使用项目根目录下的template目录
-        template_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
-            "template",
-            "statement_template.xlsx",
+            template_cache_dir: 模板解析结果的持久化缓存目录，可选
+            export_format: 导出格式，xlsx、csv、jsonl、parquet之一或逗号分隔的多个格式，默认只生成xlsx；
+                表格格式导出每台设备每种油品每天的用量明细，只导出表格格式时不加载模板
+            output_writer: 后台保存句柄（OutputTask），提供时工作簿交给后台线程保存
+        """
+        write_xlsx, table_formats = parse_export_formats(export_format)
+        export_table(
+            output_file, STATEMENT_COLUMNS,
+            self._statement_rows(all_devices_data, customer_name, start_date, end_date),
+            table_formats, column_types=STATEMENT_COLUMN_TYPES,
         )
+        if not write_xlsx:
+            return
+
+        # 使用项目根目录下的template目录中的模板
+        template_path = STATEMENT_TEMPLATE_PATH
 
         # 检查模板目录是否存在
         template_dir = os.path.dirname(template_path)
@@ -408,32 +419,8 @@ class CustomerStatementGenerator(BaseReportGenerator):
 
         wb = None
         try:
-            # 自定义警告处理器，提供更详细的图表外部数据引用错误信息
-            def custom_warning_handler(message, category, filename, lineno, file=None, line=None):
-                """自定义警告处理器，提供更详细的图表外部数据引用错误信息"""
-                if "externalData" in str(message) and "id should be" in str(message):
-                    # 对于图表外部数据引用问题，提供更友好的提示信息
-                    print("信息: 检测到Excel模板中的图表存在外部数据引用")
-                    print("  问题描述:", str(message))
-                    print("  详细解释: 这是Excel模板中图表的一个技术性问题，不是数据源引用错误。")
-                    print("            openpyxl在读取包含图表的Excel文件时无法正确处理某些外部数据引用，")
-                    print("            但这不影响我们生成的报表，因为程序会在处理过程中修复这些问题。")
-                    print("  建议措施: 可以安全忽略此警告，它不会影响最终生成的报表文件。")
-                    print("  详细位置: 文件 %s, 行 %s" % (filename, lineno))
-                    print("")
-                else:
-                    # 其他警告使用默认处理方式
-                    print("警告:", str(message))
-
-            # 临时设置自定义警告处理器
-            old_showwarning = warnings.showwarning
-            warnings.showwarning = custom_warning_handler
-
-            # 加载模板工作簿
-            wb = load_workbook(template_path)
-            
-            # 恢复原来的警告处理器
-            warnings.showwarning = old_showwarning
+            # 加载模板工作簿（进程内只解析一次，每个客户使用独立副本）
+            wb = load_template(template_path, template_cache_dir, loader=load_workbook)
 
             # 检查必需的工作表是否存在
             required_sheets = ["中润对账单", "每日用量明细", "每月用量对比"]
@@ -488,6 +475,13 @@ class CustomerStatementGenerator(BaseReportGenerator):
                             ):
                                 chart.externalData.id = ""
 
+            if output_writer is not None:
+                # 工作簿交给后台线程保存，并由后台线程关闭
+                output_writer.save(output_file, wb.save, wb)
+                wb = None
+                print(f"已生成对账单，已提交后台保存: {output_file}")
+                return
+
             try:
                 wb.save(output_file)
                 print(f"已生成对账单: {output_file}")
@@ -509,6 +503,37 @@ class CustomerStatementGenerator(BaseReportGenerator):
                 except:
                     pass
 
+    def _statement_rows(self, all_devices_data, customer_name, start_date, end_date):
+        """
+        逐行生成表格导出用的用量明细，同一设备同一油品同一天的用量合并
+
+        Args:
+            all_devices_data: 所有设备的数据
+            customer_name: 客户名称
+            start_date: 开始日期
+            end_date: 结束日期
+
+        Yields:
+            list: 与STATEMENT_COLUMNS顺序一致的一行数据
+        """
+        start_date, end_date = self._prepare_date_range(start_date, end_date)
+        usage = defaultdict(lambda: defaultdict(float))
+        for device_data in all_devices_data:
+            oil_key = (device_data["device_code"], device_data["oil_name"])
+            data_source = device_data.get("daily_usage_data", None)
+            if data_source is None:
+                data_source = device_data["data"]
+            daily = usage[oil_key]
+            for date, value in data_source:
+                if isinstance(date, str):
+                    date = datetime.strptime(date, "%Y-%m-%d").date()
+                daily[date] += float(value) if value is not None else 0.0
+
+        date_list = default_calendar.date_range(start_date, end_date)
+        for (device_code, oil_name), daily in usage.items():
+            for current_date in date_list:
+                yield [customer_name, device_code, oil_name, current_date, round(daily.get(current_date, 0.0), 2)]
+
     def _prepare_date_range(self, start_date, end_date):
         """
         准备日期范围，确保输入是date对象
@@ -529,25 +554,6 @@ class CustomerStatementGenerator(BaseReportGenerator):
             end_date = parse_date(end_date).date()
         return start_date, end_date
 
-    def _clear_old_data(self, worksheet, start_row, num_rows, start_col=3):
-        """
-        清除工作表中的旧数据
-
-        Args:
-            worksheet: 工作表对象
-            start_row: 开始行号
-            num_rows: 需要清除的行数
-            start_col: 开始列号（默认为3，即C列）
-        """
-        max_cols = worksheet.max_column
-        if max_cols >= start_col:
-            for col in range(start_col, max_cols + 1):
-                # 清除数据
-                for row in range(start_row, start_row + num_rows):
-                    cell = worksheet.cell(row=row, column=col)
-                    if cell.coordinate not in worksheet.merged_cells:
-                        cell.value = None
-
     def _update_daily_usage_sheet(self, ws, all_devices_data, start_date, end_date):
         """
         更新每日用量明细工作表
@@ -566,17 +572,16 @@ class CustomerStatementGenerator(BaseReportGenerator):
             if date_span > 31:
                 raise ValueError(f"日期跨度不能超过31天，当前跨度为{date_span}天")
 
+            # 合并单元格映射只计算一次，之后按行列批量写入
+            writer = SheetWriter(ws)
+
             # 在G3单元格写入开始日期，格式：2025年8月1日
-            self._write_cell_safe(
-                ws, 3, 7, start_date
-            )
+            writer.write(3, 7, start_date)
             # 设置单元格格式为"yyyy年m月d日"格式
             ws.cell(row=3, column=7).number_format = 'yyyy"年"m"月"d"日"'
             
             # 在H3单元格写入结束日期
-            self._write_cell_safe(
-                ws, 3, 8, end_date
-            )
+            writer.write(3, 8, end_date)
             # 设置单元格格式为"yyyy年m月d日"格式
             ws.cell(row=3, column=8).number_format = 'yyyy"年"m"月"d"日"'
             
@@ -613,22 +618,9 @@ class CustomerStatementGenerator(BaseReportGenerator):
                     if device_code == "MO24111301600002" and date_obj == datetime(2025, 7, 1).date():
                         print(f"设备 {device_code} 在 {date_obj} 的数据: 原始值={value}, 累计值={daily_usage[date_obj][oil_key]}")
 
-            # 写入日期列 (B列)
-            current_date = start_date
-            row_index = 6  # 从第6行开始写入数据
-            date_list = []
-
-            while current_date <= end_date:
-                date_list.append(current_date)
-                # 日期格式调整为：7.1
-                self._write_cell_safe(
-                    ws,
-                    row_index,
-                    2,
-                    f"{current_date.month}.{current_date.day}",
-                )
-                current_date += timedelta(days=1)
-                row_index += 1
+            # 写入日期列 (B列)，从第6行开始，日期格式为：7.1
+            date_list = default_calendar.date_range(start_date, end_date)
+            writer.write_column(6, 2, [f"{current_date.month}.{current_date.day}" for current_date in date_list])
 
             print(f"日期列表长度: {len(date_list)}")
             
@@ -637,7 +629,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
                 # 合并单元格
                 merge_start_row = 6
                 merge_end_row = 5 + len(date_list)
-                ws.merge_cells(start_row=merge_start_row, start_column=1, end_row=merge_end_row, end_column=1)
+                writer.merge(merge_start_row, 1, merge_end_row, 1)
                 
                 # 在合并后的单元格中写入结束日期（只显示年月）
                 cell = ws.cell(row=6, column=1)  # 合并区域的左上角单元格
@@ -647,33 +639,18 @@ class CustomerStatementGenerator(BaseReportGenerator):
                 # 设置单元格居中对齐
                 cell.alignment = Alignment(horizontal='center', vertical='center')
 
-            # 清除模板中可能存在的旧数据（C列及之后的列）
-            # 从第5行开始清除表头
-            # 从第6行开始清除数据
-            self._clear_old_data(ws, 5, 1, 3)  # 清除表头（第5行）
-            self._clear_old_data(
-                ws, 6, len(date_list), 3
-            )  # 清除数据（第6行到第6+日期数量-1行）
+            # 清除模板中可能存在的旧数据（C列及之后的列）：第5行表头和第6行开始的每日数据
+            writer.clear(5, 3, 5 + len(date_list), ws.max_column)
 
-            # 为每个设备的油品写入数据
+            # 为每个设备的油品写入数据，从第3列(C列)开始
             print(f"设备油品组合: {oil_columns}")
-            for col_index, (device_code, oil_name) in enumerate(
-                oil_columns, start=3
-            ):  # 从第3列开始(C列)
-                print(f"  写入设备 {device_code} 的油品 {oil_name} 到第{col_index}列")
-                # 写入油品名称到第5行，格式为：设备编码\n油品名称
-                oil_key = (device_code, oil_name)
-                self._write_cell_safe(ws, 5, col_index, f"{device_code}\n{oil_name}")
-
-                # 写入每日用量数据
-                for row_index, date in enumerate(date_list, start=6):
-                    usage = daily_usage[date].get(oil_key, 0)
-                    cell_value = round(usage, 2)
-                    self._write_cell_safe(ws, row_index, col_index, cell_value)
-                    
-                    # 添加调试信息，帮助追踪特定设备的数据写入
-                    if device_code == "MO24111301600002" and date == datetime(2025, 7, 31).date():
-                        print(f"写入设备 {device_code} 在 {date} 的数据: 值={cell_value}")
+            # 第5行写入表头，格式为：设备编码\n油品名称
+            writer.write_row(5, 3, [f"{device_code}\n{oil_name}" for device_code, oil_name in oil_columns])
+            # 从第6行开始按日期写入每日用量数据
+            writer.write_block(6, 3, (
+                [round(daily_usage[date].get(oil_key, 0), 2) for oil_key in oil_columns]
+                for date in date_list
+            ))
 
         except Exception as e:
             print(f"更新每日用量明细工作表时出错: {e}")
@@ -693,6 +670,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
         """
         try:
             start_date, end_date = self._prepare_date_range(start_date, end_date)
+            writer = SheetWriter(ws)
 
             # 构建显示日期范围的字符串
             # 在A1单元格写入截止日期信息
@@ -704,8 +682,8 @@ class CustomerStatementGenerator(BaseReportGenerator):
             cell.value = f"截止日期：{cell.value}"
             # 设置对齐方式为靠右居中
             cell.alignment = Alignment(horizontal='right', vertical='center')
-            # 合并A1到I1单元格
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=15)
+            # 合并A1到O1单元格
+            writer.merge(1, 1, 1, 15)
 
             # 收集月度数据
             # 修改数据结构，使用(设备ID, 油品名称)作为键，确保不同设备的相同油品创建独立列
@@ -736,7 +714,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
                         exit()
 
                     # 格式化月份为"YYYY-MM"用于键值
-                    month = date_obj.strftime("%Y-%m")
+                    month = default_calendar.month_key(date_obj)
                     # 将数值统一转换为 float 类型
                     value = float(value) if value is not None else 0.0
                     monthly_stats[month][oil_key] += value
@@ -752,7 +730,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
             
             # 在C5单元格合并区域写入年份，格式为"{year}年"
             # 首先合并C5到N5单元格
-            ws.merge_cells(start_row=5, start_column=3, end_row=5, end_column=14)
+            writer.merge(5, 3, 5, 14)
             # 在合并后的单元格中写入年份
             year_cell = ws.cell(row=5, column=3)
             year_cell.value = f"{report_year}年"
@@ -760,9 +738,7 @@ class CustomerStatementGenerator(BaseReportGenerator):
             year_cell.alignment = Alignment(horizontal='center', vertical='center')
             
             # 在C6到N6单元格分别写入1月到12月
-            for i in range(1, 13):
-                month_cell = ws.cell(row=6, column=2+i)  # 从第3列(C)开始
-                month_cell.value = f"{i}月"
+            writer.write_row(6, 3, [f"{i}月" for i in range(1, 13)])
             
             # 获取对账单对应的月份（基于end_date）
             report_month = end_date.month
@@ -770,31 +746,21 @@ class CustomerStatementGenerator(BaseReportGenerator):
             # 找到对账单对应月份的列索引（相对于C列的位置）
             report_month_column_index = 2 + report_month  # C列是第3列，所以是2+month
             
-            # 获取所有月份并排序
+            # 获取所有月份并排序，从"2023-07"格式提取月份，计算该月份应该写入的列索引（C列是第3列）
             sorted_months = sorted(monthly_stats.keys())
+            month_columns = [(month, 2 + int(month.split("-")[1])) for month in sorted_months]
             
             # 为每个设备和油品组合写入数据
             for device_code, oil_name in oil_columns:
                 oil_key = (device_code, oil_name)
                 
-                # A列写入设备编码
-                device_cell = ws.cell(row=current_row, column=1)
-                device_cell.value = device_code
-                
-                # B列写入油品名称
-                oil_cell = ws.cell(row=current_row, column=2)
-                oil_cell.value = oil_name
+                # A列写入设备编码，B列写入油品名称
+                writer.write_row(current_row, 1, [device_code, oil_name])
                 
                 # 从C列开始写入各月份的用量数据
-                for i, month in enumerate(sorted_months):
-                    month_data = monthly_stats[month]
-                    value = month_data.get(oil_key, 0)
-                    # 从"2023-07"格式提取月份
-                    month_number = int(month.split("-")[1])
-                    # 计算该月份应该写入的列索引
-                    column_index = 2 + month_number  # C列是第3列
-                    data_cell = ws.cell(row=current_row, column=column_index)
-                    data_cell.value = round(float(value), 2)
+                for month, column_index in month_columns:
+                    value = monthly_stats[month].get(oil_key, 0)
+                    writer.write(current_row, column_index, round(float(value), 2))
                     
                 current_row += 1
 
@@ -814,41 +780,30 @@ class CustomerStatementGenerator(BaseReportGenerator):
             all_devices_data: 所有设备数据
         """
         try:
+            writer = SheetWriter(ws)
             # 只更新客户名称和统计日期等最基本的信息
-            self._write_cell_safe(ws, 5, 1, f"客户名称：{customer_name}")
+            writer.write(5, 1, f"客户名称：{customer_name}")
             # 修改列号为7，写入内容格式："月份：7月份（2025.7.1-2025.7.31）"
             month_str = f"{start_date.month}月份"
             # 使用标准的日期格式化方法
             start_date_str = f"{start_date.year}.{start_date.month}.{start_date.day}"
             end_date_str = f"{end_date.year}.{end_date.month}.{end_date.day}"
             date_range_str = f"{start_date_str}-{end_date_str}"
-            # 使用_write_cell_or_merge方法处理可能的合并单元格
-            self._write_cell_or_merge(
-                ws,
-                5,
-                7,
-                f"月份：{month_str}（{date_range_str}）",
-            )
+            # 合并单元格写入左上角单元格
+            writer.write_anchor(5, 7, f"月份：{month_str}（{date_range_str}）")
             
             # 更新A22单元格中的日期为程序执行时的日期
             now = datetime.now()
             current_date_str = f"\n\n日期：{now.year}年{now.month}月{now.day}日{' ':>50}制单人：XXX"
-            self._write_cell_or_merge(ws, 22, 1, current_date_str)
+            writer.write_anchor(22, 1, current_date_str)
             
             # 清理模板中旧的设备数据（第9行到第16行）
             # 为了最大程度保护模板中的样式和元素，对于非合并单元格直接清除，对于合并单元格只清空左上角单元格
             for row in range(9, 17):  # 第9行到第16行
                 # 需要清除的列: A(序号), B(油品名称/型号), E(设备编码), F(本月总升数计量), H(备注)
-                columns_to_clear = [1, 2, 5, 6, 8]
-                for col in columns_to_clear:
-                    cell = ws.cell(row=row, column=col)
-                    # 检查单元格是否为合并单元格的一部分
-                    if cell.coordinate in ws.merged_cells:
-                        # 对于合并单元格，只清空单元格值，保留格式
-                        cell.value = ""
-                    else:
-                        # 对于非合并单元格，直接清除值
-                        cell.value = None
+                for col in (1, 2, 5, 6, 8):
+                    # 对于合并单元格，只清空单元格值，保留格式；对于非合并单元格，直接清除值
+                    writer.write_anchor(row, col, "" if writer.is_merged(row, col) else None)
             
             # 更新主页表格的设备信息（从第9行开始）
             current_row = 9
@@ -864,27 +819,27 @@ class CustomerStatementGenerator(BaseReportGenerator):
                     raise ValueError("设备行数超过限制（最多8行）")
                 
                 # A列：序号
-                self._write_cell_or_merge(ws, current_row, 1, index)
+                writer.write_anchor(current_row, 1, index)
                 
                 # B列：油品名称/型号
                 # 根据代码中的其他部分，实际字段名为"oil_name"
                 oil_model = device_data.get("oil_name", "")
                 # 添加调试信息
                 # print(f"设备 {device_data.get('device_code', '')} 的油品名称: {oil_model}")
-                self._write_cell_or_merge(ws, current_row, 2, oil_model)
+                writer.write_anchor(current_row, 2, oil_model)
                 
                 # E列：设备编码
                 device_code = device_data.get("device_code", "")
-                self._write_cell_or_merge(ws, current_row, 5, device_code)
+                writer.write_anchor(current_row, 5, device_code)
                 
                 # F列：本月总升数计量（该周期内的总量）
                 # 从monthly_usage_data计算总用量
                 monthly_usage_data = device_data.get("monthly_usage_data", [])
                 total_usage = sum(usage for month, usage in monthly_usage_data)
-                self._write_cell_or_merge(ws, current_row, 6, round(float(total_usage), 2))
+                writer.write_anchor(current_row, 6, round(float(total_usage), 2))
                 
                 # H列：备注字段（插入该设备的导出明细报表附件）
-                self._write_cell_or_merge(ws, current_row, 8, "详见明细报表")
+                writer.write_anchor(current_row, 8, "详见明细报表")
                 
                 current_row += 1
 
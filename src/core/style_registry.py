@@ -0,0 +1,183 @@
+"""
+命名样式注册表模块
+报表中反复使用的单元格样式（标题、提示、表头、数据行、斑马纹、警告高亮等）在这里统一定义，
+每个工作簿只注册一次为Excel命名样式，之后按名称或索引直接把预先计算好的样式数组赋给单元格，
+不再逐个单元格创建Font、PatternFill、Border、Alignment对象并在样式表中查找。
+"""
+from copy import copy
+
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.styles.fonts import DEFAULT_FONT
+
+_THIN_SIDE = Side(style="thin")
+_THIN_BORDER = Border(left=_THIN_SIDE, right=_THIN_SIDE, top=_THIN_SIDE, bottom=_THIN_SIDE)
+# 数据行交替填充
+_EVEN_ROW_FILL = PatternFill(start_color="DCE6F1", end_color="DCE6F1", fill_type="solid")
+_WARNING_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
+_HINT_FONT = Font(size=9, color="FF4500", name="Calibri", bold=True, italic=False)
+_WARNING_FONT = Font(color="9C0006")
+
+# 斑马纹样式名称后缀，带该后缀的样式在基础样式上叠加交替行填充
+ZEBRA_SUFFIX = "_斑马"
+
+
+def _data_styles(definitions):
+    """为数据行样式生成带交替行填充的变体"""
+    styles = {}
+    for name, spec in definitions.items():
+        styles[name] = spec
+        if "fill" not in spec:
+            styles[name + ZEBRA_SUFFIX] = dict(spec, fill=_EVEN_ROW_FILL)
+    return styles
+
+
+# 各报表共用的样式定义：名称 -> NamedStyle参数
+REPORT_STYLES = {
+    "报表标题": {
+        "font": Font(size=16, bold=True, name="Calibri"),
+        "alignment": Alignment(horizontal="center"),
+    },
+    "报表提示": {
+        "font": _HINT_FONT,
+        "alignment": Alignment(horizontal="left", vertical="center", wrap_text=True),
+    },
+    "报表提示_居中": {
+        "font": _HINT_FONT,
+        "alignment": Alignment(horizontal="center"),
+    },
+    "表头": {
+        "font": Font(bold=True, color="FFFFFF", name="Calibri"),
+        "fill": PatternFill(start_color="4F81BD", end_color="4F81BD", fill_type="solid"),
+        "border": _THIN_BORDER,
+    },
+    **_data_styles({
+        "数据": {"border": _THIN_BORDER},
+        "数据_序号": {"border": _THIN_BORDER, "alignment": Alignment(horizontal="center", vertical="center")},
+        "数据_链接": {"border": _THIN_BORDER, "font": Font(color="0563C1", underline="single")},
+        "数据_两位小数": {"border": _THIN_BORDER, "number_format": "0.00"},
+        "数据_百分比": {"border": _THIN_BORDER, "number_format": "0.00%"},
+        "数据_百分比_警告": {"border": _THIN_BORDER, "number_format": "0.00%", "fill": _WARNING_FILL},
+        "数据_备注_警告": {
+            "border": _THIN_BORDER, "font": _WARNING_FONT,
+            "alignment": Alignment(vertical="top", wrap_text=True),
+        },
+    }),
+}
+
+
+class StyleRegistry:
+    """
+    工作簿级的命名样式注册表
+
+    样式注册时加入工作簿的命名样式并计算出样式数组，应用时直接复制样式数组，
+    同一行模式（例如一整行数据的各列样式）可以一次性应用到整行。
+    """
+
+    def __init__(self, workbook, definitions=None):
+        """
+        初始化注册表
+
+        Args:
+            workbook (Workbook): 样式所属的工作簿
+            definitions (dict, optional): 预先注册的样式定义，名称 -> NamedStyle参数，默认为REPORT_STYLES
+        """
+        self.workbook = workbook
+        self._names = {}
+        self._arrays = []
+        for name, spec in (REPORT_STYLES if definitions is None else definitions).items():
+            self.register(name, **spec)
+
+    def register(self, name, font=None, fill=None, border=None, alignment=None, number_format=None):
+        """
+        注册命名样式，同名样式只注册一次
+
+        Args:
+            name (str): 样式名称
+            font (Font, optional): 字体，默认为工作簿的默认字体
+            fill (PatternFill, optional): 填充
+            border (Border, optional): 边框
+            alignment (Alignment, optional): 对齐方式
+            number_format (str, optional): 数字格式
+
+        Returns:
+            int: 样式索引
+        """
+        index = self._names.get(name)
+        if index is not None:
+            return index
+        style = NamedStyle(
+            name=name, font=font or DEFAULT_FONT, fill=fill, border=border, alignment=alignment,
+            number_format=number_format or "General",
+        )
+        self.workbook.add_named_style(style)
+        index = self._names[name] = len(self._arrays)
+        self._arrays.append(copy(style.as_tuple()))
+        return index
+
+    def index(self, name):
+        """
+        获取样式索引
+
+        Args:
+            name (str): 样式名称
+
+        Returns:
+            int: 样式索引
+
+        Raises:
+            KeyError: 样式未注册
+        """
+        return self._names[name]
+
+    def apply(self, cell, style):
+        """
+        把样式应用到单元格
+
+        Args:
+            cell (Cell): 单元格
+            style (str or int): 样式名称或索引
+        """
+        if not isinstance(style, int):
+            style = self._names[style]
+        cell._style = copy(self._arrays[style])
+
+    def apply_row(self, worksheet, row, styles, start_column=1):
+        """
+        把一行的样式模式应用到指定行
+
+        Args:
+            worksheet (Worksheet): 工作表
+            row (int): 行号
+            styles (list): 从start_column开始各列的样式名称或索引
+            start_column (int): 起始列号
+        """
+        arrays = self._arrays
+        names = self._names
+        for column, style in enumerate(styles, start_column):
+            if not isinstance(style, int):
+                style = names[style]
+            worksheet.cell(row=row, column=column)._style = copy(arrays[style])
+
+    def cells(self, worksheet, values, styles):
+        """
+        为只写模式的工作表生成一行带样式的单元格，可直接传给worksheet.append
+
+        Args:
+            worksheet (WriteOnlyWorksheet): 只写模式的工作表
+            values (list): 单元格值
+            styles (list): 与values一一对应的样式名称或索引
+
+        Returns:
+            list: WriteOnlyCell列表
+        """
+        arrays = self._arrays
+        names = self._names
+        row = []
+        for value, style in zip(values, styles):
+            if not isinstance(style, int):
+                style = names[style]
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell._style = copy(arrays[style])
+            row.append(cell)
+        return row
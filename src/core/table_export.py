@@ -0,0 +1,321 @@
+"""
+表格数据导出模块
+把报表底层的数据表直接导出为CSV、JSON Lines或Parquet，供下游BI任务读取，不构建openpyxl工作簿。
+多种格式在同一次遍历中写出，行数据逐行写入，Parquet按批写入。
+Parquet导出需要安装pyarrow，未安装时跳过并给出提示。
+Parquet的列类型由报表声明（见PARQUET_TYPES），未声明时按第一批数据推断：
+数值列统一为float64，全为空或类型混杂的列为string，之后各批按确定的类型转换后写入。
+"""
+import csv
+import datetime
+import json
+import os
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW_AVAILABLE = True
+except ImportError:  # pragma: no cover - 取决于运行环境
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+# 支持的表格导出格式 -> 文件扩展名
+TABLE_FORMATS = {
+    "csv": ".csv",
+    "jsonl": ".jsonl",
+    "parquet": ".parquet",
+}
+
+# Parquet每批写入的行数
+PARQUET_BATCH_ROWS = 10000
+
+# 可声明的Parquet列类型
+PARQUET_TYPES = ("string", "float64", "int64", "date", "timestamp")
+
+
+def parse_export_formats(export_format):
+    """
+    解析导出格式配置
+
+    Args:
+        export_format (str or list): 单个格式、逗号分隔的多个格式或格式列表，
+            可选 xlsx、csv、jsonl、parquet，为空时只生成xlsx
+
+    Returns:
+        tuple: (是否生成xlsx, 表格导出格式列表)
+
+    Raises:
+        ValueError: 不支持的导出格式
+    """
+    if not export_format:
+        return True, []
+    if isinstance(export_format, str):
+        export_format = export_format.split(",")
+    formats = []
+    for fmt in export_format:
+        fmt = fmt.strip().lower()
+        if fmt and fmt not in formats:
+            formats.append(fmt)
+    unknown = [fmt for fmt in formats if fmt != "xlsx" and fmt not in TABLE_FORMATS]
+    if unknown:
+        raise ValueError(
+            f"不支持的导出格式: {', '.join(unknown)}，可选值: xlsx, {', '.join(TABLE_FORMATS)}"
+        )
+    return "xlsx" in formats, [fmt for fmt in formats if fmt != "xlsx"]
+
+
+def _json_default(value):
+    """JSON序列化日期和Decimal"""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _infer_parquet_types(batch, column_count):
+    """
+    按一批数据推断各列的Parquet类型
+
+    Args:
+        batch (list): 数据行
+        column_count (int): 列数
+
+    Returns:
+        list: 各列的类型，取值见PARQUET_TYPES
+    """
+    types = []
+    for idx in range(column_count):
+        kinds = set()
+        for row in batch:
+            value = row[idx] if idx < len(row) else None
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float, Decimal, datetime.date)):
+                kinds.add("string")
+            elif isinstance(value, datetime.datetime):
+                kinds.add("timestamp")
+            elif isinstance(value, datetime.date):
+                kinds.add("date")
+            else:
+                kinds.add("float64")
+        if kinds == {"date", "timestamp"}:
+            types.append("timestamp")
+        elif len(kinds) == 1:
+            types.append(kinds.pop())
+        else:
+            # 全为空或类型混杂的列按字符串写入，之后的批次不会因类型不符而失败
+            types.append("string")
+    return types
+
+
+def _to_parquet_value(type_name, value):
+    """
+    把单元格值转换为列类型对应的Python值
+
+    Args:
+        type_name (str): 列类型，取值见PARQUET_TYPES
+        value: 单元格值
+
+    Returns:
+        转换后的值，None保持为None
+
+    Raises:
+        ValueError: 值无法转换为该列类型
+    """
+    if value is None:
+        return None
+    try:
+        if type_name == "string":
+            return value if isinstance(value, str) else str(value)
+        if type_name == "float64":
+            return float(value)
+        if type_name == "int64":
+            return int(value)
+        if type_name == "date":
+            if isinstance(value, datetime.datetime):
+                return value.date()
+            if isinstance(value, datetime.date):
+                return value
+            return datetime.date.fromisoformat(str(value)[:10])
+        if type_name == "timestamp":
+            if isinstance(value, datetime.datetime):
+                return value
+            if isinstance(value, datetime.date):
+                return datetime.datetime.combine(value, datetime.time())
+            return datetime.datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"值 {value!r} 无法写入{type_name}类型的Parquet列")
+    raise ValueError(f"不支持的Parquet列类型: {type_name}，可选值: {', '.join(PARQUET_TYPES)}")
+
+
+def _arrow_type(type_name):
+    """列类型对应的pyarrow类型"""
+    return {
+        "string": pa.string,
+        "float64": pa.float64,
+        "int64": pa.int64,
+        "date": pa.date32,
+        "timestamp": lambda: pa.timestamp("us"),
+    }[type_name]()
+
+
+class TableExportWriter:
+    """在一次遍历中把同一份数据表写入多种格式的文件"""
+
+    def __init__(self, base_path, columns, formats, batch_rows=PARQUET_BATCH_ROWS, column_types=None):
+        """
+        打开各格式的输出文件
+
+        Args:
+            base_path (str): 输出文件路径（不含扩展名），各格式在其后追加扩展名
+            columns (list): 列名
+            formats (list): 表格导出格式，取值见TABLE_FORMATS
+            batch_rows (int): Parquet每批写入的行数
+            column_types (list, optional): 各列的Parquet类型，取值见PARQUET_TYPES，为空时按第一批数据推断
+
+        Raises:
+            ValueError: 列类型与列名数量不一致或类型不支持
+        """
+        self.columns = [str(column) for column in columns]
+        if column_types is not None:
+            column_types = list(column_types)
+            if len(column_types) != len(self.columns):
+                raise ValueError(f"列类型数量({len(column_types)})与列数({len(self.columns)})不一致")
+            unknown = [t for t in column_types if t not in PARQUET_TYPES]
+            if unknown:
+                raise ValueError(
+                    f"不支持的Parquet列类型: {', '.join(unknown)}，可选值: {', '.join(PARQUET_TYPES)}"
+                )
+        self.column_types = column_types
+        self.paths = []
+        self._csv_file = None
+        self._csv_writer = None
+        self._jsonl_file = None
+        self._parquet_path = None
+        self._parquet_writer = None
+        self._parquet_batch = []
+        self._batch_rows = batch_rows
+
+        output_dir = os.path.dirname(base_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+
+        for fmt in formats:
+            path = base_path + TABLE_FORMATS[fmt]
+            if fmt == "csv":
+                # 带BOM的UTF-8，Excel和BI工具都能正确识别中文
+                self._csv_file = open(path, "w", newline="", encoding="utf-8-sig")
+                self._csv_writer = csv.writer(self._csv_file)
+                self._csv_writer.writerow(self.columns)
+            elif fmt == "jsonl":
+                self._jsonl_file = open(path, "w", encoding="utf-8")
+            elif fmt == "parquet":
+                if not PYARROW_AVAILABLE:
+                    print("提示：未安装pyarrow，跳过Parquet导出")
+                    continue
+                self._parquet_path = path
+            self.paths.append(path)
+
+    def write_row(self, values):
+        """
+        写入一行
+
+        Args:
+            values (list): 与列名顺序一致的单元格值
+        """
+        if self._csv_writer is not None:
+            self._csv_writer.writerow(values)
+        if self._jsonl_file is not None:
+            self._jsonl_file.write(json.dumps(
+                dict(zip(self.columns, values)), ensure_ascii=False, default=_json_default
+            ))
+            self._jsonl_file.write("\n")
+        if self._parquet_path is not None:
+            self._parquet_batch.append(values)
+            if len(self._parquet_batch) >= self._batch_rows:
+                self._flush_parquet()
+
+    def write_rows(self, rows):
+        """
+        依次写入多行
+
+        Args:
+            rows (iterable): 行数据
+        """
+        for values in rows:
+            self.write_row(values)
+
+    def _flush_parquet(self):
+        """把当前批次按固定的列类型写入Parquet文件，未声明列类型时由第一批推断"""
+        batch, self._parquet_batch = self._parquet_batch, []
+        if not batch and self._parquet_writer is not None:
+            return
+        if self._parquet_writer is None:
+            if self.column_types is None:
+                self.column_types = _infer_parquet_types(batch, len(self.columns))
+            schema = pa.schema([
+                (column, _arrow_type(type_name)) for column, type_name in zip(self.columns, self.column_types)
+            ])
+            self._parquet_writer = pq.ParquetWriter(self._parquet_path, schema)
+        data = {
+            column: [_to_parquet_value(type_name, row[idx] if idx < len(row) else None) for row in batch]
+            for idx, (column, type_name) in enumerate(zip(self.columns, self.column_types))
+        }
+        table = pa.Table.from_pydict(data, schema=self._parquet_writer.schema)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        """
+        写出剩余数据并关闭所有文件
+
+        Returns:
+            list: 已写出的文件路径
+        """
+        try:
+            if self._parquet_path is not None:
+                self._flush_parquet()
+        finally:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
+            self._parquet_path = None
+            for handle in (self._csv_file, self._jsonl_file):
+                if handle is not None:
+                    handle.close()
+            self._csv_file = self._csv_writer = self._jsonl_file = None
+        return self.paths
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+
+def export_table(output_file_path, columns, rows, formats, column_types=None):
+    """
+    把数据表导出为指定的各种格式
+
+    Args:
+        output_file_path (str): 报表的xlsx输出路径，导出文件与其同名、扩展名不同
+        columns (list): 列名
+        rows (iterable): 行数据，只遍历一次
+        formats (list): 表格导出格式
+        column_types (list, optional): 各列的Parquet类型，取值见PARQUET_TYPES
+
+    Returns:
+        list: 已写出的文件路径
+    """
+    if not formats:
+        return []
+    base_path = os.path.splitext(output_file_path)[0]
+    with TableExportWriter(base_path, columns, formats, column_types=column_types) as writer:
+        writer.write_rows(rows)
+    for path in writer.paths:
+        print(f"数据已导出: {path}")
+    return writer.paths
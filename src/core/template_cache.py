@@ -0,0 +1,168 @@
+"""
+报表模板缓存模块
+模板工作簿在每个进程中只解析一次，解析结果以pickle字节保存，每次使用时反序列化出一份独立副本，
+比重新解析xlsx（包括图表和样式）快一个数量级。
+配置缓存目录时解析结果同时持久化到磁盘，按模板文件内容的SHA1和openpyxl版本命名，
+模板被修改后自动失效。
+缓存目录可能是共享目录，持久化文件带有以当前用户本地密钥计算的HMAC签名，
+签名校验通过后才反序列化，其他人写入或篡改的文件视为缓存未命中。
+"""
+import hashlib
+import os
+import pickle
+import warnings
+
+import openpyxl
+from openpyxl import load_workbook
+
+from .cache_signing import SIGNATURE_SIZE, sign, verify
+
+# 进程内缓存：(模板路径, 解析函数) -> (修改时间, 文件大小, 解析结果的pickle字节)
+_parsed_templates = {}
+
+
+def _template_warning_handler(message, category, filename, lineno, file=None, line=None):
+    """自定义警告处理器，提供更详细的图表外部数据引用错误信息"""
+    if "externalData" in str(message) and "id should be" in str(message):
+        # 对于图表外部数据引用问题，提供更友好的提示信息
+        print("信息: 检测到Excel模板中的图表存在外部数据引用")
+        print("  问题描述:", str(message))
+        print("  详细解释: 这是Excel模板中图表的一个技术性问题，不是数据源引用错误。")
+        print("            openpyxl在读取包含图表的Excel文件时无法正确处理某些外部数据引用，")
+        print("            但这不影响我们生成的报表，因为程序会在处理过程中修复这些问题。")
+        print("  建议措施: 可以安全忽略此警告，它不会影响最终生成的报表文件。")
+        print("  详细位置: 文件 %s, 行 %s" % (filename, lineno))
+        print("")
+    else:
+        # 其他警告使用默认处理方式
+        print("警告:", str(message))
+
+
+def _parse_template(template_path, loader):
+    """
+    解析模板工作簿并序列化
+
+    Args:
+        template_path (str): 模板文件路径
+        loader (callable): 解析模板的函数
+
+    Returns:
+        bytes: 工作簿的pickle字节
+    """
+    # 临时设置自定义警告处理器
+    old_showwarning = warnings.showwarning
+    warnings.showwarning = _template_warning_handler
+    try:
+        wb = loader(template_path)
+    finally:
+        # 恢复原来的警告处理器
+        warnings.showwarning = old_showwarning
+    try:
+        return pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        wb.close()
+
+
+def template_digest(template_path):
+    """
+    计算模板文件内容的SHA1摘要
+
+    Args:
+        template_path (str): 模板文件路径
+
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha1()
+    with open(template_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _persisted_path(cache_dir, template_path):
+    """
+    计算模板解析结果的持久化文件路径
+
+    Args:
+        cache_dir (str): 缓存目录
+        template_path (str): 模板文件路径
+
+    Returns:
+        str: 缓存文件路径，文件名包含模板内容摘要和openpyxl版本
+    """
+    name = os.path.splitext(os.path.basename(template_path))[0]
+    return os.path.join(
+        cache_dir, f"{name}.{template_digest(template_path)}.openpyxl-{openpyxl.__version__}.pickle"
+    )
+
+
+def _load_parsed(template_path, cache_dir, loader):
+    """
+    读取模板解析结果：优先使用持久化文件，不存在时解析模板并写入缓存目录
+
+    Args:
+        template_path (str): 模板文件路径
+        cache_dir (str): 缓存目录，为空时不持久化
+        loader (callable): 解析模板的函数
+
+    Returns:
+        bytes: 工作簿的pickle字节
+    """
+    if not cache_dir:
+        return _parse_template(template_path, loader)
+
+    cache_file = _persisted_path(cache_dir, template_path)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "rb") as f:
+                signature = f.read(SIGNATURE_SIZE)
+                payload = f.read()
+            # 签名校验通过（由当前用户写入且未被修改）后才反序列化
+            if not verify(os.path.basename(cache_file), signature, payload):
+                raise ValueError("缓存文件签名校验失败")
+            pickle.loads(payload).close()
+            return payload
+        except Exception as e:
+            print(f"读取模板缓存失败，将重新解析模板: {e}")
+
+    payload = _parse_template(template_path, loader)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(sign(os.path.basename(cache_file), payload))
+            f.write(payload)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"写入模板缓存失败: {e}")
+    return payload
+
+
+def load_template(template_path, cache_dir=None, loader=load_workbook):
+    """
+    获取模板工作簿的独立副本
+
+    同一进程内模板文件未修改（修改时间和大小不变）时不再重新解析，
+    直接从缓存的pickle字节反序列化出新的工作簿，调用方可以任意修改和保存。
+
+    Args:
+        template_path (str): 模板文件路径
+        cache_dir (str, optional): 持久化缓存目录，配置后解析结果跨进程、跨运行复用
+        loader (callable): 解析模板的函数，默认为openpyxl.load_workbook
+
+    Returns:
+        Workbook: 模板工作簿副本
+    """
+    stat = os.stat(template_path)
+    cache_key = (template_path, loader)
+    cached = _parsed_templates.get(cache_key)
+    if cached is None or cached[0] != stat.st_mtime_ns or cached[1] != stat.st_size:
+        cached = (stat.st_mtime_ns, stat.st_size, _load_parsed(template_path, cache_dir, loader))
+        _parsed_templates[cache_key] = cached
+    return pickle.loads(cached[2])
+
+
+def clear_template_cache():
+    """清空进程内的模板缓存"""
+    _parsed_templates.clear()
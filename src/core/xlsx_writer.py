@@ -0,0 +1,487 @@
+"""
+轻量XLSX写出模块
+库存报表和消耗误差报表的版式固定：标题行、列标题行、若干数据行、少量说明文字和一个折线图。
+DirectWorkbook只实现这些报表用到的工作表接口（append、cell、merge_cells、column_dimensions、add_chart），
+保存时直接把工作表XML、共享字符串、样式和图表部件写入zip，不经过openpyxl的对象模型和序列化，
+生成的版式与openpyxl一致（单元格位置、合并区域、列宽、字体、对齐、数字格式和图表）。
+图表必须是由图表模板生成的StampedChart。
+"""
+import datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape, quoteattr
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.datetime import to_excel
+from openpyxl.writer.theme import theme_xml
+
+from .chart_templates import StampedChart, save_workbook
+
+# 可选的报表写出后端
+WRITER_BACKENDS = ("openpyxl", "direct")
+
+# 厘米转换为EMU（图表锚点尺寸单位）
+_EMU_PER_CM = 360000
+
+# 与openpyxl一致的日期和日期时间数字格式
+_DATE_FORMAT = "yyyy-mm-dd"
+_DATETIME_FORMAT = "yyyy-mm-dd h:mm:ss"
+
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_CONTENT_TYPES = (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '<Override PartName="/xl/theme/theme1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.theme+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '{chart_parts}'
+    '</Types>'
+)
+
+_CHART_CONTENT_TYPES = (
+    '<Override PartName="/xl/drawings/drawing1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.drawing+xml"/>'
+    '<Override PartName="/xl/charts/chart1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.drawingml.chart+xml"/>'
+)
+
+_ROOT_RELS = (
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_WORKBOOK_RELS = (
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="/xl/worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+    f'<Relationship Id="rId3" Type="{_REL_NS}/theme" Target="theme/theme1.xml"/>'
+    f'<Relationship Id="rId4" Type="{_REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+
+_SHEET_RELS = (
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/drawing" Target="/xl/drawings/drawing1.xml"/>'
+    '</Relationships>'
+)
+
+_DRAWING_RELS = (
+    f'<Relationships xmlns="{_PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{_REL_NS}/chart" Target="/xl/charts/chart1.xml"/>'
+    '</Relationships>'
+)
+
+_DRAWING = (
+    '<wsDr xmlns="http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing" '
+    'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+    'xmlns:c="http://schemas.openxmlformats.org/drawingml/2006/chart" '
+    f'xmlns:r="{_REL_NS}">'
+    '<oneCellAnchor><from><col>{col}</col><colOff>0</colOff><row>{row}</row><rowOff>0</rowOff></from>'
+    '<ext cx="{cx}" cy="{cy}"/>'
+    '<graphicFrame><nvGraphicFramePr><cNvPr id="1" name="Chart 1"/><cNvGraphicFramePr/></nvGraphicFramePr>'
+    '<xfrm/><a:graphic><a:graphicData uri="http://schemas.openxmlformats.org/drawingml/2006/chart">'
+    '<c:chart r:id="rId1"/></a:graphicData></a:graphic></graphicFrame><clientData/></oneCellAnchor>'
+    '</wsDr>'
+)
+
+
+class _DirectCell:
+    """单元格：值、字体、对齐方式"""
+
+    __slots__ = ("value", "font", "alignment")
+
+    def __init__(self, value=None):
+        self.value = value
+        self.font = None
+        self.alignment = None
+
+
+class _ColumnDimension:
+    """列宽和隐藏设置"""
+
+    __slots__ = ("width", "hidden")
+
+    def __init__(self):
+        self.width = None
+        self.hidden = False
+
+
+class _ColumnDimensions(dict):
+    """按列字母访问列宽设置，不存在时自动创建"""
+
+    def __missing__(self, key):
+        dimension = _ColumnDimension()
+        self[key] = dimension
+        return dimension
+
+
+class DirectWorksheet:
+    """DirectWorkbook的工作表，接口与openpyxl工作表中报表用到的部分一致"""
+
+    def __init__(self, title="Sheet"):
+        self.title = title
+        self.column_dimensions = _ColumnDimensions()
+        self._rows = {}
+        self._current_row = 0
+        self._merged = []
+        self._chart = None
+        self._chart_anchor = None
+
+    def cell(self, row, column, value=None):
+        """
+        获取单元格，不存在时创建
+
+        Args:
+            row (int): 行号（从1开始）
+            column (int): 列号（从1开始）
+            value: 单元格值，提供时写入
+
+        Returns:
+            _DirectCell: 单元格
+        """
+        cells = self._rows.setdefault(row, {})
+        cell = cells.get(column)
+        if cell is None:
+            cell = cells[column] = _DirectCell()
+            if row > self._current_row:
+                self._current_row = row
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def append(self, values):
+        """
+        在当前最后一行之后追加一行
+
+        Args:
+            values (iterable): 单元格值
+        """
+        row = self._current_row + 1
+        self._rows[row] = {column: _DirectCell(value) for column, value in enumerate(values, 1)}
+        self._current_row = row
+
+    def merge_cells(self, start_row, start_column, end_row, end_column):
+        """
+        合并单元格区域
+
+        Args:
+            start_row (int): 起始行
+            start_column (int): 起始列
+            end_row (int): 结束行
+            end_column (int): 结束列
+        """
+        self._merged.append(
+            f"{get_column_letter(start_column)}{start_row}:{get_column_letter(end_column)}{end_row}"
+        )
+
+    def add_chart(self, chart, anchor):
+        """
+        添加图表，每个工作表只支持一个由图表模板生成的图表
+
+        Args:
+            chart (StampedChart): 图表
+            anchor (str): 左上角单元格，例如 "E5"
+
+        Raises:
+            TypeError: 图表不是StampedChart
+            ValueError: 工作表中已经有图表
+        """
+        if not isinstance(chart, StampedChart):
+            raise TypeError("DirectWorkbook只支持由图表模板生成的图表")
+        if self._chart is not None:
+            raise ValueError("DirectWorkbook的每个工作表只支持一个图表")
+        self._chart = chart
+        self._chart_anchor = anchor
+
+
+class _StyleTable:
+    """收集单元格使用的字体、对齐方式和数字格式组合，生成styles.xml"""
+
+    def __init__(self):
+        # 默认字体与openpyxl一致
+        self._fonts = ['<font><name val="Calibri"/><family val="2"/><color theme="1"/><sz val="11"/>'
+                       '<scheme val="minor"/></font>']
+        self._font_ids = {None: 0}
+        self._num_fmts = {}
+        self._xfs = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+        self._xf_ids = {(0, None, 0): 0}
+
+    def _font_id(self, font):
+        if font is None:
+            return 0
+        color = getattr(font.color, "rgb", None) if font.color is not None else None
+        key = (font.name, font.b, font.i, font.sz, color if isinstance(color, str) else None)
+        font_id = self._font_ids.get(key)
+        if font_id is None:
+            name, bold, italic, size, rgb = key
+            parts = []
+            if name:
+                parts.append(f"<name val={quoteattr(name)}/>")
+            if bold:
+                parts.append('<b val="1"/>')
+            if italic:
+                parts.append('<i val="1"/>')
+            if rgb:
+                parts.append(f'<color rgb="{rgb}"/>')
+            if size:
+                parts.append(f'<sz val="{size:g}"/>')
+            font_id = self._font_ids[key] = len(self._fonts)
+            self._fonts.append(f"<font>{''.join(parts)}</font>")
+        return font_id
+
+    def _num_fmt_id(self, number_format):
+        if number_format is None:
+            return 0
+        fmt_id = self._num_fmts.get(number_format)
+        if fmt_id is None:
+            fmt_id = self._num_fmts[number_format] = 164 + len(self._num_fmts)
+        return fmt_id
+
+    def style_id(self, font, alignment, number_format):
+        """
+        获取单元格样式索引
+
+        Args:
+            font (Font): openpyxl字体，可为None
+            alignment (Alignment): openpyxl对齐方式，可为None
+            number_format (str): 数字格式，可为None
+
+        Returns:
+            int: cellXfs中的索引
+        """
+        if font is None and alignment is None and number_format is None:
+            return 0
+        align_key = None
+        if alignment is not None:
+            align_key = (alignment.horizontal, alignment.vertical, bool(alignment.wrap_text))
+        key = (self._font_id(font), align_key, self._num_fmt_id(number_format))
+        xf_id = self._xf_ids.get(key)
+        if xf_id is None:
+            font_id, align_key, fmt_id = key
+            attrs = f'numFmtId="{fmt_id}" fontId="{font_id}" fillId="0" borderId="0" xfId="0"'
+            if fmt_id:
+                attrs += ' applyNumberFormat="1"'
+            if font_id:
+                attrs += ' applyFont="1"'
+            if align_key is None:
+                xf = f"<xf {attrs}/>"
+            else:
+                horizontal, vertical, wrap = align_key
+                align_attrs = ""
+                if horizontal:
+                    align_attrs += f' horizontal="{horizontal}"'
+                if vertical:
+                    align_attrs += f' vertical="{vertical}"'
+                if wrap:
+                    align_attrs += ' wrapText="1"'
+                xf = f'<xf {attrs} applyAlignment="1"><alignment{align_attrs}/></xf>'
+            xf_id = self._xf_ids[key] = len(self._xfs)
+            self._xfs.append(xf)
+        return xf_id
+
+    def to_xml(self):
+        """生成styles.xml内容"""
+        parts = [f'<styleSheet xmlns="{_MAIN_NS}">']
+        if self._num_fmts:
+            parts.append(f'<numFmts count="{len(self._num_fmts)}">')
+            for code, fmt_id in self._num_fmts.items():
+                parts.append(f'<numFmt numFmtId="{fmt_id}" formatCode={quoteattr(code)}/>')
+            parts.append("</numFmts>")
+        parts.append(f'<fonts count="{len(self._fonts)}">{"".join(self._fonts)}</fonts>')
+        parts.append('<fills count="2"><fill><patternFill/></fill>'
+                     '<fill><patternFill patternType="gray125"/></fill></fills>')
+        parts.append('<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>')
+        parts.append('<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>')
+        parts.append(f'<cellXfs count="{len(self._xfs)}">{"".join(self._xfs)}</cellXfs>')
+        parts.append('<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>')
+        parts.append("</styleSheet>")
+        return "".join(parts)
+
+
+class DirectWorkbook:
+    """只包含一个工作表的轻量工作簿，保存时直接写出xlsx各部件"""
+
+    def __init__(self):
+        self.active = DirectWorksheet()
+
+    def close(self):
+        """与openpyxl工作簿接口一致，没有需要释放的资源"""
+
+    def save(self, filename):
+        """
+        写出xlsx文件
+
+        Args:
+            filename (str): 输出文件路径
+        """
+        ws = self.active
+        styles = _StyleTable()
+        shared_strings = {}
+
+        with ZipFile(filename, "w", ZIP_DEFLATED, allowZip64=True) as archive:
+            with archive.open("xl/worksheets/sheet1.xml", "w") as stream:
+                self._write_sheet(ws, stream, styles, shared_strings)
+
+            archive.writestr("[Content_Types].xml", _CONTENT_TYPES.format(
+                chart_parts=_CHART_CONTENT_TYPES if ws._chart is not None else ""
+            ))
+            archive.writestr("_rels/.rels", _ROOT_RELS)
+            archive.writestr("xl/workbook.xml", (
+                f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}"><workbookPr/>'
+                '<bookViews><workbookView activeTab="0"/></bookViews>'
+                f'<sheets><sheet name={quoteattr(ws.title)} sheetId="1" state="visible" r:id="rId1"/></sheets>'
+                '<calcPr calcId="124519" fullCalcOnLoad="1"/></workbook>'
+            ))
+            archive.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+            archive.writestr("xl/styles.xml", styles.to_xml())
+            archive.writestr("xl/theme/theme1.xml", theme_xml)
+            strings = "".join(
+                f'<si><t xml:space="preserve">{escape(text)}</t></si>' for text in shared_strings
+            )
+            archive.writestr("xl/sharedStrings.xml", (
+                f'<sst xmlns="{_MAIN_NS}" uniqueCount="{len(shared_strings)}">{strings}</sst>'
+            ))
+
+            if ws._chart is not None:
+                col, row = _anchor_offsets(ws._chart_anchor)
+                archive.writestr("xl/worksheets/_rels/sheet1.xml.rels", _SHEET_RELS)
+                archive.writestr("xl/drawings/drawing1.xml", _DRAWING.format(
+                    col=col, row=row,
+                    cx=int(ws._chart.width * _EMU_PER_CM), cy=int(ws._chart.height * _EMU_PER_CM),
+                ))
+                archive.writestr("xl/drawings/_rels/drawing1.xml.rels", _DRAWING_RELS)
+                archive.writestr("xl/charts/chart1.xml", ws._chart._xml)
+
+    @staticmethod
+    def _write_sheet(ws, stream, styles, shared_strings):
+        """逐行把工作表XML写入zip条目"""
+        max_column = max((max(cells) for cells in ws._rows.values() if cells), default=1)
+        for merged in ws._merged:
+            end = merged.split(":")[1].rstrip("0123456789")
+            max_column = max(max_column, _column_index(end))
+        max_row = max(ws._rows, default=1)
+
+        head = [
+            f'<worksheet xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">',
+            '<sheetPr><outlinePr summaryBelow="1" summaryRight="1"/><pageSetUpPr/></sheetPr>',
+            f'<dimension ref="A1:{get_column_letter(max_column)}{max_row}"/>',
+            '<sheetViews><sheetView workbookViewId="0"><selection activeCell="A1" sqref="A1"/></sheetView></sheetViews>',
+            '<sheetFormatPr baseColWidth="8" defaultRowHeight="15"/>',
+        ]
+        columns = sorted(
+            (_column_index(letter), dimension.width, dimension.hidden)
+            for letter, dimension in ws.column_dimensions.items()
+            if dimension.width is not None or dimension.hidden
+        )
+        if columns:
+            head.append("<cols>")
+            for index, width, hidden in columns:
+                width_attr = f' width="{width:g}" customWidth="1"' if width is not None else ' width="13"'
+                hidden_attr = ' hidden="1"' if hidden else ""
+                head.append(f'<col min="{index}" max="{index}"{width_attr}{hidden_attr}/>')
+            head.append("</cols>")
+        head.append("<sheetData>")
+        stream.write("".join(head).encode("utf-8"))
+
+        for row in sorted(ws._rows):
+            cells = ws._rows[row]
+            parts = [f'<row r="{row}">']
+            for column in sorted(cells):
+                cell = cells[column]
+                value = cell.value
+                ref = f"{get_column_letter(column)}{row}"
+                number_format = None
+                if isinstance(value, datetime.datetime):
+                    number_format = _DATETIME_FORMAT
+                elif isinstance(value, datetime.date):
+                    number_format = _DATE_FORMAT
+                style = styles.style_id(cell.font, cell.alignment, number_format)
+                style_attr = f' s="{style}"' if style else ""
+                if value is None:
+                    if style:
+                        parts.append(f'<c r="{ref}"{style_attr}/>')
+                    continue
+                if isinstance(value, bool):
+                    parts.append(f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>')
+                elif isinstance(value, (int, float, Decimal)):
+                    parts.append(f'<c r="{ref}"{style_attr} t="n"><v>{value}</v></c>')
+                elif isinstance(value, datetime.date):
+                    parts.append(f'<c r="{ref}"{style_attr} t="n"><v>{to_excel(value)}</v></c>')
+                else:
+                    text = str(value)
+                    index = shared_strings.setdefault(text, len(shared_strings))
+                    parts.append(f'<c r="{ref}"{style_attr} t="s"><v>{index}</v></c>')
+            parts.append("</row>")
+            stream.write("".join(parts).encode("utf-8"))
+
+        tail = ["</sheetData>"]
+        if ws._merged:
+            tail.append(f'<mergeCells count="{len(ws._merged)}">')
+            tail.extend(f'<mergeCell ref="{merged}"/>' for merged in ws._merged)
+            tail.append("</mergeCells>")
+        tail.append('<pageMargins left="0.75" right="0.75" top="1" bottom="1" header="0.5" footer="0.5"/>')
+        if ws._chart is not None:
+            tail.append('<drawing r:id="rId1"/>')
+        tail.append("</worksheet>")
+        stream.write("".join(tail).encode("utf-8"))
+
+
+def _column_index(letters):
+    """列字母转换为列号"""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    return index
+
+
+def _anchor_offsets(anchor):
+    """单元格地址转换为从0开始的列、行偏移"""
+    letters = anchor.rstrip("0123456789")
+    return _column_index(letters) - 1, int(anchor[len(letters):]) - 1
+
+
+def create_workbook(backend="openpyxl"):
+    """
+    按写出后端创建工作簿
+
+    Args:
+        backend (str): "openpyxl" 或 "direct"
+
+    Returns:
+        Workbook or DirectWorkbook: 工作簿
+
+    Raises:
+        ValueError: 不支持的写出后端
+    """
+    if backend in (None, "openpyxl"):
+        return Workbook()
+    if backend == "direct":
+        return DirectWorkbook()
+    raise ValueError(f"不支持的报表写出后端: {backend}，可选值: {', '.join(WRITER_BACKENDS)}")
+
+
+def save_report_workbook(workbook, filename):
+    """
+    保存create_workbook创建的工作簿
+
+    Args:
+        workbook (Workbook or DirectWorkbook): 工作簿
+        filename (str): 输出文件路径
+    """
+    if isinstance(workbook, DirectWorkbook):
+        workbook.save(filename)
+    else:
+        save_workbook(workbook, filename)
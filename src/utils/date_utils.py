@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 
 def parse_date(date_str):
@@ -226,4 +226,140 @@ def validate_date_span(row):
         print(f"日期跨度错误: 从 {row['start_date']} 到 {row['end_date']} 的日期范围超过了1个月")
         return False
     
-    return True
\ No newline at end of file
+    return True
+
+
+class CalendarDimension:
+    """
+    预计算的日历维度表
+
+    按日序号（date.toordinal()）预先计算每一天的日期、月份键（"YYYY-MM"）、月份序号
+    （year * 12 + month - 1）、ISO周（iso_year, iso_week）及周键、季度键，报表中的分桶和补齐日期
+    都通过查表完成，避免逐行格式化和解析日期字符串。查询超出已计算范围时自动扩展。
+    """
+
+    def __init__(self, start_date, end_date):
+        """
+        初始化日历维度
+
+        Args:
+            start_date (date): 开始日期（含）
+            end_date (date): 结束日期（含）
+        """
+        self._build(_as_date(start_date), _as_date(end_date))
+
+    def _build(self, start_date, end_date):
+        """计算[start_date, end_date]范围内的日历数据"""
+        self.first_ordinal = start_date.toordinal()
+        self.last_ordinal = end_date.toordinal()
+        self.dates = [date.fromordinal(ordinal) for ordinal in range(self.first_ordinal, self.last_ordinal + 1)]
+        self.month_indexes = [day.year * 12 + day.month - 1 for day in self.dates]
+        # 月份键按月份序号共享同一字符串对象
+        month_key_cache = {}
+        self.month_keys = []
+        for day, month_index in zip(self.dates, self.month_indexes):
+            if month_index not in month_key_cache:
+                month_key_cache[month_index] = f"{day.year:04d}-{day.month:02d}"
+            self.month_keys.append(month_key_cache[month_index])
+        self.iso_weeks = [tuple(day.isocalendar())[:2] for day in self.dates]
+        self.week_keys = [f"{iso_year:04d}-W{iso_week:02d}" for iso_year, iso_week in self.iso_weeks]
+        self.quarter_keys = [
+            f"{month_index // 12:04d}-Q{month_index % 12 // 3 + 1}" for month_index in self.month_indexes
+        ]
+
+    def _position(self, value):
+        """返回日期在维度表中的位置，超出范围时扩展维度表"""
+        ordinal = value.toordinal()
+        if ordinal < self.first_ordinal or ordinal > self.last_ordinal:
+            self._build(
+                date.fromordinal(min(ordinal, self.first_ordinal)),
+                date.fromordinal(max(ordinal, self.last_ordinal)),
+            )
+        return ordinal - self.first_ordinal
+
+    def day(self, value):
+        """
+        查询某一天的日历属性
+
+        Args:
+            value (date or datetime): 日期
+
+        Returns:
+            tuple: (date, 月份键, 月份序号, ISO周)
+        """
+        position = self._position(value)
+        return (
+            self.dates[position],
+            self.month_keys[position],
+            self.month_indexes[position],
+            self.iso_weeks[position],
+        )
+
+    def month_key(self, value):
+        """返回日期所属月份键，例如 "2025-07" """
+        position = self._position(value)
+        return self.month_keys[position]
+
+    def month_index(self, value):
+        """返回日期所属月份序号 year * 12 + month - 1"""
+        position = self._position(value)
+        return self.month_indexes[position]
+
+    def iso_week(self, value):
+        """返回日期所属ISO周 (iso_year, iso_week)"""
+        position = self._position(value)
+        return self.iso_weeks[position]
+
+    def week_key(self, value):
+        """返回日期所属ISO周键，例如 "2025-W29" """
+        position = self._position(value)
+        return self.week_keys[position]
+
+    def quarter_key(self, value):
+        """返回日期所属季度键，例如 "2025-Q3" """
+        position = self._position(value)
+        return self.quarter_keys[position]
+
+    def date_range(self, start_date, end_date):
+        """
+        返回[start_date, end_date]内的所有日期，用于补齐缺失日期
+
+        Args:
+            start_date (date or datetime): 开始日期
+            end_date (date or datetime): 结束日期
+
+        Returns:
+            list: 日期列表，开始日期晚于结束日期时为空列表
+        """
+        if start_date > end_date:
+            return []
+        self._position(end_date)
+        start = self._position(start_date)
+        end = self._position(end_date)
+        return self.dates[start:end + 1]
+
+    def month_range(self, start_date, end_date):
+        """
+        返回[start_date, end_date]覆盖的所有月份键
+
+        Args:
+            start_date (date or datetime): 开始日期
+            end_date (date or datetime): 结束日期
+
+        Returns:
+            list: 按时间排序的月份键列表
+        """
+        if start_date > end_date:
+            return []
+        first = self.month_index(start_date)
+        last = self.month_index(end_date)
+        return [f"{index // 12:04d}-{index % 12 + 1:02d}" for index in range(first, last + 1)]
+
+
+def _as_date(value):
+    """将datetime转换为date，date对象原样返回"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+# 共享的日历维度，覆盖常用的报表年份，超出范围时自动扩展
+default_calendar = CalendarDimension(date(2020, 1, 1), date(2035, 12, 31))
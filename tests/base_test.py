@@ -2,12 +2,74 @@ import os
 import sys
 import tempfile
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from unittest.mock import MagicMock, Mock, patch
 
 # 添加项目根目录到sys.path，确保能正确导入模块
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+from src.core import cache_signing
+
+# 订单记录查询结果的列名
+ORDER_COLUMNS = ["加注时间", "油品名称", "油加注值", "原油剩余量"]
+
+
+def make_order_rows(start, days, orders, inventory, loss=0.0, refill=None, skip=None):
+    """
+    生成按时间升序排列的订单记录 (加注时间, 油品名称, 油加注值, 原油剩余量)
+
+    Args:
+        start (date): 第一天
+        days (int): 天数
+        orders (tuple): 每天的订单 ((小时, 油加注值), ...)
+        inventory (float): 初始库存
+        loss (float): 每条订单在油加注值之外额外消耗的库存
+        refill (callable, optional): 按天序号返回当天第一条订单前的加油量
+        skip (callable, optional): 按天序号判断当天是否没有数据
+
+    Returns:
+        list: 订单记录
+    """
+    rows = []
+    for offset in range(days):
+        if skip is not None and skip(offset):
+            continue
+        day = datetime.combine(start + timedelta(days=offset), datetime.min.time())
+        if refill is not None:
+            inventory += refill(offset)
+        for hour, oil_val in orders:
+            inventory -= oil_val + loss
+            rows.append((day.replace(hour=hour), "切削液", oil_val, inventory))
+    return rows
+
+
+class FakeDbHandler:
+    """按日期范围过滤固定订单记录的模拟数据库处理器，记录查询范围，水位为行数"""
+
+    def __init__(self, rows, watermark_available=True):
+        self.rows = rows
+        self.watermark_available = watermark_available
+        self.calls = []
+
+    @property
+    def fetch_count(self):
+        """原始数据查询次数"""
+        return len(self.calls)
+
+    def fetch_source_watermark(self, device_id, query_template, start_date, end_date):
+        return (str(len(self.rows)),) if self.watermark_available else None
+
+    def fetch_generic_data(self, device_id, query_template, start_date, end_date):
+        self.calls.append((start_date, end_date))
+        start = datetime.strptime(start_date, "%Y-%m-%d")
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        rows = [row for row in self.rows if start <= row[0] < end]
+        inventory = {}
+        for row in rows:
+            inventory[row[0].date()] = row[3]
+        # 与库存查询一致，按加注时间降序返回
+        return sorted(inventory.items()), ORDER_COLUMNS, list(reversed(rows))
+
 
 class BaseTestCase(unittest.TestCase):
     """测试基类，提供通用的测试工具和方法"""
@@ -16,6 +78,16 @@ class BaseTestCase(unittest.TestCase):
         """测试前准备"""
         # 创建临时目录用于测试输出
         self.test_output_dir = tempfile.mkdtemp()
+        # 缓存签名密钥写入测试目录，不使用真实的用户主目录
+        key_patcher = patch.object(cache_signing, "SIGNING_KEY_PATH", os.path.join(self.test_output_dir, "cache.key"))
+        key_patcher.start()
+        self.addCleanup(key_patcher.stop)
+        # 报表执行器完成回调记录的 (任务键, 结果, 异常)
+        self.done = []
+
+    def record_task_done(self, key, result, error, error_traceback):
+        """报表执行器的完成回调，按完成顺序记录到self.done"""
+        self.done.append((key, result, error))
 
     def tearDown(self):
         """测试后清理"""
@@ -0,0 +1,103 @@
+"""
+core.aggregate_cache 模块及聚合结果缓存读取的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.aggregate_cache import AggregateCache, aggregate_key
+from src.core.data_manager import ReportDataManager
+from tests.base_test import BaseTestCase, FakeDbHandler, make_order_rows
+
+QUERY = "SELECT * FROM oil.t_inventory WHERE device_id = {device_id}"
+# 每天三条订单记录
+ORDERS = ((9, 4.0), (14, 4.0), (19, 4.0))
+
+
+def make_rows(days):
+    """从2025-07-20开始生成每天三条记录的测试数据"""
+    return make_order_rows(date(2025, 7, 20), days, ORDERS, 600.0, loss=0.5)
+
+
+class TestAggregateCache(BaseTestCase):
+    """AggregateCache 及 ReportDataManager.fetch_device_aggregates 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.cache = AggregateCache(os.path.join(self.test_output_dir, "aggregates.db"))
+
+    def tearDown(self):
+        self.cache.close()
+        super().tearDown()
+
+    def test_put_and_get(self):
+        """测试按内容地址写入和读取"""
+        key = aggregate_key(1, "2025-07-01", "2025-07-31", "abc", ("10",))
+        self.assertNotEqual(key, aggregate_key(1, "2025-07-01", "2025-07-31", "abc", ("11",)))
+        self.assertIsNone(self.cache.get(key, "daily_usage"))
+        self.cache.put(key, "daily_usage", [(date(2025, 7, 1), 3.5)])
+        self.assertEqual(self.cache.get(key, "daily_usage"), [(date(2025, 7, 1), 3.5)])
+
+    def test_unsigned_payload_is_not_unpickled(self):
+        """测试被他人写入或篡改、签名不匹配的缓存内容不被反序列化"""
+        key = aggregate_key(1, "2025-07-01", "2025-07-31", "abc", ("10",))
+        self.cache.put(key, "daily_usage", [(date(2025, 7, 1), 3.5)])
+        self.cache.put(key, "daily_states", {})
+        with self.cache._conn:
+            # 把另一类结果的签名内容整体复制过来：签名与缓存键和类型绑定，同样校验失败
+            self.cache._conn.execute(
+                "UPDATE aggregate_cache SET payload = (SELECT payload FROM aggregate_cache WHERE kind = 'daily_states') "
+                "WHERE kind = 'daily_usage'"
+            )
+        with patch("src.core.aggregate_cache.pickle.loads") as loads:
+            self.assertIsNone(self.cache.get(key, "daily_usage"))
+        loads.assert_not_called()
+
+    def test_rerun_skips_fetch_and_applies_barrel_count(self):
+        """测试再次运行时跳过数据读取，桶数在缓存结果上换算"""
+        db_handler = FakeDbHandler(make_rows(15))
+        kinds = ("inventory_data", "daily_usage", "daily_states")
+        first = ReportDataManager(db_handler, aggregate_cache=self.cache).fetch_device_aggregates(
+            1, QUERY, "2025-07-20", "2025-08-03", kinds
+        )
+        manager = ReportDataManager(db_handler, aggregate_cache=self.cache)
+        second = manager.fetch_device_aggregates(1, QUERY, "2025-07-20", "2025-08-03", kinds)
+
+        self.assertEqual(db_handler.fetch_count, 1)
+        self.assertEqual(first, second)
+        self.assertTrue(second["has_oil_name_column"])
+        self.assertEqual(second["oil_name"], "切削液")
+
+        raw_data = db_handler.fetch_generic_data(1, QUERY, "2025-07-20", "2025-08-03")
+        self.assertEqual(
+            manager.calculate_daily_errors(None, 3, daily_states=second["daily_states"]),
+            manager.calculate_daily_errors(raw_data, 3),
+        )
+
+    def test_source_change_invalidates_cache(self):
+        """测试源数据水位变化或无法获取水位时重新读取"""
+        db_handler = FakeDbHandler(make_rows(5))
+        ReportDataManager(db_handler, aggregate_cache=self.cache).fetch_device_aggregates(
+            1, QUERY, "2025-07-20", "2025-07-25"
+        )
+        db_handler.rows = make_rows(6)
+        aggregates = ReportDataManager(db_handler, aggregate_cache=self.cache).fetch_device_aggregates(
+            1, QUERY, "2025-07-20", "2025-07-25"
+        )
+        self.assertEqual(db_handler.fetch_count, 2)
+        self.assertEqual(len(aggregates["daily_states"]), 6)
+
+        db_handler.watermark_available = False
+        ReportDataManager(db_handler, aggregate_cache=self.cache).fetch_device_aggregates(
+            1, QUERY, "2025-07-20", "2025-07-25"
+        )
+        self.assertEqual(db_handler.fetch_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+core.chart_downsample 模块的单元测试
+"""
+import math
+import os
+import re
+import sys
+import unittest
+import zipfile
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.chart_downsample import downsample_rows, lttb_indices, minmax_indices, parse_point_budget
+from src.core.inventory_handler import InventoryReportGenerator
+from tests.base_test import BaseTestCase
+
+
+class TestChartDownsample(BaseTestCase):
+    """图表降采样的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2025, 1, 1)
+        # 一整年的每日库存，第100天有一个尖峰
+        self.values = [500 + 200 * math.sin(day / 20) + (300 if day == 100 else 0) for day in range(365)]
+
+    def test_indices_keep_endpoints_and_spike(self):
+        """测试两种方法都保留首尾两点和尖峰，点数不超过预算"""
+        for select in (lttb_indices, minmax_indices):
+            indices = select(self.values, 60)
+            self.assertLessEqual(len(indices), 60)
+            self.assertEqual((indices[0], indices[-1]), (0, 364))
+            self.assertEqual(indices, sorted(set(indices)))
+            self.assertIn(100, indices)
+        self.assertEqual(len(lttb_indices(self.values, 60)), 60)
+        self.assertEqual(lttb_indices(self.values[:10], 60), list(range(10)))
+
+    def test_downsample_rows_and_budget(self):
+        """测试多个系列共用预算，未超过预算时不降采样，无效的预算和方法报错"""
+        rows = [[self.start_date + timedelta(days=day), value, -value] for day, value in enumerate(self.values)]
+        reduced = downsample_rows(rows, [1, 2], 100, "minmax")
+        self.assertLessEqual(len(reduced), 100)
+        self.assertEqual(reduced, sorted(reduced))
+        self.assertEqual(downsample_rows(rows, [1], None), rows)
+        with self.assertRaises(ValueError):
+            downsample_rows(rows, [1], 100, "average")
+
+        self.assertEqual(parse_point_budget(120, "inventory"), 120)
+        self.assertEqual(parse_point_budget({"inventory": 120}, "inventory"), 120)
+        self.assertIsNone(parse_point_budget({"inventory": 120}, "daily_error"))
+        self.assertIsNone(parse_point_budget(None, "inventory"))
+        for invalid in (2, "120", True):
+            with self.assertRaises(ValueError):
+                parse_point_budget(invalid, "inventory")
+
+    def test_inventory_chart_reads_hidden_range(self):
+        """测试库存报表的数据表保持完整，图表引用隐藏列中降采样后的数据，两种写出后端一致"""
+        inventory_data = [(self.start_date + timedelta(days=day), value) for day, value in enumerate(self.values)]
+        for backend in ("openpyxl", "direct"):
+            path = os.path.join(self.test_output_dir, f"{backend}.xlsx")
+            InventoryReportGenerator().generate_report(
+                inventory_data, path, device_code="DEV1", start_date=self.start_date,
+                end_date=self.start_date + timedelta(days=364), writer_backend=backend, chart_points=100,
+            )
+            with zipfile.ZipFile(path) as archive:
+                chart_xml = archive.read("xl/charts/chart1.xml").decode("utf-8")
+            self.assertIn("$AD$3:$AD$102", chart_xml)
+            self.assertIn("$AE$3:$AE$102", chart_xml)
+            self.assertEqual(re.findall(r'plotVisOnly val="(\w+)"', chart_xml), ["0"])
+
+            wb = load_workbook(path)
+            try:
+                ws = wb.active
+                self.assertEqual(ws.max_row, 367)
+                self.assertAlmostEqual(ws["B367"].value, self.values[-1])
+                self.assertTrue(ws.column_dimensions["AD"].hidden)
+                self.assertTrue(ws.column_dimensions["AE"].hidden)
+                self.assertEqual(ws["AE2"].value, "原油剩余量(L)")
+                self.assertAlmostEqual(ws["AE102"].value, self.values[-1])
+            finally:
+                wb.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
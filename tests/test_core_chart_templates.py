@@ -0,0 +1,66 @@
+"""
+core.chart_templates 模块的单元测试
+"""
+import os
+import sys
+import unittest
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.xml.functions import tostring
+
+from src.core.chart_templates import ChartTemplate, chart_template, save_workbook
+from src.core.consumption_error_handler import (
+    DailyConsumptionErrorReportGenerator,
+    MonthlyConsumptionErrorReportGenerator,
+)
+from src.core.inventory_handler import InventoryReportGenerator
+from tests.base_test import BaseTestCase
+
+
+class TestChartTemplates(BaseTestCase):
+    """ChartTemplate 与 save_workbook 的单元测试"""
+
+    def test_stamped_xml_matches_freshly_built_chart(self):
+        """测试替换生成的图表XML与逐个构建的图表序列化结果完全一致"""
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "误差 数据"
+        builders = [
+            lambda sheet, last_row, title: InventoryReportGenerator._build_chart(
+                sheet, last_row, title, {"line_color": "FF0000"}
+            ),
+            DailyConsumptionErrorReportGenerator._build_chart,
+            MonthlyConsumptionErrorReportGenerator._build_chart,
+        ]
+        for build_chart in builders:
+            template = ChartTemplate(build_chart)
+            for last_row in (4, 33, 368):
+                expected = tostring(build_chart(ws, last_row, "误差<分析>")._write()).decode("utf-8")
+                self.assertEqual(template.render(ws.title, last_row, "误差<分析>"), expected)
+
+    def test_saved_workbook_contains_stamped_charts(self):
+        """测试保存后的工作簿可以读回图表及其数据范围"""
+        template = chart_template(("test_daily_error",), DailyConsumptionErrorReportGenerator._build_chart)
+        self.assertIs(chart_template(("test_daily_error",), None), template)
+
+        wb = Workbook()
+        output_path = os.path.join(self.test_output_dir, "stamped_chart.xlsx")
+        for title in ("设备A", "设备B"):
+            ws = wb.create_sheet(title)
+            ws.add_chart(template.stamp(title, 12, "每日消耗误差分析"), "G5")
+        save_workbook(wb, output_path)
+
+        loaded = load_workbook(output_path)
+        try:
+            chart = loaded["设备B"]._charts[0]
+            self.assertEqual(len(chart.series), 3)
+            self.assertEqual(chart.series[0].val.numRef.f, "'设备B'!$B$3:$B$12")
+        finally:
+            loaded.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+core.combined_workbook 模块的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.combined_workbook import INDEX_SHEET_TITLE, CombinedWorkbook, CombinedWorkbookExecutor
+from src.core.report_controller import _render_report
+from tests.base_test import BaseTestCase
+
+
+class TestCombinedWorkbook(BaseTestCase):
+    """CombinedWorkbook 与 CombinedWorkbookExecutor 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2025, 1, 1)
+        self.end_date = date(2025, 1, 5)
+        self.inventory_data = [
+            (self.start_date + timedelta(days=offset), 400.0 - offset * 10) for offset in range(5)
+        ]
+
+    def _task(self, device_code, customer_name, inventory_data=()):
+        return ('inventory', {
+            'inventory_data': self.inventory_data if inventory_data == () else inventory_data,
+            'output_file_path': os.path.join(self.test_output_dir, f"{device_code}.xlsx"),
+            'device_code': device_code,
+            'customer_name': customer_name,
+            'start_date': self.start_date,
+            'end_date': self.end_date,
+            'oil_name': '机油',
+        })
+
+    def test_sheet_titles_are_valid_and_unique(self):
+        """测试工作表名称去除非法字符、截断并去重"""
+        combined = CombinedWorkbook(os.path.join(self.test_output_dir, "titles.xlsx"), "库存报表")
+        first = combined.add_sheet("A/B:C")
+        second = combined.add_sheet("A/B:C")
+        long_title = combined.add_sheet("X" * 40)
+        self.assertEqual(first.title, "A_B_C")
+        self.assertEqual(second.title, "A_B_C_2")
+        self.assertEqual(len(long_title.title), 31)
+
+        combined.discard(second)
+        self.assertEqual([entry['sheet'] for entry in combined.entries], ["A_B_C", "X" * 31])
+        self.assertNotIn("A_B_C_2", combined.workbook.sheetnames)
+        combined.workbook.close()
+
+    def test_customer_mode_writes_one_workbook_per_customer(self):
+        """测试按客户合并时每个客户一个工作簿，包含索引和每台设备的工作表及图表"""
+        executor = CombinedWorkbookExecutor("customer", self.test_output_dir, "库存报表")
+        executor.submit("DEV1", _render_report, self._task("DEV1", "客户A"), self.record_task_done)
+        executor.submit("DEV2", _render_report, self._task("DEV2", "客户A"), self.record_task_done)
+        executor.submit("DEV3", _render_report, self._task("DEV3", "客户B"), self.record_task_done)
+        # 生成失败的设备不出现在合并工作簿中
+        executor.submit("BAD", _render_report, self._task("BAD", "客户A", None), self.record_task_done)
+        self.assertEqual(self.done, [])
+        executor.shutdown()
+
+        path_a = os.path.join(self.test_output_dir, "客户A_2025-01-01_to_2025-01-05_库存报表.xlsx")
+        path_b = os.path.join(self.test_output_dir, "客户B_2025-01-01_to_2025-01-05_库存报表.xlsx")
+        self.assertEqual(
+            [(key, result) for key, result, error in self.done if error is None],
+            [("DEV1", path_a), ("DEV2", path_a), ("DEV3", path_b)],
+        )
+        self.assertEqual(self.done[-1][0], "BAD")
+        self.assertIsNotNone(self.done[-1][2])
+        self.assertFalse(os.path.exists(os.path.join(self.test_output_dir, "DEV1.xlsx")))
+
+        wb = load_workbook(path_a)
+        try:
+            self.assertEqual(wb.sheetnames, [INDEX_SHEET_TITLE, "DEV1", "DEV2"])
+            index = wb[INDEX_SHEET_TITLE]
+            self.assertEqual(index["B3"].value, "DEV1")
+            self.assertEqual(index["C4"].value, "客户A")
+            self.assertEqual(index["F4"].hyperlink.location, "'DEV2'!A1")
+            self.assertEqual(wb["DEV2"]["B3"].value, 400)
+            self.assertEqual(wb["DEV2"]._charts[0].series[0].val.numRef.f, "'DEV2'!$B$3:$B$7")
+        finally:
+            wb.close()
+
+    def test_run_mode_writes_single_workbook(self):
+        """测试整次运行合并时所有客户的设备写入同一个工作簿"""
+        executor = CombinedWorkbookExecutor("run", self.test_output_dir, "库存报表")
+        executor.submit("DEV1", _render_report, self._task("DEV1", "客户A"), self.record_task_done)
+        executor.submit("DEV2", _render_report, self._task("DEV2", "客户B"), self.record_task_done)
+        executor.wait()
+
+        path = os.path.join(self.test_output_dir, "全部设备_2025-01-01_to_2025-01-05_库存报表.xlsx")
+        self.assertEqual([result for _, result, _ in self.done], [path, path])
+        wb = load_workbook(path)
+        try:
+            self.assertEqual(wb.sheetnames, [INDEX_SHEET_TITLE, "DEV1", "DEV2"])
+        finally:
+            wb.close()
+
+    def test_unknown_mode_raises(self):
+        """测试不支持的合并输出模式会抛出异常"""
+        with self.assertRaises(ValueError):
+            CombinedWorkbookExecutor("device", self.test_output_dir, "库存报表")
+
+
+if __name__ == "__main__":
+    unittest.main()
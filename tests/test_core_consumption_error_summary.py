@@ -0,0 +1,111 @@
+"""
+core.consumption_error_handler 模块中误差汇总报表的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.consumption_error_handler import ConsumptionErrorSummaryGenerator
+from tests.base_test import BaseTestCase
+
+
+class TestConsumptionErrorSummary(BaseTestCase):
+    """ConsumptionErrorSummaryGenerator 数值模式的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.summary_data = [
+            {'device_code': 'D1', 'customer_name': '客户A', 'total_order_volume': 100.0,
+             'total_inventory_consumption': 101.0, 'days_in_range': 10, 'offline_events': []},
+            {'device_code': 'D2', 'customer_name': '客户B', 'total_order_volume': 200.0,
+             'total_inventory_consumption': 120.0, 'days_in_range': 10,
+             'offline_events': [{'create_time': datetime(2025, 1, 2), 'biz_type': 2,
+                                 'recovery_time': datetime(2025, 1, 3)}]},
+            {'device_code': 'D3', 'customer_name': '客户C', 'total_order_volume': 0,
+             'total_inventory_consumption': 5.0, 'days_in_range': 10, 'offline_events': [],
+             'barrel_count': 3},
+        ]
+
+    def _generate(self, filename="summary.xlsx", **kwargs):
+        output_path = os.path.join(self.test_output_dir, filename)
+        self.assertTrue(ConsumptionErrorSummaryGenerator().generate_report(
+            self.summary_data, output_path, start_date="2025-01-01", end_date="2025-01-10", **kwargs
+        ))
+        return load_workbook(output_path)
+
+    def test_values_mode_writes_numbers(self):
+        """测试数值模式按CSV和查询结果中的桶数计算G–J列，不写入逐行公式"""
+        wb = self._generate(summary_values=True, barrel_counts={'D2': 2})
+        try:
+            ws = wb["设备误差汇总"]
+            self.assertEqual([ws.cell(row=4, column=c).value for c in range(1, 11)],
+                             [1, 'D1', '客户A', 1, 100, 101, 101, 1, 0.1, 0.01])
+            self.assertEqual([ws.cell(row=5, column=c).value for c in range(4, 11)],
+                             [2, 200, 120, 240, 40, 4, 0.2])
+            self.assertEqual([ws.cell(row=6, column=c).value for c in (4, 7, 8, 10)], [3, 15, 15, 0])
+            self.assertEqual(ws["K5"].value, 24)
+            self.assertEqual(ws["L5"].value, "2025-01-02 00:00离线至2025-01-03 00:00恢复")
+            formulas = [
+                cell.coordinate for row in ws.iter_rows(min_row=4) for cell in row
+                if isinstance(cell.value, str) and cell.value.startswith("=")
+            ]
+            self.assertEqual(formulas, [])
+
+            ws_update = wb["非单桶设备编码"]
+            self.assertEqual([(ws_update.cell(row=r, column=1).value, ws_update.cell(row=r, column=2).value)
+                              for r in (4, 5)], [('D2', 2), ('D3', 3)])
+            self.assertIn("$B$4:$B$6", ws_update["C4"].value)
+            self.assertIsNone(ws_update["C6"].value)
+        finally:
+            wb.close()
+
+    def test_formula_mode_unchanged(self):
+        """测试默认模式仍写入VLOOKUP桶数和派生公式"""
+        wb = self._generate()
+        try:
+            ws = wb["设备误差汇总"]
+            self.assertEqual(ws["D4"].value, "=IFERROR(VLOOKUP(B4,'非单桶设备编码'!A:B,2,FALSE),1)")
+            self.assertEqual(ws["G5"].value, "=D5*F5")
+            self.assertEqual(ws["L5"].value, "2025-01-02 00:00离线至2025-01-03 00:00恢复")
+            self.assertTrue(wb["非单桶设备编码"]["C499"].value.startswith("=IF("))
+        finally:
+            wb.close()
+
+    def test_streamed_rows_match_list(self):
+        """测试数据流与预先累计的离线时长生成的报表与列表输入一致"""
+        events = [dict(event, device_code=item['device_code'])
+                  for item in self.summary_data for event in item['offline_events']]
+        offline_map = ConsumptionErrorSummaryGenerator.aggregate_offline_events(
+            iter(events), datetime(2025, 1, 1), datetime(2025, 1, 10, 23, 59, 59), datetime.now()
+        )
+        self.assertEqual(offline_map['D2'][0], 24)
+
+        def stream(items):
+            for item in items:
+                row = {key: value for key, value in item.items() if key != 'offline_events'}
+                row['offline_summary'] = offline_map.get(row['device_code'], (0, []))
+                yield row
+
+        expected = self._generate(summary_values=True)
+        self.summary_data = stream(self.summary_data)
+        streamed = self._generate("streamed.xlsx", summary_values=True)
+        try:
+            self.assertEqual(
+                [[cell.value for cell in row] for row in streamed["设备误差汇总"].iter_rows()],
+                [[cell.value for cell in row] for row in expected["设备误差汇总"].iter_rows()],
+            )
+            self.assertEqual(streamed["设备误差汇总"].auto_filter.ref, "A3:L6")
+            self.assertEqual(streamed["设备误差汇总"]["J5"].fill.fgColor.rgb, "00FFC7CE")
+        finally:
+            expected.close()
+            streamed.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+core.daily_state_store 模块及增量每日误差计算的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.daily_state_store import DailyStateStore, query_fingerprint
+from src.core.data_manager import ReportDataManager
+from tests.base_test import BaseTestCase, FakeDbHandler, make_order_rows
+
+QUERY = "SELECT * FROM oil.t_inventory WHERE device_id = {device_id}"
+
+
+def make_rows(start, days):
+    """生成每天两条订单记录，第三天有一次加油"""
+    return make_order_rows(
+        start, days, ((9, 10.0), (15, 12.5)), 500.0, loss=1.0, refill=lambda offset: 200.0 if offset == 2 else 0.0
+    )
+
+
+class TestDailyStateStore(BaseTestCase):
+    """DailyStateStore 类的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.store = DailyStateStore(os.path.join(self.test_output_dir, "state.db"))
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_save_and_load_states(self):
+        """测试保存状态后按范围读取和覆盖区间"""
+        fingerprint = query_fingerprint(QUERY)
+        states = {
+            date(2025, 7, day): {
+                "end_inventory": 100.0 - day,
+                "order_total": 1.0,
+                "refill": 0.0,
+                "consumption": 1.0,
+                "oil_name": "切削液",
+            }
+            for day in range(1, 6)
+        }
+        self.store.save_states(1, fingerprint, states, date(2025, 7, 1), date(2025, 7, 4))
+
+        self.assertEqual(self.store.get_coverage(1, fingerprint), (date(2025, 7, 1), date(2025, 7, 4)))
+        loaded = self.store.load_states(1, fingerprint, date(2025, 7, 2), date(2025, 7, 10))
+        # 超出覆盖区间的日期不会被写入
+        self.assertEqual(list(loaded.keys()), [date(2025, 7, 2), date(2025, 7, 3), date(2025, 7, 4)])
+        last_date, last_state = self.store.get_last_state(1, fingerprint, date(2025, 7, 31))
+        self.assertEqual(last_date, date(2025, 7, 4))
+        self.assertEqual(last_state["end_inventory"], 96.0)
+
+        self.store.clear_device(1, fingerprint)
+        self.assertIsNone(self.store.get_coverage(1, fingerprint))
+
+
+class TestIncrementalDailyErrors(BaseTestCase):
+    """ReportDataManager.calculate_daily_errors_incremental 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.store = DailyStateStore(os.path.join(self.test_output_dir, "state.db"))
+        self.db_handler = FakeDbHandler(make_rows(date(2025, 7, 1), 10))
+
+    def tearDown(self):
+        self.store.close()
+        super().tearDown()
+
+    def test_first_run_matches_full_calculation(self):
+        """测试首次运行结果与全量计算一致"""
+        manager = ReportDataManager(self.db_handler, state_store=self.store)
+        error_data, inventory_data, oil_name = manager.calculate_daily_errors_incremental(
+            1, QUERY, "2025-07-01", "2025-07-08", barrel_count=2
+        )
+        expected = manager.calculate_daily_errors(
+            self.db_handler.fetch_generic_data(1, QUERY, "2025-07-01", "2025-07-08"), 2
+        )
+
+        self.assertEqual(error_data, expected)
+        self.assertEqual(oil_name, "切削液")
+        self.assertEqual(len(inventory_data), 8)
+
+    def test_rolling_window_only_fetches_new_days(self):
+        """测试滚动窗口再次运行时只查询新增日期，并且结果与连续计算一致"""
+        manager = ReportDataManager(self.db_handler, state_store=self.store)
+        manager.calculate_daily_errors_incremental(1, QUERY, "2025-07-01", "2025-07-07")
+        error_data, inventory_data, _ = manager.calculate_daily_errors_incremental(
+            1, QUERY, "2025-07-03", "2025-07-10"
+        )
+
+        self.assertEqual(self.db_handler.calls[-1], ("2025-07-08", "2025-07-10"))
+        # 期初库存取自已持久化的前一日期末库存，因此与整段连续计算的结果一致
+        full = manager.calculate_daily_errors(
+            self.db_handler.fetch_generic_data(1, QUERY, "2025-07-01", "2025-07-10")
+        )
+        window = [date(2025, 7, day) for day in range(3, 11)]
+        self.assertEqual(list(error_data["daily_consumption"].keys()), window)
+        for day in window:
+            self.assertAlmostEqual(error_data["daily_consumption"][day], full["daily_consumption"][day])
+            self.assertAlmostEqual(error_data["daily_order_totals"][day], full["daily_order_totals"][day])
+        self.assertEqual(inventory_data[0][0], date(2025, 7, 3))
+
+    def test_fully_covered_window_skips_query(self):
+        """测试窗口已全部持久化时不再查询数据库"""
+        manager = ReportDataManager(self.db_handler, state_store=self.store)
+        manager.calculate_daily_errors_incremental(1, QUERY, "2025-07-01", "2025-07-10")
+        call_count = len(self.db_handler.calls)
+        error_data, _, _ = manager.calculate_daily_errors_incremental(1, QUERY, "2025-07-02", "2025-07-05")
+
+        self.assertEqual(len(self.db_handler.calls), call_count)
+        self.assertEqual(len(error_data["daily_order_totals"]), 4)
+
+    def test_requires_state_store(self):
+        """测试未配置状态存储时抛出异常"""
+        manager = ReportDataManager(self.db_handler)
+        with self.assertRaises(ValueError):
+            manager.calculate_daily_errors_incremental(1, QUERY, "2025-07-01", "2025-07-02")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -11,7 +11,7 @@ from unittest.mock import MagicMock, Mock, patch, mock_open
 # 添加项目根目录到sys.path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from src.core.data_manager import CustomerGroupingUtil
+from src.core.data_manager import CustomerGroupingUtil, ReportDataManager
 from tests.base_test import BaseTestCase
 
 
@@ -140,5 +140,24 @@ class TestCustomerGroupingUtil(BaseTestCase):
         self.assertEqual(len(result[1]['devices']), 1)  # 只有一个有效设备
 
 
+class TestReportDataManagerRelease(BaseTestCase):
+    """ReportDataManager.release_raw_data 的单元测试"""
+
+    def test_release_raw_data(self):
+        """测试释放原始数据后重新读取，并同时清空数据库处理器的查询缓存"""
+        db_handler = Mock()
+        db_handler.fetch_generic_data.return_value = ([], ["加注时间"], [])
+        manager = ReportDataManager(db_handler)
+
+        manager.fetch_raw_data(1, "SELECT 1", "2025-07-01", "2025-07-31")
+        manager.fetch_raw_data(1, "SELECT 1", "2025-07-01", "2025-07-31")
+        self.assertEqual(db_handler.fetch_generic_data.call_count, 1)
+
+        manager.release_raw_data()
+        db_handler.clear_query_cache.assert_called_once()
+        manager.fetch_raw_data(1, "SELECT 1", "2025-07-01", "2025-07-31")
+        self.assertEqual(db_handler.fetch_generic_data.call_count, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
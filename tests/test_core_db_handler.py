@@ -221,6 +221,84 @@ class TestCoreDbHandler(BaseTestCase):
         # 检查连接池
         self.assertIsNotNone(db_handler.connection_pool)
 
+    @unittest.skipIf(not DATABASE_HANDLER_AVAILABLE, "数据库处理模块不可用")
+    def test_iter_generic_rows_reads_in_batches(self):
+        """测试分批读取查询结果并把降序排序改写为升序"""
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        mock_connection.is_connected.return_value = True
+        mock_cursor.description = [("加注时间",), ("油加注值",)]
+        mock_cursor.fetchmany.side_effect = [[(1, 2), (3, 4)], [(5, 6)], []]
+        self.db_handler.connection = mock_connection
+
+        stream = self.db_handler.iter_generic_rows(
+            1,
+            "SELECT * FROM t WHERE device_id = {device_id} AND time BETWEEN '{start_date}' AND '{end_condition}' ORDER BY create_time DESC",
+            "2025-07-01",
+            "2025-07-31",
+            batch_size=2,
+        )
+
+        self.assertEqual(stream.columns, ["加注时间", "油加注值"])
+        self.assertEqual(list(stream), [(1, 2), (3, 4), (5, 6)])
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT * FROM t WHERE device_id = 1 AND time BETWEEN '2025-07-01' AND '2025-07-31 23:59:59' ORDER BY create_time ASC"
+        )
+        mock_cursor.fetchmany.assert_called_with(2)
+        mock_cursor.close.assert_called_once()
+
+    @unittest.skipIf(not DATABASE_HANDLER_AVAILABLE, "数据库处理模块不可用")
+    def test_close_unread_stream_discards_rows(self):
+        """测试未读完（或未开始读取）的数据流关闭时先丢弃剩余结果再关闭游标"""
+        for batches_read in (0, 1):
+            mock_connection = MagicMock()
+            mock_cursor = MagicMock()
+            mock_connection.cursor.return_value = mock_cursor
+            mock_cursor.description = [("加注时间",)]
+            mock_cursor.fetchmany.side_effect = [[(1,), (2,)], [(3,)], []]
+            self.db_handler.connection = mock_connection
+
+            stream = self.db_handler.iter_generic_rows(
+                1, "SELECT * FROM t WHERE device_id = {device_id}", "2025-07-01", "2025-07-31", batch_size=2
+            )
+            rows = iter(stream)
+            for _ in range(batches_read * 2):
+                next(rows)
+            stream.close()
+            stream.close()
+
+            mock_connection.consume_results.assert_called_once()
+            mock_cursor.close.assert_called_once()
+
+    def test_fetch_source_watermark(self):
+        """测试源数据水位查询去掉排序子句并只返回一行汇总"""
+        mock_connection = MagicMock()
+        mock_cursor = MagicMock()
+        mock_connection.cursor.return_value = mock_cursor
+        mock_connection.is_connected.return_value = True
+        mock_cursor.fetchone.return_value = (3, "2025-07-31 10:00:00", 30.5, 900, 8589934592)
+        self.db_handler.connection = mock_connection
+
+        watermark = self.db_handler.fetch_source_watermark(
+            1,
+            "SELECT * FROM t WHERE device_id = {device_id} AND time BETWEEN '{start_date}' AND '{end_condition}' ORDER BY create_time DESC",
+            "2025-07-01",
+            "2025-07-31",
+        )
+
+        self.assertEqual(watermark, ("3", "2025-07-31 10:00:00", "30.5", "900", "8589934592"))
+        mock_cursor.execute.assert_called_once_with(
+            "SELECT COUNT(*), MAX(`加注时间`), SUM(`油加注值`), SUM(`原油剩余量`), "
+            "SUM(CRC32(CONCAT_WS('|', `加注时间`, `油加注值`, `原油剩余量`, `油品名称`))) FROM "
+            "(SELECT * FROM t WHERE device_id = 1 AND time BETWEEN '2025-07-01' AND '2025-07-31 23:59:59') "
+            "AS watermark_source"
+        )
+
+        # 查询失败时返回None，调用方不使用缓存
+        mock_cursor.execute.side_effect = Exception("unknown column")
+        self.assertIsNone(self.db_handler.fetch_source_watermark(1, "SELECT 1"))
+
     def test_main_functionality(self):
         """测试主功能"""
         # 这个测试主要是为了提高覆盖率，实际的主功能测试在集成测试中完成
@@ -405,5 +405,29 @@ DEV001,2025-07-01,2025-10-01
         finally:
             os.unlink(csv_file_path)
 
+    def test_filehandler_read_barrel_counts_from_csv(self):
+        """
+        测试 FileHandler.read_barrel_counts_from_csv 方法读取设备桶数
+        """
+        csv_content = """\ufeffdevice_code,start_date,end_date,barrel_count
+DEV001,2025-07-01,2025-07-10,2
+DEV002,2025-07-01,2025-07-10,
+DEV003,2025-07-01,2025-07-10,3
+"""
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False, encoding="utf-8") as f:
+            f.write(csv_content)
+            csv_file_path = f.name
+
+        try:
+            self.assertEqual(
+                self.file_handler.read_barrel_counts_from_csv(csv_file_path), {"DEV001": 2, "DEV003": 3}
+            )
+            with open(csv_file_path, "a", encoding="utf-8") as f:
+                f.write("DEV004,2025-07-01,2025-07-10,0\n")
+            with self.assertRaises(FileReadError):
+                self.file_handler.read_barrel_counts_from_csv(csv_file_path)
+        finally:
+            os.unlink(csv_file_path)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+数据管理器定点体积运算模式（volume_unit）的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.data_manager import ReportDataManager
+from src.core.fleet_calculator import compute_fleet_errors
+from src.core.row_stream import to_fixed_point
+from tests.base_test import BaseTestCase
+
+COLUMNS = ["加注时间", "油品名称", "油加注值", "原油剩余量"]
+
+
+class TestFixedPointVolumes(BaseTestCase):
+    """定点体积运算模式的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        # 模拟mysql.connector返回的Decimal值，0.1的累加在浮点运算下会产生误差
+        start = datetime(2025, 7, 30, 6)
+        self.rows = [
+            (start + timedelta(hours=offset * 5), "切削液", Decimal("0.10"), Decimal("200.00") - Decimal("0.35") * offset)
+            for offset in range(30)
+        ]
+        self.raw_data = ([], COLUMNS, list(reversed(self.rows)))
+
+    def test_to_fixed_point(self):
+        """测试体积值转换为整数定点值"""
+        self.assertEqual(to_fixed_point(Decimal("12.345"), 100), 1235)
+        self.assertEqual(to_fixed_point(1.1, 1000), 1100)
+        self.assertEqual(to_fixed_point(None, 100), 0)
+        self.assertEqual(to_fixed_point("3", 100), 300)
+        with self.assertRaises(ValueError):
+            ReportDataManager(db_handler=None, volume_unit="gal")
+
+    def test_fixed_point_totals_are_exact(self):
+        """测试定点模式下的合计值精确，并与浮点模式结果一致"""
+        fixed = ReportDataManager(db_handler=None, volume_unit="cl")
+        floating = ReportDataManager(db_handler=None)
+
+        daily_usage = fixed.calculate_daily_usage(self.raw_data)
+        self.assertEqual(daily_usage[0], (date(2025, 7, 30), 0.4))
+        self.assertEqual(fixed.calculate_monthly_usage(self.raw_data, "2025-07-01", "2025-08-31"), [("2025-08", 3.0)])
+
+        fixed_errors = fixed.calculate_daily_errors(self.raw_data, 2)
+        floating_errors = floating.calculate_daily_errors(self.raw_data, 2)
+        for day, value in floating_errors["daily_consumption"].items():
+            self.assertAlmostEqual(fixed_errors["daily_consumption"][day], value)
+        self.assertEqual(fixed_errors["daily_consumption"][date(2025, 7, 30)], 2.1)
+
+    def test_fixed_point_fleet_matches_manager(self):
+        """测试定点模式下全设备计算与逐台计算结果完全一致"""
+        manager = ReportDataManager(db_handler=None, volume_unit="ml")
+        tables = manager.calculate_fleet_errors(manager.build_fleet_arrays([self.raw_data], [3]))
+        self.assertEqual(tables.daily_errors(0), manager.calculate_daily_errors(self.raw_data, 3))
+        self.assertEqual(
+            tables.monthly_errors(0, date(2025, 7, 1), date(2025, 8, 31)),
+            manager.calculate_monthly_errors(self.raw_data, "2025-07-01", "2025-08-31", 3),
+        )
+        python_tables = compute_fleet_errors(
+            {key: list(values) for key, values in manager.build_fleet_arrays([self.raw_data], [3]).items()}, 1000
+        )
+        self.assertEqual(python_tables.inventory_data(0), tables.inventory_data(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+core.fleet_calculator 模块的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.data_manager import ReportDataManager
+from src.core.fleet_calculator import NUMPY_AVAILABLE, _compute_fleet_errors_python
+from tests.base_test import BaseTestCase
+
+COLUMNS = ["加注时间", "油品名称", "油加注值", "原油剩余量"]
+
+
+def make_raw_data(seed, days, start=date(2025, 6, 25)):
+    """生成跨月的设备原始数据，按时间倒序排列（与数据库查询一致）"""
+    rows = []
+    inventory = 300.0 + seed * 10
+    for offset in range(days):
+        day = datetime.combine(start + timedelta(days=offset), datetime.min.time())
+        if offset % 4 == seed % 4:
+            inventory += 150.0
+        for hour in (8, 12, 17):
+            oil_val = 5.0 + (seed + offset + hour) % 7
+            inventory -= oil_val + (seed % 3) * 0.5
+            rows.append((day.replace(hour=hour), "切削液", oil_val, inventory))
+        # 同一天加入字符串格式时间的记录
+        rows.append((day.replace(hour=20).strftime("%Y-%m-%d %H:%M:%S"), "切削液", 1.0, inventory - 1.0))
+        inventory -= 1.0
+    rows.reverse()
+    return [], COLUMNS, rows
+
+
+class TestFleetCalculator(BaseTestCase):
+    """全设备批量误差计算的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.manager = ReportDataManager(db_handler=None)
+        self.raw_data_list = [make_raw_data(seed, 12 + seed) for seed in range(4)]
+        self.barrel_counts = [1, 2, 3, 1]
+
+    def assert_matches_per_device(self, tables):
+        for index, raw_data in enumerate(self.raw_data_list):
+            expected_daily = self.manager.calculate_daily_errors(raw_data, self.barrel_counts[index])
+            actual_daily = tables.daily_errors(index)
+            for key, values in expected_daily.items():
+                self.assertEqual(list(actual_daily[key].keys()), list(values.keys()), key)
+                for day, value in values.items():
+                    self.assertAlmostEqual(actual_daily[key][day], value, places=6)
+
+            expected_monthly = self.manager.calculate_monthly_errors(
+                raw_data, "2025-06-01", "2025-07-31", self.barrel_counts[index]
+            )
+            actual_monthly = tables.monthly_errors(index, date(2025, 6, 1), date(2025, 7, 31))
+            self.assertEqual(actual_monthly['monthly_order_totals'].keys(),
+                             expected_monthly['monthly_order_totals'].keys())
+            for month, value in expected_monthly['monthly_consumption'].items():
+                self.assertAlmostEqual(actual_monthly['monthly_consumption'][month]['value'], value['value'], places=6)
+            for key in ('monthly_shortage_errors', 'monthly_excess_errors'):
+                self.assertEqual(actual_monthly[key].keys(), expected_monthly[key].keys())
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "未安装numpy")
+    def test_vectorized_matches_per_device_calculation(self):
+        """测试向量化结果与逐台设备计算结果一致"""
+        arrays = self.manager.build_fleet_arrays(self.raw_data_list, self.barrel_counts)
+        self.assert_matches_per_device(self.manager.calculate_fleet_errors(arrays))
+
+    def test_python_fallback_matches_per_device_calculation(self):
+        """测试未安装numpy时的退回实现与逐台设备计算结果一致"""
+        arrays = self.manager.build_fleet_arrays(self.raw_data_list, self.barrel_counts)
+        arrays = {key: list(values) for key, values in arrays.items()}
+        if NUMPY_AVAILABLE:
+            arrays["timestamp"] = [value.astype(datetime) for value in arrays["timestamp"]]
+        self.assert_matches_per_device(_compute_fleet_errors_python(arrays))
+
+    def test_inventory_data_and_missing_device(self):
+        """测试期末库存切片以及没有数据的设备"""
+        raw_data_list = self.raw_data_list + [([], COLUMNS, [])]
+        arrays = self.manager.build_fleet_arrays(raw_data_list)
+        tables = self.manager.calculate_fleet_errors(arrays)
+
+        inventory = tables.inventory_data(0)
+        self.assertEqual(inventory[0][0], date(2025, 6, 25))
+        self.assertEqual(len(inventory), 12)
+        self.assertEqual(tables.daily_errors(4)['daily_order_totals'], {})
+        self.assertEqual(tables.monthly_errors(4, date(2025, 6, 1), date(2025, 6, 30))['monthly_order_totals'],
+                         {'2025-06': 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""
+core.html_preview 模块的单元测试
+"""
+import os
+import re
+import sys
+import unittest
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.html_preview import PREVIEW_MAX_POINTS, PreviewExecutor, PreviewPage
+from src.core.parallel_executor import ReportTaskExecutor
+from src.core.report_controller import _open_report_executor, _preview_series, _render_report
+from tests.base_test import BaseTestCase
+
+
+class TestHtmlPreview(BaseTestCase):
+    """PreviewPage 与 PreviewExecutor 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2024, 1, 1)
+        self.page_path = os.path.join(self.test_output_dir, "库存报表预览.html")
+
+    def _task(self, device_code, days):
+        inventory_data = [(self.start_date + timedelta(days=offset), 400.0 - offset % 50) for offset in range(days)]
+        return ('inventory', {
+            'inventory_data': inventory_data,
+            'output_file_path': os.path.join(self.test_output_dir, f"{device_code}.xlsx"),
+            'device_code': device_code,
+            'start_date': self.start_date,
+            'end_date': self.start_date + timedelta(days=days - 1),
+            'oil_name': '机油',
+        })
+
+    def _run(self, preview_only):
+        executor = PreviewExecutor(
+            ReportTaskExecutor(), PreviewPage("库存报表预览"), self.page_path, _preview_series, preview_only
+        )
+        with executor:
+            executor.submit("DEV1", _render_report, self._task("DEV1", 10), self.record_task_done)
+            executor.submit("DEV<2>", _render_report, self._task("DEV<2>", 730), self.record_task_done)
+        with open(self.page_path, encoding="utf-8") as f:
+            return f.read()
+
+    def test_preview_alongside_xlsx(self):
+        """测试预览页面包含设备索引和内联SVG，xlsx照常生成，长序列按点数上限绘制"""
+        page = self._run(preview_only=False)
+        self.assertTrue(os.path.exists(os.path.join(self.test_output_dir, "DEV1.xlsx")))
+        self.assertIn('<a href="#section-1">DEV1</a>', page)
+        self.assertIn("DEV&lt;2&gt;", page)
+        self.assertIn('<td class="num">730</td>', page)
+        self.assertEqual(page.count("<svg "), 2)
+        self.assertNotIn("<script", page)
+        points = re.findall(r'points="([^"]*)"', page)
+        self.assertEqual(len(points[0].split()), 10)
+        self.assertLessEqual(len(points[1].split()), PREVIEW_MAX_POINTS)
+
+    def test_preview_only_skips_xlsx(self):
+        """测试只生成预览时不写出xlsx，结果指向预览页面中的图表"""
+        self._run(preview_only=True)
+        self.assertEqual(os.listdir(self.test_output_dir), ["库存报表预览.html"])
+        self.assertEqual(self.done[1], ("DEV<2>", f"{self.page_path}#section-2", None))
+
+    def test_invalid_option(self):
+        """测试无效的html_preview配置报错"""
+        with self.assertRaises(ValueError):
+            _open_report_executor({'html_preview': 'yes'}, self.test_output_dir, "库存报表")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""
+core.output_bundle 模块的单元测试
+"""
+import io
+import json
+import os
+import sys
+import unittest
+import zipfile
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.output_bundle import BUNDLE_MANIFEST_NAME, BundleExecutor, OutputBundle, append_to_bundle
+from src.core.parallel_executor import ReportTaskExecutor
+from src.core.report_controller import _render_report
+from tests.base_test import BaseTestCase
+
+
+class TestOutputBundle(BaseTestCase):
+    """OutputBundle 与 BundleExecutor 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2025, 1, 1)
+        self.inventory_data = [
+            (self.start_date + timedelta(days=offset), 400.0 - offset * 10) for offset in range(5)
+        ]
+        self.bundle_path = os.path.join(self.test_output_dir, "库存报表.zip")
+
+    def _task(self, device_code, inventory_data):
+        return ('inventory', {
+            'inventory_data': inventory_data,
+            'output_file_path': os.path.join(self.test_output_dir, f"{device_code}.xlsx"),
+            'device_code': device_code,
+            'start_date': self.start_date,
+            'end_date': self.start_date + timedelta(days=4),
+            'oil_name': '机油',
+        })
+
+    def _run(self, max_workers=None):
+        bundle = OutputBundle(self.bundle_path, self.test_output_dir)
+        with BundleExecutor(ReportTaskExecutor(max_workers), bundle) as executor:
+            for device_code, data in (("DEV1", self.inventory_data), ("BAD", None), ("DEV2", self.inventory_data)):
+                executor.submit(device_code, _render_report, self._task(device_code, data), self.record_task_done)
+        append_to_bundle(self.bundle_path, "库存表处理日志.txt", "日志内容")
+
+    def _check_bundle(self):
+        # 输出目录中只有打包文件，没有单独的报表文件和临时文件
+        self.assertEqual(os.listdir(self.test_output_dir), ["库存报表.zip"])
+        results = {key: (result, error) for key, result, error in self.done}
+        self.assertEqual(results["DEV1"], (os.path.join(self.bundle_path, "DEV1.xlsx"), None))
+        self.assertIsNotNone(results["BAD"][1])
+
+        with zipfile.ZipFile(self.bundle_path) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                sorted(["DEV1.xlsx", "DEV2.xlsx", BUNDLE_MANIFEST_NAME, "库存表处理日志.txt"]),
+            )
+            self.assertEqual(archive.getinfo("DEV1.xlsx").compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(archive.getinfo("库存表处理日志.txt").compress_type, zipfile.ZIP_DEFLATED)
+            manifest = json.loads(archive.read(BUNDLE_MANIFEST_NAME))
+            wb = load_workbook(io.BytesIO(archive.read("DEV2.xlsx")))
+            try:
+                self.assertEqual(wb.active["B3"].value, 400)
+                self.assertEqual(len(wb.active._charts), 1)
+            finally:
+                wb.close()
+        statuses = {entry["key"]: entry["status"] for entry in manifest["reports"]}
+        self.assertEqual(statuses, {"DEV1": "ok", "BAD": "failed", "DEV2": "ok"})
+
+    def test_sequential_reports_written_into_bundle(self):
+        """测试顺序生成的报表直接写入打包文件，失败的设备记录在运行清单中"""
+        self._run()
+        self._check_bundle()
+
+    def test_parallel_reports_written_into_bundle(self):
+        """测试工作进程生成的报表由主进程写入同一个打包文件"""
+        self._run(max_workers=2)
+        self._check_bundle()
+
+    def test_duplicate_names_are_numbered(self):
+        """测试同名文件在打包文件中添加序号"""
+        bundle = OutputBundle(self.bundle_path, self.test_output_dir)
+        first = bundle.add(os.path.join(self.test_output_dir, "A.xlsx"), b"1")
+        second = bundle.add(os.path.join(self.test_output_dir, "A.xlsx"), b"2")
+        bundle.close()
+        self.assertEqual((first, second), ("A.xlsx", "A_1.xlsx"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+core.output_manifest 模块的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.data_manager import ReportDataManager
+from src.core.output_manifest import MANIFEST_FILENAME, ManifestExecutor, OutputManifest, input_digest
+from src.core.parallel_executor import ReportTaskExecutor
+from src.core.report_controller import _generator_fingerprint, _render_report
+from tests.base_test import BaseTestCase
+
+
+class TestOutputManifest(BaseTestCase):
+    """输出清单与ManifestExecutor的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2025, 1, 1)
+        self.inventory_data = [
+            (self.start_date + timedelta(days=offset), 400.0 - offset * 10) for offset in range(5)
+        ]
+        self.rendered = []
+
+    def _render(self, task):
+        self.rendered.append(task[1]['device_code'])
+        return _render_report(task)
+
+    def _task(self, device_code, inventory_data=None):
+        return ('inventory', {
+            'inventory_data': inventory_data or self.inventory_data,
+            'output_file_path': os.path.join(self.test_output_dir, f"{device_code}.xlsx"),
+            'device_code': device_code,
+            'start_date': self.start_date,
+            'end_date': self.start_date + timedelta(days=4),
+            'oil_name': '机油',
+        })
+
+    def _run(self, tasks):
+        with ManifestExecutor(ReportTaskExecutor(), self.test_output_dir, _generator_fingerprint) as executor:
+            for task in tasks:
+                executor.submit(task[1]['device_code'], self._render, task, self.record_task_done)
+
+    def test_input_digest(self):
+        """测试输入摘要只由报表输入决定，与输出路径等运行时参数无关"""
+        _, kwargs = self._task("DEV1")
+        digest = input_digest('inventory', kwargs, ('InventoryReportGenerator', 1))
+        self.assertEqual(digest, input_digest('inventory', dict(kwargs, output_file_path="other.xlsx"),
+                                              ('InventoryReportGenerator', 1)))
+        self.assertNotEqual(digest, input_digest('inventory', dict(kwargs, barrel_count=2),
+                                                 ('InventoryReportGenerator', 1)))
+        self.assertNotEqual(digest, input_digest('inventory', kwargs, ('InventoryReportGenerator', 2)))
+
+    def test_rerun_skips_unchanged_reports(self):
+        """测试重新运行时只重新生成输入变化或文件缺失的报表"""
+        self._run([self._task("DEV1"), self._task("DEV2"), self._task("DEV3")])
+        self.assertEqual(self.rendered, ["DEV1", "DEV2", "DEV3"])
+        self.assertTrue(os.path.exists(os.path.join(self.test_output_dir, MANIFEST_FILENAME)))
+
+        os.remove(os.path.join(self.test_output_dir, "DEV3.xlsx"))
+        changed = [(day, value + 1) for day, value in self.inventory_data]
+        self.rendered, self.done = [], []
+        self._run([self._task("DEV1"), self._task("DEV2", changed), self._task("DEV3")])
+
+        self.assertEqual(self.rendered, ["DEV2", "DEV3"])
+        self.assertEqual([(key, error) for key, _, error in self.done],
+                         [("DEV1", None), ("DEV2", None), ("DEV3", None)])
+        # 输入变化的报表写回原文件名，不产生带序号的副本
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.test_output_dir) if name.endswith(".xlsx")),
+            ["DEV1.xlsx", "DEV2.xlsx", "DEV3.xlsx"],
+        )
+
+    def test_failed_regeneration_keeps_last_good_file(self):
+        """测试输入变化后重新生成失败时保留上次的文件，且不记录到清单"""
+        self._run([self._task("DEV1")])
+        output_path = os.path.join(self.test_output_dir, "DEV1.xlsx")
+        with open(output_path, "rb") as f:
+            last_good = f.read()
+
+        bad = self._task("DEV1")
+        bad[1]['inventory_data'] = None
+        self.done = []
+        self._run([bad])
+
+        self.assertIsNotNone(self.done[0][2])
+        with open(output_path, "rb") as f:
+            self.assertEqual(f.read(), last_good)
+        self.assertEqual(OutputManifest(self.test_output_dir).reports, {})
+        self.assertEqual(sorted(os.listdir(self.test_output_dir)), [MANIFEST_FILENAME, "DEV1.xlsx"])
+
+    def test_existing_file_is_overwritten_in_place(self):
+        """测试输出目录中原有的同名文件被原地覆盖（每日误差报表不再生成带序号的副本）并记录到清单"""
+        manager = ReportDataManager(None)
+        raw_data = ([], ["加注时间", "油品名称", "油加注值", "原油剩余量"], [
+            (datetime(2025, 1, 1 + offset, 9), "机油", 5.0, 400.0 - offset * 6) for offset in range(5)
+        ])
+        task = ('daily_error', {
+            'inventory_data': self.inventory_data,
+            'error_data': manager.calculate_daily_errors(raw_data),
+            'output_file_path': os.path.join(self.test_output_dir, "OLD.xlsx"),
+            'device_code': "OLD",
+            'start_date': self.start_date,
+            'end_date': self.start_date + timedelta(days=4),
+            'oil_name': '机油',
+        })
+        with open(os.path.join(self.test_output_dir, "OLD.xlsx"), "w") as f:
+            f.write("旧文件")
+
+        self._run([task])
+        self.assertEqual(self.done, [("OLD", os.path.join(self.test_output_dir, "OLD.xlsx"), None)])
+        self.assertEqual(sorted(os.listdir(self.test_output_dir)), [MANIFEST_FILENAME, "OLD.xlsx"])
+        self.assertEqual(list(OutputManifest(self.test_output_dir).reports), ["OLD.xlsx"])
+
+        self.rendered = []
+        self._run([task])
+        self.assertEqual(self.rendered, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+core.output_writer 模块的单元测试
+"""
+import os
+import sys
+import threading
+import unittest
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.output_writer import BackgroundSaveExecutor, OutputWriter, atomic_save
+from src.core.report_controller import _render_report
+from tests.base_test import BaseTestCase
+
+
+def _write_text(text):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+    return write
+
+
+def _fail(path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("部分内容")
+    raise PermissionError("文件被占用")
+
+
+class TestOutputWriter(BaseTestCase):
+    """OutputWriter 与 BackgroundSaveExecutor 的单元测试"""
+
+    def test_atomic_save_keeps_old_file_on_failure(self):
+        """测试写出失败时删除临时文件，保留原有文件"""
+        path = os.path.join(self.test_output_dir, "report.xlsx")
+        atomic_save(path, _write_text("旧内容"))
+        with self.assertRaises(PermissionError):
+            atomic_save(path, _fail)
+        with open(path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "旧内容")
+        self.assertEqual(os.listdir(self.test_output_dir), ["report.xlsx"])
+
+    def test_callbacks_wait_for_background_saves(self):
+        """测试生成阶段结束后，回调等到保存完成才在主线程中执行，保存失败时回调为失败"""
+        release = threading.Event()
+
+        def slow_write(path):
+            release.wait(5)
+            _write_text("内容")(path)
+
+        writer = OutputWriter(max_pending=2)
+        ok_path = os.path.join(self.test_output_dir, "ok.xlsx")
+        ok = writer.task("DEV1", self.record_task_done)
+        ok.save(ok_path, slow_write)
+        ok.finish(ok_path)
+        bad = writer.task("DEV2", self.record_task_done)
+        bad.save(os.path.join(self.test_output_dir, "bad.xlsx"), _fail)
+        bad.finish(os.path.join(self.test_output_dir, "bad.xlsx"))
+
+        writer.poll()
+        self.assertEqual(self.done, [])
+        release.set()
+        writer.close()
+
+        self.assertEqual(self.done[0], ("DEV1", ok_path, None))
+        self.assertEqual(self.done[1][:2], ("DEV2", None))
+        self.assertIsInstance(self.done[1][2], PermissionError)
+        self.assertEqual(sorted(os.listdir(self.test_output_dir)), ["ok.xlsx"])
+
+    def test_invalid_queue_size_raises(self):
+        """测试队列长度必须为正整数"""
+        with self.assertRaises(ValueError):
+            OutputWriter(max_pending=0)
+
+    def test_executor_saves_reports_in_background(self):
+        """测试后台保存执行器生成的库存报表与直接保存一致，生成失败的设备回调为失败"""
+        start_date = date(2025, 1, 1)
+        inventory_data = [(start_date + timedelta(days=offset), 400.0 - offset * 10) for offset in range(5)]
+
+        def task(device_code, data):
+            return ('inventory', {
+                'inventory_data': data,
+                'output_file_path': os.path.join(self.test_output_dir, f"{device_code}.xlsx"),
+                'device_code': device_code,
+                'start_date': start_date,
+                'end_date': start_date + timedelta(days=4),
+                'oil_name': '机油',
+            })
+
+        with BackgroundSaveExecutor(max_pending=1) as executor:
+            executor.submit("DEV1", _render_report, task("DEV1", inventory_data), self.record_task_done)
+            executor.submit("BAD", _render_report, task("BAD", None), self.record_task_done)
+            executor.submit("DEV2", _render_report, task("DEV2", inventory_data), self.record_task_done)
+
+        results = {key: (result, error) for key, result, error in self.done}
+        self.assertEqual(set(results), {"DEV1", "BAD", "DEV2"})
+        self.assertIsNotNone(results["BAD"][1])
+        for key in ("DEV1", "DEV2"):
+            path, error = results[key]
+            self.assertIsNone(error)
+            wb = load_workbook(path)
+            try:
+                ws = wb.active
+                self.assertEqual(ws["B3"].value, 400)
+                self.assertEqual(len(ws._charts), 1)
+            finally:
+                wb.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
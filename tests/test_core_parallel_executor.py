@@ -0,0 +1,72 @@
+"""
+core.parallel_executor 模块的单元测试
+"""
+import os
+import sys
+import unittest
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.parallel_executor import ReportTaskExecutor, compact_device_payload
+from tests.base_test import BaseTestCase
+
+
+def write_report(payload):
+    """模拟报表生成任务：写入文件并返回路径，内容为空时抛出异常"""
+    output_path, content = payload
+    if not content:
+        raise ValueError("没有数据")
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return output_path
+
+
+class TestReportTaskExecutor(BaseTestCase):
+    """ReportTaskExecutor 类的单元测试"""
+
+    def run_tasks(self, executor):
+        results = []
+
+        def on_done(key, result, error, error_traceback):
+            results.append((key, result, None if error is None else str(error)))
+            if error is not None:
+                self.assertIn("没有数据", error_traceback)
+
+        with executor:
+            for index, content in enumerate(["A", "", "C"]):
+                output_path = os.path.join(self.test_output_dir, f"report_{index}.txt")
+                executor.submit(f"DEV{index}", write_report, (output_path, content), on_done)
+        return results
+
+    def test_serial_mode_runs_immediately(self):
+        """测试未配置工作进程数时顺序执行并按提交顺序回调"""
+        executor = ReportTaskExecutor()
+        self.assertFalse(executor.is_parallel)
+        results = self.run_tasks(executor)
+
+        self.assertEqual([key for key, _, _ in results], ["DEV0", "DEV1", "DEV2"])
+        self.assertEqual(results[1][2], "没有数据")
+        self.assert_file_exists(os.path.join(self.test_output_dir, "report_2.txt"))
+
+    def test_process_pool_mode_collects_results(self):
+        """测试进程池模式下成功与失败结果都能回到主进程"""
+        executor = ReportTaskExecutor(max_workers=2)
+        self.assertTrue(executor.is_parallel)
+        results = self.run_tasks(executor)
+
+        self.assertEqual([key for key, _, _ in results], ["DEV0", "DEV1", "DEV2"])
+        self.assertIsNone(results[0][2])
+        self.assertEqual(results[1][1], None)
+        self.assertEqual(results[1][2], "没有数据")
+        self.assert_file_contains_text(os.path.join(self.test_output_dir, "report_2.txt"), "C")
+
+    def test_compact_device_payload(self):
+        """测试分发前剔除原始行数据"""
+        device = {"device_code": "DEV0", "data": [1], "raw_data": [(1, 2)], "columns": ["a"]}
+        self.assertEqual(compact_device_payload(device), {"device_code": "DEV0", "data": [1]})
+        self.assertIn("raw_data", device)
+
+
+if __name__ == "__main__":
+    unittest.main()
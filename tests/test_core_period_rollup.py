@@ -0,0 +1,139 @@
+"""
+core.period_rollup 模块及基于每日状态的每月汇总的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.daily_state_store import DailyStateStore
+from src.core.data_manager import ReportDataManager
+from src.core.period_rollup import rollup_states, rollup_usage
+from tests.base_test import ORDER_COLUMNS, BaseTestCase, FakeDbHandler, make_order_rows
+
+QUERY = "SELECT * FROM oil.t_inventory WHERE device_id = {device_id}"
+
+
+def make_rows(start, days):
+    """生成跨月的订单记录，每5天加一次油，中间有几天没有数据"""
+    return make_order_rows(
+        start, days, ((8, 6.0), (13, 9.5), (20, 4.25)), 800.0, loss=0.5,
+        refill=lambda offset: 150.0 if offset % 5 == 0 else 0.0, skip=lambda offset: offset % 7 == 3,
+    )
+
+
+class TestPeriodRollup(BaseTestCase):
+    """rollup_states / rollup_usage 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.raw_data = ([], ORDER_COLUMNS, make_rows(date(2025, 5, 20), 80))
+        self.manager = ReportDataManager(None)
+
+    def test_monthly_errors_from_daily_states_match_raw_scan(self):
+        """测试由每日状态汇总的每月误差与直接扫描原始数据一致"""
+        daily_states = self.manager.calculate_daily_states(self.raw_data)
+        rolled = self.manager.calculate_monthly_errors(
+            None, "2025-05-01", "2025-08-31", barrel_count=2, daily_states=daily_states
+        )
+        expected = self.manager.calculate_monthly_errors(self.raw_data, "2025-05-01", "2025-08-31", 2)
+
+        self.assertEqual(list(rolled["monthly_order_totals"]), list(expected["monthly_order_totals"]))
+        for key in ("monthly_order_totals", "monthly_consumption", "monthly_shortage_errors",
+                    "monthly_excess_errors"):
+            self.assertEqual(rolled[key].keys(), expected[key].keys())
+            for month, value in expected[key].items():
+                if isinstance(value, dict):
+                    self.assertAlmostEqual(rolled[key][month]["value"], value["value"])
+                else:
+                    self.assertAlmostEqual(rolled[key][month], value)
+
+    def test_monthly_usage_from_daily_usage(self):
+        """测试由每日用量汇总的每月用量与直接扫描原始数据一致"""
+        daily_usage = self.manager.calculate_daily_usage(self.raw_data)
+        self.assertEqual(
+            self.manager.calculate_monthly_usage(self.raw_data, daily_usage=daily_usage),
+            self.manager.calculate_monthly_usage(self.raw_data),
+        )
+        # 跨月对账时全部归属结束日期所在月份
+        self.assertEqual(
+            self.manager.calculate_monthly_usage(None, "2025-05-20", "2025-08-07", daily_usage=daily_usage),
+            self.manager.calculate_monthly_usage(self.raw_data, "2025-05-20", "2025-08-07"),
+        )
+
+    def test_fixed_point_rollup_matches_raw_scan(self):
+        """测试定点模式下由每日结果汇总的每月用量和误差与直接扫描原始数据完全相等"""
+        manager = ReportDataManager(None, volume_unit="cl")
+        rows = []
+        inventory = 100.0
+        for offset in range(30):
+            day = datetime(2025, 6, 1 + offset, 8)
+            for hour, oil_val in ((0, 0.1), (4, 0.2)):
+                inventory -= oil_val
+                rows.append((day.replace(hour=8 + hour), "切削液", oil_val, round(inventory, 2)))
+        raw_data = ([], ORDER_COLUMNS, rows)
+
+        daily_usage = manager.calculate_daily_usage(raw_data)
+        self.assertEqual(manager.calculate_monthly_usage(None, daily_usage=daily_usage), [("2025-06", 9.0)])
+        self.assertEqual(
+            manager.calculate_monthly_usage(None, "2025-06-01", "2025-06-30", daily_usage=daily_usage),
+            manager.calculate_monthly_usage(raw_data, "2025-06-01", "2025-06-30"),
+        )
+
+        daily_states = manager.calculate_daily_states(raw_data)
+        rolled = manager.rollup_daily_states(daily_states)
+        self.assertEqual(rolled["2025-06"]["order_total"], 9.0)
+        self.assertEqual(rolled["2025-06"]["consumption"], 8.9)
+        self.assertEqual(
+            manager.calculate_monthly_errors(None, "2025-06-01", "2025-06-30", daily_states=daily_states),
+            manager.calculate_monthly_errors(raw_data, "2025-06-01", "2025-06-30"),
+        )
+        # 传入的每日状态保持以升为单位
+        self.assertIsInstance(daily_states[date(2025, 6, 1)]["order_total"], float)
+
+    def test_week_and_quarter_rollup(self):
+        """测试按周和季度汇总"""
+        daily_states = self.manager.calculate_daily_states(self.raw_data)
+        quarters = rollup_states(daily_states, "quarter")
+        self.assertEqual(list(quarters), ["2025-Q2", "2025-Q3"])
+        last_day = max(daily_states)
+        self.assertEqual(quarters["2025-Q3"]["end_inventory"], daily_states[last_day]["end_inventory"])
+
+        weeks = rollup_usage([(date(2025, 6, 29), 1.0), (date(2025, 6, 30), 2.0), (date(2025, 7, 1), 3.0)], "week")
+        self.assertEqual(weeks, [("2025-W26", 1.0), ("2025-W27", 5.0)])
+
+        with self.assertRaises(ValueError):
+            rollup_states(daily_states, "year")
+
+
+class TestMonthlyErrorsIncremental(BaseTestCase):
+    """ReportDataManager.calculate_monthly_errors_incremental 的单元测试"""
+
+    def test_monthly_errors_from_state_store(self):
+        """测试基于持久化每日状态的每月误差与连续计算一致"""
+        store = DailyStateStore(os.path.join(self.test_output_dir, "state.db"))
+        try:
+            db_handler = FakeDbHandler(make_rows(date(2025, 5, 20), 80))
+            manager = ReportDataManager(db_handler, state_store=store)
+            manager.calculate_daily_errors_incremental(1, QUERY, "2025-05-20", "2025-06-30")
+            error_data, inventory_data, oil_name = manager.calculate_monthly_errors_incremental(
+                1, QUERY, "2025-05-20", "2025-08-07"
+            )
+            expected = manager.calculate_monthly_errors(
+                db_handler.fetch_generic_data(1, QUERY, "2025-05-20", "2025-08-07"), "2025-05-20", "2025-08-07"
+            )
+        finally:
+            store.close()
+
+        self.assertEqual(oil_name, "切削液")
+        self.assertEqual(inventory_data[0][0], date(2025, 5, 20))
+        for month, value in expected["monthly_consumption"].items():
+            self.assertAlmostEqual(error_data["monthly_consumption"][month]["value"], value["value"])
+            self.assertAlmostEqual(error_data["monthly_order_totals"][month], expected["monthly_order_totals"][month])
+
+
+if __name__ == "__main__":
+    unittest.main()
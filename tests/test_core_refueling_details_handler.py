@@ -10,7 +10,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
 
 from openpyxl import load_workbook
 
-from src.core.refueling_details_handler import RefuelingDetailsReportGenerator
+from src.core.refueling_details_handler import RefuelingDetailsReportGenerator, plan_refueling_pieces
+from src.core.row_stream import RowStream
 from tests.base_test import BaseTestCase
 
 
@@ -182,5 +183,95 @@ class TestCoreRefuelingDetailsHandler(BaseTestCase):
                             raise  # 最后一次尝试仍然失败，则抛出异常
 
 
+    def test_generate_report_from_row_stream(self):
+        """
+        测试从只能消费一次的分批数据流生成报表，列宽按写入过程中的最大长度设置
+        """
+        output_path = os.path.join(self.test_output_dir, "stream_refueling.xlsx")
+        stream = RowStream(self.columns, iter([self.test_data[:1], self.test_data[1:]]), batched=True)
+
+        result = self.refueling_handler.generate_refueling_details_report(
+            refueling_data=stream,
+            output_file_path=output_path,
+            device_code=self.device_code,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            columns=stream.columns
+        )
+
+        self.assertTrue(result)
+        wb = load_workbook(output_path)
+        ws = wb["加注明细"]
+        rows = list(ws.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), self.columns)
+        self.assertEqual([tuple(row) for row in rows[1:]], self.test_data)
+        # 加注时间列宽度为最长值长度加2
+        self.assertEqual(ws.column_dimensions["B"].width, len('2025-07-01 08:00:00') + 2)
+        # 超长列标题的宽度不超过50
+        self.assertLessEqual(ws.column_dimensions["L"].width, 50)
+        wb.close()
+
+    def test_row_budgets_split_sheets_and_files(self):
+        """
+        测试超出行数预算时拆分为编号的工作表和文件，并在第一个文件中写入索引
+        """
+        output_path = os.path.join(self.test_output_dir, "split_refueling.xlsx")
+        rows = [(i, '2025-07-01 08:00:00', 1, '切削液') for i in range(1, 8)]
+        stream = RowStream(self.columns[:4], iter(rows))
+
+        result = self.refueling_handler.generate_report(
+            refueling_data=stream,
+            output_file_path=output_path,
+            device_code=self.device_code,
+            columns=stream.columns,
+            rows_per_sheet=2,
+            rows_per_file=3
+        )
+
+        self.assertTrue(result)
+        part_paths = [output_path] + [
+            os.path.join(self.test_output_dir, f"split_refueling_part{n}.xlsx") for n in (2, 3)
+        ]
+        first = load_workbook(part_paths[0])
+        self.assertEqual(first.sheetnames, ["索引", "加注明细", "加注明细_2"])
+        index_rows = list(first["索引"].iter_rows(min_row=2, values_only=True))
+        self.assertEqual(index_rows[-1], ("split_refueling_part3.xlsx", "加注明细_5", 7, 7, 1))
+        first.close()
+
+        written = []
+        for path in part_paths:
+            wb = load_workbook(path)
+            for ws in wb.worksheets:
+                if ws.title != "索引":
+                    written.extend(row[0] for row in ws.iter_rows(min_row=2, values_only=True))
+            wb.close()
+        self.assertEqual(written, list(range(1, 8)))
+
+    def test_plan_refueling_pieces(self):
+        """
+        测试拆分计划：未超出预算时只有一个工作表，预算非法时抛出异常
+        """
+        pieces = plan_refueling_pieces("out.xlsx", 0)
+        self.assertEqual(pieces, [{'path': "out.xlsx", 'sheets': [{'title': "加注明细", 'first_row': 1, 'row_count': 0}]}])
+        self.assertEqual(len(plan_refueling_pieces("out.xlsx", 5, rows_per_sheet=2)[0]['sheets']), 3)
+        with self.assertRaises(ValueError):
+            plan_refueling_pieces("out.xlsx", 5, rows_per_sheet=0)
+
+    def test_zero_row_budget_is_rejected(self):
+        """
+        测试generate_report传递为0的行数预算，报表生成失败而不是写出未拆分的文件
+        """
+        output_path = os.path.join(self.test_output_dir, "zero_budget.xlsx")
+        result = self.refueling_handler.generate_report(
+            refueling_data=self.test_data,
+            output_file_path=output_path,
+            device_code=self.device_code,
+            columns=self.columns,
+            rows_per_file=0
+        )
+        self.assertFalse(result)
+        self.assertFalse(os.path.exists(output_path))
+
+
 if __name__ == '__main__':
     unittest.main()
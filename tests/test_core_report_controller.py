@@ -5,7 +5,7 @@ import os
 import sys
 import tempfile
 import unittest
-from datetime import date
+from datetime import date, datetime
 from unittest.mock import MagicMock, Mock, patch, mock_open
 
 # 添加项目根目录到sys.path
@@ -17,8 +17,14 @@ from src.core.report_controller import (
     generate_inventory_reports,
     generate_customer_statement,
     generate_both_reports,
-    _load_config
+    generate_error_summary_report,
+    _load_config,
+    _refueling_options,
+    _render_report,
+    _submit_fleet_reports,
+    _use_fleet_compute
 )
+from src.core.data_manager import ReportDataManager
 from tests.base_test import BaseTestCase
 
 
@@ -219,3 +225,132 @@ class TestCoreReportController(BaseTestCase):
         mock_db_instance.connect.assert_called_once()
         mock_db_instance.get_latest_device_id_and_customer_id.assert_called_once()
         mock_db_instance.get_customer_name_by_device_code.assert_called_once()
+
+    def _summary_config(self):
+        return {
+            "db_config": {},
+            "sql_templates": {
+                "error_summary_main_query": "SELECT * FROM summary WHERE d BETWEEN '{start_date_str}' AND '{end_date_str}'",
+                "error_summary_offline_query": "SELECT * FROM offline",
+            },
+            "report_options": {"stream_error_summary": True},
+        }
+
+    @patch("src.ui.date_dialog.get_date_range", return_value=("2025-01-01", "2025-01-10"))
+    @patch("src.core.report_controller.file_dialog_selector")
+    @patch("src.core.report_controller.DatabaseHandler")
+    def test_error_summary_asks_directory_before_query(self, mock_db_handler, mock_file_dialog_selector, mock_get_date_range):
+        """测试误差汇总在执行查询前选择输出目录，取消时不连接数据库"""
+        mock_file_dialog_selector.choose_directory.return_value = ""
+
+        generate_error_summary_report(query_config=self._summary_config())
+
+        mock_file_dialog_selector.choose_directory.assert_called_once()
+        mock_db_handler.assert_not_called()
+
+    @patch("src.core.report_controller.ConsumptionErrorSummaryGenerator")
+    @patch("src.ui.date_dialog.get_date_range", return_value=("2025-01-01", "2025-01-10"))
+    @patch("src.core.report_controller.file_dialog_selector")
+    @patch("src.core.report_controller.DatabaseHandler")
+    def test_error_summary_stream_closed_on_failure(self, mock_db_handler, mock_file_dialog_selector,
+                                                    mock_get_date_range, mock_summary_generator):
+        """测试流式误差汇总写入失败时仍释放数据流"""
+        mock_file_dialog_selector.choose_directory.return_value = self.test_output_dir
+        summary_stream = MagicMock()
+        summary_stream.__iter__.return_value = iter([{"device_code": "D1"}])
+        mock_db_handler.return_value.iter_dict_rows.side_effect = [iter([]), summary_stream]
+        mock_summary_generator.aggregate_offline_events.return_value = {}
+        mock_summary_generator.return_value.generate_report.side_effect = RuntimeError("写入失败")
+
+        with patch("src.core.report_controller._save_error_log"):
+            generate_error_summary_report(query_config=self._summary_config())
+
+        summary_stream.close.assert_called_once()
+
+    def test_render_report_raises_when_generator_fails(self):
+        """测试报表生成器返回False时_render_report抛出异常，执行器记录为失败"""
+        output_path = os.path.join(self.test_output_dir, "failed_refueling.xlsx")
+        task = ('refueling', {
+            'refueling_data': [(1, '2025-07-01 08:00:00')],
+            'output_file_path': output_path,
+            'device_code': "DEV001",
+            'columns': ['订单序号', '加注时间'],
+            'rows_per_file': 0,
+        })
+        with self.assertRaises(Exception):
+            _render_report(task)
+        self.assertFalse(os.path.exists(output_path))
+
+    def test_refueling_options_reject_invalid_budgets(self):
+        """测试加注明细行数预算在处理设备前检查，0、字符串和布尔值均报错"""
+        self.assertEqual(
+            _refueling_options({'refueling_rows_per_sheet': 1000}),
+            {'rows_per_sheet': 1000, 'rows_per_file': None, 'export_format': None},
+        )
+        for options in ({'refueling_rows_per_sheet': 0}, {'refueling_rows_per_file': "1000"},
+                        {'refueling_rows_per_file': True}):
+            with self.assertRaises(ValueError):
+                _refueling_options(options)
+
+    def test_use_fleet_compute_only_without_state_store_or_cache(self):
+        """测试批量误差计算只在未配置每日状态存储和聚合结果缓存时生效"""
+        self.assertFalse(_use_fleet_compute({}, None, None))
+        self.assertTrue(_use_fleet_compute({'fleet_compute': True}, None, None))
+        self.assertFalse(_use_fleet_compute({'fleet_compute': True}, Mock(), None))
+        self.assertFalse(_use_fleet_compute({'fleet_compute': True}, None, Mock()))
+
+    def test_fleet_reports_match_per_device_errors(self):
+        """测试批量计算后按设备切出的误差与逐台设备计算一致，并按设备提交报表"""
+        columns = ["加注时间", "油品名称", "油加注值", "原油剩余量"]
+        raw_data_list = [
+            ([], columns, [
+                (datetime(2025, 6, 30, 8), "切削液", 5.0, 95.0),
+                (datetime(2025, 7, 1, 8), "切削液", 4.0, 90.0),
+                (datetime(2025, 7, 1, 18), "切削液", 2.0, 150.0),
+            ]),
+            ([], columns, [(datetime(2025, 7, 2, 9), "液压油", 3.0, 60.0), (datetime(2025, 7, 3, 9), "液压油", 1.5, 57.0)]),
+        ]
+        barrel_counts = [1, 2]
+        data_manager = ReportDataManager(None)
+        for generator_name in ('daily_error', 'monthly_error'):
+            executor = Mock()
+            fleet_reports = [
+                (f"DEV{index}", barrel_counts[index],
+                 {'start_date': date(2025, 6, 30), 'end_date': date(2025, 7, 3), 'error_data': None})
+                for index in range(2)
+            ]
+            fleet_raw_data = list(raw_data_list)
+            _submit_fleet_reports(data_manager, executor, generator_name, fleet_raw_data, fleet_reports, Mock())
+
+            self.assertEqual(fleet_raw_data, [])
+            self.assertEqual(executor.submit.call_count, 2)
+            for index, submit_call in enumerate(executor.submit.call_args_list):
+                device_code, func, (name, report_kwargs), _ = submit_call.args
+                self.assertEqual((device_code, func, name), (f"DEV{index}", _render_report, generator_name))
+                if generator_name == 'daily_error':
+                    expected = data_manager.calculate_daily_errors(raw_data_list[index], barrel_counts[index])
+                else:
+                    expected = data_manager.calculate_monthly_errors(
+                        raw_data_list[index], "2025-06-30", "2025-07-03", barrel_counts[index]
+                    )
+                for key, values in expected.items():
+                    self.assertEqual(report_kwargs['error_data'][key].keys(), values.keys(), key)
+                    for period, value in values.items():
+                        if isinstance(value, dict):
+                            self.assertAlmostEqual(report_kwargs['error_data'][key][period]['value'], value['value'])
+                        else:
+                            self.assertAlmostEqual(report_kwargs['error_data'][key][period], value)
+
+    def test_fleet_compute_failure_marks_every_device_failed(self):
+        """测试批量计算失败时每台设备都以失败回调，不提交报表"""
+        data_manager = Mock()
+        data_manager.calculate_fleet_errors.side_effect = RuntimeError("计算失败")
+        executor = Mock()
+        on_done = Mock()
+        _submit_fleet_reports(
+            data_manager, executor, 'daily_error', [Mock(), Mock()],
+            [("DEV0", 1, {}), ("DEV1", 1, {})], on_done,
+        )
+        executor.submit.assert_not_called()
+        self.assertEqual([call.args[0] for call in on_done.call_args_list], ["DEV0", "DEV1"])
+        self.assertIsInstance(on_done.call_args.args[2], RuntimeError)
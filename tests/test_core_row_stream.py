@@ -0,0 +1,86 @@
+"""
+core.row_stream 模块及数据管理器流式计算的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, datetime, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.data_manager import ReportDataManager
+from src.core.row_stream import InventoryAccumulator, PeriodStateAccumulator, RowStream, UsageAccumulator
+from tests.base_test import BaseTestCase
+
+COLUMNS = ["加注时间", "油品名称", "油加注值", "原油剩余量"]
+
+
+def make_rows():
+    """生成按时间升序排列、跨月并包含加油的测试数据"""
+    rows = []
+    inventory = 400.0
+    start = datetime(2025, 6, 28, 8)
+    for offset in range(12):
+        current = start + timedelta(hours=offset * 9)
+        if offset == 5:
+            inventory += 120.0
+        inventory -= 7.5
+        rows.append((current, "切削液", 6.0 + offset % 3, inventory))
+    return rows
+
+
+class TestRowStream(BaseTestCase):
+    """RowStream 与聚合器的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.rows = make_rows()
+        self.manager = ReportDataManager(db_handler=None)
+
+    def batched_stream(self, batch_size=4):
+        batches = (self.rows[i:i + batch_size] for i in range(0, len(self.rows), batch_size))
+        return RowStream(COLUMNS, batches, batched=True)
+
+    def test_stream_results_match_materialized_data(self):
+        """测试数据流计算结果与物化数据计算结果一致"""
+        # 物化数据按数据库的降序排列
+        raw_data = ([], COLUMNS, list(reversed(self.rows)))
+
+        self.assertEqual(self.manager.calculate_daily_errors(self.batched_stream(), 2),
+                         self.manager.calculate_daily_errors(raw_data, 2))
+        self.assertEqual(self.manager.calculate_monthly_errors(self.batched_stream(), "2025-06-01", "2025-08-31"),
+                         self.manager.calculate_monthly_errors(raw_data, "2025-06-01", "2025-08-31"))
+        self.assertEqual(self.manager.calculate_daily_usage(self.batched_stream()),
+                         self.manager.calculate_daily_usage(raw_data))
+        self.assertEqual(self.manager.calculate_monthly_usage(self.batched_stream(), "2025-06-01", "2025-07-31"),
+                         [("2025-07", sum(row[2] for row in self.rows))])
+
+    def test_consume_feeds_multiple_accumulators_in_one_pass(self):
+        """测试一次遍历同时计算库存、用量和每日状态"""
+        inventory, usage, states = self.batched_stream().consume(
+            InventoryAccumulator(),
+            UsageAccumulator(lambda order_time: order_time.date()),
+            PeriodStateAccumulator(lambda order_time: order_time.date()),
+        )
+
+        self.assertEqual(inventory.result()[-1], (date(2025, 7, 2), self.rows[-1][3]))
+        self.assertEqual(len(usage.result()), len(states.result()))
+        self.assertEqual(states.oil_name, "切削液")
+
+    def test_stream_can_only_be_consumed_once(self):
+        """测试数据流只能被消费一次"""
+        stream = RowStream(COLUMNS, iter(self.rows))
+        list(stream)
+        with self.assertRaises(RuntimeError):
+            list(stream)
+
+    def test_unsorted_stream_is_rejected(self):
+        """测试未按时间升序排列的数据流会被拒绝"""
+        stream = RowStream(COLUMNS, reversed(self.rows))
+        with self.assertRaises(ValueError):
+            self.manager.calculate_daily_errors(stream)
+
+
+if __name__ == "__main__":
+    unittest.main()
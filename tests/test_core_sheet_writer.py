@@ -0,0 +1,70 @@
+"""
+core.sheet_writer 模块的单元测试
+"""
+import os
+import sys
+import unittest
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import Workbook
+
+from src.core.sheet_writer import SheetWriter
+from tests.base_test import BaseTestCase
+
+
+class TestSheetWriter(BaseTestCase):
+    """SheetWriter 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.wb = Workbook()
+        self.ws = self.wb.active
+        self.ws["B2"] = "合并"
+        self.ws.merge_cells("B2:C3")
+
+    def test_merged_map_matches_worksheet(self):
+        """测试合并单元格映射与工作表的合并区域一致，新合并的区域同步更新"""
+        writer = SheetWriter(self.ws)
+        for row in range(1, 6):
+            for column in range(1, 6):
+                coordinate = self.ws.cell(row=row, column=column).coordinate
+                self.assertEqual(writer.is_merged(row, column), coordinate in self.ws.merged_cells)
+        writer.merge(5, 1, 6, 1)
+        self.assertTrue(writer.is_merged(6, 1))
+        self.assertIn("A5:A6", self.ws.merged_cells)
+        self.assertIs(writer.cell(3, 3), self.ws["B2"])
+
+    def test_bulk_writes_skip_merged_cells(self):
+        """测试按行、列和区域写入时跳过合并区域，write_anchor只写入合并区域左上角"""
+        writer = SheetWriter(self.ws)
+        writer.write_block(1, 1, [[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        self.assertEqual([[cell.value for cell in row] for row in self.ws["A1:C3"]],
+                         [[1, 2, 3], [4, "合并", None], [7, None, None]])
+        writer.write_row(4, 2, ["x", "y"])
+        writer.write_column(2, 4, ["p", "q"])
+        self.assertEqual((self.ws["B4"].value, self.ws["C4"].value), ("x", "y"))
+        self.assertEqual((self.ws["D2"].value, self.ws["D3"].value), ("p", "q"))
+
+        self.assertFalse(writer.write(2, 2, "新值"))
+        self.assertTrue(writer.write_anchor(2, 2, "新值"))
+        self.assertFalse(writer.write_anchor(3, 3, "忽略"))
+        self.assertEqual(self.ws["B2"].value, "新值")
+
+    def test_clear_keeps_merged_cells_and_formats(self):
+        """测试清除区域时合并区域和单元格格式保持不变，不为空白区域创建单元格"""
+        self.ws["A1"] = 1
+        self.ws["A1"].number_format = "0.00"
+        self.ws["D4"] = "区域外"
+        cell_count = len(self.ws._cells)
+        SheetWriter(self.ws).clear(1, 1, 3, 10)
+        self.assertIsNone(self.ws["A1"].value)
+        self.assertEqual(self.ws["A1"].number_format, "0.00")
+        self.assertEqual(self.ws["B2"].value, "合并")
+        self.assertEqual(self.ws["D4"].value, "区域外")
+        self.assertEqual(len(self.ws._cells), cell_count)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+core.style_registry 模块的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from src.core.consumption_error_handler import ConsumptionErrorSummaryGenerator
+from src.core.style_registry import ZEBRA_SUFFIX, StyleRegistry
+from tests.base_test import BaseTestCase
+
+
+class TestStyleRegistry(BaseTestCase):
+    """StyleRegistry 的单元测试"""
+
+    def test_register_once_and_apply_by_name_or_index(self):
+        """测试同名样式只注册一次，按名称和索引应用的结果相同"""
+        wb = Workbook()
+        styles = StyleRegistry(wb, {})
+        index = styles.register("粗体", font=Font(bold=True), number_format="0.00")
+        self.assertEqual(styles.register("粗体", font=Font(italic=True)), index)
+        self.assertEqual(wb.named_styles.count("粗体"), 1)
+
+        ws = wb.active
+        styles.apply(ws["A1"], "粗体")
+        styles.apply_row(ws, 2, [index, index], start_column=2)
+        for cell in (ws["A1"], ws["B2"], ws["C2"]):
+            self.assertTrue(cell.font.b)
+            self.assertEqual(cell.number_format, "0.00")
+            self.assertEqual(cell.style, "粗体")
+
+        # 修改单元格样式不影响注册表中的样式
+        ws["A1"].number_format = "0%"
+        self.assertEqual(ws["B2"].number_format, "0.00")
+
+    def test_data_styles_have_zebra_variants(self):
+        """测试数据行样式带有交替行填充变体，自带填充的样式不生成变体"""
+        styles = StyleRegistry(Workbook())
+        styles.index("数据" + ZEBRA_SUFFIX)
+        styles.index("数据_百分比" + ZEBRA_SUFFIX)
+        with self.assertRaises(KeyError):
+            styles.index("数据_百分比_警告" + ZEBRA_SUFFIX)
+
+    def test_summary_report_styles(self):
+        """测试误差汇总报表的表头、斑马纹、数字格式和警告样式"""
+        summary_data = [
+            {'device_code': 'D1', 'customer_name': '客户A', 'total_order_volume': 100.0,
+             'total_inventory_consumption': 101.0, 'days_in_range': 10, 'offline_events': []},
+            {'device_code': 'D2', 'customer_name': '客户B', 'total_order_volume': 100.0,
+             'total_inventory_consumption': 120.0, 'days_in_range': 10,
+             'offline_events': [{'create_time': datetime(2025, 1, 2), 'biz_type': 2,
+                                 'recovery_time': datetime(2025, 1, 3)}]},
+        ]
+        output_path = os.path.join(self.test_output_dir, "summary_styles.xlsx")
+        self.assertTrue(ConsumptionErrorSummaryGenerator().generate_report(
+            summary_data, output_path, start_date="2025-01-01", end_date="2025-01-10"
+        ))
+
+        wb = load_workbook(output_path)
+        try:
+            ws = wb["设备误差汇总"]
+            self.assertEqual(ws["A3"].fill.fgColor.rgb, "004F81BD")
+            self.assertTrue(ws["L3"].font.b)
+            self.assertEqual(ws["A4"].alignment.horizontal, "center")
+            self.assertEqual(ws["A4"].border.left.style, "thin")
+            self.assertIsNone(ws["B4"].fill.fill_type)
+            self.assertEqual(ws["I4"].number_format, "0.00")
+            self.assertEqual(ws["J4"].number_format, "0.00%")
+            # 第二行数据：斑马纹、误差超过5%高亮、备注警告字体
+            self.assertEqual(ws["B5"].fill.fgColor.rgb, "00DCE6F1")
+            self.assertEqual(ws["J5"].fill.fgColor.rgb, "00FFC7CE")
+            self.assertEqual(ws["J5"].number_format, "0.00%")
+            self.assertEqual(ws["L5"].font.color.rgb, "009C0006")
+            self.assertTrue(ws["L5"].alignment.wrap_text)
+            self.assertEqual(ws["L5"].fill.fgColor.rgb, "00DCE6F1")
+            self.assertEqual(wb["非单桶设备编码"]["A1"].font.sz, 16)
+        finally:
+            wb.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,188 @@
+"""
+core.table_export 模块的单元测试
+"""
+import csv
+import json
+import os
+import sys
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.consumption_error_handler import (
+    DAILY_ERROR_COLUMNS,
+    SUMMARY_COLUMNS,
+    ConsumptionErrorSummaryGenerator,
+    DailyConsumptionErrorReportGenerator,
+)
+from src.core.refueling_details_handler import RefuelingDetailsReportGenerator
+from src.core.table_export import (
+    PYARROW_AVAILABLE,
+    TableExportWriter,
+    _infer_parquet_types,
+    _to_parquet_value,
+    export_table,
+    parse_export_formats,
+)
+from tests.base_test import BaseTestCase
+
+
+class TestTableExport(BaseTestCase):
+    """表格导出的单元测试"""
+
+    def _read_csv(self, path):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.reader(f))
+
+    def _read_jsonl(self, path):
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_parse_export_formats(self):
+        """测试导出格式解析：默认只生成xlsx，支持逗号分隔和列表，未知格式报错"""
+        self.assertEqual(parse_export_formats(None), (True, []))
+        self.assertEqual(parse_export_formats("csv"), (False, ["csv"]))
+        self.assertEqual(parse_export_formats("XLSX, jsonl,csv,jsonl"), (True, ["jsonl", "csv"]))
+        self.assertEqual(parse_export_formats(["parquet", "xlsx"]), (True, ["parquet"]))
+        with self.assertRaises(ValueError):
+            parse_export_formats("xls")
+
+    def test_csv_and_jsonl_written_in_one_pass(self):
+        """测试同一次遍历写出CSV和JSON Lines，日期和Decimal可以序列化"""
+        rows = iter([[date(2025, 1, 1), Decimal("1.50")], [date(2025, 1, 2), None]])
+        paths = export_table(
+            os.path.join(self.test_output_dir, "table.xlsx"), ["日期", "用量"], rows, ["csv", "jsonl"]
+        )
+        csv_path = os.path.join(self.test_output_dir, "table.csv")
+        jsonl_path = os.path.join(self.test_output_dir, "table.jsonl")
+        self.assertEqual(paths, [csv_path, jsonl_path])
+        self.assertEqual(self._read_csv(csv_path), [["日期", "用量"], ["2025-01-01", "1.50"], ["2025-01-02", ""]])
+        self.assertEqual(self._read_jsonl(jsonl_path), [
+            {"日期": "2025-01-01", "用量": 1.5}, {"日期": "2025-01-02", "用量": None},
+        ])
+
+    @unittest.skipUnless(PYARROW_AVAILABLE, "未安装pyarrow")
+    def test_parquet_written_in_batches(self):
+        """测试Parquet按批写入，行数和列名正确"""
+        import pyarrow.parquet as pq
+
+        base_path = os.path.join(self.test_output_dir, "batched")
+        with TableExportWriter(base_path, ["序号", "值"], ["parquet"], batch_rows=2) as writer:
+            writer.write_rows([i, float(i)] for i in range(5))
+        table = pq.read_table(base_path + ".parquet")
+        self.assertEqual(table.column_names, ["序号", "值"])
+        self.assertEqual(table.column("序号").to_pylist(), [0, 1, 2, 3, 4])
+
+    def test_parquet_types_inferred_with_fallback(self):
+        """测试未声明列类型时的推断：数值列统一为float64，全为空或类型混杂的列为string"""
+        batch = [
+            [1, None, date(2025, 1, 1), "a", 1],
+            [2.5, None, datetime(2025, 1, 2, 8), 3, None],
+            [Decimal("1.5"), None, None, None, True],
+        ]
+        self.assertEqual(
+            _infer_parquet_types(batch, 6),
+            ["float64", "string", "timestamp", "string", "string", "string"],
+        )
+        self.assertEqual(_to_parquet_value("float64", 3), 3.0)
+        self.assertEqual(_to_parquet_value("string", 1.5), "1.5")
+        self.assertEqual(_to_parquet_value("date", datetime(2025, 1, 2, 8)), date(2025, 1, 2))
+        self.assertEqual(_to_parquet_value("timestamp", date(2025, 1, 2)), datetime(2025, 1, 2))
+        self.assertIsNone(_to_parquet_value("int64", None))
+        with self.assertRaises(ValueError):
+            _to_parquet_value("float64", "-")
+
+    def test_declared_column_types_validated(self):
+        """测试声明的列类型数量和取值在打开文件前校验"""
+        base_path = os.path.join(self.test_output_dir, "typed")
+        with self.assertRaises(ValueError):
+            TableExportWriter(base_path, ["日期", "值"], ["csv"], column_types=["date"])
+        with self.assertRaises(ValueError):
+            TableExportWriter(base_path, ["日期", "值"], ["csv"], column_types=["date", "decimal"])
+        self.assertFalse(os.path.exists(base_path + ".csv"))
+
+    @unittest.skipUnless(PYARROW_AVAILABLE, "未安装pyarrow")
+    def test_parquet_schema_stable_across_batches(self):
+        """测试第一批为空值或整数的列，之后的批次出现小数时仍能写入"""
+        import pyarrow.parquet as pq
+
+        base_path = os.path.join(self.test_output_dir, "inferred")
+        with TableExportWriter(base_path, ["备注", "值"], ["parquet"], batch_rows=2) as writer:
+            writer.write_rows([[None, 1], [None, 2], ["离线", 2.5]])
+        table = pq.read_table(base_path + ".parquet")
+        self.assertEqual(table.column("备注").to_pylist(), [None, None, "离线"])
+        self.assertEqual(table.column("值").to_pylist(), [1.0, 2.0, 2.5])
+
+        base_path = os.path.join(self.test_output_dir, "declared")
+        with TableExportWriter(
+            base_path, ["日期", "值"], ["parquet"], batch_rows=1, column_types=["date", "float64"]
+        ) as writer:
+            writer.write_rows([[date(2025, 1, 1), None], [date(2025, 1, 2), 3]])
+        table = pq.read_table(base_path + ".parquet")
+        self.assertEqual(str(table.schema.field("值").type), "double")
+        self.assertEqual(table.column("值").to_pylist(), [None, 3.0])
+
+    def test_daily_report_exports_without_xlsx(self):
+        """测试每日误差报表只导出表格格式时不生成xlsx"""
+        inventory_data = [(date(2025, 1, 1), 500.0), (date(2025, 1, 2), 480.0)]
+        error_data = {
+            'daily_order_totals': {date(2025, 1, 2): 18.0},
+            'daily_consumption': {date(2025, 1, 2): 20.0},
+            'daily_shortage_errors': {date(2025, 1, 2): 2.0},
+        }
+        output_path = os.path.join(self.test_output_dir, "daily.xlsx")
+        self.assertTrue(DailyConsumptionErrorReportGenerator().generate_daily_consumption_error_report_with_chart(
+            inventory_data, error_data, output_path, "DEV1", date(2025, 1, 1), date(2025, 1, 2),
+            export_format="csv,jsonl",
+        ))
+        self.assertFalse(os.path.exists(output_path))
+        rows = self._read_csv(os.path.join(self.test_output_dir, "daily.csv"))
+        self.assertEqual(rows[0], DAILY_ERROR_COLUMNS)
+        self.assertEqual(len(rows), 3)
+        records = self._read_jsonl(os.path.join(self.test_output_dir, "daily.jsonl"))
+        self.assertEqual(records[1]["日期"], "2025-01-02")
+        self.assertEqual(records[1]["库存消耗总量(L)"], 20.0)
+        self.assertEqual(records[1]["中润亏损(L)"], 2.0)
+
+    def test_summary_exports_computed_values(self):
+        """测试误差汇总报表导出公式列的计算结果"""
+        summary_data = [{
+            'device_code': 'D1', 'customer_name': '客户A', 'total_order_volume': 100.0,
+            'total_inventory_consumption': 110.0, 'days_in_range': 10,
+            'offline_events': [{'create_time': datetime(2025, 1, 2), 'biz_type': 2,
+                                'recovery_time': datetime(2025, 1, 3)}],
+        }]
+        output_path = os.path.join(self.test_output_dir, "summary.xlsx")
+        self.assertTrue(ConsumptionErrorSummaryGenerator().generate_report(
+            summary_data, output_path, start_date="2025-01-01", end_date="2025-01-10", export_format="jsonl"
+        ))
+        self.assertFalse(os.path.exists(output_path))
+        records = self._read_jsonl(os.path.join(self.test_output_dir, "summary.jsonl"))
+        self.assertEqual(list(records[0]), SUMMARY_COLUMNS)
+        record = records[0]
+        self.assertEqual(record["误差值总数(L)"], 10.0)
+        self.assertEqual(record["平均每日误差(L)"], 1.0)
+        self.assertAlmostEqual(record["误差百分比(%)"], 0.1)
+        self.assertEqual(record["累计离线时长(小时)"], 24.0)
+        self.assertEqual(record["备注"], "2025-01-02 00:00离线至2025-01-03 00:00恢复")
+
+    def test_refueling_stream_exports_alongside_xlsx(self):
+        """测试加注明细数据流在写xlsx的同时导出CSV"""
+        columns = ["订单序号", "油加注值"]
+        output_path = os.path.join(self.test_output_dir, "refueling.xlsx")
+        self.assertTrue(RefuelingDetailsReportGenerator().generate_refueling_details_report(
+            iter([[1, 2.5], [2, 3.0]]), output_path, "DEV1", date(2025, 1, 1), date(2025, 1, 2),
+            columns=columns, export_format="xlsx,csv",
+        ))
+        self.assertTrue(os.path.exists(output_path))
+        self.assertEqual(
+            self._read_csv(os.path.join(self.test_output_dir, "refueling.csv")),
+            [columns, ["1", "2.5"], ["2", "3.0"]],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
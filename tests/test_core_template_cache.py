@@ -0,0 +1,92 @@
+"""
+core.template_cache 模块的单元测试
+"""
+import os
+import shutil
+import sys
+import unittest
+from unittest.mock import patch
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import Workbook, load_workbook
+
+from src.core import template_cache
+from src.core.cache_signing import SIGNATURE_SIZE
+from src.core.template_cache import clear_template_cache, load_template
+from tests.base_test import BaseTestCase
+
+
+class TestTemplateCache(BaseTestCase):
+    """load_template 的单元测试"""
+
+    def setUp(self):
+        super().setUp()
+        clear_template_cache()
+        self.template_path = os.path.join(self.test_output_dir, "cached_template.xlsx")
+        wb = Workbook()
+        wb.active.title = "中润对账单"
+        wb.active["A1"] = "模板"
+        wb.active.merge_cells("A1:C1")
+        wb.save(self.template_path)
+        self.cache_dir = os.path.join(self.test_output_dir, "template_cache")
+
+    def tearDown(self):
+        clear_template_cache()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+    def test_template_parsed_once_and_copies_are_independent(self):
+        """测试同一进程内模板只解析一次，每次返回互不影响的副本"""
+        with patch.object(template_cache, "_parse_template", wraps=template_cache._parse_template) as parse:
+            first = load_template(self.template_path)
+            first["中润对账单"]["A1"] = "客户A"
+            second = load_template(self.template_path)
+
+        self.assertEqual(parse.call_count, 1)
+        self.assertEqual(second["中润对账单"]["A1"].value, "模板")
+        self.assertIn("A1:C1", [str(r) for r in second["中润对账单"].merged_cells.ranges])
+
+    def test_persisted_cache_reused_and_invalidated(self):
+        """测试持久化缓存跨进程复用，模板修改后重新解析"""
+        load_template(self.template_path, self.cache_dir)
+        clear_template_cache()
+        with patch.object(template_cache, "_parse_template") as parse:
+            wb = load_template(self.template_path, self.cache_dir)
+        parse.assert_not_called()
+        self.assertEqual(wb["中润对账单"]["A1"].value, "模板")
+
+        modified = load_workbook(self.template_path)
+        modified["中润对账单"]["A1"] = "新模板"
+        modified.save(self.template_path)
+        clear_template_cache()
+        self.assertEqual(load_template(self.template_path, self.cache_dir)["中润对账单"]["A1"].value, "新模板")
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_unsigned_cache_file_is_not_unpickled(self):
+        """测试签名不匹配的缓存文件（其他人写入或篡改）不被反序列化，重新解析模板并覆盖"""
+        load_template(self.template_path, self.cache_dir)
+        clear_template_cache()
+        cache_file = os.path.join(self.cache_dir, os.listdir(self.cache_dir)[0])
+        with open(cache_file, "rb") as f:
+            payload = f.read()[SIGNATURE_SIZE:]
+        with open(cache_file, "wb") as f:
+            f.write(b"\0" * SIGNATURE_SIZE + payload)
+
+        with patch.object(template_cache.pickle, "loads", wraps=template_cache.pickle.loads) as loads, \
+                patch.object(template_cache, "_parse_template", wraps=template_cache._parse_template) as parse:
+            wb = load_template(self.template_path, self.cache_dir)
+        parse.assert_called_once()
+        # 只反序列化了重新解析的结果，没有反序列化被篡改的文件
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(wb["中润对账单"]["A1"].value, "模板")
+
+        clear_template_cache()
+        with patch.object(template_cache, "_parse_template") as parse:
+            load_template(self.template_path, self.cache_dir)
+        parse.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
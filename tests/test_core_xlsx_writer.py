@@ -0,0 +1,147 @@
+"""
+core.xlsx_writer 模块的单元测试
+"""
+import os
+import sys
+import unittest
+from datetime import date, timedelta
+
+# 添加项目根目录到sys.path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import load_workbook
+
+from src.core.consumption_error_handler import (
+    DailyConsumptionErrorReportGenerator,
+    MonthlyConsumptionErrorReportGenerator,
+)
+from src.core.inventory_handler import InventoryReportGenerator
+from src.core.xlsx_writer import DirectWorkbook, create_workbook
+from tests.base_test import BaseTestCase
+
+
+class TestDirectXlsxWriter(BaseTestCase):
+    """DirectWorkbook 与openpyxl写出结果的一致性测试"""
+
+    def setUp(self):
+        super().setUp()
+        self.start_date = date(2025, 1, 1)
+        self.end_date = date(2025, 1, 10)
+        days = [self.start_date + timedelta(days=offset) for offset in range(10)]
+        self.inventory_data = [(day, 500.0 - offset * 12.5) for offset, day in enumerate(days)]
+        self.daily_error_data = {
+            'daily_order_totals': {day: 10.0 + offset for offset, day in enumerate(days)},
+            'daily_shortage_errors': {days[2]: {'value': 1.5}},
+            'daily_excess_errors': {days[4]: 2.25},
+            'daily_consumption': {day: 12.5 for day in days},
+        }
+        self.monthly_error_data = {
+            'monthly_order_totals': {'2025-01': 300.0, '2025-02': 280.5},
+            'monthly_shortage_errors': {'2025-01': {'value': 3.0}},
+            'monthly_excess_errors': {'2025-02': 1.25},
+            'monthly_consumption': {'2025-01': 303.0, '2025-02': 279.25},
+        }
+
+    def _generate_both(self, generator, name, *args, **kwargs):
+        """分别用两种写出后端生成报表，返回两个输出路径"""
+        paths = []
+        for backend in ("openpyxl", "direct"):
+            path = os.path.join(self.test_output_dir, f"{name}_{backend}.xlsx")
+            generator.generate_report(
+                *args, output_file_path=path, device_code="DEV<1>&2",
+                start_date=self.start_date, end_date=self.end_date, oil_name="机油",
+                writer_backend=backend, **kwargs
+            )
+            paths.append(path)
+        return paths
+
+    def assertSameLayout(self, expected_path, actual_path):
+        """比较两个文件的单元格值、字体、对齐、合并区域、列宽和图表"""
+        expected_wb = load_workbook(expected_path)
+        actual_wb = load_workbook(actual_path)
+        try:
+            expected, actual = expected_wb.active, actual_wb.active
+            self.assertEqual(actual.title, expected.title)
+            self.assertEqual(actual.max_row, expected.max_row)
+            self.assertEqual(
+                sorted(str(r) for r in actual.merged_cells.ranges),
+                sorted(str(r) for r in expected.merged_cells.ranges),
+            )
+            for expected_row, actual_row in zip(expected.iter_rows(), actual.iter_rows()):
+                for expected_cell, actual_cell in zip(expected_row, actual_row):
+                    ref = expected_cell.coordinate
+                    self.assertEqual(actual_cell.value, expected_cell.value, ref)
+                    self.assertEqual(actual_cell.number_format, expected_cell.number_format, ref)
+                    self.assertEqual(actual_cell.font.b, expected_cell.font.b, ref)
+                    self.assertEqual(actual_cell.font.sz, expected_cell.font.sz, ref)
+                    self.assertEqual(
+                        getattr(actual_cell.font.color, "rgb", None),
+                        getattr(expected_cell.font.color, "rgb", None), ref
+                    )
+                    self.assertEqual(actual_cell.alignment.horizontal, expected_cell.alignment.horizontal, ref)
+                    self.assertEqual(actual_cell.alignment.wrap_text, expected_cell.alignment.wrap_text, ref)
+            for letter, dimension in expected.column_dimensions.items():
+                self.assertEqual(actual.column_dimensions[letter].width, dimension.width, letter)
+
+            self.assertEqual(len(actual._charts), len(expected._charts))
+            for expected_chart, actual_chart in zip(expected._charts, actual._charts):
+                self.assertEqual(actual_chart.anchor._from.col, expected_chart.anchor._from.col)
+                self.assertEqual(actual_chart.anchor._from.row, expected_chart.anchor._from.row)
+                self.assertEqual(
+                    [s.val.numRef.f for s in actual_chart.series],
+                    [s.val.numRef.f for s in expected_chart.series],
+                )
+        finally:
+            expected_wb.close()
+            actual_wb.close()
+
+    def test_inventory_report_matches_openpyxl(self):
+        """测试库存报表两种写出后端的版式一致"""
+        expected, actual = self._generate_both(
+            InventoryReportGenerator(), "inventory", inventory_data=self.inventory_data
+        )
+        self.assertSameLayout(expected, actual)
+
+    def test_daily_error_report_matches_openpyxl(self):
+        """测试每日消耗误差报表两种写出后端的版式一致"""
+        expected, actual = self._generate_both(
+            DailyConsumptionErrorReportGenerator(), "daily_error",
+            inventory_data=self.inventory_data, error_data=self.daily_error_data
+        )
+        self.assertSameLayout(expected, actual)
+
+    def test_monthly_error_report_matches_openpyxl(self):
+        """测试每月消耗误差报表两种写出后端的版式一致"""
+        expected, actual = self._generate_both(
+            MonthlyConsumptionErrorReportGenerator(), "monthly_error",
+            inventory_data=self.inventory_data, error_data=self.monthly_error_data
+        )
+        self.assertSameLayout(expected, actual)
+
+    def test_shared_strings_are_deduplicated(self):
+        """测试重复的文本只在共享字符串表中保存一次"""
+        wb = DirectWorkbook()
+        ws = wb.active
+        for _ in range(3):
+            ws.append(["相同文本", 1])
+        path = os.path.join(self.test_output_dir, "shared_strings.xlsx")
+        wb.save(path)
+
+        from zipfile import ZipFile
+        with ZipFile(path) as archive:
+            shared = archive.read("xl/sharedStrings.xml").decode("utf-8")
+        self.assertEqual(shared.count("相同文本"), 1)
+        loaded = load_workbook(path)
+        try:
+            self.assertEqual([cell.value for cell in loaded.active["A"]], ["相同文本"] * 3)
+        finally:
+            loaded.close()
+
+    def test_unknown_backend_raises(self):
+        """测试不支持的写出后端会抛出异常"""
+        with self.assertRaises(ValueError):
+            create_workbook("xlsxwriter")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,7 +7,7 @@ from unittest.mock import Mock, patch
 # 添加项目根目录到sys.path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
-from src.utils.date_utils import parse_date, validate_csv_data, validate_date_span
+from src.utils.date_utils import CalendarDimension, parse_date, validate_csv_data, validate_date_span
 from tests.base_test import BaseTestCase
 
 
@@ -290,5 +290,33 @@ class TestUtilsDateUtils(BaseTestCase):
         self.assertEqual(result, "2025-07-01")
 
 
+class TestCalendarDimension(BaseTestCase):
+    """CalendarDimension 类的单元测试"""
+
+    def test_day_lookup(self):
+        """测试按日期查询月份键、月份序号和ISO周"""
+        calendar = CalendarDimension(date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual(
+            calendar.day(datetime(2025, 7, 15, 10, 30)),
+            (date(2025, 7, 15), "2025-07", 2025 * 12 + 6, (2025, 29)),
+        )
+        self.assertEqual(calendar.iso_week(date(2025, 12, 29)), (2026, 1))
+
+    def test_date_range_extends_table(self):
+        """测试超出预计算范围时自动扩展，并与逐日累加结果一致"""
+        calendar = CalendarDimension(date(2025, 7, 1), date(2025, 7, 31))
+        result = calendar.date_range(datetime(2025, 6, 28), datetime(2025, 8, 2))
+        self.assertEqual(result, get_date_range(date(2025, 6, 28), date(2025, 8, 2)))
+        self.assertEqual(calendar.date_range(date(2025, 7, 2), date(2025, 7, 1)), [])
+
+    def test_month_range_crosses_year(self):
+        """测试跨年月份范围"""
+        calendar = CalendarDimension(date(2025, 1, 1), date(2025, 12, 31))
+        self.assertEqual(
+            calendar.month_range(date(2025, 11, 30), date(2026, 2, 1)),
+            ["2025-11", "2025-12", "2026-01", "2026-02"],
+        )
+
+
 if __name__ == "__main__":
     unittest.main()